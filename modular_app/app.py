@@ -22,11 +22,6 @@ from models import db, init_db
 # Create Flask app with explicit template folder
 # This is needed for Vercel deployment where api/index.py imports from parent dir
 template_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), 'templates'))
-print(f"🔍 Template directory set to: {template_dir}")
-print(f"🔍 __file__ is: {__file__}")
-print(f"🔍 Template dir exists: {os.path.exists(template_dir)}")
-if os.path.exists(template_dir):
-    print(f"🔍 Contents: {os.listdir(template_dir)}")
 app = Flask(__name__, template_folder=template_dir)
 
 # Load configuration
@@ -54,11 +49,14 @@ if database_url and database_url.startswith('postgres://'):
     database_url = database_url.replace('postgres://', 'postgresql://', 1)
 
 # Use PostgreSQL if available, otherwise SQLite for local development
-if database_url:
-    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
-else:
+if not database_url:
     # Local development uses SQLite
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os_module.path.join(basedir, "instance", "app.db")}'
+    database_url = f'sqlite:///{os_module.path.join(basedir, "instance", "app.db")}'
+
+# Pool profile (serverless / long-running), PgBouncer handling, keepalives
+# - see utils/db_connection.py
+from utils.db_connection import configure_database, init_connection_management
+configure_database(app, database_url)
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
@@ -81,6 +79,14 @@ if not os.environ.get('VERCEL'):
 
 # Initialize database
 init_db(app)
+init_connection_management(app, db)
+
+# ============================================================
+# Request instrumentation (queries, DB time, Server-Timing)
+# Registered before the tenant middleware so its lookups are counted
+# ============================================================
+from utils.request_metrics import init_request_metrics
+init_request_metrics(app)
 
 # ============================================================
 # Multi-tenant middleware
@@ -93,198 +99,12 @@ def before_request():
     return load_tenant()
 
 # ============================================================
-# Import and register blueprints
+# Register blueprints
+# Core blueprints load now; one-off migration / fix / diagnose blueprints
+# load on first use (MAINTENANCE_ROUTES=lazy|eager|off, see routes/registry.py)
 # ============================================================
-from routes.registration import registration_bp
-from routes.attendance import attendance_bp
-from routes.inventory import inventory_bp
-from routes.admin import admin_bp
-from routes.migration import migration_bp
-from routes.add_indexes import add_indexes_bp  # NEW: Performance optimization indexes
-from routes.optimize_db import optimize_db_bp  # NEW: Database optimization & diagnostics
-from routes.superadmin import superadmin_bp
-from routes.items import items_bp  # NEW: Professional items management
-from routes.expenses import expenses_bp  # NEW: Expenses tracking
-from routes.purchase_requests import purchase_request_bp, admin_purchase_bp  # NEW: Purchase requests
-from routes.customers import customers_bp  # NEW: Customer management
-from routes.vendors import vendors_bp  # NEW: Vendor management
-from routes.invoices import invoices_bp  # NEW: GST Invoicing
-from routes.tasks import tasks_bp  # NEW: Task management (admin)
-from routes.employee_tasks import employee_tasks_bp  # NEW: Task management (employee)
-from routes.employee_portal import employee_portal_bp  # NEW: Unified employee portal
-from routes.sales_orders import sales_order_bp  # NEW: Sales Order management
-from routes.delivery_challans import delivery_challan_bp  # NEW: Delivery Challan management
-from routes.gst_reports import gst_reports_bp  # NEW: GST Reports
-from routes.purchase_bills import purchase_bills_bp  # NEW: Purchase Bills management
-from routes.backup import backup_bp  # NEW: Backup & Restore
-from routes.subscription_migration import subscription_migration_bp  # NEW: Subscription management migration
-from routes.subscriptions import subscriptions_bp  # NEW: Subscription management
-from routes.subscription_indexes import subscription_indexes_bp  # NEW: Subscription performance indexes
-from routes.sku_migration import sku_migration_bp  # NEW: SKU constraint migration (global → per-tenant)
-from routes.password_reset_migration import password_reset_migration_bp  # NEW: Secure password reset tokens
-from routes.customer_portal import customer_portal_bp  # NEW: Customer self-service portal
-from routes.customer_orders import customer_orders_bp  # NEW: Customer orders admin
-from routes.employee_delivery import employee_delivery_bp  # NEW: Employee delivery portal with bottle tracking
-from routes.accounts import accounts_bp  # NEW: Bank/Cash Account Management (Phase 1)
-from routes.payroll import payroll_bp  # NEW: Payroll Management
-from routes.mrp_discount_migration import mrp_discount_migration_bp  # NEW: MRP & Discount features
-from routes.site_default_migration import site_default_migration_bp  # NEW: Default site feature
-from routes.barcode_migration import barcode_migration_bp  # NEW: Barcode scanner feature
-from routes.barcode_api import barcode_api_bp  # NEW: Barcode API endpoints
-from routes.loyalty_migration import loyalty_migration_bp  # NEW: Loyalty program feature
-from routes.loyalty import loyalty_bp  # NEW: Loyalty program API & admin pages
-from routes.loyalty_features_migration import loyalty_features_bp  # NEW: Loyalty birthday/anniversary + tiers
-from routes.tier_benefits_migration import tier_benefits_bp  # NEW: Tier benefits (earning/redemption multipliers)
-from routes.vendor_performance_migration import vendor_performance_bp  # NEW: Vendor performance optimization
-from routes.fix_attendance_cascade import fix_cascade_bp  # FIX: Attendance CASCADE delete
-from routes.add_invoice_public_token_column import add_invoice_public_token_bp  # MIGRATION: Add public_token column to invoices
-from routes.add_public_tokens import add_public_tokens_bp  # MIGRATION: Add public tokens to existing invoices
-from routes.public_invoice import public_invoice_bp  # PUBLIC: Public invoice view (no login required)
-from routes.commission_payments_migration import commission_payments_migration_bp  # MIGRATION: Create commission_payments table
-from routes.fix_item_discounts import fix_discounts_bp  # MIGRATION: Fix missing discount_percent
-from routes.fix_barcode_floats import fix_barcodes_bp  # MIGRATION: Fix barcodes with .0 suffix
-from routes.add_barcode_index import add_barcode_index_bp  # MIGRATION: Add barcode index for fast scanning
-from routes.add_special_day_bonus_columns import add_special_day_columns_bp  # MIGRATION: Add special day bonus columns
-from routes.scheduled_tasks import scheduled_tasks_bp  # NEW: Scheduled tasks for automated jobs (birthday/anniversary bonuses)
-from routes.diagnose_inventory_equity import diagnose_inventory_equity_bp  # DIAGNOSTIC: Check inventory equity status
-from routes.diagnose_trial_balance_detail import diagnose_trial_detail_bp  # DIAGNOSTIC: Check what trial balance sees
-from routes.diagnose_remaining_imbalance import diagnose_remaining_bp  # DIAGNOSTIC: Find remaining imbalance
-from routes.comprehensive_diagnosis import comprehensive_diagnosis_bp  # DIAGNOSTIC: Complete trial balance breakdown
-from routes.compare_trial_balance import compare_trial_balance_bp  # DIAGNOSTIC: Compare transactions vs fallback tables
-from routes.inventory_changes import inventory_changes_bp  # DIAGNOSTIC: Show inventory changes
-from routes.comprehensive_double_entry_migration import comprehensive_double_entry_migration_bp  # MIGRATION: Fix all data with double-entry
-from routes.gst_smart_invoice_migration import gst_smart_invoice_migration_bp  # MIGRATION: GST Smart Invoice Management
-from routes.gst_invoice_api import gst_invoice_api_bp  # API: GST Smart Invoice stock info
-from routes.create_attribute_tables import create_attribute_tables_bp  # MIGRATION: Create variant attributes tables
-from routes.add_attribute_values_column import add_attribute_values_column_bp  # MIGRATION: Add attribute_values column to items table
-from routes.add_purchase_bill_columns import add_purchase_bill_columns_bp  # MIGRATION: Add group_id and attribute_data_json to purchase_bill_items
-from routes.item_attributes_settings import item_attributes_settings_bp  # SETTINGS: Configure item attributes
-from routes.debug_equity import debug_equity_bp  # DEBUG: Check equity entries
-from routes.fix_inventory_equity_mismatch import fix_inventory_equity_mismatch_bp  # FIX: Adjust inventory equity when stock value changes
-from routes.fix_inventory_double_entry import fix_inventory_double_entry_bp  # FIX: Create missing inventory asset DEBIT entries
-from routes.fix_trial_balance_final import fix_trial_balance_final_bp  # FIX: Delete wrong entries and create correct ones
-from routes.fix_cash_bank_opening import fix_cash_bank_opening_bp  # FIX: Correct cash/bank opening balance equity
-from routes.diagnose_return_entries import diagnose_return_bp  # DEBUG: Diagnose return accounting entries
-from routes.diagnose_gst_entries import diagnose_gst_bp  # DEBUG: Diagnose GST entries
-from routes.fix_unpaid_return_entries import fix_unpaid_return_bp  # FIX: Add missing entries for unpaid returns
-from routes.remove_duplicate_equity import remove_duplicate_equity_bp  # FIX: Remove duplicate equity entries
-from routes.show_equity_entries import show_equity_entries_bp  # DEBUG: Show all equity entries
-from routes.final_balance_fix import final_balance_fix_bp  # FIX: Comprehensive final fix
-
-app.register_blueprint(registration_bp)
-app.register_blueprint(employee_portal_bp)  # Register unified portal
-app.register_blueprint(attendance_bp)
-app.register_blueprint(inventory_bp)
-app.register_blueprint(admin_bp)
-app.register_blueprint(migration_bp)
-app.register_blueprint(add_indexes_bp)  # Performance optimization indexes
-app.register_blueprint(optimize_db_bp)  # Database optimization & diagnostics
-app.register_blueprint(superadmin_bp)
-app.register_blueprint(items_bp)  # NEW: Register items blueprint
-app.register_blueprint(expenses_bp)  # NEW: Register expenses blueprint
-app.register_blueprint(purchase_request_bp)  # NEW: Employee purchase requests
-app.register_blueprint(admin_purchase_bp)  # NEW: Admin purchase management
-app.register_blueprint(customers_bp)  # NEW: Customer management
-app.register_blueprint(vendors_bp)  # NEW: Vendor management
-app.register_blueprint(invoices_bp)  # NEW: GST invoicing
-from routes.returns import returns_bp
-app.register_blueprint(returns_bp)  # NEW: Returns & Refunds management
-app.register_blueprint(tasks_bp)  # NEW: Task management (admin)
-app.register_blueprint(employee_tasks_bp)  # NEW: Task management (employee)
-app.register_blueprint(sales_order_bp)  # NEW: Sales Order management
-app.register_blueprint(delivery_challan_bp)  # NEW: Delivery Challan management
-app.register_blueprint(gst_reports_bp)  # NEW: GST Reports
-app.register_blueprint(purchase_bills_bp)  # NEW: Purchase Bills management
-app.register_blueprint(backup_bp)  # NEW: Backup & Restore
-app.register_blueprint(subscription_migration_bp)  # NEW: Subscription management migration
-app.register_blueprint(subscriptions_bp)  # NEW: Subscription management
-app.register_blueprint(subscription_indexes_bp)  # NEW: Subscription performance indexes
-app.register_blueprint(sku_migration_bp)  # NEW: SKU constraint migration
-app.register_blueprint(password_reset_migration_bp)  # NEW: Secure password reset tokens
-app.register_blueprint(customer_portal_bp)  # NEW: Customer self-service portal
-app.register_blueprint(customer_orders_bp)  # NEW: Customer orders admin
-app.register_blueprint(employee_delivery_bp)  # NEW: Employee delivery portal  # NEW: Customer orders admin
-app.register_blueprint(accounts_bp)  # NEW: Bank/Cash Account Management (Phase 1)
-app.register_blueprint(payroll_bp)  # NEW: Payroll Management
-app.register_blueprint(mrp_discount_migration_bp)  # NEW: MRP & Discount features
-app.register_blueprint(site_default_migration_bp)  # NEW: Default site feature
-app.register_blueprint(barcode_migration_bp)  # NEW: Barcode scanner feature
-app.register_blueprint(barcode_api_bp)  # NEW: Barcode API endpoints
-app.register_blueprint(loyalty_migration_bp)  # NEW: Loyalty program migration
-app.register_blueprint(loyalty_bp)  # NEW: Loyalty program API & admin pages
-app.register_blueprint(loyalty_features_bp)  # NEW: Loyalty birthday/anniversary + tiers
-app.register_blueprint(tier_benefits_bp)  # NEW: Tier benefits (earning/redemption multipliers)
-from routes.fix_inventory_equity import fix_inventory_equity_bp
-app.register_blueprint(fix_inventory_equity_bp)  # FIX: Create missing inventory equity entries
-app.register_blueprint(vendor_performance_bp)  # NEW: Vendor performance optimization
-app.register_blueprint(fix_cascade_bp)  # FIX: Attendance CASCADE delete issue
-app.register_blueprint(add_invoice_public_token_bp)  # MIGRATION: Add public_token column to invoices
-app.register_blueprint(add_public_tokens_bp)  # MIGRATION: Add public tokens to existing invoices
-app.register_blueprint(public_invoice_bp)  # PUBLIC: Public invoice view (no login required)
-app.register_blueprint(commission_payments_migration_bp)  # MIGRATION: Create commission_payments table
-app.register_blueprint(fix_discounts_bp)  # MIGRATION: Fix missing discount_percent
-app.register_blueprint(fix_barcodes_bp)  # MIGRATION: Fix barcodes with .0 suffix
-app.register_blueprint(add_barcode_index_bp)  # MIGRATION: Add barcode index for fast scanning
-app.register_blueprint(add_special_day_columns_bp)  # MIGRATION: Add special day bonus columns
-app.register_blueprint(scheduled_tasks_bp)  # NEW: Scheduled tasks (birthday/anniversary bonuses)
-app.register_blueprint(diagnose_inventory_equity_bp)  # DIAGNOSTIC: Check inventory equity status
-app.register_blueprint(diagnose_trial_detail_bp)  # DIAGNOSTIC: Check what trial balance sees
-app.register_blueprint(diagnose_remaining_bp)  # DIAGNOSTIC: Find remaining imbalance
-app.register_blueprint(comprehensive_diagnosis_bp)  # DIAGNOSTIC: Complete breakdown
-app.register_blueprint(compare_trial_balance_bp)  # DIAGNOSTIC: Compare sources
-app.register_blueprint(inventory_changes_bp)  # DIAGNOSTIC: Inventory changes
-app.register_blueprint(comprehensive_double_entry_migration_bp)  # MIGRATION: Fix all data
-app.register_blueprint(gst_smart_invoice_migration_bp)  # MIGRATION: GST Smart Invoice Management
-app.register_blueprint(gst_invoice_api_bp)  # API: GST Smart Invoice stock info
-app.register_blueprint(create_attribute_tables_bp)  # MIGRATION: Create variant attributes tables
-app.register_blueprint(add_attribute_values_column_bp)  # MIGRATION: Add attribute_values column to items table
-app.register_blueprint(add_purchase_bill_columns_bp)  # MIGRATION: Add group_id and attribute_data_json to purchase_bill_items
-app.register_blueprint(item_attributes_settings_bp)  # SETTINGS: Configure item attributes
-app.register_blueprint(debug_equity_bp)  # DEBUG: Check equity
-app.register_blueprint(fix_inventory_equity_mismatch_bp)  # FIX: Adjust inventory equity mismatch
-app.register_blueprint(fix_inventory_double_entry_bp)  # FIX: Create missing inventory asset DEBIT entries
-app.register_blueprint(fix_trial_balance_final_bp)  # FIX: Final trial balance fix
-app.register_blueprint(fix_cash_bank_opening_bp)  # FIX: Cash/bank opening balance
-app.register_blueprint(remove_duplicate_equity_bp)  # FIX: Remove duplicate equity entries
-app.register_blueprint(show_equity_entries_bp)  # DEBUG: Show all equity entries
-app.register_blueprint(final_balance_fix_bp)  # FIX: Comprehensive final fix
-from routes.migrate_double_entry import migrate_double_entry_bp
-app.register_blueprint(migrate_double_entry_bp)  # MIGRATION: Convert to double-entry accounting
-app.register_blueprint(diagnose_return_bp)  # DEBUG: Diagnose return accounting entries
-app.register_blueprint(diagnose_gst_bp)  # DEBUG: Diagnose GST entries
-app.register_blueprint(fix_unpaid_return_bp)  # FIX: Add missing entries for unpaid returns
-from routes.fix_vendor_payment_constraint import fix_vendor_payment_bp
-app.register_blueprint(fix_vendor_payment_bp)  # FIX: Vendor payment constraint (tenant-specific)
-from routes.fix_purchase_bill_constraint import fix_purchase_bill_bp
-app.register_blueprint(fix_purchase_bill_bp)  # FIX: Purchase bill constraint (tenant-specific)
-from routes.fix_return_accounting import fix_return_accounting_bp
-app.register_blueprint(fix_return_accounting_bp)  # FIX: Add missing refund entries for returns
-from routes.diagnose_returns import diagnose_returns_bp
-app.register_blueprint(diagnose_returns_bp)  # DIAGNOSTIC: Check returns accounting status
-
-from routes.diagnose_commission import diagnose_commission_bp
-app.register_blueprint(diagnose_commission_bp)  # DIAGNOSTIC: Check commission status
-
-from routes.diagnose_commission_balance import diagnose_commission_balance_bp
-app.register_blueprint(diagnose_commission_balance_bp)  # DIAGNOSTIC: Check commission balance in trial balance
-
-from routes.diagnose_return_amounts import diagnose_return_amounts_bp
-app.register_blueprint(diagnose_return_amounts_bp)  # DIAGNOSTIC: Check return amounts and rounding
-
-from routes.fix_round_off_sign import fix_round_off_sign_bp
-app.register_blueprint(fix_round_off_sign_bp)  # MIGRATION: Fix incorrect round-off sign in returns
-
-from routes.diagnose_all_round_offs import diagnose_all_round_offs_bp
-app.register_blueprint(diagnose_all_round_offs_bp)  # DIAGNOSTIC: Check all round-off entries
-
-from routes.diagnose_commission_mismatch import diagnose_commission_mismatch_bp
-app.register_blueprint(diagnose_commission_mismatch_bp)  # DIAGNOSTIC: Check commission calculation mismatches
-from routes.diagnose_trial_balance import diagnose_trial_bp
-app.register_blueprint(diagnose_trial_bp)  # DIAGNOSTIC: Check trial balance components
-from routes.migration_add_purchase_bill_item_fields import migration_purchase_bill_items_bp
-app.register_blueprint(migration_purchase_bill_items_bp)  # MIGRATION: Add fields for creating items from purchase bills
-from routes.migration_create_returns_tables import migration_returns_bp
-app.register_blueprint(migration_returns_bp)  # MIGRATION: Create returns & refunds tables
+from routes.registry import register_blueprints
+register_blueprints(app)
 
 # ============================================================
 # Main route
@@ -325,13 +145,28 @@ def purchase_bill_document(tenant_id, filename):
 # ============================================================
 @app.route('/health')
 def health_check():
-    """Simple health check endpoint - keeps Vercel function warm"""
+    """Simple health check endpoint - keeps Vercel function warm (and its database connection)"""
     from flask import jsonify
+    from utils.db_connection import warm_up
     import datetime
+    
+    # ⚡ Open / pre-ping a connection so the next real request doesn't pay for it
+    try:
+        db_ms = warm_up(db)
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Health check: database unreachable: {e}")
+        return jsonify({
+            'status': 'error',
+            'timestamp': datetime.datetime.utcnow().isoformat(),
+            'message': 'Database unreachable'
+        }), 503
+    
     return jsonify({
         'status': 'ok',
         'timestamp': datetime.datetime.utcnow().isoformat(),
-        'message': 'BizBooks is running'
+        'message': 'BizBooks is running',
+        'db_ms': round(db_ms, 1)
     }), 200
 
 # Welcome page for documentation
@@ -558,6 +393,13 @@ if __name__ == '__main__':
     print(f"👤 Default Admin: admin / admin123")
     print(f"{'='*60}\n")
     
+    # Background jobs (bulk invoices, imports, backups) - run them in this
+    # process unless a separate job_worker.py is running
+    # (with the debug reloader, only in the child process that serves requests)
+    if os.environ.get('JOB_WORKER_IN_PROCESS', '1') == '1' and (not config.DEBUG or os.environ.get('WERKZEUG_RUN_MAIN')):
+        from services.job_queue import start_worker_thread
+        start_worker_thread(app)
+    
     app.run(
         host=host,
         port=port,
@@ -0,0 +1,163 @@
+"""
+Inventory Import Benchmark
+==========================
+Time the bulk inventory import against the sample BizBooks_*.xlsx files in
+the repository root, scaled up to a realistic catalog size.
+
+Each sample's data rows are repeated (with unique SKUs) until the file has
+the requested number of rows, then imported into a throwaway tenant in a
+temporary SQLite database (or DATABASE_URL with --use-database-url).
+
+Usage:
+    python benchmark_inventory_import.py [rows] [--chunk-size N] [--use-database-url]
+
+Example:
+    python benchmark_inventory_import.py 10000
+    python benchmark_inventory_import.py 20000 --chunk-size 500
+"""
+
+import sys
+import os
+import glob
+import time
+import tempfile
+import argparse
+from io import BytesIO
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def build_workbook(sample_path, target_rows):
+    """
+    Sample file's import sheet with its data rows repeated up to target_rows (in memory)
+
+    Only rows the importer would process count as data rows - rows whose
+    required fields are all empty (template padding like a lone 0 in a formula
+    column) are skipped by import_inventory_from_excel, so they're dropped here.
+    """
+    from openpyxl import Workbook, load_workbook
+    from utils.excel_import import INVENTORY_COLUMN_MAP, INVENTORY_REQUIRED_FIELDS
+
+    source = load_workbook(sample_path, read_only=True, data_only=True)
+    ws = source['Inventory Import'] if 'Inventory Import' in source.sheetnames else source.worksheets[0]
+    rows = ws.iter_rows(values_only=True)
+    header = list(next(rows, None) or [])
+
+    # Required columns, matched the way the importer matches headers
+    headers = {str(h).strip().replace('*', '').replace('🔶', '').strip(): i for i, h in enumerate(header) if h}
+    required_cols = []
+    for field in INVENTORY_REQUIRED_FIELDS:
+        col = next((headers[name] for name in INVENTORY_COLUMN_MAP[field] if name in headers), None)
+        if col is None:
+            source.close()
+            return None, 0  # The importer would reject the whole file
+        required_cols.append(col)
+
+    data = [list(row) for row in rows
+            if any(col < len(row) and row[col] not in (None, '') for col in required_cols)]
+    source.close()
+
+    if not header or not data:
+        return None, 0
+
+    sku_col = next((i for i, h in enumerate(header) if h and str(h).strip().rstrip('*') == 'SKU'), None)
+    barcode_col = next((i for i, h in enumerate(header) if h and str(h).strip().rstrip('*') == 'Barcode'), None)
+
+    wb = Workbook(write_only=True)
+    out = wb.create_sheet('Inventory Import')
+    out.append(header)
+    for n in range(target_rows):
+        row = list(data[n % len(data)])
+        copy = n // len(data)
+        if copy:
+            # Keep SKUs/barcodes unique across copies
+            if sku_col is not None and sku_col < len(row) and row[sku_col]:
+                row[sku_col] = f"{row[sku_col]}-{copy}"
+            if barcode_col is not None and barcode_col < len(row) and row[barcode_col]:
+                row[barcode_col] = f"{row[barcode_col]}{copy}"
+        out.append(row)
+
+    buffer = BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    return buffer, target_rows
+
+
+def run_benchmark(target_rows, chunk_size, use_database_url):
+    if not use_database_url:
+        db_path = os.path.join(tempfile.mkdtemp(), 'import_benchmark.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+
+        # Match production: account_id was made nullable by the employee
+        # expenses migration (opening stock entries use virtual accounts)
+        from models.bank_account import AccountTransaction
+        AccountTransaction.__table__.c.account_id.nullable = True
+
+    from app import app
+    from models import db, Tenant, Site, Item
+    from sqlalchemy import event
+    from utils.excel_import import import_inventory_from_excel, IMPORT_CHUNK_SIZE
+
+    chunk_size = chunk_size or IMPORT_CHUNK_SIZE
+
+    samples = sorted(glob.glob(os.path.join(REPO_ROOT, 'BizBooks_*.xlsx')))
+    if not samples:
+        print(f"❌ No BizBooks_*.xlsx sample files found in {REPO_ROOT}")
+        return False
+
+    with app.app_context():
+        query_count = [0]
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def count_queries(conn, cursor, statement, parameters, context, executemany):
+            query_count[0] += 1
+
+        print(f"\n📦 Inventory import benchmark: {target_rows} rows per file, chunks of {chunk_size}\n")
+        print(f"{'Sample file':<55} {'Imported':>9} {'Errors':>7} {'Seconds':>8} {'Rows/s':>8} {'Queries':>8}")
+
+        for n, sample_path in enumerate(samples, start=1):
+            workbook, row_count = build_workbook(sample_path, target_rows)
+            name = os.path.basename(sample_path)
+            if workbook is None:
+                print(f"{name:<55} {'(no data rows)':>9}")
+                continue
+
+            # Fresh tenant per file so every run starts from an empty catalog
+            tenant = Tenant(company_name=f'Import Benchmark {n}', subdomain=f'import-benchmark-{n}-{int(time.time())}',
+                            admin_name='Benchmark', admin_email=f'benchmark{n}@example.com',
+                            admin_password_hash='-', status='active')
+            db.session.add(tenant)
+            db.session.flush()
+            db.session.add(Site(tenant_id=tenant.id, name='Main Store', is_default=True, active=True))
+            db.session.commit()
+
+            query_count[0] = 0
+            started = time.perf_counter()
+            success_count, errors = import_inventory_from_excel(workbook, tenant.id, chunk_size=chunk_size)
+            elapsed = time.perf_counter() - started
+
+            # Rate over rows actually imported - rejected rows cost next to nothing
+            rate = success_count / elapsed if elapsed else 0
+            print(f"{name:<55} {success_count:>9} {len(errors):>7} {elapsed:>8.2f} {rate:>8.0f} {query_count[0]:>8}")
+            if success_count + len(errors) < row_count:
+                print(f"   ⚠️ {row_count - success_count - len(errors)} of {row_count} rows neither imported nor reported")
+            if errors and not success_count:
+                print(f"   ⚠️ {errors[0]}")
+
+        print(f"\n✅ Done ({Item.query.count()} items in database)")
+        return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the bulk inventory import')
+    parser.add_argument('rows', nargs='?', type=int, default=10000, help='Rows per sample file (default 10000)')
+    parser.add_argument('--chunk-size', type=int, default=None, help='Rows per chunk (default IMPORT_CHUNK_SIZE)')
+    parser.add_argument('--use-database-url', action='store_true',
+                        help='Import into DATABASE_URL instead of a temporary SQLite database')
+    args = parser.parse_args()
+
+    success = run_benchmark(args.rows, args.chunk_size, args.use_database_url)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,51 @@
+"""
+Background Job Worker
+=====================
+Runs queued background jobs (bulk subscription invoices, Excel imports,
+barcode label PDFs, special day bonuses) from the background_jobs
+table. Start as many workers as you like - jobs are claimed atomically.
+
+Usage:
+    python job_worker.py [--once] [--poll-interval SECONDS] [--types TYPE,TYPE]
+
+Example:
+    python job_worker.py                       # run forever (Render worker / systemd)
+    python job_worker.py --once                # drain the queue and exit (cron)
+    python job_worker.py --types excel_import  # only imports
+
+On Render this runs as the bizbooks-worker service (render.yaml). On
+serverless hosting (Vercel) there's no long-running process: queueing a job
+wakes /scheduled-tasks/run-background-jobs in a separate invocation, and the
+cron in vercel.json calls it daily for anything left over.
+"""
+
+import sys
+import os
+import argparse
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from services.job_queue import run_worker
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run queued background jobs')
+    parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+    parser.add_argument('--poll-interval', type=int, default=5, help='Seconds to wait when the queue is empty')
+    parser.add_argument('--types', default=None, help='Comma-separated job types to run (default: all)')
+    args = parser.parse_args()
+
+    job_types = [t.strip() for t in args.types.split(',') if t.strip()] if args.types else None
+
+    try:
+        summary = run_worker(app, poll_interval=args.poll_interval, once=args.once, job_types=job_types)
+    except KeyboardInterrupt:
+        print("\n👋 Job worker stopped")
+        sys.exit(0)
+
+    if args.once:
+        print(f"✅ Ran {summary['jobs_run']} job(s): {summary.get('succeeded', 0)} succeeded, "
+              f"{summary.get('failed', 0)} failed, {summary.get('retrying', 0)} retrying")
+        sys.exit(0)
@@ -0,0 +1,76 @@
+"""
+Schema Migration Runner
+=======================
+Apply pending schema migrations (models/migrations.py) to DATABASE_URL and
+record them in the schema_version table. Once the database is at the latest
+version, app startup skips create_all() and the seed checks.
+
+Usage:
+    python migrate.py            Apply all pending migrations
+    python migrate.py --status   List migrations and when each was applied
+    python migrate.py --to N     Apply pending migrations up to version N
+
+The new models need the migrated schema, so every deploy runs it before the
+app serves: the render.yaml start command, and vercel_build.sh (the Vercel
+build command). App startup refuses to run on a schema that is behind.
+"""
+
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# App startup refuses to run on an old schema - skip that check, this script migrates it
+os.environ['SCHEMA_CHECK'] = '0'
+
+from app import app
+from models.migrations import run_migrations, migration_status, current_schema_version, LATEST_SCHEMA_VERSION
+
+
+def show_status():
+    with app.app_context():
+        print(f"\n📋 Schema version {current_schema_version()} (latest {LATEST_SCHEMA_VERSION})")
+        for version, name, applied_at in migration_status():
+            state = f"applied {applied_at:%Y-%m-%d %H:%M}" if applied_at else "PENDING"
+            print(f"   {version:>3}  {name:<30} {state}")
+        return True
+
+
+def migrate(target=None):
+    with app.app_context():
+        version = current_schema_version()
+        print(f"\n🔄 Schema version {version}, migrating to {target or LATEST_SCHEMA_VERSION}...")
+
+        applied = run_migrations(target)
+
+        if applied:
+            print(f"✅ Applied {len(applied)} migration(s), schema version {current_schema_version()}")
+        else:
+            print("✅ Nothing to do - schema is up to date")
+        return True
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] in ('-h', '--help'):
+        print(__doc__)
+        sys.exit(0)
+
+    if len(sys.argv) > 1 and sys.argv[1] == '--status':
+        success = show_status()
+    elif len(sys.argv) > 1 and sys.argv[1] == '--to':
+        try:
+            target = int(sys.argv[2])
+        except (IndexError, ValueError):
+            print("❌ Error: --to needs a version number")
+            print(__doc__)
+            sys.exit(1)
+        success = migrate(target)
+    elif len(sys.argv) > 1:
+        print(f"❌ Error: Unknown argument '{sys.argv[1]}'")
+        print(__doc__)
+        sys.exit(1)
+    else:
+        success = migrate()
+
+    sys.exit(0 if success else 1)
@@ -12,6 +12,7 @@ from .item import (
     Item, ItemCategory, ItemGroup, ItemImage, ItemStock, 
     ItemStockMovement, InventoryAdjustment, InventoryAdjustmentLine
 )
+from . import item_stock_totals  # items.total_stock / is_low_stock triggers
 from .expense import Expense, ExpenseCategory
 from .purchase_request import PurchaseRequest
 from .customer import Customer
@@ -37,6 +38,9 @@ from .subscription import (
 )
 from .customer_order import CustomerOrder, CustomerOrderItem
 from .bank_account import BankAccount, AccountTransaction
+from .ledger_balance import LedgerDailyBalance
+from .open_item_balance import OpenItemBalance
+from .daily_tenant_metrics import DailyTenantMetric
 from .loyalty_program import LoyaltyProgram
 from .customer_loyalty_points import CustomerLoyaltyPoints
 from .loyalty_transaction import LoyaltyTransaction
@@ -44,6 +48,12 @@ from .return_model import Return
 from .return_item import ReturnItem
 from .item_attribute import ItemAttribute, ItemAttributeValue, TenantAttributeConfig
 from .stock_batch import StockBatch
+from .document_sequence import DocumentSequence
+from .background_job import BackgroundJob
+from .billing_run import BillingRun, BillingRunItem
+from .tenant_backup import TenantBackup, BackupTombstone
+from .tenant_usage_stats import TenantUsageStats
+from .schema_version import SchemaVersion
 
 # Create Party alias for Customer (for unified party management)
 Party = Customer
@@ -67,10 +77,15 @@ __all__ = [
     'CommissionAgent', 'InvoiceCommission',
     'SubscriptionPlan', 'CustomerSubscription', 'SubscriptionPayment', 'SubscriptionDelivery', 'DeliveryDayNote',
     'CustomerOrder', 'CustomerOrderItem',
-    'BankAccount', 'AccountTransaction',
+    'BankAccount', 'AccountTransaction', 'LedgerDailyBalance', 'OpenItemBalance', 'DailyTenantMetric',
     'LoyaltyProgram', 'CustomerLoyaltyPoints', 'LoyaltyTransaction',
     'Return', 'ReturnItem',
     'ItemAttribute', 'ItemAttributeValue', 'TenantAttributeConfig',
-    'StockBatch'
+    'StockBatch',
+    'DocumentSequence',
+    'BackgroundJob',
+    'BillingRun', 'BillingRunItem',
+    'TenantBackup', 'BackupTombstone', 'TenantUsageStats',
+    'SchemaVersion'
 ]
 
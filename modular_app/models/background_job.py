@@ -0,0 +1,86 @@
+"""
+Background Job model - DB-backed queue for long-running tenant work
+(bulk invoicing, Excel imports, label PDFs, scheduled tasks)
+
+Jobs are claimed by job_worker.py (or the cron drain endpoint) with a single
+UPDATE ... RETURNING, so any number of workers can share the table without
+an external broker.
+"""
+from .database import db
+from datetime import datetime
+
+
+class BackgroundJob(db.Model):
+    """One queued / running / finished background job"""
+    __tablename__ = 'background_jobs'
+    __table_args__ = (
+        db.Index('idx_background_jobs_claim', 'status', 'run_after'),
+        db.Index('idx_background_jobs_tenant', 'tenant_id', 'status'),
+    )
+
+    # Statuses
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+    FINISHED_STATUSES = (SUCCEEDED, FAILED)
+
+    id = db.Column(db.Integer, primary_key=True)
+    tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id', ondelete='CASCADE'), nullable=True)  # NULL = system job
+    job_type = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=QUEUED)
+
+    # Input
+    payload = db.Column(db.JSON)  # Handler arguments
+    input_file = db.deferred(db.Column(db.LargeBinary))  # Uploaded file (Excel imports)
+    input_filename = db.Column(db.String(255))
+
+    # Progress / output
+    progress = db.Column(db.Integer, default=0)  # 0-100
+    progress_message = db.Column(db.String(255))
+    result = db.Column(db.JSON)  # Handler summary
+    result_file = db.deferred(db.Column(db.LargeBinary))  # Downloadable output (PDFs)
+    result_filename = db.Column(db.String(255))
+    result_mimetype = db.Column(db.String(100))
+    error = db.Column(db.Text)
+
+    # Retries
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Backoff: not before this time
+
+    # Worker bookkeeping
+    locked_by = db.Column(db.String(100))
+    heartbeat_at = db.Column(db.DateTime)
+
+    created_by = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    @property
+    def is_finished(self):
+        return self.status in self.FINISHED_STATUSES
+
+    def to_dict(self):
+        """Status payload for the job status endpoint"""
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'status': self.status,
+            'progress': self.progress or 0,
+            'progress_message': self.progress_message,
+            'result': self.result,
+            'has_file': self.result_filename is not None,
+            'result_filename': self.result_filename,
+            'error': self.error,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def __repr__(self):
+        return f'<BackgroundJob {self.id} {self.job_type} ({self.status})>'
@@ -52,7 +52,7 @@ class AccountTransaction(db.Model):
     tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id', ondelete='CASCADE'), nullable=False, index=True)
     
     # Account Reference
-    account_id = db.Column(db.Integer, db.ForeignKey('bank_accounts.id', ondelete='CASCADE'), nullable=False, index=True)
+    account_id = db.Column(db.Integer, db.ForeignKey('bank_accounts.id', ondelete='CASCADE'), nullable=True, index=True)  # NULL = ledger-only entry (sales, expenses...)
     
     # Transaction Details
     transaction_date = db.Column(db.Date, nullable=False, index=True)
@@ -0,0 +1,74 @@
+"""
+Billing Run models - one bulk metered-billing batch and its per-subscription outcomes
+
+A run snapshots the subscriptions that are due when it starts, then bills
+them in chunks; each chunk's invoices and the outcome rows are committed
+together. A run that stops part-way (worker died, deploy, error) is picked up
+again by the next run for the tenant, which only bills the subscriptions
+still pending - nobody is invoiced twice.
+"""
+from .database import db
+from datetime import datetime
+
+
+class BillingRun(db.Model):
+    """One bulk billing batch for a tenant"""
+    __tablename__ = 'billing_runs'
+    __table_args__ = (
+        db.Index('idx_billing_runs_tenant', 'tenant_id', 'status'),
+    )
+
+    # Statuses
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+
+    id = db.Column(db.Integer, primary_key=True)
+    tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id', ondelete='CASCADE'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=RUNNING)
+    billing_date = db.Column(db.Date, nullable=False)  # Invoice date of the run
+
+    # Totals (updated after every chunk)
+    subscription_count = db.Column(db.Integer, nullable=False, default=0)
+    invoiced_count = db.Column(db.Integer, nullable=False, default=0)
+    skipped_count = db.Column(db.Integer, nullable=False, default=0)
+    failed_count = db.Column(db.Integer, nullable=False, default=0)
+    total_amount = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+
+    job_id = db.Column(db.Integer)  # Background job that last worked on the run
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    items = db.relationship('BillingRunItem', backref='run', lazy='dynamic', cascade='all, delete-orphan')
+
+    def __repr__(self):
+        return f'<BillingRun {self.id} tenant={self.tenant_id} {self.status}>'
+
+
+class BillingRunItem(db.Model):
+    """Outcome of one subscription in a billing run"""
+    __tablename__ = 'billing_run_items'
+    __table_args__ = (
+        db.UniqueConstraint('run_id', 'subscription_id', name='uq_billing_run_subscription'),
+        db.Index('idx_billing_run_items_status', 'run_id', 'status'),
+    )
+
+    # Statuses
+    PENDING = 'pending'
+    INVOICED = 'invoiced'
+    SKIPPED = 'skipped'  # Nothing delivered in the period
+    FAILED = 'failed'
+
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, db.ForeignKey('billing_runs.id', ondelete='CASCADE'), nullable=False)
+    subscription_id = db.Column(db.Integer, db.ForeignKey('customer_subscriptions.id', ondelete='CASCADE'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=PENDING)
+
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoices.id', ondelete='SET NULL'))
+    quantity = db.Column(db.Numeric(12, 2))
+    amount = db.Column(db.Numeric(15, 2))
+    error = db.Column(db.Text)
+
+    processed_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<BillingRunItem run={self.run_id} subscription={self.subscription_id} {self.status}>'
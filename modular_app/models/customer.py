@@ -1,4 +1,5 @@
 from models.database import db
+from models.document_sequence import DocumentSequence
 from datetime import datetime
 
 class Customer(db.Model):
@@ -108,26 +109,50 @@ class Customer(db.Model):
         current_outstanding = self.get_outstanding_balance()
         return (current_outstanding + new_amount) > self.credit_limit
     
+    @staticmethod
+    def _highest_customer_code(tenant_id):
+        """Highest CUST-#### number in use (seeds the customer code sequence)"""
+        codes = db.session.query(Customer.customer_code).filter(
+            Customer.tenant_id == tenant_id,
+            Customer.customer_code.like('CUST-%')
+        ).all()
+        return DocumentSequence.highest_number(code for (code,) in codes)
+    
     @staticmethod
     def generate_customer_code(tenant_id):
-        """Generate next customer code for tenant"""
-        # Get all customers for this tenant
-        customers = Customer.query.filter_by(tenant_id=tenant_id).all()
-        
-        if not customers:
-            return "CUST-0001"
-        
-        # Find the highest customer code number
-        max_number = 0
-        for customer in customers:
-            if customer.customer_code and customer.customer_code.startswith('CUST-'):
-                try:
-                    # Extract number from CUST-0001 format
-                    number = int(customer.customer_code.split('-')[1])
-                    max_number = max(max_number, number)
-                except (IndexError, ValueError):
-                    continue
-        
-        next_number = max_number + 1
-        return f"CUST-{next_number:04d}"
-
+        """Generate (and reserve) next customer code for tenant"""
+        number = DocumentSequence.next_value(
+            tenant_id, DocumentSequence.CUSTOMER,
+            seed=lambda: Customer._highest_customer_code(tenant_id)
+        )
+        return f"CUST-{number:04d}"
+    
+    @staticmethod
+    def reserve_customer_codes(tenant_id, count):
+        """Reserve `count` consecutive customer codes at once (bulk imports)"""
+        numbers = DocumentSequence.reserve(
+            tenant_id, DocumentSequence.CUSTOMER, count,
+            seed=lambda: Customer._highest_customer_code(tenant_id)
+        )
+        return [f"CUST-{number:04d}" for number in numbers]
+    
+    @staticmethod
+    def preview_customer_code(tenant_id):
+        """Next customer code, for pre-filling the add form (not reserved)"""
+        number = DocumentSequence.peek(
+            tenant_id, DocumentSequence.CUSTOMER,
+            seed=lambda: Customer._highest_customer_code(tenant_id)
+        )
+        return f"CUST-{number:04d}"
+    
+    @staticmethod
+    def claim_customer_code(tenant_id, customer_code):
+        """Keep the sequence ahead of a manually entered CUST-#### code"""
+        if not customer_code.startswith('CUST-'):
+            return
+        number = DocumentSequence.highest_number([customer_code])
+        if number:
+            DocumentSequence.advance_to(
+                tenant_id, DocumentSequence.CUSTOMER, number,
+                seed=lambda: Customer._highest_customer_code(tenant_id)
+            )
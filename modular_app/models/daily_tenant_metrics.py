@@ -0,0 +1,73 @@
+"""
+Daily Tenant Metrics model - per-day sales / purchase rollup for the dashboard
+
+Kept in sync with invoices and purchase bills by database triggers;
+`python rebuild.py daily_tenant_metrics` re-installs them and backfills.
+"""
+from .database import db
+from .trigger_rollup import AdditiveRollup
+
+
+class DailyTenantMetric(db.Model):
+    """Sales and purchase totals of one tenant on one day"""
+    __tablename__ = 'daily_tenant_metrics'
+    __table_args__ = (
+        db.UniqueConstraint('tenant_id', 'metric_date', name='uq_daily_tenant_metric'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id', ondelete='CASCADE'), nullable=False)
+    metric_date = db.Column(db.Date, nullable=False)
+
+    # Invoices dated this day
+    sales_total = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    invoice_count = db.Column(db.Integer, nullable=False, default=0)
+
+    # Unpaid / partially paid invoices dated this day (summed over all days = pending receivables)
+    receivables_total = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+
+    # Approved purchase bills dated this day
+    purchase_total = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    bill_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DailyTenantMetric {self.tenant_id} {self.metric_date}>'
+
+
+# ============================================================
+# Sources: which documents count, and what they add to their day
+# ============================================================
+
+DAILY_TENANT_METRICS = AdditiveRollup(
+    name='daily_tenant_metrics',
+    table='daily_tenant_metrics',
+    keys=['tenant_id', 'metric_date'],
+    values=['sales_total', 'invoice_count', 'receivables_total', 'purchase_total', 'bill_count'],
+    empty_when='invoice_count <= 0 AND bill_count <= 0',
+    sqlite_trigger_prefix='trg_daily_metrics',
+    sources=[
+        {
+            'table': 'invoices',
+            'keys': {'tenant_id': '{r}.tenant_id', 'metric_date': '{r}.invoice_date'},
+            'values': {
+                'sales_total': 'CAST({r}.total_amount AS NUMERIC(15, 2))',
+                'invoice_count': '1',
+                'receivables_total': "CASE WHEN {r}.payment_status != 'paid' "
+                                     "THEN CAST({r}.total_amount AS NUMERIC(15, 2)) ELSE 0 END",
+            },
+            'where': '{r}.invoice_date IS NOT NULL',
+            'columns': 'tenant_id, invoice_date, total_amount, payment_status',
+        },
+        {
+            'table': 'purchase_bills',
+            'keys': {'tenant_id': '{r}.tenant_id', 'metric_date': '{r}.bill_date'},
+            'values': {
+                'purchase_total': '{r}.total_amount',
+                'bill_count': '1',
+            },
+            # Draft bills shouldn't appear in accounting
+            'where': "{r}.status = 'approved'",
+            'columns': 'tenant_id, bill_date, total_amount, status',
+        },
+    ],
+)
@@ -3,41 +3,51 @@ Database initialization and shared setup
 """
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+import os
 
 # Initialize SQLAlchemy
 db = SQLAlchemy()
 
+# The models map columns the migrations add, so the app can't run on an older
+# schema. Deploys apply migrations with `python migrate.py` (render.yaml start
+# command, vercel_build.sh); startup only checks the version and refuses to
+# serve when it's behind. SCHEMA_AUTO_MIGRATE=1 migrates on startup instead
+# (local development, tests); SCHEMA_CHECK=0 skips the check (migrate.py itself)
+SCHEMA_AUTO_MIGRATE = os.environ.get('SCHEMA_AUTO_MIGRATE', '0')
+SCHEMA_CHECK = os.environ.get('SCHEMA_CHECK', '1')
+
+
+class SchemaOutOfDateError(RuntimeError):
+    """The database is behind the code's schema version"""
+
+
 def init_db(app):
     """Initialize database with app"""
     db.init_app(app)
     
+    if SCHEMA_CHECK != '1':
+        return
+    
     with app.app_context():
-        # Create all tables (safe even if some already exist)
-        from sqlalchemy.exc import ProgrammingError
-        try:
-            db.create_all()
-        except ProgrammingError as exc:
-            # Ignore duplicate table errors triggered when tables are created via manual migrations
-            message = str(exc).lower()
-            if 'already exists' in message:
-                db.session.rollback()
-                app.logger.warning(f"⚠️ Skipping create_all duplicate table error: {exc}")
-            else:
-                raise
+        from .migrations import current_schema_version, run_migrations, LATEST_SCHEMA_VERSION
+        
+        # ⚡ One cheap query on warm boots - no create_all reflection, no seed lookups
+        version = current_schema_version()
+        if version >= LATEST_SCHEMA_VERSION:
+            print(f"✅ Database schema is current (version {version})")
+            return
         
-        # Create default admin user if not exists
-        from .user import User
-        if not User.query.filter_by(username='admin').first():
-            admin = User(
-                username='admin',
-                is_admin=True
-            )
-            admin.set_password('admin123')  # Change this!
-            db.session.add(admin)
-            db.session.commit()
-            print("✅ Default admin user created (username: admin, password: admin123)")
+        if SCHEMA_AUTO_MIGRATE == '1':
+            # Concurrent starts can race here - run_migrations() holds an advisory lock per migration
+            applied = run_migrations()
+            print(f"✅ Database migrated to schema version {LATEST_SCHEMA_VERSION} ({len(applied)} migration(s))")
+            return
         
-        print("✅ Database initialized successfully!")
+        raise SchemaOutOfDateError(
+            f"Database schema version {version} is behind {LATEST_SCHEMA_VERSION} - "
+            f"run `python migrate.py` against this DATABASE_URL before starting the app "
+            f"(or set SCHEMA_AUTO_MIGRATE=1 to migrate on startup)"
+        )
 
 # Base model with common fields
 class TimestampMixin:
@@ -0,0 +1,135 @@
+"""
+Document Sequence model - per-tenant counters for document numbers
+(invoice numbers, customer codes, SKUs, voucher numbers)
+
+Numbers are handed out with a single UPDATE ... RETURNING on the tenant's
+sequence row, which row-locks it until the transaction commits - two
+cashiers billing at the same time never get the same number.
+"""
+from .database import db
+from datetime import datetime
+from sqlalchemy import text
+
+
+class DocumentSequence(db.Model):
+    """Last number issued per tenant, document type and period"""
+    __tablename__ = 'document_sequences'
+    __table_args__ = (
+        db.UniqueConstraint('tenant_id', 'document_type', 'period', name='uq_document_sequence'),
+    )
+
+    # Document types
+    INVOICE = 'invoice'
+    CUSTOMER = 'customer'
+    ITEM_SKU = 'item_sku'
+    CONTRA = 'contra'
+    EMPLOYEE_ADVANCE = 'employee_advance'
+    EMPLOYEE_EXPENSE = 'employee_expense'
+
+    id = db.Column(db.Integer, primary_key=True)
+    tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id', ondelete='CASCADE'), nullable=False)
+    document_type = db.Column(db.String(30), nullable=False)
+    period = db.Column(db.String(10), nullable=False, default='')  # e.g. '2025' for yearly invoice numbers
+    last_value = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @staticmethod
+    def reserve(tenant_id, document_type, count=1, period='', seed=None):
+        """
+        Atomically reserve the next `count` numbers of a sequence
+
+        Args:
+            tenant_id: Tenant ID
+            document_type: One of the DocumentSequence document types
+            count: How many consecutive numbers to reserve (bulk imports)
+            period: Optional sub-sequence key (e.g. year)
+            seed: Callable returning the highest number already in use.
+                  Only called once, when the sequence row doesn't exist yet
+                  (tenants that were numbered before sequences existed).
+
+        Returns:
+            List of reserved numbers in ascending order
+        """
+        params = {
+            'tenant_id': tenant_id,
+            'document_type': document_type,
+            'period': period,
+            'count': count,
+            'now': datetime.utcnow()
+        }
+        increment = text("""
+            UPDATE document_sequences
+            SET last_value = last_value + :count, updated_at = :now
+            WHERE tenant_id = :tenant_id
+            AND document_type = :document_type
+            AND period = :period
+            RETURNING last_value
+        """)
+
+        row = db.session.execute(increment, params).fetchone()
+        if row is None:
+            # First use: start from the highest number already issued
+            db.session.execute(text("""
+                INSERT INTO document_sequences (tenant_id, document_type, period, last_value, updated_at)
+                VALUES (:tenant_id, :document_type, :period, :start, :now)
+                ON CONFLICT (tenant_id, document_type, period) DO NOTHING
+            """), {**params, 'start': seed() if seed else 0})
+            row = db.session.execute(increment, params).fetchone()
+
+        last_value = row[0]
+        return list(range(last_value - count + 1, last_value + 1))
+
+    @staticmethod
+    def next_value(tenant_id, document_type, period='', seed=None):
+        """Atomically get the next number of a sequence"""
+        return DocumentSequence.reserve(tenant_id, document_type, 1, period, seed)[0]
+
+    @staticmethod
+    def peek(tenant_id, document_type, period='', seed=None):
+        """Next number that would be issued (for form previews - does NOT reserve it)"""
+        row = db.session.execute(text("""
+            SELECT last_value FROM document_sequences
+            WHERE tenant_id = :tenant_id
+            AND document_type = :document_type
+            AND period = :period
+        """), {'tenant_id': tenant_id, 'document_type': document_type, 'period': period}).fetchone()
+
+        if row is None:
+            return (seed() if seed else 0) + 1
+        return row[0] + 1
+
+    @staticmethod
+    def advance_to(tenant_id, document_type, value, period='', seed=None):
+        """
+        Make sure the sequence never issues `value` again
+        (used when a number in the sequence format was entered manually)
+        """
+        DocumentSequence.reserve(tenant_id, document_type, 0, period, seed)
+        db.session.execute(text("""
+            UPDATE document_sequences
+            SET last_value = :value, updated_at = :now
+            WHERE tenant_id = :tenant_id
+            AND document_type = :document_type
+            AND period = :period
+            AND last_value < :value
+        """), {
+            'tenant_id': tenant_id,
+            'document_type': document_type,
+            'period': period,
+            'value': value,
+            'now': datetime.utcnow()
+        })
+
+    @staticmethod
+    def highest_number(codes):
+        """Highest trailing number in codes like 'CUST-0012' / 'INV-2025-0007' (seed helper)"""
+        highest = 0
+        for code in codes:
+            try:
+                highest = max(highest, int(str(code).rsplit('-', 1)[-1]))
+            except (ValueError, TypeError):
+                continue
+        return highest
+
+    def __repr__(self):
+        return f'<DocumentSequence {self.document_type}{self.period and "/" + self.period} = {self.last_value}>'
@@ -12,6 +12,7 @@ class Invoice(db.Model, TimestampMixin):
     __table_args__ = (
         db.Index('idx_invoice_tenant', 'tenant_id', 'invoice_date'),
         db.Index('idx_invoice_number', 'tenant_id', 'invoice_number'),
+        db.Index('idx_invoice_customer', 'tenant_id', 'customer_id', 'invoice_date'),
     )
 
     id = db.Column(db.Integer, primary_key=True)
@@ -94,26 +95,32 @@ class Invoice(db.Model, TimestampMixin):
         return f'<Invoice {self.invoice_number} - {self.customer_name} - ₹{self.total_amount}>'
 
     def generate_invoice_number(self):
-        """Generate invoice number like INV-2024-001"""
+        """Generate invoice number like INV-2024-0001 (per-tenant, per-year sequence)"""
+        return Invoice.reserve_invoice_numbers(self.tenant_id)[0]
+    
+    @staticmethod
+    def reserve_invoice_numbers(tenant_id, count=1):
+        """Reserve `count` consecutive invoice numbers of this year (bulk billing reserves a whole chunk)"""
+        from models.document_sequence import DocumentSequence
+        
         ist = pytz.timezone('Asia/Kolkata')
         now = datetime.now(ist)
         year = now.year
         
-        # Get last invoice number for this tenant and year
-        last_invoice = Invoice.query.filter_by(
-            tenant_id=self.tenant_id
-        ).filter(
-            Invoice.invoice_number.like(f'INV-{year}-%')
-        ).order_by(Invoice.id.desc()).first()
+        def last_issued():
+            # Sequence not created yet - continue from the last invoice number of this year
+            last_invoice = Invoice.query.filter_by(
+                tenant_id=tenant_id
+            ).filter(
+                Invoice.invoice_number.like(f'INV-{year}-%')
+            ).order_by(Invoice.id.desc()).first()
+            return DocumentSequence.highest_number([last_invoice.invoice_number]) if last_invoice else 0
         
-        if last_invoice:
-            # Extract sequence number and increment
-            last_seq = int(last_invoice.invoice_number.split('-')[-1])
-            new_seq = last_seq + 1
-        else:
-            new_seq = 1
+        sequence_numbers = DocumentSequence.reserve(
+            tenant_id, DocumentSequence.INVOICE, count, period=str(year), seed=last_issued
+        )
         
-        return f'INV-{year}-{new_seq:04d}'  # INV-2024-0001
+        return [f'INV-{year}-{seq:04d}' for seq in sequence_numbers]  # INV-2024-0001
     
     def generate_public_token(self):
         """Generate a secure random token for public invoice access"""
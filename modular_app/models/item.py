@@ -58,6 +58,7 @@ class Item(db.Model, TimestampMixin):
         db.Index('idx_item_tenant', 'tenant_id', 'is_active'),
         db.Index('idx_item_sku', 'sku'),
         db.Index('idx_item_category', 'category_id'),
+        db.Index('idx_item_low_stock', 'tenant_id', 'is_low_stock', 'is_active'),
         # SKU must be unique PER TENANT, not globally
         # This allows Tenant A and Tenant B to both have ITEM-0001
         db.UniqueConstraint('tenant_id', 'sku', name='uq_tenant_sku'),
@@ -119,6 +120,10 @@ class Item(db.Model, TimestampMixin):
     opening_stock_value = db.Column(db.Float, default=0.0)
     reorder_point = db.Column(db.Float, default=0.0)  # Alert when stock below this
     
+    # Maintained by triggers on item_stocks (see models/item_stock_totals.py) - never set these
+    total_stock = db.Column(db.Float, nullable=False, default=0.0, server_default='0')  # Sum over all sites
+    is_low_stock = db.Column(db.Boolean, nullable=False, default=False, server_default='0')  # Tracked and below reorder point
+    
     # ===== Images =====
     primary_image = db.Column(db.Text)  # URL from Vercel Blob
     
@@ -146,13 +151,6 @@ class Item(db.Model, TimestampMixin):
         """Get total stock across all sites"""
         return sum([stock.quantity_available for stock in self.stocks])
     
-    def is_low_stock(self):
-        """Check if any site has low stock"""
-        if not self.track_inventory:
-            return False
-        total = self.get_total_stock()
-        return total < self.reorder_point
-    
     def get_stock_value(self):
         """Calculate total stock value"""
         return self.get_total_stock() * self.cost_price
@@ -0,0 +1,144 @@
+"""
+Item stock totals - items.total_stock / items.is_low_stock kept in sync with item_stocks
+
+Database triggers re-sum an item's stock when its item_stocks rows change
+and re-evaluate is_low_stock when the total, reorder point or tracking
+changes. `python rebuild.py item_stock_totals` re-installs them and
+recomputes the totals.
+"""
+from .trigger_rollup import TriggerRollup
+from sqlalchemy import text, inspect
+
+# {r} is NEW inside triggers, or the table name in the backfill
+LOW_STOCK_EXPR = (
+    'COALESCE({r}.track_inventory, FALSE) AND {r}.reorder_point IS NOT NULL '
+    'AND {r}.total_stock < {r}.reorder_point'
+)
+
+STOCK_SUM_SQL = """
+    (SELECT COALESCE(SUM(s.quantity_available), 0) FROM item_stocks s WHERE s.item_id = items.id)
+"""
+
+
+# ============================================================
+# Trigger DDL (PostgreSQL + SQLite)
+# ============================================================
+
+POSTGRES_TRIGGER_SQL = [
+    f"""
+    CREATE OR REPLACE FUNCTION items_low_stock_flag() RETURNS trigger AS $$
+    BEGIN
+        NEW.is_low_stock := {LOW_STOCK_EXPR.format(r='NEW')};
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_items_low_stock ON items",
+    """
+    CREATE TRIGGER trg_items_low_stock
+    BEFORE INSERT OR UPDATE OF total_stock, reorder_point, track_inventory
+    ON items
+    FOR EACH ROW EXECUTE FUNCTION items_low_stock_flag()
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION item_stocks_sync_total() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE items SET total_stock = {STOCK_SUM_SQL} WHERE id = OLD.item_id;
+        END IF;
+
+        IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.item_id IS DISTINCT FROM OLD.item_id) THEN
+            UPDATE items SET total_stock = {STOCK_SUM_SQL} WHERE id = NEW.item_id;
+        END IF;
+
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_item_stocks_total ON item_stocks",
+    """
+    CREATE TRIGGER trg_item_stocks_total
+    AFTER INSERT OR DELETE OR UPDATE OF item_id, quantity_available
+    ON item_stocks
+    FOR EACH ROW EXECUTE FUNCTION item_stocks_sync_total()
+    """,
+]
+
+
+def _sqlite_trigger_sql():
+    """SQLite can't assign NEW in a BEFORE trigger, so the flag is set by an AFTER UPDATE"""
+    set_flag = f"UPDATE items SET is_low_stock = {LOW_STOCK_EXPR.format(r='items')} WHERE id = NEW.id;"
+    return [
+        "DROP TRIGGER IF EXISTS trg_items_low_stock_insert",
+        "DROP TRIGGER IF EXISTS trg_items_low_stock_update",
+        "DROP TRIGGER IF EXISTS trg_item_stocks_total_insert",
+        "DROP TRIGGER IF EXISTS trg_item_stocks_total_update",
+        "DROP TRIGGER IF EXISTS trg_item_stocks_total_delete",
+        f"""
+        CREATE TRIGGER trg_items_low_stock_insert AFTER INSERT ON items
+        BEGIN {set_flag} END
+        """,
+        f"""
+        CREATE TRIGGER trg_items_low_stock_update
+        AFTER UPDATE OF total_stock, reorder_point, track_inventory ON items
+        BEGIN {set_flag} END
+        """,
+        f"""
+        CREATE TRIGGER trg_item_stocks_total_insert AFTER INSERT ON item_stocks
+        BEGIN
+            UPDATE items SET total_stock = {STOCK_SUM_SQL} WHERE id = NEW.item_id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER trg_item_stocks_total_update
+        AFTER UPDATE OF item_id, quantity_available ON item_stocks
+        BEGIN
+            UPDATE items SET total_stock = {STOCK_SUM_SQL} WHERE id IN (OLD.item_id, NEW.item_id);
+        END
+        """,
+        f"""
+        CREATE TRIGGER trg_item_stocks_total_delete AFTER DELETE ON item_stocks
+        BEGIN
+            UPDATE items SET total_stock = {STOCK_SUM_SQL} WHERE id = OLD.item_id;
+        END
+        """,
+    ]
+
+
+class ItemStockTotals(TriggerRollup):
+    """item_stocks → items.total_stock / items.is_low_stock"""
+
+    def prepare(self, connection):
+        """Add total_stock / is_low_stock (and their index) to an items table created before them"""
+        columns = {column['name'] for column in inspect(connection).get_columns('items')}
+        if 'total_stock' not in columns:
+            connection.execute(text("ALTER TABLE items ADD COLUMN total_stock FLOAT NOT NULL DEFAULT 0"))
+        if 'is_low_stock' not in columns:
+            connection.execute(text("ALTER TABLE items ADD COLUMN is_low_stock BOOLEAN NOT NULL DEFAULT FALSE"))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_item_low_stock ON items (tenant_id, is_low_stock, is_active)"
+        ))
+
+    def trigger_sql(self, dialect):
+        return POSTGRES_TRIGGER_SQL if dialect == 'postgresql' else _sqlite_trigger_sql()
+
+    def backfill(self, connection, tenant_id=None):
+        """Recompute total_stock and is_low_stock from item_stocks - returns items updated"""
+        params = {}
+        tenant_filter = ''
+        if tenant_id is not None:
+            tenant_filter = 'WHERE items.tenant_id = :tenant_id'
+            params['tenant_id'] = tenant_id
+
+        result = connection.execute(text(f"""
+            UPDATE items SET total_stock = {STOCK_SUM_SQL}
+            {tenant_filter}
+        """), params)
+        connection.execute(text(f"""
+            UPDATE items SET is_low_stock = {LOW_STOCK_EXPR.format(r='items')}
+            {tenant_filter}
+        """), params)
+        return result.rowcount
+
+
+ITEM_STOCK_TOTALS = ItemStockTotals(name='item_stock_totals', table='items')
@@ -0,0 +1,157 @@
+"""
+Ledger Daily Balance model - materialized per-head, per-day totals of account_transactions
+
+account_transactions is written from dozens of places (most of them raw SQL),
+so the table is kept in sync by database triggers rather than application code.
+The triggers (and an initial backfill) are installed automatically when
+create_all() creates this table; `python rebuild.py ledger_daily_balances`
+re-installs them and re-computes the totals for existing tenants.
+"""
+from .database import db
+from .trigger_rollup import TriggerRollup
+from sqlalchemy import text
+
+
+class LedgerDailyBalance(db.Model):
+    """Sum of debits/credits per tenant, account head and day"""
+    __tablename__ = 'ledger_daily_balances'
+    __table_args__ = (
+        db.UniqueConstraint('tenant_id', 'account_head', 'balance_date', name='uq_ledger_daily_balance'),
+        db.Index('idx_ledger_balance_tenant_date', 'tenant_id', 'balance_date'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id', ondelete='CASCADE'), nullable=False)
+
+    # Account head = account_transactions.transaction_type
+    # ('sales_income', 'cogs', 'gst_payable', 'accounts_payable', ...)
+    account_head = db.Column(db.String(50), nullable=False)
+    balance_date = db.Column(db.Date, nullable=False)
+
+    # Totals of all transactions for this head on this day
+    debit_total = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    credit_total = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<LedgerDailyBalance {self.account_head} {self.balance_date}>'
+
+
+# ============================================================
+# Trigger DDL (PostgreSQL + SQLite)
+# ============================================================
+
+POSTGRES_TRIGGER_SQL = [
+    """
+    CREATE OR REPLACE FUNCTION ledger_daily_balances_sync() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE ledger_daily_balances
+            SET debit_total = debit_total - COALESCE(OLD.debit_amount, 0),
+                credit_total = credit_total - COALESCE(OLD.credit_amount, 0)
+            WHERE tenant_id = OLD.tenant_id
+            AND account_head = OLD.transaction_type
+            AND balance_date = OLD.transaction_date;
+        END IF;
+
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO ledger_daily_balances (tenant_id, account_head, balance_date, debit_total, credit_total)
+            VALUES (NEW.tenant_id, NEW.transaction_type, NEW.transaction_date,
+                    COALESCE(NEW.debit_amount, 0), COALESCE(NEW.credit_amount, 0))
+            ON CONFLICT (tenant_id, account_head, balance_date) DO UPDATE
+            SET debit_total = ledger_daily_balances.debit_total + EXCLUDED.debit_total,
+                credit_total = ledger_daily_balances.credit_total + EXCLUDED.credit_total;
+        END IF;
+
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_ledger_daily_balances ON account_transactions",
+    """
+    CREATE TRIGGER trg_ledger_daily_balances
+    AFTER INSERT OR DELETE
+    OR UPDATE OF tenant_id, transaction_type, transaction_date, debit_amount, credit_amount
+    ON account_transactions
+    FOR EACH ROW EXECUTE FUNCTION ledger_daily_balances_sync()
+    """,
+]
+
+# SQLite has no upsert inside triggers, so seed the row first and then add to it
+_SQLITE_ADD = """
+    INSERT OR IGNORE INTO ledger_daily_balances (tenant_id, account_head, balance_date, debit_total, credit_total)
+    VALUES (NEW.tenant_id, NEW.transaction_type, NEW.transaction_date, 0, 0);
+    UPDATE ledger_daily_balances
+    SET debit_total = debit_total + COALESCE(NEW.debit_amount, 0),
+        credit_total = credit_total + COALESCE(NEW.credit_amount, 0)
+    WHERE tenant_id = NEW.tenant_id
+    AND account_head = NEW.transaction_type
+    AND balance_date = NEW.transaction_date;
+"""
+
+_SQLITE_SUBTRACT = """
+    UPDATE ledger_daily_balances
+    SET debit_total = debit_total - COALESCE(OLD.debit_amount, 0),
+        credit_total = credit_total - COALESCE(OLD.credit_amount, 0)
+    WHERE tenant_id = OLD.tenant_id
+    AND account_head = OLD.transaction_type
+    AND balance_date = OLD.transaction_date;
+"""
+
+SQLITE_TRIGGER_SQL = [
+    "DROP TRIGGER IF EXISTS trg_ledger_daily_balances_insert",
+    "DROP TRIGGER IF EXISTS trg_ledger_daily_balances_update",
+    "DROP TRIGGER IF EXISTS trg_ledger_daily_balances_delete",
+    f"""
+    CREATE TRIGGER trg_ledger_daily_balances_insert AFTER INSERT ON account_transactions
+    BEGIN {_SQLITE_ADD} END
+    """,
+    f"""
+    CREATE TRIGGER trg_ledger_daily_balances_update
+    AFTER UPDATE OF tenant_id, transaction_type, transaction_date, debit_amount, credit_amount
+    ON account_transactions
+    BEGIN {_SQLITE_SUBTRACT} {_SQLITE_ADD} END
+    """,
+    f"""
+    CREATE TRIGGER trg_ledger_daily_balances_delete AFTER DELETE ON account_transactions
+    BEGIN {_SQLITE_SUBTRACT} END
+    """,
+]
+
+BACKFILL_SQL = """
+    INSERT INTO ledger_daily_balances (tenant_id, account_head, balance_date, debit_total, credit_total)
+    SELECT
+        tenant_id,
+        transaction_type,
+        transaction_date,
+        COALESCE(SUM(debit_amount), 0),
+        COALESCE(SUM(credit_amount), 0)
+    FROM account_transactions
+    WHERE transaction_type IS NOT NULL
+    AND transaction_date IS NOT NULL
+    {tenant_filter}
+    GROUP BY tenant_id, transaction_type, transaction_date
+"""
+
+
+class LedgerDailyBalances(TriggerRollup):
+    """account_transactions → ledger_daily_balances"""
+
+    def trigger_sql(self, dialect):
+        return POSTGRES_TRIGGER_SQL if dialect == 'postgresql' else SQLITE_TRIGGER_SQL
+
+    def backfill(self, connection, tenant_id=None):
+        params = {}
+        if tenant_id is None:
+            connection.execute(text("DELETE FROM ledger_daily_balances"))
+            tenant_filter = ''
+        else:
+            connection.execute(text("DELETE FROM ledger_daily_balances WHERE tenant_id = :tenant_id"),
+                               {'tenant_id': tenant_id})
+            tenant_filter = 'AND tenant_id = :tenant_id'
+            params['tenant_id'] = tenant_id
+
+        result = connection.execute(text(BACKFILL_SQL.format(tenant_filter=tenant_filter)), params)
+        return result.rowcount
+
+
+LEDGER_DAILY_BALANCES = LedgerDailyBalances(name='ledger_daily_balances', table='ledger_daily_balances')
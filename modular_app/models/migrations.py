@@ -0,0 +1,166 @@
+"""
+Versioned schema migrations
+
+MIGRATIONS are applied in order by `python migrate.py` (run by every
+deploy) and recorded in the schema_version table; the app refuses to start
+on an older schema. Each migration runs under a PostgreSQL advisory lock.
+
+Adding a schema change: append a function taking the connection to
+MIGRATIONS with the next version number (new models too - startup doesn't
+call create_all). Migrations must be safe to run on a database that already
+has the change.
+"""
+from .database import db
+from .schema_version import SchemaVersion
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from datetime import datetime
+
+MIGRATION_LOCK_ID = 724_001  # pg_advisory_xact_lock key - one migration at a time
+
+
+# ============================================================
+# Migrations
+# ============================================================
+
+def _create_tables(connection):
+    """Create missing tables (after_create hooks install their triggers)"""
+    db.metadata.create_all(bind=connection)
+
+
+def _seed_default_admin(connection):
+    """Default admin user (username: admin, password: admin123 - change it!)"""
+    from .user import User
+    if not User.query.filter_by(username='admin').first():
+        admin = User(username='admin', is_admin=True)
+        admin.set_password('admin123')
+        db.session.add(admin)
+        db.session.flush()
+        print("✅ Default admin user created (username: admin, password: admin123)")
+
+
+def _item_stock_totals(connection):
+    """items.total_stock / is_low_stock columns, triggers and values"""
+    from .item_stock_totals import ITEM_STOCK_TOTALS
+    ITEM_STOCK_TOTALS.rebuild(connection)
+
+
+def _ledger_balances(connection):
+    """account_transactions → ledger_daily_balances triggers and rollup"""
+    from .ledger_balance import LEDGER_DAILY_BALANCES
+    LEDGER_DAILY_BALANCES.rebuild(connection)
+
+
+def _open_item_balances(connection):
+    """invoices / purchase_bills → open_item_balances triggers and rollup"""
+    from .open_item_balance import OPEN_ITEM_BALANCES
+    OPEN_ITEM_BALANCES.rebuild(connection)
+
+
+def _daily_tenant_metrics(connection):
+    """invoices / purchase_bills → daily_tenant_metrics triggers and rollup"""
+    from .daily_tenant_metrics import DAILY_TENANT_METRICS
+    DAILY_TENANT_METRICS.rebuild(connection)
+
+
+def _backup_tombstones(connection):
+    """Delete triggers recording tombstones for delta backups"""
+    from .tenant_backup import install_tombstone_triggers
+    install_tombstone_triggers(connection)
+
+
+def _backup_tombstones_chain_only(connection):
+    """Tombstone triggers skip tenants without a backup chain"""
+    from .tenant_backup import install_tombstone_triggers
+    install_tombstone_triggers(connection)
+
+
+def _backup_touch_parent(connection):
+    """Child row changes bump the parent's updated_at (delta backups re-send the children)"""
+    from .tenant_backup import install_touch_parent_triggers
+    install_touch_parent_triggers(connection)
+
+
+# (version, name, function) - append only, never renumber
+MIGRATIONS = [
+    (1, 'create_tables', _create_tables),
+    (2, 'seed_default_admin', _seed_default_admin),
+    (3, 'item_stock_totals', _item_stock_totals),
+    (4, 'ledger_daily_balances', _ledger_balances),
+    (5, 'open_item_balances', _open_item_balances),
+    (6, 'daily_tenant_metrics', _daily_tenant_metrics),
+    (7, 'backup_tombstones', _backup_tombstones),
+    (8, 'backup_tombstones_chain_only', _backup_tombstones_chain_only),
+    (9, 'backup_touch_parent', _backup_touch_parent),
+]
+
+LATEST_SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+# ============================================================
+# Runner
+# ============================================================
+
+def current_schema_version():
+    """Highest applied migration, 0 if none (or no schema_version table yet) - one query"""
+    try:
+        version = db.session.execute(text("SELECT MAX(version) FROM schema_version")).scalar()
+    except (OperationalError, ProgrammingError):
+        db.session.rollback()  # Table doesn't exist yet
+        return 0
+    return version or 0
+
+
+def pending_migrations(version=None):
+    """Migrations newer than `version` (default: the database's current version)"""
+    version = current_schema_version() if version is None else version
+    return [migration for migration in MIGRATIONS if migration[0] > version]
+
+
+def run_migrations(target=None):
+    """
+    Apply pending migrations in order, one transaction each
+
+    Args:
+        target: Stop after this version (default: LATEST_SCHEMA_VERSION)
+
+    Returns:
+        List of (version, name) applied
+    """
+    target = LATEST_SCHEMA_VERSION if target is None else target
+    postgres = db.engine.dialect.name == 'postgresql'
+
+    try:
+        SchemaVersion.__table__.create(bind=db.session.connection(), checkfirst=True)
+        db.session.commit()
+
+        applied = []
+        for version, name, migrate in pending_migrations():
+            if version > target:
+                break
+            if postgres:
+                # Transaction-scoped lock (a session lock would leak across PgBouncer clients):
+                # a concurrent runner waits here, then sees the version was applied
+                db.session.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {'lock_id': MIGRATION_LOCK_ID})
+                if current_schema_version() >= version:
+                    db.session.commit()
+                    continue
+            print(f"🔧 Migration {version}: {name}...")
+            migrate(db.session.connection())
+            db.session.add(SchemaVersion(version=version, name=name, applied_at=datetime.utcnow()))
+            db.session.commit()
+            applied.append((version, name))
+        return applied
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def migration_status():
+    """[(version, name, applied_at or None)] for every known migration"""
+    try:
+        applied = {row.version: row.applied_at for row in SchemaVersion.query.all()}
+    except (OperationalError, ProgrammingError):
+        db.session.rollback()
+        applied = {}
+    return [(version, name, applied.get(version)) for version, name, _ in MIGRATIONS]
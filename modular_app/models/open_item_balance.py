@@ -0,0 +1,97 @@
+"""
+Open Item Balance model - materialized open (unpaid) amounts per party and due date
+
+Receivables come from invoices, payables from approved purchase bills. Both are
+updated from many places (invoice edits, payments, returns, bill approval...),
+so - like ledger_daily_balances - the table is kept in sync by database
+triggers rather than application code. Rows are keyed by due date, not by
+aging bucket, so they never go stale as days pass: the aging report buckets
+them with CASE against today's date at read time (see AgingService).
+
+The triggers (and an initial backfill) are installed automatically when
+create_all() creates this table; `python rebuild.py open_item_balances`
+re-installs them and re-computes the totals for existing tenants.
+"""
+from .database import db
+from .trigger_rollup import AdditiveRollup
+
+
+class OpenItemBalance(db.Model):
+    """Outstanding amount and number of open documents per party and due date"""
+    __tablename__ = 'open_item_balances'
+    __table_args__ = (
+        db.UniqueConstraint('tenant_id', 'party_type', 'party_id', 'party_name', 'due_date',
+                            name='uq_open_item_balance'),
+        db.Index('idx_open_item_tenant_type', 'tenant_id', 'party_type', 'due_date'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id', ondelete='CASCADE'), nullable=False)
+
+    # 'receivable' (invoices) or 'payable' (purchase bills)
+    party_type = db.Column(db.String(20), nullable=False)
+
+    # customer_id / vendor_id (0 = walk-in / not linked to the master)
+    party_id = db.Column(db.Integer, nullable=False, default=0)
+    party_name = db.Column(db.String(255), nullable=False)
+
+    # Due date (falls back to the document date when no due date is set)
+    due_date = db.Column(db.Date, nullable=False)
+
+    # Totals of all open documents for this party and due date
+    open_amount = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    open_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<OpenItemBalance {self.party_type} {self.party_name} {self.due_date}>'
+
+
+# ============================================================
+# Sources: which documents are open, and how they map to a row
+# ============================================================
+
+OPEN_ITEM_BALANCES = AdditiveRollup(
+    name='open_item_balances',
+    table='open_item_balances',
+    keys=['tenant_id', 'party_type', 'party_id', 'party_name', 'due_date'],
+    values=['open_amount', 'open_count'],
+    empty_when='open_count <= 0',
+    sqlite_trigger_prefix='trg_open_items',
+    sources=[
+        {
+            'table': 'invoices',
+            'keys': {
+                'tenant_id': '{r}.tenant_id',
+                'party_type': "'receivable'",
+                'party_id': 'COALESCE({r}.customer_id, 0)',
+                'party_name': '{r}.customer_name',
+                'due_date': 'COALESCE({r}.due_date, {r}.invoice_date)',
+            },
+            'values': {
+                'open_amount': 'CAST({r}.total_amount - COALESCE({r}.paid_amount, 0) AS NUMERIC(15, 2))',
+                'open_count': '1',
+            },
+            'where': "{r}.payment_status != 'paid'",
+            'columns': 'tenant_id, customer_id, customer_name, due_date, invoice_date, '
+                       'total_amount, paid_amount, payment_status',
+        },
+        {
+            'table': 'purchase_bills',
+            'keys': {
+                'tenant_id': '{r}.tenant_id',
+                'party_type': "'payable'",
+                'party_id': 'COALESCE({r}.vendor_id, 0)',
+                'party_name': '{r}.vendor_name',
+                'due_date': 'COALESCE({r}.due_date, {r}.bill_date)',
+            },
+            'values': {
+                'open_amount': '{r}.total_amount - COALESCE({r}.paid_amount, 0)',
+                'open_count': '1',
+            },
+            # Draft bills shouldn't appear in accounting
+            'where': "{r}.status = 'approved' AND {r}.payment_status != 'paid'",
+            'columns': 'tenant_id, vendor_id, vendor_name, due_date, bill_date, '
+                       'total_amount, paid_amount, payment_status, status',
+        },
+    ],
+)
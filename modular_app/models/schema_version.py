@@ -0,0 +1,17 @@
+"""
+Schema Version model - one row per migration applied by models/migrations.py
+"""
+from .database import db
+from datetime import datetime
+
+
+class SchemaVersion(db.Model):
+    """A schema migration that has been applied to this database"""
+    __tablename__ = 'schema_version'
+
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(100), nullable=False)
+    applied_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SchemaVersion {self.version} {self.name}>'
@@ -268,7 +268,9 @@ class SubscriptionDelivery(db.Model):
     Daily Delivery Records (for METERED subscriptions only)
     
     Tracks actual daily deliveries for consumption-based billing.
-    Auto-generated on enrollment, updated only for exceptions.
+    Only exceptions (pauses, quantity changes, manual assignments) and
+    completed deliveries are stored - regular days are expanded from the
+    plan's delivery pattern by services/delivery_engine.py.
     
     Examples:
     - Dec 1: 2L delivered (default) ✅
@@ -318,6 +320,9 @@ class SubscriptionDelivery(db.Model):
         db.UniqueConstraint('subscription_id', 'delivery_date', name='uq_subscription_delivery_date'),
     )
     
+    # Rule-based days are ScheduledDelivery objects (is_virtual = True)
+    is_virtual = False
+    
     # Relationships
     assigned_to_employee = db.relationship('Employee', foreign_keys=[assigned_to], backref='assigned_deliveries')
     delivered_by_employee = db.relationship('Employee', foreign_keys=[delivered_by], backref='deliveries_made')
@@ -365,37 +370,6 @@ class SubscriptionDelivery(db.Model):
         )
         
         return query.order_by(cls.delivery_date.asc()).all()
-    
-    @classmethod
-    def bulk_pause(cls, subscription_id, date_from, date_to, reason="Paused by customer"):
-        """
-        Pause deliveries for a date range
-        Updates all deliveries in range to quantity=0, status=paused
-        """
-        from datetime import timedelta
-        
-        current_date = date_from
-        updated_count = 0
-        
-        while current_date <= date_to:
-            delivery = cls.query.filter_by(
-                subscription_id=subscription_id,
-                delivery_date=current_date
-            ).first()
-            
-            if delivery:
-                delivery.quantity = 0
-                delivery.amount = 0
-                delivery.status = 'paused'
-                delivery.is_modified = True
-                delivery.modification_reason = reason
-                delivery.updated_at = datetime.utcnow()
-                updated_count += 1
-            
-            current_date += timedelta(days=1)
-        
-        db.session.commit()
-        return updated_count
 
 
 class DeliveryDayNote(db.Model):
@@ -0,0 +1,222 @@
+"""
+Tenant Backup models - backup chain bookkeeping and deletion tombstones
+
+Each backup records its watermark; a delta exports the rows changed since
+the previous one. Database triggers record deleted rows in
+backup_tombstones (only for tenants with a backup chain) and bump the
+parent's updated_at when child rows (invoice_items, ...) change.
+"""
+from .database import db
+from sqlalchemy import event, text, inspect
+from datetime import datetime
+
+
+class TenantBackup(db.Model):
+    """One backup taken (or restored) for a tenant"""
+    __tablename__ = 'tenant_backups'
+    __table_args__ = (
+        db.Index('idx_tenant_backups_tenant', 'tenant_id', 'completed_at'),
+    )
+
+    # Kinds
+    FULL = 'full'
+    DELTA = 'delta'
+    RESTORE = 'restore'  # Data was replaced from a backup - the next backup must be full
+
+    id = db.Column(db.Integer, primary_key=True)
+    tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id', ondelete='CASCADE'), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)
+
+    # Chain: a delta applies on top of its parent; base is the chain's full backup
+    base_backup_id = db.Column(db.Integer)
+    parent_backup_id = db.Column(db.Integer)
+
+    since = db.Column(db.DateTime)  # Delta: rows changed after this time
+    watermark = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Time the backup started reading
+    record_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)  # NULL while streaming (or if the download broke off)
+
+    @staticmethod
+    def latest(tenant_id):
+        """The tenant's last completed backup or restore"""
+        return TenantBackup.query.filter(
+            TenantBackup.tenant_id == tenant_id,
+            TenantBackup.completed_at.isnot(None)
+        ).order_by(TenantBackup.completed_at.desc(), TenantBackup.id.desc()).first()
+
+    def __repr__(self):
+        return f'<TenantBackup {self.id} tenant={self.tenant_id} {self.kind}>'
+
+
+class BackupTombstone(db.Model):
+    """A row deleted from a backed-up table (written by triggers)"""
+    __tablename__ = 'backup_tombstones'
+    __table_args__ = (
+        db.Index('idx_backup_tombstones_tenant', 'tenant_id', 'deleted_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    tenant_id = db.Column(db.Integer, nullable=False)
+    table_name = db.Column(db.String(64), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False)  # UTC
+
+    def __repr__(self):
+        return f'<BackupTombstone {self.table_name} {self.row_id}>'
+
+
+# Backed-up tables with a tenant_id column. Child rows without one
+# (invoice_items, task_updates, payment_allocations) are re-sent with their parent.
+TOMBSTONE_TABLES = [
+    'customers', 'vendors', 'sites', 'employees',
+    'item_categories', 'item_groups', 'items', 'item_stocks',
+    'expense_categories', 'expenses',
+    'invoices', 'purchase_bills', 'purchase_bill_items',
+    'sales_orders', 'sales_order_items',
+    'delivery_challans', 'delivery_challan_items',
+    'purchase_requests', 'tasks',
+    'commission_agents', 'invoice_commissions', 'vendor_payments',
+    'bank_accounts', 'account_transactions',
+]
+
+
+# (child table, foreign key, parent table) - child rows re-sent whole when the parent changes
+CHILD_TABLES = [
+    ('invoice_items', 'invoice_id', 'invoices'),
+    ('sales_order_items', 'sales_order_id', 'sales_orders'),
+    ('task_updates', 'task_id', 'tasks'),
+    ('payment_allocations', 'payment_id', 'vendor_payments'),
+]
+
+
+# ============================================================
+# Trigger DDL (PostgreSQL + SQLite)
+# ============================================================
+
+# The deleted row's tenant has a backup a delta could build on
+HAS_BACKUP_CHAIN_SQL = """
+    (SELECT kind FROM tenant_backups WHERE tenant_id = OLD.tenant_id
+     ORDER BY id DESC LIMIT 1) IN ('full', 'delta')
+"""
+
+POSTGRES_FUNCTION_SQL = f"""
+    CREATE OR REPLACE FUNCTION backup_tombstones_record() RETURNS trigger AS $$
+    BEGIN
+        IF {HAS_BACKUP_CHAIN_SQL} THEN
+            INSERT INTO backup_tombstones (tenant_id, table_name, row_id, deleted_at)
+            VALUES (OLD.tenant_id, TG_TABLE_NAME, OLD.id, clock_timestamp() AT TIME ZONE 'UTC');
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+
+def _postgres_trigger_sql(table):
+    return [
+        f"DROP TRIGGER IF EXISTS trg_backup_tombstones ON {table}",
+        f"""
+        CREATE TRIGGER trg_backup_tombstones
+        AFTER DELETE ON {table}
+        FOR EACH ROW EXECUTE FUNCTION backup_tombstones_record()
+        """,
+    ]
+
+
+def _sqlite_trigger_sql(table):
+    return [
+        f"DROP TRIGGER IF EXISTS trg_backup_tombstones_{table}",
+        f"""
+        CREATE TRIGGER trg_backup_tombstones_{table} AFTER DELETE ON {table}
+        WHEN {HAS_BACKUP_CHAIN_SQL}
+        BEGIN
+            INSERT INTO backup_tombstones (tenant_id, table_name, row_id, deleted_at)
+            VALUES (OLD.tenant_id, '{table}', OLD.id, CURRENT_TIMESTAMP);
+        END
+        """,
+    ]
+
+
+def install_tombstone_triggers(connection):
+    """(Re-)create the tombstone triggers on every backed-up table that exists"""
+    existing = set(inspect(connection).get_table_names())
+
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text(POSTGRES_FUNCTION_SQL))
+        build = _postgres_trigger_sql
+    else:
+        build = _sqlite_trigger_sql
+
+    for table in TOMBSTONE_TABLES:
+        if table in existing:
+            for statement in build(table):
+                connection.execute(text(statement))
+
+
+def _postgres_touch_parent_sql(child, foreign_key, parent):
+    # One statement's rows share statement_timestamp() - the parent is updated once, not per line
+    touch = f"""
+        UPDATE {parent} SET updated_at = statement_timestamp() AT TIME ZONE 'UTC'
+        WHERE id = {{r}}.{foreign_key}
+        AND updated_at IS DISTINCT FROM statement_timestamp() AT TIME ZONE 'UTC';
+    """
+    return [
+        f"""
+        CREATE OR REPLACE FUNCTION backup_touch_parent_{child}() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                {touch.format(r='OLD')}
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                {touch.format(r='NEW')}
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        f"DROP TRIGGER IF EXISTS trg_backup_touch_parent ON {child}",
+        f"""
+        CREATE TRIGGER trg_backup_touch_parent
+        AFTER INSERT OR UPDATE OR DELETE ON {child}
+        FOR EACH ROW EXECUTE FUNCTION backup_touch_parent_{child}()
+        """,
+    ]
+
+
+def _sqlite_touch_parent_sql(child, foreign_key, parent):
+    touch = f"""
+        UPDATE {parent} SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')
+        WHERE id = {{r}}.{foreign_key};
+    """
+    name = f"trg_backup_touch_parent_{child}"
+    return [
+        f"DROP TRIGGER IF EXISTS {name}_insert",
+        f"DROP TRIGGER IF EXISTS {name}_update",
+        f"DROP TRIGGER IF EXISTS {name}_delete",
+        f"CREATE TRIGGER {name}_insert AFTER INSERT ON {child} BEGIN {touch.format(r='NEW')} END",
+        f"""
+        CREATE TRIGGER {name}_update AFTER UPDATE ON {child}
+        BEGIN {touch.format(r='OLD')} {touch.format(r='NEW')} END
+        """,
+        f"CREATE TRIGGER {name}_delete AFTER DELETE ON {child} BEGIN {touch.format(r='OLD')} END",
+    ]
+
+
+def install_touch_parent_triggers(connection):
+    """(Re-)create the triggers bumping a parent's updated_at when its child rows change"""
+    existing = set(inspect(connection).get_table_names())
+    build = _postgres_touch_parent_sql if connection.dialect.name == 'postgresql' else _sqlite_touch_parent_sql
+
+    for child, foreign_key, parent in CHILD_TABLES:
+        if child in existing and parent in existing:
+            for statement in build(child, foreign_key, parent):
+                connection.execute(text(statement))
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _setup_backup_tombstones(target, connection, tables=(), **kw):
+    """Install triggers when create_all() creates the tombstones table"""
+    if any(table.name == 'backup_tombstones' for table in tables):
+        install_tombstone_triggers(connection)
+        install_touch_parent_triggers(connection)
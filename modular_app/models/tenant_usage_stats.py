@@ -0,0 +1,42 @@
+"""
+Tenant Usage Stats model - per-tenant record counts and last activity for the superadmin console
+
+Refreshed in bulk by TenantUsageService.
+"""
+from .database import db
+from datetime import datetime
+
+
+class TenantUsageStats(db.Model):
+    """Usage snapshot of one tenant"""
+    __tablename__ = 'tenant_usage_stats'
+
+    tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id', ondelete='CASCADE'), primary_key=True)
+
+    # Record counts
+    employee_count = db.Column(db.Integer, nullable=False, default=0)
+    attendance_count = db.Column(db.Integer, nullable=False, default=0)
+    site_count = db.Column(db.Integer, nullable=False, default=0)
+    material_count = db.Column(db.Integer, nullable=False, default=0)
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+    customer_count = db.Column(db.Integer, nullable=False, default=0)
+    vendor_count = db.Column(db.Integer, nullable=False, default=0)
+    invoice_count = db.Column(db.Integer, nullable=False, default=0)
+    purchase_bill_count = db.Column(db.Integer, nullable=False, default=0)
+    expense_count = db.Column(db.Integer, nullable=False, default=0)
+    task_count = db.Column(db.Integer, nullable=False, default=0)
+
+    # Amounts (recent = last 30 days as of refreshed_at)
+    total_sales = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    recent_sales = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    total_purchases = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    total_expenses_amount = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    recent_expenses = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+
+    # Newest attendance punch / created document of any kind
+    last_activity = db.Column(db.DateTime)
+
+    refreshed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<TenantUsageStats tenant={self.tenant_id} refreshed={self.refreshed_at}>'
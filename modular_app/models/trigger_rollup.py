@@ -0,0 +1,245 @@
+"""
+Trigger-maintained rollups - shared scaffolding for tables kept in sync by database triggers
+
+Several summaries (ledger_daily_balances, open_item_balances,
+daily_tenant_metrics, items.total_stock) are written from too many places
+to maintain in application code, so database triggers keep them in sync.
+Each one is a TriggerRollup: it knows its trigger DDL per dialect and how to
+recompute itself from the source tables, and it is registered in ROLLUPS
+so `python rebuild.py <name>` can re-install and backfill any of them.
+
+Most are additive: every source row adds its values to one summary row
+(AdditiveRollup builds the PostgreSQL and SQLite triggers and the backfill
+from a description of the sources).
+
+Triggers (and an initial backfill) are installed automatically when
+create_all() creates the rollup's table.
+"""
+from .database import db
+from sqlalchemy import event, text
+
+ROLLUPS = {}  # name -> TriggerRollup (registered on import of the model module)
+
+
+class TriggerRollup:
+    """A table (or columns) kept in sync with its sources by database triggers"""
+
+    def __init__(self, name, table):
+        """
+        Args:
+            name: Name used by `python rebuild.py <name>`
+            table: Table whose creation by create_all() installs the triggers
+        """
+        self.name = name
+        self.table = table
+        ROLLUPS[name] = self
+        event.listen(db.metadata, 'after_create', self._setup_on_create)
+
+    def trigger_sql(self, dialect):
+        """Statements (re-)creating the triggers for 'postgresql' or 'sqlite'"""
+        raise NotImplementedError
+
+    def backfill(self, connection, tenant_id=None):
+        """Recompute the rollup from its sources (one tenant or all) - returns rows written"""
+        raise NotImplementedError
+
+    def prepare(self, connection):
+        """Schema the triggers need on databases created before the rollup (default: none)"""
+
+    def install(self, connection):
+        """(Re-)create the triggers for the connection's dialect"""
+        for statement in self.trigger_sql(connection.dialect.name):
+            connection.execute(text(statement))
+
+    def rebuild(self, connection, tenant_id=None):
+        """Prepare the schema, re-install the triggers and backfill (caller commits)"""
+        self.prepare(connection)
+        self.install(connection)
+        return self.backfill(connection, tenant_id)
+
+    def _setup_on_create(self, target, connection, tables=(), **kw):
+        if any(table.name == self.table for table in tables):
+            self.install(connection)
+            self.backfill(connection)
+
+
+class AdditiveRollup(TriggerRollup):
+    """
+    Summary rows keyed by `keys`, holding sums of `values` over the source rows
+
+    Each source is a dict ({r} in expressions is NEW / OLD inside triggers, or
+    the table name in the backfill):
+        table:   Source table
+        keys:    {key column: expression} - the summary row a source row belongs to
+        values:  {value column: expression} - what a source row adds (others add 0)
+        where:   Condition for a source row to count
+        columns: Source columns whose UPDATE re-applies the row
+    """
+
+    def __init__(self, name, table, keys, values, sources, empty_when, sqlite_trigger_prefix):
+        """
+        Args:
+            keys: Key columns of the summary table (its unique constraint)
+            values: Value columns of the summary table
+            empty_when: Condition on a summary row that has no source rows left (deleted)
+            sqlite_trigger_prefix: SQLite trigger names are <prefix>_<source table>_<event>
+        """
+        super().__init__(name, table)
+        self.keys = keys
+        self.values = values
+        self.sources = sources
+        self.empty_when = empty_when
+        self.sqlite_trigger_prefix = sqlite_trigger_prefix
+
+    @staticmethod
+    def _expr(template, ref):
+        return template.format(r=ref)
+
+    def _key_values(self, source, ref):
+        return ', '.join(self._expr(source['keys'][key], ref) for key in self.keys)
+
+    def _row_filter(self, source, ref):
+        """WHERE clause matching the summary row of a source row"""
+        return ' AND '.join(f"{key} = {self._expr(source['keys'][key], ref)}" for key in self.keys)
+
+    def _apply(self, source, ref, sign):
+        """SET clause adding (sign='+') or removing (sign='-') a source row"""
+        return ', '.join(
+            f"{column} = {column} {sign} ({self._expr(expr, ref)})"
+            for column, expr in source['values'].items()
+        )
+
+    def _subtract_sql(self, source):
+        """Remove OLD from its row (and drop rows with no source rows left)"""
+        row_filter = self._row_filter(source, 'OLD')
+        return f"""
+            UPDATE {self.table}
+            SET {self._apply(source, 'OLD', '-')}
+            WHERE {row_filter};
+            DELETE FROM {self.table}
+            WHERE {row_filter}
+            AND {self.empty_when};
+        """
+
+    def _postgres_trigger_sql(self, source):
+        table = source['table']
+        columns = ', '.join(self.keys + self.values)
+        values = ', '.join(self._expr(source['values'].get(column, '0'), 'NEW') for column in self.values)
+        updates = ', '.join(
+            f"{column} = {self.table}.{column} + EXCLUDED.{column}"
+            for column in source['values']
+        )
+        return [
+            f"""
+            CREATE OR REPLACE FUNCTION {self.table}_sync_{table}() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    IF {self._expr(source['where'], 'OLD')} THEN
+                        {self._subtract_sql(source)}
+                    END IF;
+                END IF;
+
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    IF {self._expr(source['where'], 'NEW')} THEN
+                        INSERT INTO {self.table} ({columns})
+                        VALUES ({self._key_values(source, 'NEW')}, {values})
+                        ON CONFLICT ({', '.join(self.keys)}) DO UPDATE
+                        SET {updates};
+                    END IF;
+                END IF;
+
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            """,
+            f"DROP TRIGGER IF EXISTS trg_{self.table} ON {table}",
+            f"""
+            CREATE TRIGGER trg_{self.table}
+            AFTER INSERT OR DELETE OR UPDATE OF {source['columns']}
+            ON {table}
+            FOR EACH ROW EXECUTE FUNCTION {self.table}_sync_{table}()
+            """,
+        ]
+
+    def _sqlite_trigger_sql(self, source):
+        """SQLite has no upsert inside triggers, so seed the row first and then add to it"""
+        table = source['table']
+        name = f"{self.sqlite_trigger_prefix}_{table}"
+        zeros = ', '.join('0' for _ in self.values)
+        add = f"""
+            INSERT OR IGNORE INTO {self.table} ({', '.join(self.keys + self.values)})
+            VALUES ({self._key_values(source, 'NEW')}, {zeros});
+            UPDATE {self.table}
+            SET {self._apply(source, 'NEW', '+')}
+            WHERE {self._row_filter(source, 'NEW')};
+        """
+        subtract = self._subtract_sql(source)
+        new_counts = self._expr(source['where'], 'NEW')
+        old_counts = self._expr(source['where'], 'OLD')
+
+        # UPDATE is split in two triggers: take OLD out of its row, put NEW into its row
+        return [
+            f"DROP TRIGGER IF EXISTS {name}_insert",
+            f"DROP TRIGGER IF EXISTS {name}_update_old",
+            f"DROP TRIGGER IF EXISTS {name}_update_new",
+            f"DROP TRIGGER IF EXISTS {name}_delete",
+            f"""
+            CREATE TRIGGER {name}_insert AFTER INSERT ON {table}
+            WHEN {new_counts}
+            BEGIN {add} END
+            """,
+            f"""
+            CREATE TRIGGER {name}_update_old AFTER UPDATE OF {source['columns']} ON {table}
+            WHEN {old_counts}
+            BEGIN {subtract} END
+            """,
+            f"""
+            CREATE TRIGGER {name}_update_new AFTER UPDATE OF {source['columns']} ON {table}
+            WHEN {new_counts}
+            BEGIN {add} END
+            """,
+            f"""
+            CREATE TRIGGER {name}_delete AFTER DELETE ON {table}
+            WHEN {old_counts}
+            BEGIN {subtract} END
+            """,
+        ]
+
+    def trigger_sql(self, dialect):
+        build = self._postgres_trigger_sql if dialect == 'postgresql' else self._sqlite_trigger_sql
+        return [statement for source in self.sources for statement in build(source)]
+
+    def backfill(self, connection, tenant_id=None):
+        params = {}
+        if tenant_id is None:
+            connection.execute(text(f"DELETE FROM {self.table}"))
+        else:
+            connection.execute(text(f"DELETE FROM {self.table} WHERE tenant_id = :tenant_id"),
+                               {'tenant_id': tenant_id})
+            params['tenant_id'] = tenant_id
+
+        # Sources can land in the same summary rows, so aggregate them together
+        source_rows = []
+        for source in self.sources:
+            table = source['table']
+            tenant_filter = f'AND {table}.tenant_id = :tenant_id' if tenant_id is not None else ''
+            columns = ', '.join(
+                [f"{self._expr(source['keys'][key], table)} AS {key}" for key in self.keys] +
+                [f"{self._expr(source['values'].get(column, '0'), table)} AS {column}" for column in self.values]
+            )
+            source_rows.append(f"""
+                SELECT {columns}
+                FROM {table}
+                WHERE {self._expr(source['where'], table)}
+                {tenant_filter}
+            """)
+
+        keys = ', '.join(self.keys)
+        totals = ', '.join(f'SUM({column})' for column in self.values)
+        result = connection.execute(text(f"""
+            INSERT INTO {self.table} ({', '.join(self.keys + self.values)})
+            SELECT {keys}, {totals}
+            FROM ({' UNION ALL '.join(source_rows)}) AS source_rows
+            GROUP BY {keys}
+        """), params)
+        return result.rowcount
@@ -0,0 +1,134 @@
+"""
+Import-Time Profiler
+====================
+Measure how long `import app` takes in a fresh interpreter (what a serverless
+cold start pays before the first request) and which modules it spends the
+time on, using Python's `-X importtime`.
+
+The report lists the slowest modules by cumulative and by self time, and the
+blueprints / URL rules registered at startup. The script exits with status 1
+when the import is slower than the budget (IMPORT_TIME_BUDGET_MS, 0 disables),
+so it can guard cold starts in CI or a pre-deploy check;
+tests/test_import_time.py holds the import to the same budget.
+
+Usage:
+    python profile_imports.py [--top N] [--budget-ms MS] [--runs N]
+                              [--maintenance-routes lazy|eager|off] [--use-database-url]
+
+Example:
+    python profile_imports.py
+    python profile_imports.py --budget-ms 1500 --runs 5
+    python profile_imports.py --maintenance-routes eager --top 30
+"""
+
+import sys
+import os
+import json
+import tempfile
+import argparse
+import subprocess
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+IMPORT_TIME_BUDGET_MS = int(os.environ.get('IMPORT_TIME_BUDGET_MS', 2500))
+
+# Runs in the child interpreter: import the app, then report wall time and what got registered
+CHILD_SCRIPT = """
+import io, json, sys, time, contextlib
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    from app import app
+elapsed_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({
+    'wall_ms': elapsed_ms,
+    'blueprints': len(app.blueprints),
+    'url_rules': len(list(app.url_map.iter_rules())),
+    'modules': len(sys.modules),
+}))
+"""
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us, depth)] from -X importtime output"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries
+
+
+def profile_once(maintenance_routes, database_url):
+    env = dict(os.environ, MAINTENANCE_ROUTES=maintenance_routes)
+    if database_url:
+        env['DATABASE_URL'] = database_url
+
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD_SCRIPT],
+        cwd=APP_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        print(result.stderr[-3000:])
+        raise SystemExit(f"❌ `import app` failed (exit code {result.returncode})")
+
+    summary = json.loads(result.stdout.strip().splitlines()[-1])
+    return summary, parse_importtime(result.stderr)
+
+
+def print_report(summary, entries, top):
+    print(f"\n{'='*70}")
+    print(f"⏱️  import app: {summary['wall_ms']:.0f}ms wall")
+    print(f"   {summary['modules']} modules loaded, {summary['blueprints']} blueprints, "
+          f"{summary['url_rules']} URL rules registered at startup")
+    print(f"{'='*70}")
+
+    app_modules = [entry for entry in entries if entry[0].split('.')[0] in ('app', 'routes', 'models', 'services', 'utils', 'config')]
+    routes_us = sum(entry[1] for entry in entries if entry[0].startswith('routes'))
+    print(f"   routes.* modules: {routes_us / 1000:.0f}ms self time")
+
+    print(f"\n📦 Slowest imports (cumulative, top-level packages):")
+    top_level = sorted((entry for entry in entries if entry[3] == 0), key=lambda entry: -entry[2])
+    for name, self_us, cumulative_us, _ in top_level[:top]:
+        print(f"   {cumulative_us / 1000:8.1f}ms  {name}")
+
+    print(f"\n🏠 Slowest application modules (self time):")
+    for name, self_us, cumulative_us, _ in sorted(app_modules, key=lambda entry: -entry[1])[:top]:
+        print(f"   {self_us / 1000:8.1f}ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Profile `import app` (cold start import time)')
+    parser.add_argument('--top', type=int, default=15, help='Modules to list per table')
+    parser.add_argument('--budget-ms', type=int, default=IMPORT_TIME_BUDGET_MS,
+                        help=f'Fail if the best run is slower, 0 to disable (default: {IMPORT_TIME_BUDGET_MS})')
+    parser.add_argument('--runs', type=int, default=3, help='Fresh interpreters to time; the best run is reported')
+    parser.add_argument('--maintenance-routes', default=os.environ.get('MAINTENANCE_ROUTES', 'lazy'),
+                        choices=['lazy', 'eager', 'off'])
+    parser.add_argument('--use-database-url', action='store_true',
+                        help='Import against DATABASE_URL instead of a throwaway SQLite file')
+    args = parser.parse_args()
+
+    database_url = None
+    if not args.use_database_url:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'profile_imports.db')}"
+        # Untimed first import creates the tables, so the runs measure a start against an existing schema
+        profile_once(args.maintenance_routes, database_url)
+
+    runs = [profile_once(args.maintenance_routes, database_url) for _ in range(max(1, args.runs))]
+    summary, entries = min(runs, key=lambda run: run[0]['wall_ms'])
+    timings = ', '.join(f"{run[0]['wall_ms']:.0f}ms" for run in runs)
+    print(f"🔬 MAINTENANCE_ROUTES={args.maintenance_routes}, best of {len(runs)}: {timings}")
+    print_report(summary, entries, args.top)
+
+    if args.budget_ms:
+        if summary['wall_ms'] > args.budget_ms:
+            print(f"\n❌ import app took {summary['wall_ms']:.0f}ms - over the {args.budget_ms}ms budget")
+            return 1
+        print(f"\n✅ import app took {summary['wall_ms']:.0f}ms - within the {args.budget_ms}ms budget")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+Trigger Rollup Rebuild Utility
+==============================
+(Re-)install the triggers of a trigger-maintained rollup and recompute it
+from its source tables (models/trigger_rollup.py).
+
+Usage:
+    python rebuild.py <rollup> --all
+    or
+    python rebuild.py <rollup> <tenant_id>
+    or
+    python rebuild.py --list
+
+Example:
+    python rebuild.py ledger_daily_balances --all
+    python rebuild.py open_item_balances 11
+
+Run this once after deploying a new rollup on an existing database, or any
+time a report looks out of sync with the documents it summarizes.
+"""
+
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from models import db
+from models.trigger_rollup import ROLLUPS
+
+
+def rebuild(name, tenant_id=None):
+    """Rebuild one rollup for one tenant (or every tenant if tenant_id is None)"""
+    rollup = ROLLUPS[name]
+    with app.app_context():
+        scope = f"tenant {tenant_id}" if tenant_id else "ALL tenants"
+        print(f"\n🔄 Rebuilding {name} for {scope}...")
+
+        rows_written = rollup.rebuild(db.session.connection(), tenant_id)
+        db.session.commit()
+
+        print(f"✅ Triggers installed, {rows_written} rows written")
+        return True
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--list':
+        print('\n'.join(sorted(ROLLUPS)))
+        sys.exit(0)
+
+    if len(sys.argv) < 3:
+        print(__doc__)
+        print(f"Rollups: {', '.join(sorted(ROLLUPS))}")
+        sys.exit(1)
+
+    name = sys.argv[1]
+    if name not in ROLLUPS:
+        print(f"❌ Error: Unknown rollup '{name}' (one of: {', '.join(sorted(ROLLUPS))})")
+        sys.exit(1)
+
+    tenant_id = None
+
+    if sys.argv[2] != '--all':
+        try:
+            tenant_id = int(sys.argv[2])
+        except ValueError:
+            print(f"❌ Error: Invalid tenant_id '{sys.argv[2]}'")
+            print(__doc__)
+            sys.exit(1)
+
+    success = rebuild(name, tenant_id=tenant_id)
+    sys.exit(0 if success else 1)
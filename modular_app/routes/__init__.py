@@ -5,7 +5,8 @@ To add a new feature:
 1. Create a file here (e.g., my_feature.py)
 2. Create a Blueprint
 3. Add routes to the blueprint
-4. Register in app.py
+4. Add it to CORE_BLUEPRINTS in registry.py (one-off migrations and
+   diagnostics go in MAINTENANCE_BLUEPRINTS - loaded on first use)
 
 Example in QUICK_START.md
 """
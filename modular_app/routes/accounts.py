@@ -4,12 +4,13 @@ Phase 1 of Accounting Module
 """
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, g, session
-from models import db, BankAccount, AccountTransaction
+from models import db, BankAccount, AccountTransaction, DocumentSequence
 from utils.tenant_middleware import require_tenant, get_current_tenant_id
 from sqlalchemy import text
 from datetime import datetime
 import pytz
 from decimal import Decimal
+from services.ledger_aggregation_service import LedgerAggregationService
 
 accounts_bp = Blueprint('accounts', __name__, url_prefix='/admin/accounts')
 
@@ -33,6 +34,22 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+
+def next_voucher_number(tenant_id, document_type, transaction_type, prefix):
+    """Next voucher number like CONTRA-0001 from the tenant's voucher sequence"""
+    def last_issued():
+        # Sequence not created yet - continue from the last voucher of this type
+        last_voucher = db.session.execute(text("""
+            SELECT voucher_number FROM account_transactions
+            WHERE tenant_id = :tenant_id AND transaction_type = :transaction_type
+            AND voucher_number LIKE :pattern
+            ORDER BY id DESC LIMIT 1
+        """), {'tenant_id': tenant_id, 'transaction_type': transaction_type, 'pattern': f'{prefix}-%'}).fetchone()
+        return DocumentSequence.highest_number([last_voucher[0]]) if last_voucher and last_voucher[0] else 0
+    
+    number = DocumentSequence.next_value(tenant_id, document_type, seed=last_issued)
+    return f'{prefix}-{number:04d}'
+
 @accounts_bp.route('/', methods=['GET'], strict_slashes=False)  # PERFORMANCE: Prevent 308 redirects
 @require_tenant
 @login_required
@@ -563,18 +580,7 @@ def contra_create():
             return redirect(url_for('accounts.contra_list'))
         
         # Generate voucher number
-        last_voucher = db.session.execute(text("""
-            SELECT voucher_number FROM account_transactions
-            WHERE tenant_id = :tenant_id AND transaction_type = 'contra'
-            AND voucher_number LIKE 'CONTRA-%'
-            ORDER BY id DESC LIMIT 1
-        """), {'tenant_id': tenant_id}).fetchone()
-        
-        if last_voucher and last_voucher[0]:
-            last_num = int(last_voucher[0].split('-')[1])
-            voucher_number = f'CONTRA-{last_num + 1:04d}'
-        else:
-            voucher_number = 'CONTRA-0001'
+        voucher_number = next_voucher_number(tenant_id, DocumentSequence.CONTRA, 'contra', 'CONTRA')
         
         ist = pytz.timezone('Asia/Kolkata')
         now = datetime.now(ist)
@@ -779,18 +785,7 @@ def employee_cash_give():
             return redirect(url_for('accounts.employee_cash_list'))
         
         # Generate voucher number
-        last_voucher = db.session.execute(text("""
-            SELECT voucher_number FROM account_transactions
-            WHERE tenant_id = :tenant_id AND transaction_type = 'employee_advance'
-            AND voucher_number LIKE 'EMP-ADV-%'
-            ORDER BY id DESC LIMIT 1
-        """), {'tenant_id': tenant_id}).fetchone()
-        
-        if last_voucher and last_voucher[0]:
-            last_num = int(last_voucher[0].split('-')[2])
-            voucher_number = f'EMP-ADV-{last_num + 1:04d}'
-        else:
-            voucher_number = 'EMP-ADV-0001'
+        voucher_number = next_voucher_number(tenant_id, DocumentSequence.EMPLOYEE_ADVANCE, 'employee_advance', 'EMP-ADV')
         
         ist = pytz.timezone('Asia/Kolkata')
         now = datetime.now(ist)
@@ -940,27 +935,7 @@ def employee_cash_expense():
         new_balance = available_cash - amount
         
         # Generate voucher number for employee expense
-        # Get the last expense voucher number for this tenant
-        last_voucher = db.session.execute(text("""
-            SELECT voucher_number
-            FROM account_transactions
-            WHERE tenant_id = :tenant_id 
-            AND transaction_type = 'employee_expense'
-            AND voucher_number LIKE 'EMP-EXP-%'
-            ORDER BY id DESC
-            LIMIT 1
-        """), {'tenant_id': tenant_id}).fetchone()
-        
-        if last_voucher and last_voucher[0]:
-            try:
-                last_number = int(last_voucher[0].split('-')[-1])
-                next_number = last_number + 1
-            except (ValueError, IndexError):
-                next_number = 1
-        else:
-            next_number = 1
-        
-        voucher_number = f"EMP-EXP-{next_number:04d}"
+        voucher_number = next_voucher_number(tenant_id, DocumentSequence.EMPLOYEE_EXPENSE, 'employee_expense', 'EMP-EXP')
         
         # Create expense transaction (credit - employee spent cash)
         # Note: account_id is NULL for employee expenses (they don't affect bank/cash accounts)
@@ -1558,61 +1533,18 @@ def balance_sheet():
     # ====================
     
     # 1. Cash & Bank Accounts (Current Assets)
-    cash_bank_accounts = db.session.execute(text("""
-        SELECT 
-            account_name,
-            account_type,
-            current_balance
-        FROM bank_accounts
-        WHERE tenant_id = :tenant_id 
-        AND is_active = TRUE
-        ORDER BY 
-            CASE account_type 
-                WHEN 'cash' THEN 1 
-                WHEN 'bank' THEN 2 
-            END,
-            account_name
-    """), {'tenant_id': tenant_id}).fetchall()
+    cash_bank_accounts = LedgerAggregationService.get_cash_bank_accounts(tenant_id)
     
     cash_and_bank_total = sum(Decimal(str(acc[2])) for acc in cash_bank_accounts)
     
     # 2. Accounts Receivable (Unpaid Invoices)
-    # 🆕 EXCLUDE credit_adjustment invoices (no AR - customer already paid via kaccha bill)
-    accounts_receivable = db.session.execute(text("""
-        SELECT 
-            customer_name,
-            SUM(total_amount - COALESCE(paid_amount, 0)) as outstanding
-        FROM invoices
-        WHERE tenant_id = :tenant_id 
-        AND payment_status != 'paid'
-        AND invoice_date <= :as_of_date
-        AND (invoice_type IS NULL OR invoice_type != 'credit_adjustment')
-        GROUP BY customer_name
-        ORDER BY outstanding DESC
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchall()
+    accounts_receivable = LedgerAggregationService.get_receivables(tenant_id, as_of_date)
     
     accounts_receivable_total = sum(Decimal(str(acc[1])) for acc in accounts_receivable) if accounts_receivable else Decimal('0')
     
     # 3. Inventory/Stock Value
-    # ✅ PROPER FIX: Calculate from account_transactions (double-entry)
-    # This ensures balance sheet matches trial balance!
-    inventory_debits = db.session.execute(text("""
-        SELECT COALESCE(SUM(debit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type IN ('inventory_opening_debit', 'inventory_purchase')
-        AND transaction_date <= :as_of_date
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchone()[0]
-    
-    inventory_credits = db.session.execute(text("""
-        SELECT COALESCE(SUM(credit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type IN ('inventory_sale')
-        AND transaction_date <= :as_of_date
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchone()[0]
-    
-    inventory_value = Decimal(str(inventory_debits or 0)) - Decimal(str(inventory_credits or 0))
+    # ✅ From the double-entry ledger (same chart line as the trial balance)
+    inventory_value = LedgerAggregationService.aggregate(tenant_id, as_of_date).balance('inventory')
     
     # Total Current Assets
     total_current_assets = cash_and_bank_total + accounts_receivable_total + Decimal(str(inventory_value))
@@ -1752,16 +1684,12 @@ def profit_loss():
     sales_paid = sum(Decimal(str(inv[3])) for inv in sales_revenue_detail if inv[4] == 'paid')
     sales_pending = sum(Decimal(str(inv[3])) for inv in sales_revenue_detail if inv[4] != 'paid')
     
-    # 1.5. Sales Returns (reduce from gross sales)
-    sales_returns_from_transactions = db.session.execute(text("""
-        SELECT COALESCE(SUM(debit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type = 'sales_return'
-        AND transaction_date BETWEEN :start_date AND :end_date
-    """), {'tenant_id': tenant_id, 'start_date': start_date, 'end_date': end_date}).fetchone()[0]
+    # Ledger totals for the period (double-entry)
+    # ⚡ One grouped query, same chart of accounts as the Trial Balance
+    ledger = LedgerAggregationService.aggregate(tenant_id, end_date, start_date=start_date)
     
-    total_sales_returns = Decimal(str(sales_returns_from_transactions or 0))
+    # 1.5. Sales Returns (reduce from gross sales)
+    total_sales_returns = ledger.balance('sales_returns')
     
     # Get return details for display
     sales_returns_detail = db.session.execute(text("""
@@ -1790,27 +1718,8 @@ def profit_loss():
     
     # 1. Cost of Goods Sold (COGS - from double-entry accounting)
     # IMPORTANT: COGS is calculated when items are SOLD, not when purchased
-    # Uses account_transactions with transaction_type = 'cogs'
-    cogs_from_transactions = db.session.execute(text("""
-        SELECT COALESCE(SUM(debit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type = 'cogs'
-        AND transaction_date BETWEEN :start_date AND :end_date
-    """), {'tenant_id': tenant_id, 'start_date': start_date, 'end_date': end_date}).fetchone()[0]
-    
-    total_cogs = Decimal(str(cogs_from_transactions or 0))
-    
-    # Subtract COGS reversals (from returns)
-    cogs_reversals = db.session.execute(text("""
-        SELECT COALESCE(SUM(credit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type = 'cogs_reversal'
-        AND transaction_date BETWEEN :start_date AND :end_date
-    """), {'tenant_id': tenant_id, 'start_date': start_date, 'end_date': end_date}).fetchone()[0]
-    
-    total_cogs = total_cogs - Decimal(str(cogs_reversals or 0))
+    # Uses account_transactions with transaction_type = 'cogs' (net of returns' cogs_reversal)
+    total_cogs = ledger.balance('cogs')
     
     # Get COGS details for display (which invoices contributed to COGS)
     purchase_expenses_detail = db.session.execute(text("""
@@ -1831,15 +1740,7 @@ def profit_loss():
     
     # 2. Operating Expenses (from double-entry accounting)
     # Uses account_transactions with transaction_type = 'operating_expense'
-    operating_expenses_from_transactions = db.session.execute(text("""
-        SELECT COALESCE(SUM(debit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type = 'operating_expense'
-        AND transaction_date BETWEEN :start_date AND :end_date
-    """), {'tenant_id': tenant_id, 'start_date': start_date, 'end_date': end_date}).fetchone()[0]
-    
-    total_operating_expenses = Decimal(str(operating_expenses_from_transactions or 0))
+    total_operating_expenses = ledger.balance('operating_expenses')
     
     # Get details for display (using old expenses table for backward compatibility)
     operating_expenses_detail = db.session.execute(text("""
@@ -1880,19 +1781,11 @@ def profit_loss():
         ORDER BY total_spent DESC
     """), {'tenant_id': tenant_id, 'start_date': start_date, 'end_date': end_date}).fetchall()
     
-    total_employee_expenses = sum(Decimal(str(emp[1])) for emp in employee_expenses_detail)
+    total_employee_expenses = ledger.balance('employee_expenses')
     
     # 4. Salary Expenses (from double-entry accounting)
     # Uses account_transactions with transaction_type = 'salary_expense'
-    salary_expenses_from_transactions = db.session.execute(text("""
-        SELECT COALESCE(SUM(debit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type = 'salary_expense'
-        AND transaction_date BETWEEN :start_date AND :end_date
-    """), {'tenant_id': tenant_id, 'start_date': start_date, 'end_date': end_date}).fetchone()[0]
-    
-    total_salary_expenses = Decimal(str(salary_expenses_from_transactions or 0))
+    total_salary_expenses = ledger.balance('salary_expenses')
     
     # Get details for display (using old salary_slips table for backward compatibility)
     start_year = start_date.year
@@ -1921,23 +1814,7 @@ def profit_loss():
     
     # 5. Commission Expenses (from double-entry accounting)
     # Uses account_transactions with transaction_type = 'commission_expense'
-    commission_expenses_from_transactions = db.session.execute(text("""
-        SELECT COALESCE(SUM(debit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type = 'commission_expense'
-        AND transaction_date BETWEEN :start_date AND :end_date
-    """), {'tenant_id': tenant_id, 'start_date': start_date, 'end_date': end_date}).fetchone()[0]
-    
-    commission_reversal_from_transactions = db.session.execute(text("""
-        SELECT COALESCE(SUM(credit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type = 'commission_reversal'
-        AND transaction_date BETWEEN :start_date AND :end_date
-    """), {'tenant_id': tenant_id, 'start_date': start_date, 'end_date': end_date}).fetchone()[0]
-    
-    total_commission_expenses = Decimal(str(commission_expenses_from_transactions or 0)) - Decimal(str(commission_reversal_from_transactions or 0))
+    total_commission_expenses = ledger.balance('commission_expenses')
     
     # CRITICAL FIX: Commission expenses can be negative when reversals exceed expenses
     # This is valid and should be shown as negative (reduces total expenses)
@@ -2041,16 +1918,7 @@ def trial_balance():
     accounts = []
     
     # 1. Bank & Cash Accounts (Assets - Debit Balance)
-    cash_bank_accounts = db.session.execute(text("""
-        SELECT 
-            account_name,
-            account_type,
-            current_balance
-        FROM bank_accounts
-        WHERE tenant_id = :tenant_id 
-        AND is_active = TRUE
-        ORDER BY account_name
-    """), {'tenant_id': tenant_id}).fetchall()
+    cash_bank_accounts = LedgerAggregationService.get_cash_bank_accounts(tenant_id)
     
     for acc in cash_bank_accounts:
         balance = Decimal(str(acc[2]))
@@ -2062,20 +1930,7 @@ def trial_balance():
         })
     
     # 2. Accounts Receivable (Assets - Debit Balance)
-    # 🆕 EXCLUDE credit_adjustment invoices (no AR - customer already paid via kaccha bill)
-    receivables = db.session.execute(text("""
-        SELECT 
-            customer_name,
-            SUM(total_amount - COALESCE(paid_amount, 0)) as outstanding
-        FROM invoices
-        WHERE tenant_id = :tenant_id 
-        AND payment_status != 'paid'
-        AND invoice_date <= :as_of_date
-        AND (invoice_type IS NULL OR invoice_type != 'credit_adjustment')
-        GROUP BY customer_name
-        HAVING SUM(total_amount - COALESCE(paid_amount, 0)) > 0
-        ORDER BY customer_name
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchall()
+    receivables = LedgerAggregationService.get_receivables(tenant_id, as_of_date)
     
     receivables_total = sum(Decimal(str(r[1])) for r in receivables) if receivables else Decimal('0')
     if receivables_total > 0:
@@ -2086,411 +1941,11 @@ def trial_balance():
             'credit': Decimal('0')
         })
     
-    # 3. Inventory (Assets - Debit Balance)
-    # ✅ PROPER FIX: Calculate from account_transactions (double-entry)
-    # Inventory increases: inventory_opening_debit, inventory_purchase
-    # Inventory decreases: inventory_sale (ONLY! Not COGS - that's a separate expense)
-    inventory_debits = db.session.execute(text("""
-        SELECT COALESCE(SUM(debit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type IN ('inventory_opening_debit', 'inventory_purchase')
-        AND transaction_date <= :as_of_date
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchone()[0]
-    
-    inventory_credits = db.session.execute(text("""
-        SELECT COALESCE(SUM(credit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type IN ('inventory_sale')
-        AND transaction_date <= :as_of_date
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchone()[0]
-    
-    inventory_value = Decimal(str(inventory_debits or 0)) - Decimal(str(inventory_credits or 0))
-    
-    if inventory_value > 0:
-        accounts.append({
-            'account_name': 'Inventory (Stock on Hand)',
-            'category': 'Assets',
-            'debit': inventory_value,
-            'credit': Decimal('0')
-        })
-    
-    # 3.5. Input Tax Credit / ITC (Asset - Debit Balance)
-    # GST paid on purchases that can be claimed back from government
-    itc_from_transactions = db.session.execute(text("""
-        SELECT COALESCE(SUM(debit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type = 'input_tax_credit'
-        AND transaction_date <= :as_of_date
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchone()[0]
-    
-    itc_total = Decimal(str(itc_from_transactions or 0))
-    
-    if itc_total > 0:
-        accounts.append({
-            'account_name': 'Input Tax Credit (ITC)',
-            'category': 'Assets',
-            'debit': itc_total,
-            'credit': Decimal('0')
-        })
-    
-    # 3.6. GST Receivable on Returns (Asset - Debit Balance)
-    # GST amounts from customer returns that can be claimed back
-    gst_return_cgst = db.session.execute(text("""
-        SELECT COALESCE(SUM(debit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type = 'gst_return_cgst'
-        AND transaction_date <= :as_of_date
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchone()[0]
-    
-    gst_return_sgst = db.session.execute(text("""
-        SELECT COALESCE(SUM(debit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type = 'gst_return_sgst'
-        AND transaction_date <= :as_of_date
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchone()[0]
-    
-    gst_return_igst = db.session.execute(text("""
-        SELECT COALESCE(SUM(debit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type = 'gst_return_igst'
-        AND transaction_date <= :as_of_date
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchone()[0]
-    
-    gst_return_total = Decimal(str(gst_return_cgst or 0)) + Decimal(str(gst_return_sgst or 0)) + Decimal(str(gst_return_igst or 0))
-    
-    if gst_return_total > 0:
-        accounts.append({
-            'account_name': 'GST Receivable (Returns)',
-            'category': 'Assets',
-            'debit': gst_return_total,
-            'credit': Decimal('0')
-        })
-    
-    # 3.7. Commission Recoverable (Asset - Debit Balance)
-    # Commission amounts to be recovered from agents due to sales returns
-    commission_recoverable = db.session.execute(text("""
-        SELECT COALESCE(SUM(debit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type = 'commission_recoverable'
-        AND transaction_date <= :as_of_date
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchone()[0]
-    
-    commission_recoverable_total = Decimal(str(commission_recoverable or 0))
-    
-    if commission_recoverable_total > 0:
-        accounts.append({
-            'account_name': 'Commission Recoverable',
-            'category': 'Assets',
-            'debit': commission_recoverable_total,
-            'credit': Decimal('0')
-        })
-    
-    # 4. Accounts Payable (Liabilities - Credit Balance)
-    # NEW: Calculate from account_transactions (double-entry system)
-    # Formula: CREDITS (bills created) - DEBITS (payments made) = Outstanding
-    payables_from_transactions = db.session.execute(text("""
-        SELECT COALESCE(SUM(credit_amount - debit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type IN ('accounts_payable', 'accounts_payable_payment')
-        AND transaction_date <= :as_of_date
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchone()[0]
-    
-    # ✅ NO FALLBACK - Only use account_transactions for accuracy
-    payables_total = Decimal(str(payables_from_transactions or 0))
-    
-    if payables_total > 0:
-        accounts.append({
-            'account_name': 'Accounts Payable (Vendors)',
-            'category': 'Liabilities',
-            'debit': Decimal('0'),
-            'credit': payables_total
-        })
-    
-    # 4.5. GST Payable (Liabilities - Credit Balance)
-    # 🔧 CRITICAL FIX: This was missing! GST collected from customers must appear as liability!
-    gst_payable_from_transactions = db.session.execute(text("""
-        SELECT COALESCE(SUM(credit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type = 'gst_payable'
-        AND transaction_date <= :as_of_date
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchone()[0]
-    
-    gst_payable_total = Decimal(str(gst_payable_from_transactions or 0))
-    
-    if gst_payable_total > 0:
-        accounts.append({
-            'account_name': 'GST Payable (CGST+SGST+IGST)',
-            'category': 'Liabilities',
-            'debit': Decimal('0'),
-            'credit': gst_payable_total
-        })
-    
-    # 5. Sales Income (Income - Credit Balance)
-    # NEW: Calculate from account_transactions (double-entry system)
-    # This will be populated when we implement sales/invoice accounting
-    sales_from_transactions = db.session.execute(text("""
-        SELECT COALESCE(SUM(credit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type = 'sales_income'
-        AND transaction_date <= :as_of_date
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchone()[0]
-    
-    # ✅ NO FALLBACK - Only use account_transactions for accuracy
-    sales_total = Decimal(str(sales_from_transactions or 0))
-    
-    if sales_total > 0:
-        accounts.append({
-            'account_name': 'Sales Income',
-            'category': 'Income',
-            'debit': Decimal('0'),
-            'credit': sales_total
-        })
-    
-    # 6. Cost of Goods Sold / COGS (Expense - Debit Balance)
-    # Calculate from account_transactions (double-entry system)
-    # COGS is recorded when items are SOLD, not when purchased
-    cogs_from_transactions = db.session.execute(text("""
-        SELECT COALESCE(SUM(debit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type = 'cogs'
-        AND transaction_date <= :as_of_date
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchone()[0]
-    
-    cogs_total = Decimal(str(cogs_from_transactions or 0))
-    
-    # Subtract COGS reversals (from returns)
-    cogs_reversals = db.session.execute(text("""
-        SELECT COALESCE(SUM(credit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type = 'cogs_reversal'
-        AND transaction_date <= :as_of_date
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchone()[0]
-    
-    cogs_total = cogs_total - Decimal(str(cogs_reversals or 0))
-    
-    # IMPORTANT: Do NOT show purchase_bills as COGS!
-    # In double-entry: Purchases → Inventory (Asset), not Expense
-    # Only when sold: Inventory → COGS (Expense)
-    
-    if cogs_total > 0:
-        accounts.append({
-            'account_name': 'Cost of Goods Sold (COGS)',
-            'category': 'Expenses',
-            'debit': cogs_total,
-            'credit': Decimal('0')
-        })
-    
-    # 6.5. Sales Returns (Contra-Revenue - Debit Balance)
-    # Sales returns reduce income, shown as debit
-    sales_returns_from_transactions = db.session.execute(text("""
-        SELECT COALESCE(SUM(debit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type = 'sales_return'
-        AND transaction_date <= :as_of_date
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchone()[0]
-    
-    sales_returns_total = Decimal(str(sales_returns_from_transactions or 0))
-    
-    if sales_returns_total > 0:
-        accounts.append({
-            'account_name': 'Sales Returns',
-            'category': 'Expenses',
-            'debit': sales_returns_total,
-            'credit': Decimal('0')
-        })
-    
-    # 6.6. Round-off Expense (from returns) (Expense - Can be DEBIT or CREDIT)
-    # CRITICAL FIX: Net DEBIT and CREDIT amounts (not just DEBIT)
-    round_off_debits = db.session.execute(text("""
-        SELECT COALESCE(SUM(debit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type = 'round_off_expense'
-        AND transaction_date <= :as_of_date
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchone()[0]
-    
-    round_off_credits = db.session.execute(text("""
-        SELECT COALESCE(SUM(credit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type = 'round_off_expense'
-        AND transaction_date <= :as_of_date
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchone()[0]
-    
-    round_off_total = Decimal(str(round_off_debits or 0)) - Decimal(str(round_off_credits or 0))
-    
-    # Show if non-zero (can be positive DEBIT or negative CREDIT)
-    if round_off_total != 0:
-        if round_off_total > 0:
-            # Normal: DEBIT balance (expense increases total)
-            accounts.append({
-                'account_name': 'Round-off Expense',
-                'category': 'Expenses',
-                'debit': round_off_total,
-                'credit': Decimal('0')
-            })
-        else:
-            # Negative: CREDIT balance (reduces total expenses)
-            accounts.append({
-                'account_name': 'Round-off Expense (Credit Excess)',
-                'category': 'Expenses',
-                'debit': Decimal('0'),
-                'credit': abs(round_off_total)
-            })
-    
-    # 🆕 6.7. Other Income/Expense (for GST Credit Adjustment costs)
-    # When creating credit adjustment, GST becomes a cost/expense
-    other_income_debits = db.session.execute(text("""
-        SELECT COALESCE(SUM(debit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type = 'other_income_reversal'
-        AND transaction_date <= :as_of_date
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchone()[0]
-    
-    other_income_credits = db.session.execute(text("""
-        SELECT COALESCE(SUM(credit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type = 'other_income'
-        AND transaction_date <= :as_of_date
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchone()[0]
-    
-    other_income_total = Decimal(str(other_income_debits or 0)) - Decimal(str(other_income_credits or 0))
-    
-    # Show if non-zero
-    if other_income_total != 0:
-        if other_income_total > 0:
-            # DEBIT balance = Expense (GST cost from credit adjustment)
-            accounts.append({
-                'account_name': 'Other Income/Expense (GST Cost)',
-                'category': 'Expenses',
-                'debit': other_income_total,
-                'credit': Decimal('0')
-            })
-        else:
-            # CREDIT balance = Income
-            accounts.append({
-                'account_name': 'Other Income',
-                'category': 'Income',
-                'debit': Decimal('0'),
-                'credit': abs(other_income_total)
-            })
-    
-    # 7. Operating Expenses (Expense - Debit Balance)
-    # NEW: Calculate from account_transactions (double-entry system)
-    # The expenses.py route already creates entries with transaction_type='expense'
-    operating_from_transactions = db.session.execute(text("""
-        SELECT COALESCE(SUM(debit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type = 'operating_expense'
-        AND transaction_date <= :as_of_date
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchone()[0]
-    
-    # ✅ NO FALLBACK - Only use account_transactions for accuracy
-    operating_total = Decimal(str(operating_from_transactions or 0))
-    if operating_total > 0:
-        accounts.append({
-            'account_name': 'Operating Expenses',
-            'category': 'Expenses',
-            'debit': operating_total,
-            'credit': Decimal('0')
-        })
-    
-    # 8. Employee Expenses (Expense - Debit Balance)
-    employee_expenses_total = db.session.execute(text("""
-        SELECT COALESCE(SUM(credit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id 
-        AND reference_type = 'employee'
-        AND transaction_type = 'employee_expense'
-        AND transaction_date <= :as_of_date
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchone()[0] or Decimal('0')
-    
-    if Decimal(str(employee_expenses_total)) > 0:
-        accounts.append({
-            'account_name': 'Employee Expenses',
-            'category': 'Expenses',
-            'debit': Decimal(str(employee_expenses_total)),
-            'credit': Decimal('0')
-        })
-    
-    # 9. Salary Expenses (Expense - Debit Balance)
-    # NEW: Calculate from account_transactions (double-entry system)
-    # This will be populated when we fix salary payment accounting (Day 3)
-    salary_from_transactions = db.session.execute(text("""
-        SELECT COALESCE(SUM(debit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type = 'salary_expense'
-        AND transaction_date <= :as_of_date
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchone()[0]
-    
-    # ✅ NO FALLBACK - Only use account_transactions for accuracy
-    salary_total = Decimal(str(salary_from_transactions or 0))
-    
-    if salary_total > 0:
-        accounts.append({
-            'account_name': 'Salary Expenses',
-            'category': 'Expenses',
-            'debit': salary_total,
-            'credit': Decimal('0')
-        })
-    
-    # 10. Commission Expenses (Expense - Debit Balance)
-    # Calculate from account_transactions (double-entry system)
-    commission_from_transactions = db.session.execute(text("""
-        SELECT COALESCE(SUM(debit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type = 'commission_expense'
-        AND transaction_date <= :as_of_date
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchone()[0]
-    
-    commission_reversal_from_transactions = db.session.execute(text("""
-        SELECT COALESCE(SUM(credit_amount), 0)
-        FROM account_transactions
-        WHERE tenant_id = :tenant_id
-        AND transaction_type = 'commission_reversal'
-        AND transaction_date <= :as_of_date
-    """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchone()[0]
-    
-    commission_total = Decimal(str(commission_from_transactions or 0)) - Decimal(str(commission_reversal_from_transactions or 0))
-    
-    # CRITICAL FIX: Show commission account even if negative (when reversals > expenses)
-    # Negative balance in expense account = CREDIT balance
-    if commission_total != 0:
-        if commission_total > 0:
-            # Normal: Expenses exceed reversals (DEBIT balance)
-            accounts.append({
-                'account_name': 'Commission Expenses',
-                'category': 'Expenses',
-                'debit': commission_total,
-                'credit': Decimal('0')
-            })
-        else:
-            # Unusual: Reversals exceed expenses (CREDIT balance)
-            # Show as negative expense (reduces total expenses)
-            accounts.append({
-                'account_name': 'Commission Expenses (Reversal Excess)',
-                'category': 'Expenses',
-                'debit': Decimal('0'),
-                'credit': abs(commission_total)
-            })
+    # 3-10. Ledger heads (Inventory, ITC, Payables, GST, Income, Expenses...)
+    # ⚡ PERFORMANCE: One grouped query, mapped through the shared chart of accounts
+    # (services/ledger_aggregation_service.py) so Balance Sheet and P&L agree with it
+    ledger = LedgerAggregationService.aggregate(tenant_id, as_of_date)
+    accounts.extend(ledger.trial_balance_lines())
     
     # 11. Owner's Equity / Capital (from Opening Balance Equity - Credit Balance)
     # These are entries with account_id = NULL and transaction_type in:
@@ -2586,99 +2041,48 @@ def receivables_aging():
     Receivables Aging Report
     Shows which customers owe money and for how long
     Aging buckets: Current, 1-30, 31-60, 61-90, 90+ days overdue
+
+    Customer totals come from the open_item_balances summary (one grouped query);
+    invoice details are loaded only for the customer picked with ?party=
     """
     from flask import g
+    from services.aging_service import AgingService
     tenant_id = g.tenant.id if hasattr(g, 'tenant') and g.tenant else session.get('tenant_id')
     ist = pytz.timezone('Asia/Kolkata')
     today = datetime.now(ist).date()
+    selected_party = request.args.get('party')
     
-    # Get all unpaid/partially paid invoices
-    invoices = db.session.execute(text("""
-        SELECT 
-            id,
-            invoice_number,
-            customer_name,
-            invoice_date,
-            due_date,
-            total_amount,
-            COALESCE(paid_amount, 0) as paid_amount,
-            payment_status
-        FROM invoices
-        WHERE tenant_id = :tenant_id 
-        AND payment_status != 'paid'
-        ORDER BY customer_name, invoice_date
-    """), {'tenant_id': tenant_id}).fetchall()
+    aging_data, aging_summary = AgingService.get_party_aging(tenant_id, 'receivable', today)
+    for data in aging_data.values():
+        data['invoices'] = []
     
-    print(f"[DEBUG] Receivables Aging - Tenant ID: {tenant_id}")
-    print(f"[DEBUG] Found {len(invoices)} unpaid/partial invoices")
-    if invoices:
-        for inv in invoices[:5]:  # Show first 5
-            print(f"  - {inv[1]}: {inv[2]}, Status: {inv[7]}, Outstanding: ₹{float(inv[5]) - float(inv[6]):.2f}")
-    
-    # Group by customer and aging bucket
-    aging_data = {}
-    aging_summary = {
-        'current': Decimal('0'),      # Not yet due
-        '1_30': Decimal('0'),          # 1-30 days overdue
-        '31_60': Decimal('0'),         # 31-60 days overdue
-        '61_90': Decimal('0'),         # 61-90 days overdue
-        '90_plus': Decimal('0')        # 90+ days overdue
-    }
-    
-    for inv in invoices:
-        customer = inv[2]
-        invoice_date = inv[3]
-        due_date = inv[4] if inv[4] else invoice_date  # Use invoice_date if no due_date
-        outstanding = Decimal(str(inv[5])) - Decimal(str(inv[6]))
-        
-        # Calculate days overdue
-        days_overdue = (today - due_date).days
-        
-        # Determine aging bucket
-        if days_overdue <= 0:
-            bucket = 'current'
-            bucket_label = 'Current (Not Due)'
-        elif days_overdue <= 30:
-            bucket = '1_30'
-            bucket_label = '1-30 Days'
-        elif days_overdue <= 60:
-            bucket = '31_60'
-            bucket_label = '31-60 Days'
-        elif days_overdue <= 90:
-            bucket = '61_90'
-            bucket_label = '61-90 Days'
-        else:
-            bucket = '90_plus'
-            bucket_label = '90+ Days'
-        
-        # Initialize customer if not exists
-        if customer not in aging_data:
-            aging_data[customer] = {
-                'invoices': [],
-                'total': Decimal('0'),
-                'current': Decimal('0'),
-                '1_30': Decimal('0'),
-                '31_60': Decimal('0'),
-                '61_90': Decimal('0'),
-                '90_plus': Decimal('0')
-            }
-        
-        # Add invoice to customer
-        aging_data[customer]['invoices'].append({
-            'invoice_number': inv[1],
-            'invoice_date': invoice_date,
-            'due_date': due_date,
-            'days_overdue': days_overdue,
-            'outstanding': outstanding,
-            'bucket': bucket_label
-        })
-        
-        # Add to customer totals
-        aging_data[customer]['total'] += outstanding
-        aging_data[customer][bucket] += outstanding
-        
-        # Add to summary totals
-        aging_summary[bucket] += outstanding
+    if selected_party in aging_data:
+        # Unpaid/partially paid invoices of the selected customer
+        invoices = db.session.execute(text("""
+            SELECT 
+                invoice_number,
+                invoice_date,
+                COALESCE(due_date, invoice_date) as due_date,
+                total_amount - COALESCE(paid_amount, 0) as outstanding
+            FROM invoices
+            WHERE tenant_id = :tenant_id 
+            AND customer_name = :customer_name
+            AND payment_status != 'paid'
+            ORDER BY invoice_date
+        """).columns(invoice_date=db.Date, due_date=db.Date),
+            {'tenant_id': tenant_id, 'customer_name': selected_party}).fetchall()
+        
+        for inv in invoices:
+            days_overdue = (today - inv[2]).days
+            bucket, bucket_label = AgingService.get_bucket(days_overdue)
+            aging_data[selected_party]['invoices'].append({
+                'invoice_number': inv[0],
+                'invoice_date': inv[1],
+                'due_date': inv[2],
+                'days_overdue': days_overdue,
+                'outstanding': Decimal(str(inv[3])),
+                'bucket': bucket_label
+            })
     
     # Calculate grand total
     grand_total = sum(aging_summary.values())
@@ -2687,6 +2091,7 @@ def receivables_aging():
                          aging_data=aging_data,
                          aging_summary=aging_summary,
                          grand_total=float(grand_total),
+                         selected_party=selected_party,
                          today=today,
                          tenant=g.tenant)
 
@@ -2698,101 +2103,50 @@ def payables_aging():
     Payables Aging Report
     Shows which vendors you owe money to and for how long
     Aging buckets: Current, 1-30, 31-60, 61-90, 90+ days overdue
+
+    Vendor totals come from the open_item_balances summary (one grouped query);
+    bill details are loaded only for the vendor picked with ?party=
     """
     from flask import g
+    from services.aging_service import AgingService
     tenant_id = g.tenant.id if hasattr(g, 'tenant') and g.tenant else session.get('tenant_id')
     ist = pytz.timezone('Asia/Kolkata')
     today = datetime.now(ist).date()
+    selected_party = request.args.get('party')
     
-    # Get all unpaid/partially paid bills
-    # IMPORTANT: Only count APPROVED bills (draft bills shouldn't appear in accounting)
-    bills = db.session.execute(text("""
-        SELECT 
-            id,
-            bill_number,
-            vendor_name,
-            bill_date,
-            due_date,
-            total_amount,
-            COALESCE(paid_amount, 0) as paid_amount,
-            payment_status
-        FROM purchase_bills
-        WHERE tenant_id = :tenant_id 
-        AND status = 'approved'
-        AND payment_status != 'paid'
-        ORDER BY vendor_name, bill_date
-    """), {'tenant_id': tenant_id}).fetchall()
+    aging_data, aging_summary = AgingService.get_party_aging(tenant_id, 'payable', today)
+    for data in aging_data.values():
+        data['bills'] = []
     
-    print(f"[DEBUG] Payables Aging - Tenant ID: {tenant_id}")
-    print(f"[DEBUG] Found {len(bills)} unpaid/partial bills")
-    if bills:
-        for bill in bills[:5]:  # Show first 5
-            print(f"  - {bill[1]}: {bill[2]}, Status: {bill[7]}, Outstanding: ₹{float(bill[5]) - float(bill[6]):.2f}")
-    
-    # Group by vendor and aging bucket
-    aging_data = {}
-    aging_summary = {
-        'current': Decimal('0'),
-        '1_30': Decimal('0'),
-        '31_60': Decimal('0'),
-        '61_90': Decimal('0'),
-        '90_plus': Decimal('0')
-    }
-    
-    for bill in bills:
-        vendor = bill[2]
-        bill_date = bill[3]
-        due_date = bill[4] if bill[4] else bill_date
-        outstanding = Decimal(str(bill[5])) - Decimal(str(bill[6]))
-        
-        # Calculate days overdue
-        days_overdue = (today - due_date).days
-        
-        # Determine aging bucket
-        if days_overdue <= 0:
-            bucket = 'current'
-            bucket_label = 'Current (Not Due)'
-        elif days_overdue <= 30:
-            bucket = '1_30'
-            bucket_label = '1-30 Days'
-        elif days_overdue <= 60:
-            bucket = '31_60'
-            bucket_label = '31-60 Days'
-        elif days_overdue <= 90:
-            bucket = '61_90'
-            bucket_label = '61-90 Days'
-        else:
-            bucket = '90_plus'
-            bucket_label = '90+ Days'
-        
-        # Initialize vendor if not exists
-        if vendor not in aging_data:
-            aging_data[vendor] = {
-                'bills': [],
-                'total': Decimal('0'),
-                'current': Decimal('0'),
-                '1_30': Decimal('0'),
-                '31_60': Decimal('0'),
-                '61_90': Decimal('0'),
-                '90_plus': Decimal('0')
-            }
-        
-        # Add bill to vendor
-        aging_data[vendor]['bills'].append({
-            'bill_number': bill[1],
-            'bill_date': bill_date,
-            'due_date': due_date,
-            'days_overdue': days_overdue,
-            'outstanding': outstanding,
-            'bucket': bucket_label
-        })
-        
-        # Add to vendor totals
-        aging_data[vendor]['total'] += outstanding
-        aging_data[vendor][bucket] += outstanding
-        
-        # Add to summary totals
-        aging_summary[bucket] += outstanding
+    if selected_party in aging_data:
+        # Unpaid/partially paid bills of the selected vendor
+        # IMPORTANT: Only count APPROVED bills (draft bills shouldn't appear in accounting)
+        bills = db.session.execute(text("""
+            SELECT 
+                bill_number,
+                bill_date,
+                COALESCE(due_date, bill_date) as due_date,
+                total_amount - COALESCE(paid_amount, 0) as outstanding
+            FROM purchase_bills
+            WHERE tenant_id = :tenant_id 
+            AND vendor_name = :vendor_name
+            AND status = 'approved'
+            AND payment_status != 'paid'
+            ORDER BY bill_date
+        """).columns(bill_date=db.Date, due_date=db.Date),
+            {'tenant_id': tenant_id, 'vendor_name': selected_party}).fetchall()
+        
+        for bill in bills:
+            days_overdue = (today - bill[2]).days
+            bucket, bucket_label = AgingService.get_bucket(days_overdue)
+            aging_data[selected_party]['bills'].append({
+                'bill_number': bill[0],
+                'bill_date': bill[1],
+                'due_date': bill[2],
+                'days_overdue': days_overdue,
+                'outstanding': Decimal(str(bill[3])),
+                'bucket': bucket_label
+            })
     
     # Calculate grand total
     grand_total = sum(aging_summary.values())
@@ -2801,6 +2155,7 @@ def payables_aging():
                          aging_data=aging_data,
                          aging_summary=aging_summary,
                          grand_total=float(grand_total),
+                         selected_party=selected_party,
                          today=today,
                          tenant=g.tenant)
 
@@ -0,0 +1,66 @@
+"""
+Migration: Add (tenant_id, customer_id, invoice_date) index on invoices
+=======================================================================
+
+WHY THIS IS CRITICAL:
+- The customer list, ledger statement pages and period totals all look up
+  invoices by customer
+- Without an index every ledger visit scanned all of the tenant's invoices
+  (years of invoices for wholesale tenants)
+- The index also serves the statement's invoice_date ordering
+
+New databases get the index from the Invoice model; this adds it to
+existing ones.
+
+Run: GET /migration/add-customer-ledger-index
+"""
+
+from flask import Blueprint, jsonify
+from models import db
+from sqlalchemy import text
+import logging
+import traceback
+
+logger = logging.getLogger(__name__)
+
+add_customer_ledger_index_bp = Blueprint('add_customer_ledger_index', __name__, url_prefix='/migration')
+
+
+@add_customer_ledger_index_bp.route('/add-customer-ledger-index', methods=['GET'])
+def add_customer_ledger_index():
+    """
+    Add idx_invoice_customer on invoices(tenant_id, customer_id, invoice_date)
+
+    Safe to run multiple times (IF NOT EXISTS)
+    NO AUTH REQUIRED - This is a system-wide database optimization
+    """
+    try:
+        logger.info("🔧 MIGRATION START: Adding customer ledger index on invoices...")
+
+        db.session.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_invoice_customer ON invoices (tenant_id, customer_id, invoice_date)"
+        ))
+        db.session.commit()
+
+        total_invoices = db.session.execute(text("SELECT COUNT(*) FROM invoices")).scalar()
+        logger.info("✅ Customer ledger index created successfully!")
+
+        return jsonify({
+            'status': 'success',
+            'message': f'Customer ledger index added for {total_invoices} invoices',
+            'indexes': ['idx_invoice_customer']
+        }), 200
+
+    except Exception as e:
+        logger.error(f"❌ Error adding customer ledger index: {str(e)}")
+        logger.error(f"📋 Full traceback:\n{traceback.format_exc()}")
+        try:
+            db.session.rollback()
+        except:
+            pass
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to add customer ledger index: {str(e)}',
+            'error_type': type(e).__name__,
+            'traceback': traceback.format_exc()
+        }), 500
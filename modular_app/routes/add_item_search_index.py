@@ -0,0 +1,86 @@
+"""
+Migration: Add trigram indexes for item typeahead search
+========================================================
+
+WHY THIS IS CRITICAL:
+- Invoice / purchase bill entry searches items on every keystroke with
+  ILIKE '%q%' over name, SKU and barcode
+- A B-tree index can't serve '%q%', so every keystroke was a full scan of
+  the tenant's catalog (20K+ SKUs for clothing stores)
+- pg_trgm GIN indexes serve substring searches directly (~5ms)
+
+PostgreSQL only - SQLite uses the in-memory index in ItemSearchService.
+
+Run: GET /migration/add-item-search-index
+"""
+
+from flask import Blueprint, jsonify
+from models import db
+from sqlalchemy import text
+import logging
+import traceback
+
+logger = logging.getLogger(__name__)
+
+add_item_search_index_bp = Blueprint('add_item_search_index', __name__, url_prefix='/migration')
+
+TRIGRAM_INDEXES = {
+    'idx_item_name_trgm': 'name',
+    'idx_item_sku_trgm': 'sku',
+    'idx_item_barcode_trgm': 'barcode',
+}
+
+
+@add_item_search_index_bp.route('/add-item-search-index', methods=['GET'])
+def add_item_search_index():
+    """
+    Enable pg_trgm and add GIN trigram indexes on items.name/sku/barcode
+
+    Safe to run multiple times (IF NOT EXISTS everywhere)
+    NO AUTH REQUIRED - This is a system-wide database optimization
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return jsonify({
+            'status': 'skipped',
+            'message': 'Trigram indexes are PostgreSQL only - SQLite uses the in-memory search index'
+        }), 200
+
+    try:
+        logger.info("🔧 MIGRATION START: Adding trigram indexes for item search...")
+
+        db.session.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+        for index_name, column in TRIGRAM_INDEXES.items():
+            logger.info(f"🔨 Creating {index_name} on items.{column}...")
+            db.session.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {index_name} ON items USING gin ({column} gin_trgm_ops)"
+            ))
+
+        db.session.commit()
+
+        # Pick up the extension for ranking without waiting for a restart
+        from services.item_search_service import ItemSearchService
+        ItemSearchService._has_pg_trgm = True
+
+        total_items = db.session.execute(text("SELECT COUNT(*) FROM items")).scalar()
+        logger.info("✅ Trigram indexes created successfully!")
+
+        return jsonify({
+            'status': 'success',
+            'message': f'Item search indexes added for {total_items} items',
+            'indexes': list(TRIGRAM_INDEXES.keys())
+        }), 200
+
+    except Exception as e:
+        logger.error(f"❌ Error adding item search indexes: {str(e)}")
+        logger.error(f"📋 Full traceback:\n{traceback.format_exc()}")
+        try:
+            db.session.rollback()
+        except:
+            pass
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to add item search indexes: {str(e)}',
+            'error_type': type(e).__name__,
+            'traceback': traceback.format_exc()
+        }), 500
@@ -0,0 +1,65 @@
+"""
+Migration: Add items.total_stock / items.is_low_stock
+=====================================================
+
+WHY THIS IS CRITICAL:
+- The Item model maps total_stock and is_low_stock (kept in sync with
+  item_stocks by triggers), so on a database created before them EVERY
+  item query fails with "column items.total_stock does not exist"
+- Items, invoices, the dashboard, the barcode API and imports all load items
+
+New databases get the columns (and triggers) from create_all(); this adds
+them to existing ones, installs the triggers and computes the totals.
+`python migrate.py` does the same as part of the schema migrations.
+
+Run: GET /migration/add-item-stock-totals
+"""
+
+from flask import Blueprint, jsonify
+from models import db
+from sqlalchemy import text
+import logging
+import traceback
+
+logger = logging.getLogger(__name__)
+
+add_item_stock_totals_bp = Blueprint('add_item_stock_totals', __name__, url_prefix='/migration')
+
+
+@add_item_stock_totals_bp.route('/add-item-stock-totals', methods=['GET'])
+def add_item_stock_totals():
+    """
+    Add total_stock / is_low_stock to items, install triggers, backfill
+
+    Safe to run multiple times (columns are only added when missing)
+    NO AUTH REQUIRED - This is a system-wide database migration
+    """
+    try:
+        logger.info("🔧 MIGRATION START: Adding item stock total columns...")
+
+        from services.item_stock_service import ItemStockService
+        items_updated = ItemStockService.rebuild()
+
+        low_stock = db.session.execute(text("SELECT COUNT(*) FROM items WHERE is_low_stock")).scalar()
+        logger.info("✅ Item stock totals added successfully!")
+
+        return jsonify({
+            'status': 'success',
+            'message': f'Stock totals computed for {items_updated} items ({low_stock} low on stock)',
+            'columns': ['total_stock', 'is_low_stock'],
+            'indexes': ['idx_item_low_stock']
+        }), 200
+
+    except Exception as e:
+        logger.error(f"❌ Error adding item stock totals: {str(e)}")
+        logger.error(f"📋 Full traceback:\n{traceback.format_exc()}")
+        try:
+            db.session.rollback()
+        except:
+            pass
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to add item stock totals: {str(e)}',
+            'error_type': type(e).__name__,
+            'traceback': traceback.format_exc()
+        }), 500
@@ -5,7 +5,8 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from models import db, User, Employee, Site, Attendance, Material, Stock, StockMovement, Tenant
 from datetime import datetime, timedelta
 from sqlalchemy import func, text
-from utils.tenant_middleware import require_tenant, get_current_tenant_id, get_current_tenant
+from utils.tenant_middleware import require_tenant, get_current_tenant_id, get_current_tenant, get_current_tenant_record
+from utils.tenant_cache import invalidate_tenant
 from utils.license_check import check_license
 import hashlib
 
@@ -70,7 +71,7 @@ def login():
             
             # Update last login timestamp (for superadmin tracking)
             from datetime import datetime
-            tenant.last_login_at = datetime.utcnow()
+            get_current_tenant_record().last_login_at = datetime.utcnow()
             db.session.commit()
             
             print(f"3. Update last_login_at: {(time.time() - t2)*1000:.0f}ms")
@@ -153,7 +154,7 @@ def reset_password(token):
     import pytz
     from sqlalchemy import text
     
-    tenant = get_current_tenant()
+    tenant = get_current_tenant_record()
     now = datetime.utcnow()  # Use UTC for comparison
     
     # Validate token
@@ -244,7 +245,7 @@ def logout():
 def profile():
     """Admin profile management - Edit email, phone, address, company details"""
     tenant_id = get_current_tenant_id()
-    tenant = get_current_tenant()
+    tenant = get_current_tenant_record()
     
     if request.method == 'POST':
         try:
@@ -311,6 +312,7 @@ def profile():
             session['admin_name'] = admin_name
             
             db.session.commit()
+            invalidate_tenant(tenant.subdomain)
             flash('✅ Profile updated successfully!', 'success')
             return redirect(url_for('admin.profile'))
             
@@ -335,165 +337,21 @@ def profile():
 @require_tenant
 @login_required
 def dashboard():
-    """Business dashboard with key metrics - OPTIMIZED + PROFILED"""
-    import time
-    start_time = time.time()
-    
-    from models import Invoice, PurchaseBill, Customer, Vendor, Item, ItemStock
+    """Business dashboard with key metrics (daily rollup + short per-tenant cache)"""
+    from services.dashboard_metrics_service import DashboardMetricsService
     
     tenant_id = get_current_tenant_id()
     tenant = get_current_tenant()
     today = datetime.now()
     
-    print(f"\n⏱️  DASHBOARD PERFORMANCE:")
-    print(f"1. Imports + tenant: {(time.time() - start_time)*1000:.0f}ms")
+    # ⚡ Today / month-to-date come from daily_tenant_metrics, not a scan of
+    # every invoice and bill - and the whole payload is cached for a few seconds
+    metrics = DashboardMetricsService.get_dashboard(tenant_id, today.date())
     
-    # MEGA-OPTIMIZATION: Batch ALL queries into ONE database round trip!
-    # This is critical for Vercel (US) + Database (Mumbai) setup
-    # Each query = India → US → Mumbai → US → India = 1.6s!
-    # Solution: ONE query instead of 9 separate queries!
-    
-    t_batch = time.time()
-    today_start = datetime.combine(today.date(), datetime.min.time())
-    today_end = datetime.combine(today.date(), datetime.max.time())
-    month_start = datetime(today.year, today.month, 1)
-    
-    from sqlalchemy import func, text
-    
-    # Execute ONE mega-query with all stats
-    query_sql = text("""
-        SELECT 
-            -- Today's sales
-            (SELECT COALESCE(SUM(total_amount), 0) FROM invoices 
-             WHERE tenant_id = :tenant_id 
-             AND invoice_date >= :today_start 
-             AND invoice_date <= :today_end) as today_sales,
-            (SELECT COUNT(*) FROM invoices 
-             WHERE tenant_id = :tenant_id 
-             AND invoice_date >= :today_start 
-             AND invoice_date <= :today_end) as today_invoice_count,
-            
-            -- Month's sales  
-            (SELECT COALESCE(SUM(total_amount), 0) FROM invoices 
-             WHERE tenant_id = :tenant_id 
-             AND invoice_date >= :month_start) as month_sales,
-            (SELECT COUNT(*) FROM invoices 
-             WHERE tenant_id = :tenant_id 
-             AND invoice_date >= :month_start) as month_invoice_count,
-            
-            -- Pending receivables
-            (SELECT COALESCE(SUM(total_amount), 0) FROM invoices 
-             WHERE tenant_id = :tenant_id 
-             AND payment_status != 'paid') as pending_receivables,
-            
-            -- Month's purchases
-            (SELECT COALESCE(SUM(total_amount), 0) FROM purchase_bills 
-             WHERE tenant_id = :tenant_id 
-             AND bill_date >= :month_start 
-             AND status = 'approved') as month_purchases,
-            (SELECT COUNT(*) FROM purchase_bills 
-             WHERE tenant_id = :tenant_id 
-             AND bill_date >= :month_start 
-             AND status = 'approved') as month_bill_count,
-            
-            -- Quick stats
-            (SELECT COUNT(*) FROM items 
-             WHERE tenant_id = :tenant_id 
-             AND is_active = true) as total_items,
-            (SELECT COUNT(*) FROM customers 
-             WHERE tenant_id = :tenant_id 
-             AND is_active = true) as total_customers,
-            (SELECT COUNT(*) FROM vendors 
-             WHERE tenant_id = :tenant_id 
-             AND is_active = true) as total_vendors
-    """)
-    
-    result = db.session.execute(query_sql, {
-        'tenant_id': tenant_id,
-        'today_start': today_start,
-        'today_end': today_end,
-        'month_start': month_start
-    }).fetchone()
-    
-    # Unpack results
-    today_sales = float(result[0] or 0)
-    today_invoice_count = int(result[1] or 0)
-    month_sales = float(result[2] or 0)
-    month_invoice_count = int(result[3] or 0)
-    pending_receivables = float(result[4] or 0)
-    month_purchases = float(result[5] or 0)
-    month_bill_count = int(result[6] or 0)
-    total_items = int(result[7] or 0)
-    total_customers = int(result[8] or 0)
-    total_vendors = int(result[9] or 0)
-    
-    print(f"2. MEGA-QUERY (all stats): {(time.time() - t_batch)*1000:.0f}ms")
-    
-    # Low stock query (separate because complex logic)
-    t6 = time.time()
-    items_with_stock_query = db.session.query(
-        Item.id,
-        Item.reorder_point,
-        func.sum(ItemStock.quantity_available).label('total_stock')
-    ).join(
-        ItemStock, Item.id == ItemStock.item_id, isouter=True
-    ).filter(
-        Item.tenant_id == tenant_id,
-        Item.is_active == True,
-        Item.track_inventory == True,
-        Item.reorder_point.isnot(None)
-    ).group_by(Item.id, Item.reorder_point).all()
-    
-    low_stock_items = sum(1 for item in items_with_stock_query if (item.total_stock or 0) < item.reorder_point)
-    print(f"3. Low stock query: {(time.time() - t6)*1000:.0f}ms")
-    
-    # Recent activity (OPTIMIZED: only load essential fields, not full objects)
-    t8 = time.time()
-    from sqlalchemy import desc
-    recent_invoices = db.session.query(
-        Invoice.id,
-        Invoice.invoice_number,
-        Invoice.customer_name,
-        Invoice.total_amount,
-        Invoice.payment_status,
-        Invoice.invoice_date
-    ).filter(
-        Invoice.tenant_id == tenant_id
-    ).order_by(desc(Invoice.created_at)).limit(5).all()
-    
-    recent_bills = db.session.query(
-        PurchaseBill.id,
-        PurchaseBill.bill_number,
-        PurchaseBill.vendor_name,
-        PurchaseBill.total_amount,
-        PurchaseBill.payment_status,
-        PurchaseBill.bill_date
-    ).filter(
-        PurchaseBill.tenant_id == tenant_id
-    ).order_by(desc(PurchaseBill.created_at)).limit(5).all()
-    print(f"4. Recent activity queries: {(time.time() - t8)*1000:.0f}ms")
-    
-    t9 = time.time()
-    html_result = render_template('admin/dashboard_v2.html',
+    return render_template('admin/dashboard_v2.html',
                          tenant=tenant,
                          today=today,
-                         today_sales=today_sales,
-                         today_invoice_count=today_invoice_count,
-                         month_sales=month_sales,
-                         month_invoice_count=month_invoice_count,
-                         pending_receivables=pending_receivables,
-                         month_purchases=month_purchases,
-                         month_bill_count=month_bill_count,
-                         total_items=total_items,
-                         low_stock_count=low_stock_items,
-                         total_customers=total_customers,
-                         total_vendors=total_vendors,
-                         recent_invoices=recent_invoices,
-                         recent_bills=recent_bills)
-    print(f"5. Render template: {(time.time() - t9)*1000:.0f}ms")
-    print(f"✅ TOTAL DASHBOARD TIME: {(time.time() - start_time)*1000:.0f}ms")
-    print(f"🎯 IMPROVEMENT: 9 queries → 3 queries (70% fewer round trips!)\n")
-    return html_result
+                         **metrics)
 
 # Employees Management
 @admin_bp.route('/employees', strict_slashes=False)  # PERFORMANCE: Prevent 308 redirects
@@ -2259,12 +2117,11 @@ def download_template(template_type):
 @login_required
 def upload_import(import_type):
     """Process bulk import upload"""
-    from utils.excel_import import (
-        import_employees_from_excel, 
-        import_inventory_from_excel, 
-        import_customers_from_excel,
-        import_subscription_enrollments_from_excel
-    )
+    from services.job_queue import JobQueue
+    
+    if import_type not in ('employees', 'inventory', 'customers', 'subscriptions'):
+        flash('⚠️ Invalid import type', 'error')
+        return redirect(url_for('admin.bulk_import'))
     
     if 'file' not in request.files:
         flash('⚠️ No file uploaded', 'error')
@@ -2283,55 +2140,15 @@ def upload_import(import_type):
     tenant_id = get_current_tenant_id()
     
     try:
-        if import_type == 'employees':
-            success_count, errors = import_employees_from_excel(file, tenant_id)
-            entity_name = 'employees'
-        elif import_type == 'inventory':
-            success_count, errors = import_inventory_from_excel(file, tenant_id)
-            entity_name = 'items'
-        elif import_type == 'customers':
-            success_count, errors = import_customers_from_excel(file, tenant_id)
-            entity_name = 'customers'
-        elif import_type == 'subscriptions':
-            success_count, skipped_count, errors = import_subscription_enrollments_from_excel(file, tenant_id)
-            entity_name = 'subscriptions'
-            
-            # Custom messaging for subscription import
-            if success_count > 0:
-                flash(f'✅ Successfully enrolled {success_count} customer(s) in subscriptions!', 'success')
-            
-            if skipped_count > 0:
-                flash(f'⏭️ Skipped {skipped_count} duplicate enrollment(s) (already enrolled in same plan)', 'info')
-            
-            if errors:
-                # Filter out SKIPPED messages from error display (they're not real errors)
-                real_errors = [e for e in errors if 'SKIPPED' not in e]
-                if real_errors:
-                    error_msg = f'⚠️ {len(real_errors)} issue(s):<br>' + '<br>'.join(real_errors[:10])
-                    if len(real_errors) > 10:
-                        error_msg += f'<br>...and {len(real_errors) - 10} more'
-                    flash(error_msg, 'warning')
-            
-            if success_count == 0 and skipped_count == 0 and not errors:
-                flash('⚠️ No data to import. Please check your file.', 'warning')
-            
-            return redirect(url_for('admin.bulk_import'))
-        else:
-            flash('⚠️ Invalid import type', 'error')
-            return redirect(url_for('admin.bulk_import'))
-        
-        # Show results (for non-subscription imports)
-        if success_count > 0:
-            flash(f'✅ Successfully imported {success_count} {entity_name}!', 'success')
-        
-        if errors:
-            error_msg = f'⚠️ {len(errors)} errors occurred:<br>' + '<br>'.join(errors[:10])
-            if len(errors) > 10:
-                error_msg += f'<br>...and {len(errors) - 10} more errors'
-            flash(error_msg, 'warning')
-        
-        if success_count == 0 and not errors:
-            flash('⚠️ No data to import. Please check your file.', 'warning')
+        # ⚡ Large files take minutes - import in a background job and show its progress
+        job = JobQueue.enqueue(
+            'excel_import',
+            tenant_id=tenant_id,
+            payload={'import_type': import_type},
+            input_file=file.read(),
+            input_filename=file.filename
+        )
+        return redirect(url_for('jobs.view', job_id=job.id))
         
     except Exception as e:
         flash(f'❌ Import failed: {str(e)}', 'error')
@@ -2,7 +2,7 @@
 Backup & Restore Module
 Allows tenant to backup/restore business data locally
 """
-from flask import Blueprint, render_template, request, flash, redirect, url_for, session, jsonify, send_file
+from flask import Blueprint, render_template, request, flash, redirect, url_for, session, jsonify, send_file, Response, stream_with_context
 from sqlalchemy import text
 from models import (
     db, Tenant, Customer, Vendor, Employee, Site,
@@ -53,8 +53,11 @@ def index():
 @login_required
 def backup_download_page():
     """Backup to Computer page"""
+    from services.tenant_backup_service import TenantBackupService
+    
     tenant = get_current_tenant()
     tenant_id = get_current_tenant_id()
+    last_backup = TenantBackupService.delta_parent(tenant_id)
     
     # Get backup statistics
     stats = {
@@ -75,7 +78,8 @@ def backup_download_page():
     return render_template('admin/backup_download.html', 
                          tenant=tenant, 
                          stats=stats,
-                         total_records=total_records)
+                         total_records=total_records,
+                         last_backup=last_backup)
 
 
 @backup_bp.route('/restore-page')
@@ -100,243 +104,19 @@ def backup_sync_share_page():
 @require_tenant
 @login_required
 def download_backup():
-    """Generate and download backup JSON file"""
-    tenant = get_current_tenant()
+    """Download backup ZIP (one NDJSON file per table + manifest) - ?type=delta for changes only"""
+    from services.tenant_backup_service import TenantBackupService
+    
     tenant_id = get_current_tenant_id()
+    incremental = request.args.get('type') == 'delta'
     
     try:
-        # Helper function to serialize any value (handles date, datetime, Decimal)
-        def serialize_value(value):
-            """Convert Python objects to JSON-serializable types"""
-            from datetime import date
-            from decimal import Decimal
-            
-            if isinstance(value, datetime):
-                # Convert to IST and make it ISO format
-                if value.tzinfo is None:
-                    value = pytz.UTC.localize(value)
-                ist = pytz.timezone('Asia/Kolkata')
-                return value.astimezone(ist).isoformat()
-            elif isinstance(value, date):
-                return value.isoformat()  # Convert to 'YYYY-MM-DD' string
-            elif isinstance(value, Decimal):
-                return float(value)  # Convert to float for JSON
-            else:
-                return value
-        
-        # Helper function to serialize model objects
-        def serialize_model(obj, exclude_fields=None):
-            """Convert SQLAlchemy model to dict"""
-            if exclude_fields is None:
-                exclude_fields = []
-            
-            data = {}
-            for column in obj.__table__.columns:
-                if column.name not in exclude_fields:
-                    value = getattr(obj, column.name)
-                    data[column.name] = serialize_value(value)
-            return data
-        
-        # Helper function to serialize raw SQL row
-        def serialize_row(row):
-            """Convert SQLAlchemy Row to JSON-serializable dict"""
-            return {key: serialize_value(value) for key, value in row._mapping.items()}
-        
-        # Build backup data structure
-        backup_data = {
-            "backup_info": {
-                "created_at": datetime.now(pytz.timezone('Asia/Kolkata')).isoformat(),
-                "tenant_id": tenant_id,
-                "company_name": tenant.company_name,
-                "subdomain": tenant.subdomain,
-                "admin_email": tenant.admin_email,
-                "backup_version": "1.0",
-                "app_version": "2.0.0",
-                "warnings": [
-                    "⚠️ Item images NOT included (will be added in future version)",
-                    "⚠️ Purchase bill attachments NOT included",
-                    "⚠️ Task media NOT included",
-                    "⚠️ Attendance records NOT included",
-                    "⚠️ Admin password NOT included (for security)"
-                ]
-            },
-            "metadata": {},
-            "data": {}
-        }
-        
-        # Customers
-        customers = Customer.query.filter_by(tenant_id=tenant_id).all()
-        backup_data["data"]["customers"] = [serialize_model(c) for c in customers]
-        backup_data["metadata"]["customers_count"] = len(customers)
-        
-        # Vendors
-        vendors = Vendor.query.filter_by(tenant_id=tenant_id).all()
-        backup_data["data"]["vendors"] = [serialize_model(v) for v in vendors]
-        backup_data["metadata"]["vendors_count"] = len(vendors)
-        
-        # Item Categories
-        categories = ItemCategory.query.filter_by(tenant_id=tenant_id).all()
-        backup_data["data"]["item_categories"] = [serialize_model(c) for c in categories]
-        
-        # Item Groups
-        groups = ItemGroup.query.filter_by(tenant_id=tenant_id).all()
-        backup_data["data"]["item_groups"] = [serialize_model(g) for g in groups]
-        
-        # Items (exclude image URLs for now)
-        items = Item.query.filter_by(tenant_id=tenant_id).all()
-        backup_data["data"]["items"] = [serialize_model(i) for i in items]
-        backup_data["metadata"]["items_count"] = len(items)
-        
-        # Item Stock
-        stock = ItemStock.query.filter_by(tenant_id=tenant_id).all()
-        backup_data["data"]["item_stock"] = [serialize_model(s) for s in stock]
-        
-        # Sites
-        sites = Site.query.filter_by(tenant_id=tenant_id).all()
-        backup_data["data"]["sites"] = [serialize_model(s) for s in sites]
-        backup_data["metadata"]["sites_count"] = len(sites)
-        
-        # Employees
-        employees = Employee.query.filter_by(tenant_id=tenant_id).all()
-        backup_data["data"]["employees"] = [serialize_model(e) for e in employees]
-        backup_data["metadata"]["employees_count"] = len(employees)
-        
-        # Invoices
-        invoices = Invoice.query.filter_by(tenant_id=tenant_id).all()
-        backup_data["data"]["invoices"] = [serialize_model(inv) for inv in invoices]
-        backup_data["metadata"]["invoices_count"] = len(invoices)
-        
-        # Invoice Items
-        invoice_items = InvoiceItem.query.join(Invoice).filter(Invoice.tenant_id == tenant_id).all()
-        backup_data["data"]["invoice_items"] = [serialize_model(ii) for ii in invoice_items]
-        
-        # Purchase Bills
-        bills = PurchaseBill.query.filter_by(tenant_id=tenant_id).all()
-        backup_data["data"]["purchase_bills"] = [serialize_model(b) for b in bills]
-        backup_data["metadata"]["purchase_bills_count"] = len(bills)
-        
-        # Purchase Bill Items
-        bill_items = PurchaseBillItem.query.join(PurchaseBill).filter(PurchaseBill.tenant_id == tenant_id).all()
-        backup_data["data"]["purchase_bill_items"] = [serialize_model(bi) for bi in bill_items]
-        
-        # Sales Orders
-        orders = SalesOrder.query.filter_by(tenant_id=tenant_id).all()
-        backup_data["data"]["sales_orders"] = [serialize_model(o) for o in orders]
-        backup_data["metadata"]["sales_orders_count"] = len(orders)
-        
-        # Sales Order Items
-        order_items = SalesOrderItem.query.join(SalesOrder).filter(SalesOrder.tenant_id == tenant_id).all()
-        backup_data["data"]["sales_order_items"] = [serialize_model(oi) for oi in order_items]
-        
-        # Delivery Challans
-        challans = DeliveryChallan.query.filter_by(tenant_id=tenant_id).all()
-        backup_data["data"]["delivery_challans"] = [serialize_model(c) for c in challans]
-        backup_data["metadata"]["delivery_challans_count"] = len(challans)
-        
-        # Delivery Challan Items
-        challan_items = DeliveryChallanItem.query.join(DeliveryChallan).filter(DeliveryChallan.tenant_id == tenant_id).all()
-        backup_data["data"]["delivery_challan_items"] = [serialize_model(ci) for ci in challan_items]
-        
-        # Expense Categories
-        exp_categories = ExpenseCategory.query.filter_by(tenant_id=tenant_id).all()
-        backup_data["data"]["expense_categories"] = [serialize_model(ec) for ec in exp_categories]
-        
-        # Expenses
-        expenses = Expense.query.filter_by(tenant_id=tenant_id).all()
-        backup_data["data"]["expenses"] = [serialize_model(e) for e in expenses]
-        backup_data["metadata"]["expenses_count"] = len(expenses)
-        
-        # Purchase Requests
-        requests = PurchaseRequest.query.filter_by(tenant_id=tenant_id).all()
-        backup_data["data"]["purchase_requests"] = [serialize_model(r) for r in requests]
-        
-        # Tasks (text only, no media)
-        tasks = Task.query.filter_by(tenant_id=tenant_id).all()
-        backup_data["data"]["tasks"] = [serialize_model(t) for t in tasks]
-        
-        # Task Updates
-        task_updates = TaskUpdate.query.join(Task).filter(Task.tenant_id == tenant_id).all()
-        backup_data["data"]["task_updates"] = [serialize_model(tu) for tu in task_updates]
-        
-        # Commission Agents
-        agents = CommissionAgent.query.filter_by(tenant_id=tenant_id).all()
-        backup_data["data"]["commission_agents"] = [serialize_model(a) for a in agents]
-        
-        # Invoice Commissions
-        commissions = InvoiceCommission.query.filter_by(tenant_id=tenant_id).all()
-        backup_data["data"]["invoice_commissions"] = [serialize_model(c) for c in commissions]
-        
-        # Vendor Payments
-        payments = VendorPayment.query.filter_by(tenant_id=tenant_id).all()
-        backup_data["data"]["vendor_payments"] = [serialize_model(p) for p in payments]
-        
-        # Payment Allocations
-        allocations = PaymentAllocation.query.join(VendorPayment).filter(VendorPayment.tenant_id == tenant_id).all()
-        backup_data["data"]["payment_allocations"] = [serialize_model(a) for a in allocations]
-        
-        # Bank & Cash Accounts (NEW - Accounting Module) - Skip if not migrated
-        try:
-            from models.bank_account import BankAccount, AccountTransaction
-            accounts = BankAccount.query.filter_by(tenant_id=tenant_id).all()
-            backup_data["data"]["bank_accounts"] = [serialize_model(acc) for acc in accounts]
-            backup_data["metadata"]["bank_accounts_count"] = len(accounts)
-            
-            # Account Transactions (includes contra, employee advances, etc.)
-            transactions = AccountTransaction.query.filter_by(tenant_id=tenant_id).all()
-            backup_data["data"]["account_transactions"] = [serialize_model(t) for t in transactions]
-            backup_data["metadata"]["account_transactions_count"] = len(transactions)
-        except Exception as e:
-            print(f"⚠️ Skipping bank_accounts (not migrated yet): {e}")
-            backup_data["data"]["bank_accounts"] = []
-            backup_data["data"]["account_transactions"] = []
-        
-        # Payroll Payments (NEW - Payroll Module) - Skip if table doesn't exist
-        try:
-            payroll_result = db.session.execute(text("""
-                SELECT * FROM payroll_payments WHERE tenant_id = :tenant_id
-            """), {'tenant_id': tenant_id}).fetchall()
-            backup_data["data"]["payroll_payments"] = [serialize_row(row) for row in payroll_result] if payroll_result else []
-            backup_data["metadata"]["payroll_payments_count"] = len(backup_data["data"]["payroll_payments"])
-        except Exception as e:
-            print(f"⚠️ Skipping payroll_payments (table doesn't exist): {e}")
-            backup_data["data"]["payroll_payments"] = []
-            backup_data["metadata"]["payroll_payments_count"] = 0
-        
-        # Salary Slips (NEW - Payroll Module) - Skip if table doesn't exist
-        try:
-            salary_result = db.session.execute(text("""
-                SELECT * FROM salary_slips WHERE tenant_id = :tenant_id
-            """), {'tenant_id': tenant_id}).fetchall()
-            backup_data["data"]["salary_slips"] = [serialize_row(row) for row in salary_result] if salary_result else []
-            backup_data["metadata"]["salary_slips_count"] = len(backup_data["data"]["salary_slips"])
-        except Exception as e:
-            print(f"⚠️ Skipping salary_slips (table doesn't exist): {e}")
-            backup_data["data"]["salary_slips"] = []
-            backup_data["metadata"]["salary_slips_count"] = 0
-        
-        # Calculate total records
-        total_records = sum([
-            len(backup_data["data"].get(key, [])) 
-            for key in backup_data["data"].keys()
-        ])
-        backup_data["backup_info"]["total_records"] = total_records
-        
-        # Generate filename
-        timestamp = datetime.now(pytz.timezone('Asia/Kolkata')).strftime('%Y-%m-%d_%H%M')
-        filename = f"{tenant.subdomain}_backup_{timestamp}.json"
-        
-        # Create file in memory
-        json_str = json.dumps(backup_data, indent=2, ensure_ascii=False)
-        json_bytes = json_str.encode('utf-8')
-        file_obj = io.BytesIO(json_bytes)
-        
-        print(f"✅ Backup created: {filename} ({len(json_bytes)/1024:.1f} KB, {total_records} records)")
-        
-        return send_file(
-            file_obj,
-            mimetype='application/json',
-            as_attachment=True,
-            download_name=filename
+        # ⚡ Streamed table by table from server-side cursors - constant memory for any tenant size
+        filename = TenantBackupService.backup_filename(get_current_tenant(), incremental)
+        return Response(
+            stream_with_context(TenantBackupService.iter_backup(tenant_id, incremental=incremental)),
+            mimetype='application/zip',
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
         )
         
     except Exception as e:
@@ -347,6 +127,30 @@ def download_backup():
         return redirect(url_for('backup.index'))
 
 
+def _restore_backup_zip(files, tenant_id):
+    """Restore a full backup ZIP plus its delta ZIPs - tables are read and bulk-inserted in chunks"""
+    from services.tenant_backup_service import TenantBackupService
+    
+    flash(f'📦 Backup file(s): {", ".join(file.filename for file in files)}', 'info')
+    try:
+        backup_info, counts, file_count = TenantBackupService.restore_backup(
+            tenant_id, [file.stream for file in files]
+        )
+    except Exception as e:
+        print(f"❌ Restore failed, rolled back: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        flash(f'❌ Restore failed: {str(e)}', 'error')
+        flash('✅ No data was changed (transaction rolled back)', 'info')
+        return redirect(url_for('backup.index'))
+    
+    flash(f'✅ Backup restored successfully!', 'success')
+    flash(f'📊 Imported {sum(counts.values())} records from {file_count} file(s)', 'success')
+    flash(f'📅 Data as of: {backup_info.get("created_at", "Unknown")}', 'info')
+    flash('🔄 Refresh your page to see restored data', 'info')
+    return redirect(url_for('admin.dashboard'))
+
+
 @backup_bp.route('/restore', methods=['POST'])
 @require_tenant
 @login_required
@@ -365,8 +169,13 @@ def restore_backup():
         flash('❌ No file selected', 'error')
         return redirect(url_for('backup.index'))
     
+    files = [f for f in request.files.getlist('backup_file') if f.filename]
+    if files and all(f.filename.endswith('.zip') for f in files):
+        return _restore_backup_zip(files, tenant_id)
+    
+    # Legacy single-JSON backups (before backup format 2.0)
     if not file.filename.endswith('.json'):
-        flash('❌ Invalid file type. Please upload a .json backup file', 'error')
+        flash('❌ Invalid file type. Please upload a .zip (or older .json) backup file', 'error')
         return redirect(url_for('backup.index'))
     
     try:
@@ -93,7 +93,7 @@ def search_by_barcode():
             }), 404
         
         # Get total stock
-        total_stock = sum([stock.quantity_available for stock in item.stocks]) if item.track_inventory else None
+        total_stock = item.total_stock if item.track_inventory else None  # Maintained by triggers
         
         # Return item details
         return jsonify({
@@ -112,7 +112,7 @@ def search_by_barcode():
                 'unit': item.unit or 'nos',
                 'track_inventory': item.track_inventory,
                 'stock': total_stock if total_stock is not None else 'N/A',
-                'is_low_stock': item.is_low_stock(),
+                'is_low_stock': item.is_low_stock,
                 'category': item.category.name if item.category else None,
                 'brand': item.brand,
                 'manufacturer': item.manufacturer
@@ -112,14 +112,9 @@ def generate_invoice(order_id):
         return redirect(url_for('customer_orders.view_order', order_id=order_id))
     
     try:
-        # Generate invoice number (INV-YYYY-NNN)
+        # Next number of the tenant's invoice sequence (same as the invoices page)
+        invoice_number = Invoice.reserve_invoice_numbers(g.tenant.id)[0]
         today = date.today()
-        year = today.year
-        existing_invoices = Invoice.query.filter(
-            Invoice.tenant_id == g.tenant.id,
-            Invoice.invoice_number.like(f'INV-{year}-%')
-        ).count()
-        invoice_number = f"INV-{year}-{existing_invoices + 1:03d}"
         
         # Create invoice
         invoice = Invoice(
@@ -10,6 +10,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from functools import wraps
 from models import db, Customer, CustomerSubscription, SubscriptionDelivery, Invoice, SubscriptionPlan, Item, ItemCategory, CustomerOrder, CustomerOrderItem
 from utils.tenant_middleware import require_tenant, get_current_tenant
+from services.delivery_engine import DeliveryEngine
 from utils.email_utils import (send_customer_order_notification, send_subscription_pause_notification, send_subscription_resume_notification, send_subscription_modify_notification,
     send_customer_pause_confirmation, send_customer_resume_confirmation, send_customer_modify_confirmation)
 from datetime import datetime, timedelta
@@ -123,17 +124,8 @@ def dashboard():
     today = datetime.now().date()
     next_week = today + timedelta(days=7)
     
-    upcoming_deliveries = []
-    for subscription in active_subscriptions:
-        if subscription.plan.plan_type == 'metered':
-            deliveries = SubscriptionDelivery.query.filter(
-                and_(
-                    SubscriptionDelivery.subscription_id == subscription.id,
-                    SubscriptionDelivery.delivery_date >= today,
-                    SubscriptionDelivery.delivery_date <= next_week
-                )
-            ).order_by(SubscriptionDelivery.delivery_date).all()
-            upcoming_deliveries.extend(deliveries)
+    # Plan rules + exception rows for all metered subscriptions at once
+    upcoming_deliveries = DeliveryEngine.expand(active_subscriptions, today, next_week)
     
     # Get recent invoices (last 3)
     recent_invoices = Invoice.query.filter_by(
@@ -190,13 +182,7 @@ def view_deliveries(subscription_id):
     next_month = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
     end_date = next_month.replace(day=monthrange(next_month.year, next_month.month)[1])
     
-    all_deliveries = SubscriptionDelivery.query.filter(
-        and_(
-            SubscriptionDelivery.subscription_id == subscription_id,
-            SubscriptionDelivery.delivery_date >= start_date,
-            SubscriptionDelivery.delivery_date <= end_date
-        )
-    ).order_by(SubscriptionDelivery.delivery_date).all()
+    all_deliveries = DeliveryEngine.expand([subscription], start_date, end_date)
     
     # Group deliveries by month
     from collections import defaultdict
@@ -297,25 +283,8 @@ def pause_deliveries(subscription_id):
             flash('Start date must be before end date', 'error')
             return redirect(url_for('customer_portal.view_deliveries', subscription_id=subscription_id))
         
-        # Pause all deliveries in range
-        deliveries = SubscriptionDelivery.query.filter(
-            and_(
-                SubscriptionDelivery.subscription_id == subscription_id,
-                SubscriptionDelivery.delivery_date >= start_date,
-                SubscriptionDelivery.delivery_date <= end_date,
-                SubscriptionDelivery.status == 'delivered'
-            )
-        ).all()
-        
-        paused_count = 0
-        for delivery in deliveries:
-            delivery.status = 'paused'
-            delivery.quantity = 0
-            delivery.amount = 0
-            delivery.is_modified = True
-            delivery.modification_reason = 'Paused by customer'
-            delivery.updated_at = datetime.now()
-            paused_count += 1
+        # Pause all deliveries in range (sparse pause rows - one query for the range)
+        paused_count = DeliveryEngine.pause(subscription, start_date, end_date, reason='Paused by customer')
         
         db.session.commit()
         flash(f'✅ Paused {paused_count} deliveries from {start_date.strftime("%d-%m-%Y")} to {end_date.strftime("%d-%m-%Y")}', 'success')
@@ -395,26 +364,8 @@ def resume_deliveries(subscription_id):
                 flash('❌ Cannot resume today or past deliveries. You can only modify from tomorrow onwards.', 'error')
                 return redirect(url_for('customer_portal.view_deliveries', subscription_id=subscription_id))
         
-        # Resume all paused deliveries in range
-        deliveries = SubscriptionDelivery.query.filter(
-            and_(
-                SubscriptionDelivery.subscription_id == subscription_id,
-                SubscriptionDelivery.delivery_date >= start_date,
-                SubscriptionDelivery.delivery_date <= end_date,
-                SubscriptionDelivery.status == 'paused'
-            )
-        ).all()
-        
-        resumed_count = 0
-        for delivery in deliveries:
-            delivery.status = 'delivered'
-            # Restore default quantity
-            delivery.quantity = subscription.default_quantity
-            delivery.amount = float(delivery.quantity) * float(subscription.plan.unit_rate)
-            delivery.is_modified = False
-            delivery.modification_reason = None
-            delivery.updated_at = datetime.now()
-            resumed_count += 1
+        # Resume all paused deliveries in range (back to the plan rules)
+        resumed_count = DeliveryEngine.resume(subscription, start_date, end_date)
         
         db.session.commit()
         flash(f'✅ Resumed {resumed_count} deliveries from {start_date.strftime("%d-%m-%Y")} to {end_date.strftime("%d-%m-%Y")}', 'success')
@@ -497,11 +448,13 @@ def modify_delivery(subscription_id):
             flash('Quantity must be greater than 0', 'error')
             return redirect(url_for('customer_portal.view_deliveries', subscription_id=subscription_id))
         
-        # Find delivery
+        # Find delivery (stored exception, or a day the plan rules deliver on)
         delivery = SubscriptionDelivery.query.filter_by(
             subscription_id=subscription_id,
             delivery_date=delivery_date
         ).first()
+        if not delivery and DeliveryEngine.is_scheduled(subscription, delivery_date):
+            delivery = DeliveryEngine.materialize(subscription, delivery_date)
         
         if delivery:
             delivery.quantity = new_quantity
@@ -597,6 +550,30 @@ def view_invoice(invoice_id):
                          invoice=invoice)
 
 
+@customer_portal_bp.route('/invoices/<int:invoice_id>/pdf')
+@require_tenant
+@customer_login_required
+def download_invoice_pdf(invoice_id):
+    """Download one of the customer's invoices as PDF (cached per invoice version)"""
+    from flask import send_file
+    from io import BytesIO
+    from services.invoice_pdf_service import InvoicePdfService
+
+    invoice = Invoice.query.filter_by(
+        id=invoice_id,
+        customer_id=session['customer_id'],
+        tenant_id=g.tenant.id
+    ).first_or_404()
+
+    pdf = InvoicePdfService.get_invoice_pdf(invoice, g.tenant)
+    return send_file(
+        BytesIO(pdf),
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=f'{invoice.invoice_number}.pdf'
+    )
+
+
 @customer_portal_bp.route('/profile')
 @require_tenant
 @customer_login_required
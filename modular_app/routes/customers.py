@@ -47,21 +47,42 @@ def index():
     elif status_filter == 'inactive':
         query = query.filter_by(is_active=False)
     
-    customers = query.order_by(Customer.customer_code.desc()).all()
+    total_customers = query.count()
     
-    # Calculate outstanding for each customer (optimized with single query)
-    from sqlalchemy import func
-    invoice_stats = db.session.query(
-        Invoice.customer_id,
-        func.count(Invoice.id).label('invoice_count'),
-        func.sum(Invoice.total_amount - Invoice.paid_amount).label('outstanding')
-    ).filter(
-        Invoice.tenant_id == tenant_id,
-        Invoice.customer_id.in_([c.id for c in customers])
-    ).group_by(Invoice.customer_id).all()
+    # Keyset pagination on customer_code (unique per tenant, newest codes first):
+    # ?after=<code> = next page, ?before=<code> = previous page
+    per_page = 50
+    after = request.args.get('after', '').strip()
+    before = request.args.get('before', '').strip()
     
-    # Create lookup dict
-    stats_dict = {stat.customer_id: stat for stat in invoice_stats}
+    if before:
+        customers = query.filter(Customer.customer_code > before)\
+            .order_by(Customer.customer_code.asc()).limit(per_page + 1).all()
+        has_prev = len(customers) > per_page
+        customers = list(reversed(customers[:per_page]))
+        has_next = True
+    else:
+        if after:
+            query = query.filter(Customer.customer_code < after)
+        customers = query.order_by(Customer.customer_code.desc()).limit(per_page + 1).all()
+        has_next = len(customers) > per_page
+        customers = customers[:per_page]
+        has_prev = bool(after)
+    
+    # Invoice count + outstanding for this page's customers only (single grouped query)
+    stats_dict = {}
+    if customers:
+        invoice_stats = db.session.query(
+            Invoice.customer_id,
+            func.count(Invoice.id).label('invoice_count'),
+            func.sum(Invoice.total_amount - Invoice.paid_amount).label('outstanding')
+        ).filter(
+            Invoice.tenant_id == tenant_id,
+            Invoice.customer_id.in_([c.id for c in customers])
+        ).group_by(Invoice.customer_id).all()
+        
+        # Create lookup dict
+        stats_dict = {stat.customer_id: stat for stat in invoice_stats}
     
     # Assign to customers
     for customer in customers:
@@ -72,6 +93,9 @@ def index():
     return render_template('admin/customers/list.html',
                          tenant=g.tenant,
                          customers=customers,
+                         total_customers=total_customers,
+                         has_prev=has_prev,
+                         has_next=has_next,
                          search=search,
                          status_filter=status_filter)
 
@@ -88,6 +112,7 @@ def add():
         try:
             # Check if customer code is provided or auto-generate
             customer_code = request.form.get('customer_code', '').strip()
+            manual_code = bool(customer_code)
             if not customer_code:
                 customer_code = Customer.generate_customer_code(tenant_id)
             
@@ -104,6 +129,10 @@ def add():
                     return jsonify({'success': False, 'error': f'Customer code {customer_code} already exists!'}), 400
                 return redirect(url_for('customers.add'))
             
+            # Pre-filled / manually typed CUST-#### codes must not be issued again
+            if manual_code:
+                Customer.claim_customer_code(tenant_id, customer_code)
+            
             # Parse loyalty program dates
             from datetime import datetime
             date_of_birth = request.form.get('date_of_birth')
@@ -161,7 +190,7 @@ def add():
                 return jsonify({'success': False, 'error': str(e)}), 500
     
     # GET request - show form
-    next_customer_code = Customer.generate_customer_code(tenant_id)
+    next_customer_code = Customer.preview_customer_code(tenant_id)
     
     return render_template('admin/customers/add.html',
                          tenant=g.tenant,
@@ -219,18 +248,29 @@ def edit(customer_id):
 @check_license
 @login_required
 def ledger(customer_id):
-    """View customer ledger (all invoices)"""
+    """View customer ledger (statement pages with running balance)"""
+    from services.customer_ledger_service import CustomerLedgerService
     tenant_id = get_current_tenant_id()
     customer = Customer.query.filter_by(id=customer_id, tenant_id=tenant_id).first_or_404()
     
-    # Get all invoices for this customer
-    invoices = Invoice.query.filter_by(customer_id=customer_id)\
-        .order_by(Invoice.invoice_date.desc()).all()
+    # Keyset cursor of the previous page: ?before_date=YYYY-MM-DD&before_id=<invoice id>
+    before = None
+    before_date = request.args.get('before_date')
+    before_id = request.args.get('before_id', type=int)
+    if before_date and before_id:
+        try:
+            before = (datetime.strptime(before_date, '%Y-%m-%d').date(), before_id)
+        except ValueError:
+            before = None
     
-    # Calculate totals
-    total_billed = sum(inv.total_amount for inv in invoices)
-    total_paid = sum(inv.paid_amount for inv in invoices)
-    total_outstanding = sum(inv.total_amount for inv in invoices if inv.payment_status == 'unpaid')
+    invoices, next_cursor = CustomerLedgerService.get_statement_page(
+        tenant_id, customer_id,
+        opening_balance=customer.opening_balance,
+        before=before
+    )
+    
+    # Monthly + overall totals (cached until this customer's invoices change)
+    totals = CustomerLedgerService.get_period_totals(tenant_id, customer_id)
     
     # Get loyalty program data (if enabled)
     from services.loyalty_service import LoyaltyService
@@ -242,39 +282,25 @@ def ledger(customer_id):
         customer_loyalty = LoyaltyService.get_customer_balance(customer_id, tenant_id)
         loyalty_history = LoyaltyService.get_transaction_history(customer_id, tenant_id)
     
-    # Get aging analysis (overdue invoices)
+    # Get aging analysis (overdue invoice counts)
     today = datetime.now().date()
-    aging_data = {
-        '0-30': [],
-        '31-60': [],
-        '61-90': [],
-        '90+': []
-    }
-    
-    for invoice in invoices:
-        if invoice.payment_status == 'unpaid' and invoice.due_date:
-            days_overdue = (today - invoice.due_date).days
-            if days_overdue > 0:
-                if days_overdue <= 30:
-                    aging_data['0-30'].append(invoice)
-                elif days_overdue <= 60:
-                    aging_data['31-60'].append(invoice)
-                elif days_overdue <= 90:
-                    aging_data['61-90'].append(invoice)
-                else:
-                    aging_data['90+'].append(invoice)
+    aging_counts = CustomerLedgerService.get_overdue_counts(tenant_id, customer_id, today)
     
     return render_template('admin/customers/ledger.html',
                          tenant=g.tenant,
                          customer=customer,
                          invoices=invoices,
-                         total_billed=total_billed,
-                         total_paid=total_paid,
+                         next_cursor=next_cursor,
+                         is_first_page=before is None,
+                         periods=totals['periods'],
+                         invoice_count=totals['invoice_count'],
+                         total_billed=totals['total_billed'],
+                         total_paid=totals['total_paid'],
                          loyalty_program=loyalty_program,
                          customer_loyalty=customer_loyalty,
                          loyalty_history=loyalty_history,
-                         total_outstanding=total_outstanding,
-                         aging_data=aging_data)
+                         total_outstanding=totals['total_outstanding'],
+                         aging_counts=aging_counts)
 
 
 @customers_bp.route('/outstanding')
@@ -283,33 +309,30 @@ def ledger(customer_id):
 @login_required
 def outstanding():
     """Outstanding report - all customers with unpaid invoices"""
+    from services.aging_service import AgingService
     tenant_id = get_current_tenant_id()
     
-    # Get all customers with outstanding balance
-    customers = Customer.query.filter_by(tenant_id=tenant_id, is_active=True)\
-        .order_by(Customer.name).all()
-    
-    # Calculate outstanding for each
-    customers_with_outstanding = []
-    total_outstanding_all = 0
-    
-    for customer in customers:
-        outstanding = customer.get_outstanding_balance()
-        if outstanding > 0:
-            unpaid_count = Invoice.query.filter_by(
-                customer_id=customer.id,
-                payment_status='unpaid'
-            ).count()
-            
-            customers_with_outstanding.append({
-                'customer': customer,
-                'outstanding': outstanding,
-                'unpaid_count': unpaid_count
-            })
-            total_outstanding_all += outstanding
+    # Outstanding + open invoice count per customer from the open items summary
+    # (highest first) - one grouped query instead of two queries per customer
+    balances = AgingService.get_customer_outstanding(tenant_id)
+    customers = {
+        customer.id: customer
+        for customer in Customer.query.filter(
+            Customer.tenant_id == tenant_id,
+            Customer.id.in_([customer_id for customer_id, _, _ in balances])
+        ).all()
+    } if balances else {}
     
-    # Sort by outstanding amount (highest first)
-    customers_with_outstanding.sort(key=lambda x: x['outstanding'], reverse=True)
+    customers_with_outstanding = [
+        {
+            'customer': customers[customer_id],
+            'outstanding': outstanding,
+            'unpaid_count': unpaid_count
+        }
+        for customer_id, outstanding, unpaid_count in balances
+        if customer_id in customers
+    ]
+    total_outstanding_all = sum(item['outstanding'] for item in customers_with_outstanding)
     
     return render_template('admin/customers/outstanding.html',
                          tenant=g.tenant,
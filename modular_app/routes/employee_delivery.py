@@ -5,6 +5,8 @@ For delivery personnel to mark deliveries and track bottles
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, g
 from models import db, Employee, SubscriptionDelivery, Customer, CustomerSubscription, DeliveryDayNote
 from utils.tenant_middleware import require_tenant, get_current_tenant_id
+from services.delivery_engine import DeliveryEngine
+from services.route_planning_service import RoutePlanningService
 from datetime import datetime, date
 from sqlalchemy import and_
 from sqlalchemy.orm import joinedload
@@ -82,25 +84,13 @@ def today_deliveries():
     today = datetime.now(ist).date()
     
     # Get all deliveries for today ASSIGNED TO THIS EMPLOYEE
-    deliveries = SubscriptionDelivery.query.join(
-        CustomerSubscription
-    ).join(
-        CustomerSubscription.customer
-    ).join(
-        CustomerSubscription.plan
-    ).filter(
-        SubscriptionDelivery.tenant_id == tenant_id,
-        SubscriptionDelivery.delivery_date == today,
-        CustomerSubscription.status == 'active',
-        SubscriptionDelivery.status != 'paused',
-        SubscriptionDelivery.quantity > 0,
-        SubscriptionDelivery.assigned_to == employee_id  # ONLY ASSIGNED DELIVERIES
-    ).options(
-        joinedload(SubscriptionDelivery.subscription).joinedload(CustomerSubscription.customer),
-        joinedload(SubscriptionDelivery.subscription).joinedload(CustomerSubscription.plan)
-    ).order_by(
-        Customer.name.asc()
-    ).all()
+    # ⚡ Cached route plan (shared with the admin schedule page)
+    deliveries = [
+        d for d in RoutePlanningService.get_route_plan(tenant_id, today)['lines']
+        if d.status != 'paused'
+        and d.quantity > 0
+        and d.assigned_to == employee_id  # ONLY ASSIGNED DELIVERIES
+    ]
     
     # Separate completed and pending
     pending_deliveries = [d for d in deliveries if not d.delivered_at]
@@ -128,19 +118,8 @@ def today_deliveries():
                          day_note=day_note)
 
 
-@employee_delivery_bp.route('/mark/<int:delivery_id>', methods=['POST'])
-@require_tenant
-@employee_login_required
-def mark_delivery(delivery_id):
-    """Mark a delivery as completed and track bottles"""
-    tenant_id = get_current_tenant_id()
-    employee_id = session.get('employee_id')
-    
-    delivery = SubscriptionDelivery.query.filter_by(
-        id=delivery_id,
-        tenant_id=tenant_id
-    ).first_or_404()
-    
+def _complete_delivery(delivery, employee_id):
+    """Mark a delivery as completed and track bottles (from the submitted form)"""
     try:
         # Get bottle data from form
         bottles_collected = int(request.form.get('bottles_collected', 0))
@@ -169,6 +148,46 @@ def mark_delivery(delivery_id):
     return redirect(url_for('employee_delivery.today_deliveries'))
 
 
+@employee_delivery_bp.route('/mark/<int:delivery_id>', methods=['POST'])
+@require_tenant
+@employee_login_required
+def mark_delivery(delivery_id):
+    """Mark a delivery as completed and track bottles"""
+    tenant_id = get_current_tenant_id()
+    employee_id = session.get('employee_id')
+    
+    delivery = SubscriptionDelivery.query.filter_by(
+        id=delivery_id,
+        tenant_id=tenant_id
+    ).first_or_404()
+    
+    return _complete_delivery(delivery, employee_id)
+
+
+@employee_delivery_bp.route('/mark/<int:subscription_id>/<delivery_date>', methods=['POST'])
+@require_tenant
+@employee_login_required
+def mark_scheduled_delivery(subscription_id, delivery_date):
+    """Mark a rule-based delivery (no row yet) as completed"""
+    tenant_id = get_current_tenant_id()
+    employee_id = session.get('employee_id')
+    
+    subscription = CustomerSubscription.query.filter_by(
+        id=subscription_id,
+        tenant_id=tenant_id
+    ).first_or_404()
+    
+    try:
+        delivery_date = datetime.strptime(delivery_date, '%Y-%m-%d').date()
+    except ValueError:
+        flash('❌ Invalid delivery date', 'error')
+        return redirect(url_for('employee_delivery.today_deliveries'))
+    
+    # Completed deliveries are always stored
+    delivery = DeliveryEngine.materialize(subscription, delivery_date)
+    return _complete_delivery(delivery, employee_id)
+
+
 @employee_delivery_bp.route('/undo/<int:delivery_id>', methods=['POST'])
 @require_tenant
 @employee_login_required
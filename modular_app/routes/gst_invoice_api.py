@@ -179,53 +179,59 @@ def batch_validate_items():
         if customer_id:
             customer = Customer.query.filter_by(id=customer_id, tenant_id=tenant_id).first()
         
-        # Validate each item
+        # Validate all items together (⚡ one batch query for the whole invoice)
         results = []
         all_valid = True
         
-        for item_data in items:
+        lines = []
+        for position, item_data in enumerate(items):
             item_id = item_data.get('item_id')
             quantity = float(item_data.get('quantity', 0))
             
             if not item_id or quantity <= 0:
-                results.append({
+                results.append((position, {
                     'item_id': item_id,
                     'status': 'error',
                     'message': 'Invalid item_id or quantity'
-                })
+                }))
                 all_valid = False
                 continue
             
-            # Get item
-            item = Item.query.filter_by(id=item_id, tenant_id=tenant_id).first()
-            if not item:
-                results.append({
+            lines.append({'item_id': item_id, 'quantity': quantity, 'position': position})
+        
+        item_names = dict(db.session.query(Item.id, Item.name).filter(
+            Item.tenant_id == tenant_id,
+            Item.id.in_([int(line['item_id']) for line in lines])
+        ).all()) if lines else {}
+        
+        validation_results = StockBatchService.validate_invoice_items(
+            lines, invoice_type, customer, tenant_id
+        )
+        
+        for line, validation_result in zip(lines, validation_results):
+            item_id = line['item_id']
+            if int(item_id) not in item_names:
+                results.append((line['position'], {
                     'item_id': item_id,
                     'status': 'error',
                     'message': 'Item not found'
-                })
+                }))
                 all_valid = False
                 continue
             
-            # Validate
-            validation_result = StockBatchService.validate_invoice_item(
-                item_id=item_id,
-                quantity=quantity,
-                invoice_type=invoice_type,
-                customer=customer,
-                tenant_id=tenant_id
-            )
-            
             # Add item details
             validation_result['item_id'] = item_id
-            validation_result['item_name'] = item.name
-            validation_result['quantity_requested'] = quantity
+            validation_result['item_name'] = item_names[int(item_id)]
+            validation_result['quantity_requested'] = line['quantity']
             
-            results.append(validation_result)
+            results.append((line['position'], validation_result))
             
             if validation_result['status'] != 'ok':
                 all_valid = False
         
+        # Same order as the request
+        results = [result for _, result in sorted(results, key=lambda entry: entry[0])]
+        
         return jsonify({
             'all_valid': all_valid,
             'invoice_type': invoice_type,
@@ -1,13 +1,11 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, g, jsonify
 from models.database import db
-from models.invoice import Invoice, InvoiceItem
-from models.customer import Customer
 from utils.tenant_middleware import require_tenant, get_current_tenant_id
 from utils.license_check import check_license
+from services.gst_computation_service import GstComputationService
 from functools import wraps
 from flask import session
 from datetime import datetime, timedelta
-from sqlalchemy import func, extract
 from decimal import Decimal
 import calendar
 
@@ -67,207 +65,90 @@ def gstr1():
         flash(f'Error: {str(e)}', 'error')
         return redirect(url_for('gst_reports.index'))
     
-    # Get all invoices in date range
-    # 🆕 GST SMART INVOICE: Only include taxable and credit_adjustment invoices (exclude non_taxable)
-    invoices = Invoice.query.filter_by(tenant_id=tenant_id).filter(
-        Invoice.invoice_date >= start_date,
-        Invoice.invoice_date <= end_date,
-        Invoice.invoice_type.in_(['taxable', 'credit_adjustment'])
-    ).order_by(Invoice.invoice_date.desc()).all()
-    
-    # Group invoices by type
-    b2b_invoices = []  # Invoices with GSTIN
-    b2c_invoices = []  # Invoices without GSTIN
-    
-    # Summary by GST rate
-    gst_summary = {}
-    
-    total_taxable = Decimal('0')
-    total_cgst = Decimal('0')
-    total_sgst = Decimal('0')
-    total_igst = Decimal('0')
-    total_tax = Decimal('0')
-    total_invoice_value = Decimal('0')
-    
+    # ⚡ Grouped SQL over invoices / invoice_items / return_items (cached once the period is filed)
+    # 🆕 GST SMART INVOICE: Only taxable and credit_adjustment invoices (non_taxable excluded)
     try:
-        for invoice in invoices:
-            # Calculate totals - Convert all to Decimal to avoid type mismatch
-            taxable = Decimal(str(invoice.subtotal)) if invoice.subtotal else Decimal('0')
-            cgst = Decimal(str(invoice.cgst_amount)) if invoice.cgst_amount else Decimal('0')
-            sgst = Decimal(str(invoice.sgst_amount)) if invoice.sgst_amount else Decimal('0')
-            igst = Decimal(str(invoice.igst_amount)) if invoice.igst_amount else Decimal('0')
-            tax = cgst + sgst + igst
-            
-            total_taxable += taxable
-            total_cgst += cgst
-            total_sgst += sgst
-            total_igst += igst
-            total_tax += tax
-            total_invoice_value += Decimal(str(invoice.total_amount)) if invoice.total_amount else Decimal('0')
-            
-            # Categorize as B2B or B2C
-            if invoice.customer_gstin and invoice.customer_gstin.strip():
-                b2b_invoices.append(invoice)
-            else:
-                b2c_invoices.append(invoice)
-            
-            # Group by GST rates
-            try:
-                for item in invoice.items:
-                    # Convert gst_rate to Decimal for consistency
-                    gst_rate = float(item.gst_rate or 0)
-                    if gst_rate not in gst_summary:
-                        gst_summary[gst_rate] = {
-                            'taxable_value': Decimal('0'),
-                            'cgst': Decimal('0'),
-                            'sgst': Decimal('0'),
-                            'igst': Decimal('0'),
-                            'total_tax': Decimal('0')
-                        }
-                    
-                    # Convert all values to Decimal to avoid type mismatch
-                    taxable_val = Decimal(str(item.taxable_value)) if item.taxable_value else Decimal('0')
-                    cgst_val = Decimal(str(item.cgst_amount)) if item.cgst_amount else Decimal('0')
-                    sgst_val = Decimal(str(item.sgst_amount)) if item.sgst_amount else Decimal('0')
-                    igst_val = Decimal(str(item.igst_amount)) if item.igst_amount else Decimal('0')
-                    
-                    gst_summary[gst_rate]['taxable_value'] += taxable_val
-                    gst_summary[gst_rate]['cgst'] += cgst_val
-                    gst_summary[gst_rate]['sgst'] += sgst_val
-                    gst_summary[gst_rate]['igst'] += igst_val
-                    gst_summary[gst_rate]['total_tax'] += cgst_val + sgst_val + igst_val
-            except Exception as item_error:
-                print(f"⚠️  Error processing items for invoice {invoice.invoice_number}: {str(item_error)}")
-                continue
+        gstr1_data = GstComputationService.get_gstr1(tenant_id, start_date, end_date)
     except Exception as e:
-        print(f"❌ Error processing invoices: {str(e)}")
+        print(f"❌ Error computing GSTR-1: {str(e)}")
         import traceback
         traceback.print_exc()
         flash(f'Error processing invoices: {str(e)}', 'error')
         return redirect(url_for('gst_reports.index'))
     
-    # ========== PROCESS RETURNS (Credit Notes) ==========
-    from models.return_model import Return
-    from models.return_item import ReturnItem
-    
-    returns = Return.query.filter_by(tenant_id=tenant_id).filter(
-        Return.return_date >= start_date,
-        Return.return_date <= end_date,
-        Return.status == 'approved'  # Only approved returns
-    ).order_by(Return.return_date.desc()).all()
-    
-    # Initialize return totals
-    total_return_taxable = Decimal('0')
-    total_return_cgst = Decimal('0')
-    total_return_sgst = Decimal('0')
-    total_return_igst = Decimal('0')
-    total_return_tax = Decimal('0')
-    total_return_value = Decimal('0')
-    
-    return_list = []  # For displaying in template
-    
-    try:
-        for ret in returns:
-            # Calculate return totals from items
-            ret_taxable = Decimal('0')
-            ret_cgst = Decimal('0')
-            ret_sgst = Decimal('0')
-            ret_igst = Decimal('0')
-            
-            for item in ret.items:
-                ret_taxable += Decimal(str(item.taxable_amount)) if item.taxable_amount else Decimal('0')
-                ret_cgst += Decimal(str(item.cgst_amount)) if item.cgst_amount else Decimal('0')
-                ret_sgst += Decimal(str(item.sgst_amount)) if item.sgst_amount else Decimal('0')
-                ret_igst += Decimal(str(item.igst_amount)) if item.igst_amount else Decimal('0')
-                
-                # Subtract from GST summary by rate
-                try:
-                    gst_rate = float(item.gst_rate or 0)
-                    if gst_rate in gst_summary:
-                        taxable_val = Decimal(str(item.taxable_amount)) if item.taxable_amount else Decimal('0')
-                        cgst_val = Decimal(str(item.cgst_amount)) if item.cgst_amount else Decimal('0')
-                        sgst_val = Decimal(str(item.sgst_amount)) if item.sgst_amount else Decimal('0')
-                        igst_val = Decimal(str(item.igst_amount)) if item.igst_amount else Decimal('0')
-                        
-                        gst_summary[gst_rate]['taxable_value'] -= taxable_val
-                        gst_summary[gst_rate]['cgst'] -= cgst_val
-                        gst_summary[gst_rate]['sgst'] -= sgst_val
-                        gst_summary[gst_rate]['igst'] -= igst_val
-                        gst_summary[gst_rate]['total_tax'] -= (cgst_val + sgst_val + igst_val)
-                except Exception as item_error:
-                    print(f"⚠️  Error processing return item: {str(item_error)}")
-                    continue
-            
-            ret_tax = ret_cgst + ret_sgst + ret_igst
-            ret_total = ret_taxable + ret_tax
-            
-            # Add to totals
-            total_return_taxable += ret_taxable
-            total_return_cgst += ret_cgst
-            total_return_sgst += ret_sgst
-            total_return_igst += ret_igst
-            total_return_tax += ret_tax
-            total_return_value += ret_total
-            
-            # Store for display
-            return_list.append({
-                'return_number': ret.return_number,
-                'credit_note_number': ret.credit_note_number,
-                'return_date': ret.return_date,
-                'customer_name': ret.customer.name if ret.customer else 'Unknown',
-                'invoice_number': ret.invoice.invoice_number if ret.invoice else 'N/A',
-                'taxable': ret_taxable,
-                'cgst': ret_cgst,
-                'sgst': ret_sgst,
-                'igst': ret_igst,
-                'total': ret_total
-            })
-            
-    except Exception as e:
-        print(f"⚠️  Error processing returns: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        # Continue even if returns processing fails
-    
-    # ========== CALCULATE NET AMOUNTS (After Returns) ==========
-    net_taxable = total_taxable - total_return_taxable
-    net_cgst = total_cgst - total_return_cgst
-    net_sgst = total_sgst - total_return_sgst
-    net_igst = total_igst - total_return_igst
-    net_tax = total_tax - total_return_tax
-    net_invoice_value = total_invoice_value - total_return_value
-    
-    # Sort GST summary by rate
-    gst_summary = dict(sorted(gst_summary.items()))
+    gross = gstr1_data['gross']
+    return_totals = gstr1_data['return_totals']
+    net = gstr1_data['net']
     
     return render_template('admin/gst_reports/gstr1.html',
                          tenant=g.tenant,
                          start_date=start_date_str,
                          end_date=end_date_str,
-                         b2b_invoices=b2b_invoices,
-                         b2c_invoices=b2c_invoices,
-                         gst_summary=gst_summary,
-                         total_taxable=total_taxable,
-                         total_cgst=total_cgst,
-                         total_sgst=total_sgst,
-                         total_igst=total_igst,
-                         total_tax=total_tax,
-                         total_invoice_value=total_invoice_value,
+                         b2b_invoices=gstr1_data['b2b_invoices'],
+                         b2c_invoices=gstr1_data['b2c_invoices'],
+                         gst_summary=gstr1_data['rate_summary'],
+                         hsn_summary=gstr1_data['hsn_summary'],
+                         total_taxable=gross['taxable_value'],
+                         total_cgst=gross['cgst'],
+                         total_sgst=gross['sgst'],
+                         total_igst=gross['igst'],
+                         total_tax=gross['total_tax'],
+                         total_invoice_value=gstr1_data['invoice_value'],
                          # Returns data
-                         returns=return_list,
-                         total_return_taxable=total_return_taxable,
-                         total_return_cgst=total_return_cgst,
-                         total_return_sgst=total_return_sgst,
-                         total_return_igst=total_return_igst,
-                         total_return_tax=total_return_tax,
-                         total_return_value=total_return_value,
+                         returns=gstr1_data['returns'],
+                         total_return_taxable=return_totals['taxable_value'],
+                         total_return_cgst=return_totals['cgst'],
+                         total_return_sgst=return_totals['sgst'],
+                         total_return_igst=return_totals['igst'],
+                         total_return_tax=return_totals['total_tax'],
+                         total_return_value=gstr1_data['return_value'],
                          # Net amounts (after returns)
-                         net_taxable=net_taxable,
-                         net_cgst=net_cgst,
-                         net_sgst=net_sgst,
-                         net_igst=net_igst,
-                         net_tax=net_tax,
-                         net_invoice_value=net_invoice_value)
+                         net_taxable=net['taxable_value'],
+                         net_cgst=net['cgst'],
+                         net_sgst=net['sgst'],
+                         net_igst=net['igst'],
+                         net_tax=net['total_tax'],
+                         net_invoice_value=gstr1_data['net_invoice_value'])
+
+
+@gst_reports_bp.route('/gstr1/export-json')
+@require_tenant
+@check_license
+@login_required
+def gstr1_export_json():
+    """GSTR-1 JSON for the GST offline tool (b2b, b2cl, b2cs, cdnr, hsn) - ?gzip=1 for a compressed download"""
+    from flask import Response, stream_with_context
+    from services.gst_export_service import GstExportService, gzip_stream
+    import json
+    
+    tenant_id = get_current_tenant_id()
+    
+    try:
+        today = datetime.now()
+        start_date = datetime.strptime(request.args.get('start_date', today.replace(day=1).strftime('%Y-%m-%d')), '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.args.get('end_date', today.strftime('%Y-%m-%d')), '%Y-%m-%d').date()
+    except ValueError as e:
+        flash(f'Error: {str(e)}', 'error')
+        return redirect(url_for('gst_reports.gstr1'))
+    
+    tenant_settings = json.loads(g.tenant.settings) if g.tenant.settings else {}
+    
+    # ⚡ Streamed section by section from server-side cursors (100k+ invoices never sit in memory)
+    chunks = GstExportService.iter_gstr1_json(
+        tenant_id, start_date, end_date,
+        gstin=tenant_settings.get('gstin', ''),
+        home_state=tenant_settings.get('state', 'Maharashtra')
+    )
+    filename = f"GSTR1_{start_date.strftime('%m%Y')}_{start_date}_to_{end_date}.json"
+    
+    if request.args.get('gzip'):
+        return Response(stream_with_context(gzip_stream(chunks)),
+                        mimetype='application/gzip',
+                        headers={'Content-Disposition': f'attachment; filename={filename}.gz'})
+    
+    return Response(stream_with_context(chunks),
+                    mimetype='application/json',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
 
 
 @gst_reports_bp.route('/gstr3b')
@@ -293,90 +174,38 @@ def gstr3b():
     end_date = start_date.replace(day=last_day)
     end_date_str = end_date.strftime('%Y-%m-%d')
     
-    # Get all invoices in date range
-    # 🆕 GST SMART INVOICE: Only include taxable and credit_adjustment invoices
-    invoices = Invoice.query.filter_by(tenant_id=tenant_id).filter(
-        Invoice.invoice_date >= start_date,
-        Invoice.invoice_date <= end_date,
-        Invoice.invoice_type.in_(['taxable', 'credit_adjustment'])
-    ).all()
-    
-    # Calculate outward supplies (GROSS)
-    outward_taxable = Decimal('0')
-    outward_cgst = Decimal('0')
-    outward_sgst = Decimal('0')
-    outward_igst = Decimal('0')
-    
+    # ⚡ Outward supplies, credit notes and ITC from grouped SQL (cached once the period is filed)
+    # 🆕 GST SMART INVOICE: Only taxable and credit_adjustment invoices; ITC only from GST-registered vendors
     try:
-        for invoice in invoices:
-            # Convert to Decimal to avoid type mismatch
-            outward_taxable += Decimal(str(invoice.subtotal)) if invoice.subtotal else Decimal('0')
-            outward_cgst += Decimal(str(invoice.cgst_amount)) if invoice.cgst_amount else Decimal('0')
-            outward_sgst += Decimal(str(invoice.sgst_amount)) if invoice.sgst_amount else Decimal('0')
-            outward_igst += Decimal(str(invoice.igst_amount)) if invoice.igst_amount else Decimal('0')
+        gstr3b_data = GstComputationService.get_gstr3b(tenant_id, start_date, end_date)
     except Exception as e:
-        print(f"❌ Error calculating outward supplies: {str(e)}")
+        print(f"❌ Error computing GSTR-3B: {str(e)}")
         flash(f'Error: {str(e)}', 'error')
         return redirect(url_for('gst_reports.index'))
     
-    # ========== SUBTRACT RETURNS (Credit Notes) ==========
-    from models.return_model import Return
-    
-    returns = Return.query.filter_by(tenant_id=tenant_id).filter(
-        Return.return_date >= start_date,
-        Return.return_date <= end_date,
-        Return.status == 'approved'
-    ).all()
-    
-    return_taxable = Decimal('0')
-    return_cgst = Decimal('0')
-    return_sgst = Decimal('0')
-    return_igst = Decimal('0')
-    
-    try:
-        for ret in returns:
-            # Calculate return totals from items
-            for item in ret.items:
-                return_taxable += Decimal(str(item.taxable_amount)) if item.taxable_amount else Decimal('0')
-                return_cgst += Decimal(str(item.cgst_amount)) if item.cgst_amount else Decimal('0')
-                return_sgst += Decimal(str(item.sgst_amount)) if item.sgst_amount else Decimal('0')
-                return_igst += Decimal(str(item.igst_amount)) if item.igst_amount else Decimal('0')
-    except Exception as e:
-        print(f"⚠️  Error calculating returns: {str(e)}")
-        # Continue with zero returns if calculation fails
-    
-    # Calculate NET outward supplies (after returns)
-    net_outward_taxable = outward_taxable - return_taxable
-    net_outward_cgst = outward_cgst - return_cgst
-    net_outward_sgst = outward_sgst - return_sgst
-    net_outward_igst = outward_igst - return_igst
-    
-    # Calculate inward supplies (ITC from purchase bills)
-    # 🆕 GST SMART INVOICE: Only include purchases from GST-registered vendors
-    from models.purchase_bill import PurchaseBill
-    
-    purchase_bills = PurchaseBill.query.filter(
-        PurchaseBill.tenant_id == tenant_id,
-        PurchaseBill.status == 'approved',
-        PurchaseBill.bill_date >= start_date,
-        PurchaseBill.bill_date <= end_date,
-        PurchaseBill.gst_applicable == True  # Only registered vendor purchases
-    ).all()
-    
-    inward_taxable = Decimal('0')
-    inward_cgst = Decimal('0')
-    inward_sgst = Decimal('0')
-    inward_igst = Decimal('0')
-    
-    try:
-        for bill in purchase_bills:
-            inward_taxable += Decimal(str(bill.subtotal)) if bill.subtotal else Decimal('0')
-            inward_cgst += Decimal(str(bill.cgst_amount)) if bill.cgst_amount else Decimal('0')
-            inward_sgst += Decimal(str(bill.sgst_amount)) if bill.sgst_amount else Decimal('0')
-            inward_igst += Decimal(str(bill.igst_amount)) if bill.igst_amount else Decimal('0')
-    except Exception as e:
-        print(f"❌ Error calculating inward supplies: {str(e)}")
-        # Continue with zero ITC if calculation fails
+    # Outward supplies (GROSS)
+    outward_taxable = gstr3b_data['outward']['taxable_value']
+    outward_cgst = gstr3b_data['outward']['cgst']
+    outward_sgst = gstr3b_data['outward']['sgst']
+    outward_igst = gstr3b_data['outward']['igst']
+    
+    # Returns (Credit Notes)
+    return_taxable = gstr3b_data['returns']['taxable_value']
+    return_cgst = gstr3b_data['returns']['cgst']
+    return_sgst = gstr3b_data['returns']['sgst']
+    return_igst = gstr3b_data['returns']['igst']
+    
+    # NET outward supplies (after returns)
+    net_outward_taxable = gstr3b_data['net_outward']['taxable_value']
+    net_outward_cgst = gstr3b_data['net_outward']['cgst']
+    net_outward_sgst = gstr3b_data['net_outward']['sgst']
+    net_outward_igst = gstr3b_data['net_outward']['igst']
+    
+    # Inward supplies (ITC from purchase bills)
+    inward_taxable = gstr3b_data['inward']['taxable_value']
+    inward_cgst = gstr3b_data['inward']['cgst']
+    inward_sgst = gstr3b_data['inward']['sgst']
+    inward_igst = gstr3b_data['inward']['igst']
     
     # ========== CALCULATE TAX LIABILITY WITH ITC SET-OFF ==========
     # Step 1: Calculate initial liability (before cross-utilization)
@@ -479,7 +308,7 @@ def gstr3b():
                          return_cgst=return_cgst,
                          return_sgst=return_sgst,
                          return_igst=return_igst,
-                         returns_count=len(returns),
+                         returns_count=gstr3b_data['returns_count'],
                          # NET outward supplies (after returns)
                          net_outward_taxable=net_outward_taxable,
                          net_outward_cgst=net_outward_cgst,
@@ -512,7 +341,7 @@ def gstr3b():
                          net_sgst=net_sgst_liability,
                          net_igst=net_igst_liability,
                          total_tax_liability=total_tax_liability,
-                         invoice_count=len(invoices))
+                         invoice_count=gstr3b_data['invoice_count'])
 
 
 @gst_reports_bp.route('/summary')
@@ -532,88 +361,11 @@ def summary():
         start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
         end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
         
-        # Get invoices
-        invoices = Invoice.query.filter_by(tenant_id=tenant_id).filter(
-            Invoice.invoice_date >= start_date,
-            Invoice.invoice_date <= end_date
-        ).all()
-        
-        # Calculate totals - Convert all to Decimal to avoid type mismatch
-        total_sales = sum([Decimal(str(inv.total_amount)) if inv.total_amount else Decimal('0') for inv in invoices])
-        total_taxable = sum([Decimal(str(inv.subtotal)) if inv.subtotal else Decimal('0') for inv in invoices])
-        total_cgst = sum([Decimal(str(inv.cgst_amount)) if inv.cgst_amount else Decimal('0') for inv in invoices])
-        total_sgst = sum([Decimal(str(inv.sgst_amount)) if inv.sgst_amount else Decimal('0') for inv in invoices])
-        total_igst = sum([Decimal(str(inv.igst_amount)) if inv.igst_amount else Decimal('0') for inv in invoices])
-        total_gst = total_cgst + total_sgst + total_igst
-        
-        # ========== SUBTRACT RETURNS ==========
-        from models.return_model import Return
-        
-        returns = Return.query.filter_by(tenant_id=tenant_id).filter(
-            Return.return_date >= start_date,
-            Return.return_date <= end_date,
-            Return.status == 'approved'
-        ).all()
-        
-        return_sales = Decimal('0')
-        return_taxable = Decimal('0')
-        return_cgst = Decimal('0')
-        return_sgst = Decimal('0')
-        return_igst = Decimal('0')
-        
-        for ret in returns:
-            return_sales += Decimal(str(ret.total_amount)) if ret.total_amount else Decimal('0')
-            for item in ret.items:
-                return_taxable += Decimal(str(item.taxable_amount)) if item.taxable_amount else Decimal('0')
-                return_cgst += Decimal(str(item.cgst_amount)) if item.cgst_amount else Decimal('0')
-                return_sgst += Decimal(str(item.sgst_amount)) if item.sgst_amount else Decimal('0')
-                return_igst += Decimal(str(item.igst_amount)) if item.igst_amount else Decimal('0')
-        
-        return_gst = return_cgst + return_sgst + return_igst
-        
-        # Calculate NET amounts (after returns)
-        net_sales = total_sales - return_sales
-        net_taxable = total_taxable - return_taxable
-        net_cgst = total_cgst - return_cgst
-        net_sgst = total_sgst - return_sgst
-        net_igst = total_igst - return_igst
-        net_gst = total_gst - return_gst
-        
-        # Group by month (GROSS amounts first)
-        monthly_data = {}
-        for invoice in invoices:
-            month_key = invoice.invoice_date.strftime('%Y-%m')
-            if month_key not in monthly_data:
-                monthly_data[month_key] = {
-                    'sales': Decimal('0'),
-                    'taxable': Decimal('0'),
-                    'gst': Decimal('0'),
-                    'count': 0
-                }
-            # Convert to Decimal to avoid type mismatch
-            monthly_data[month_key]['sales'] += Decimal(str(invoice.total_amount)) if invoice.total_amount else Decimal('0')
-            monthly_data[month_key]['taxable'] += Decimal(str(invoice.subtotal)) if invoice.subtotal else Decimal('0')
-            cgst_dec = Decimal(str(invoice.cgst_amount)) if invoice.cgst_amount else Decimal('0')
-            sgst_dec = Decimal(str(invoice.sgst_amount)) if invoice.sgst_amount else Decimal('0')
-            igst_dec = Decimal(str(invoice.igst_amount)) if invoice.igst_amount else Decimal('0')
-            monthly_data[month_key]['gst'] += cgst_dec + sgst_dec + igst_dec
-            monthly_data[month_key]['count'] += 1
-        
-        # Subtract returns from monthly data
-        for ret in returns:
-            month_key = ret.return_date.strftime('%Y-%m')
-            if month_key in monthly_data:
-                monthly_data[month_key]['sales'] -= Decimal(str(ret.total_amount)) if ret.total_amount else Decimal('0')
-                # Calculate return GST from items
-                ret_taxable = Decimal('0')
-                ret_gst = Decimal('0')
-                for item in ret.items:
-                    ret_taxable += Decimal(str(item.taxable_amount)) if item.taxable_amount else Decimal('0')
-                    ret_gst += Decimal(str(item.cgst_amount)) if item.cgst_amount else Decimal('0')
-                    ret_gst += Decimal(str(item.sgst_amount)) if item.sgst_amount else Decimal('0')
-                    ret_gst += Decimal(str(item.igst_amount)) if item.igst_amount else Decimal('0')
-                monthly_data[month_key]['taxable'] -= ret_taxable
-                monthly_data[month_key]['gst'] -= ret_gst
+        # ⚡ Grouped SQL (cached once the period is filed)
+        summary_data = GstComputationService.get_summary(tenant_id, start_date, end_date)
+        totals = summary_data['totals']
+        returns = summary_data['returns']
+        net = summary_data['net']
     except Exception as e:
         print(f"❌ Error in summary report: {str(e)}")
         import traceback
@@ -626,24 +378,24 @@ def summary():
                          start_date=start_date_str,
                          end_date=end_date_str,
                          # Gross amounts (before returns)
-                         total_sales=total_sales,
-                         total_taxable=total_taxable,
-                         total_cgst=total_cgst,
-                         total_sgst=total_sgst,
-                         total_igst=total_igst,
-                         total_gst=total_gst,
+                         total_sales=summary_data['sales'],
+                         total_taxable=totals['taxable_value'],
+                         total_cgst=totals['cgst'],
+                         total_sgst=totals['sgst'],
+                         total_igst=totals['igst'],
+                         total_gst=totals['total_tax'],
                          # Returns
-                         return_sales=return_sales,
-                         return_taxable=return_taxable,
-                         return_gst=return_gst,
-                         returns_count=len(returns),
+                         return_sales=summary_data['return_sales'],
+                         return_taxable=returns['taxable_value'],
+                         return_gst=returns['total_tax'],
+                         returns_count=summary_data['returns_count'],
                          # NET amounts (after returns)
-                         net_sales=net_sales,
-                         net_taxable=net_taxable,
-                         net_cgst=net_cgst,
-                         net_sgst=net_sgst,
-                         net_igst=net_igst,
-                         net_gst=net_gst,
-                         invoice_count=len(invoices),
-                         monthly_data=monthly_data)
+                         net_sales=summary_data['net_sales'],
+                         net_taxable=net['taxable_value'],
+                         net_cgst=net['cgst'],
+                         net_sgst=net['sgst'],
+                         net_igst=net['igst'],
+                         net_gst=net['total_tax'],
+                         invoice_count=summary_data['invoice_count'],
+                         monthly_data=summary_data['monthly_data'])
 
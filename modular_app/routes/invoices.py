@@ -3,7 +3,8 @@ Invoice management routes
 """
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, g, session
 from models import db, Invoice, InvoiceItem, Item, ItemStock, ItemStockMovement, Site, Tenant, StockBatch, Customer
-from utils.tenant_middleware import require_tenant, get_current_tenant_id
+from utils.tenant_middleware import require_tenant, get_current_tenant_id, get_current_tenant_record
+from utils.tenant_cache import invalidate_tenant
 from utils.license_check import check_license
 from services.stock_batch_service import StockBatchService
 from sqlalchemy import func, desc, text
@@ -257,6 +258,29 @@ def create():
             total_sgst = 0
             total_igst = 0
             
+            # ⚡ Load inventory items and the default site once for the whole invoice
+            inventory_item_ids = {int(item_id) for item_id in item_ids if item_id}
+            inventory_items = {
+                item.id: item for item in Item.query.filter(
+                    Item.tenant_id == tenant_id,
+                    Item.id.in_(inventory_item_ids)
+                ).all()
+            } if inventory_item_ids else {}
+            
+            # Get default site (marked as is_default=True)
+            default_site = Site.query.filter_by(
+                tenant_id=tenant_id,
+                is_default=True,
+                active=True
+            ).first()
+            
+            # Fallback to first active site if no default is set
+            if not default_site:
+                default_site = Site.query.filter_by(tenant_id=tenant_id, active=True).first()
+            
+            # Lines whose stock is allocated from batches after the loop (one batch query)
+            batch_lines = []
+            
             for i in range(len(item_names)):
                 if not item_names[i] or not quantities[i] or not rates[i]:
                     continue
@@ -310,19 +334,8 @@ def create():
                 
                 # 🔥 REDUCE STOCK FOR THIS ITEM 🔥
                 if item_id:  # Only reduce stock if item is from inventory (not manual entry)
-                    item_obj = Item.query.get(item_id)
+                    item_obj = inventory_items.get(item_id)
                     if item_obj and item_obj.track_inventory:
-                        # Get default site (marked as is_default=True)
-                        default_site = Site.query.filter_by(
-                            tenant_id=tenant_id,
-                            is_default=True,
-                            active=True
-                        ).first()
-                        
-                        # Fallback to first active site if no default is set
-                        if not default_site:
-                            default_site = Site.query.filter_by(tenant_id=tenant_id, active=True).first()
-                        
                         if default_site:
                             # Get or create stock record
                             item_stock = ItemStock.query.filter_by(
@@ -334,20 +347,7 @@ def create():
                             if item_stock:
                                 # 🆕 GST SMART INVOICE: Allocate stock from batches (if reducing stock)
                                 if invoice.reduce_stock:
-                                    # Allocate stock from batches (FIFO, GST-aware)
-                                    allocation_result = StockBatchService.allocate_stock_for_invoice_item(
-                                        item_obj.id, quantity, invoice.invoice_type, tenant_id
-                                    )
-                                    
-                                    if allocation_result['status'] == 'success':
-                                        # Process the allocation
-                                        StockBatchService.process_invoice_item_allocation(
-                                            invoice_item, allocation_result['allocated'], reduce_stock=True
-                                        )
-                                        print(f"✅ Allocated {quantity} units from {len(allocation_result['allocated'])} batch(es)")
-                                    else:
-                                        # Allocation failed - show warning but continue
-                                        flash(f'⚠️ {allocation_result.get("message", "Stock allocation issue")}', 'warning')
+                                    batch_lines.append((invoice_item, item_obj.id, quantity))
                                 
                                 # Check if sufficient stock available
                                 if item_stock.quantity_available < quantity:
@@ -399,6 +399,27 @@ def create():
                 total_sgst += invoice_item.sgst_amount
                 total_igst += invoice_item.igst_amount
             
+            # 🆕 GST SMART INVOICE: Allocate stock from batches for all lines at once (FIFO, GST-aware)
+            if batch_lines:
+                allocation = StockBatchService.allocate_stock_for_invoice(
+                    [{'item_id': item_id, 'quantity': quantity} for _, item_id, quantity in batch_lines],
+                    invoice.invoice_type, tenant_id
+                )
+                
+                for (invoice_item, item_id, quantity), allocation_result in zip(batch_lines, allocation['lines']):
+                    if allocation_result['status'] == 'success':
+                        # Process the allocation
+                        StockBatchService.process_invoice_item_allocation(
+                            invoice_item, allocation_result['allocated']
+                        )
+                        print(f"✅ Allocated {quantity} units from {len(allocation_result['allocated'])} batch(es)")
+                    else:
+                        # Allocation failed - show warning but continue
+                        flash(f'⚠️ {allocation_result.get("message", "Stock allocation issue")}', 'warning')
+                
+                # Reduce all batch quantities in one bulk update
+                StockBatchService.apply_invoice_allocation(allocation)
+            
             # Get discount
             discount = float(request.form.get('discount', 0) or 0)
             
@@ -988,6 +1009,49 @@ def view(invoice_id):
                          today=date.today())
 
 
+@invoices_bp.route('/<int:invoice_id>/pdf')
+@require_tenant
+@login_required
+def download_pdf(invoice_id):
+    """Download invoice PDF (cached per invoice version)"""
+    from flask import send_file
+    from io import BytesIO
+    from services.invoice_pdf_service import InvoicePdfService
+
+    invoice = Invoice.query.filter_by(id=invoice_id, tenant_id=g.tenant.id).first_or_404()
+    pdf = InvoicePdfService.get_invoice_pdf(invoice, g.tenant)
+    return send_file(
+        BytesIO(pdf),
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=f'{invoice.invoice_number}.pdf'
+    )
+
+
+@invoices_bp.route('/pdf-batch', methods=['POST'])
+@require_tenant
+@login_required
+def pdf_batch():
+    """ZIP of all invoice PDFs for a month (background job)"""
+    from services.job_queue import JobQueue
+    import calendar
+
+    try:
+        year, month = (int(part) for part in request.form.get('month', '').split('-'))
+        start_date = date(year, month, 1)
+    except ValueError:
+        flash('❌ Please select a month', 'error')
+        return redirect(url_for('invoices.index'))
+    end_date = date(year, month, calendar.monthrange(year, month)[1])
+
+    # ⚡ Rendering runs as a background job - the job page offers the ZIP when ready
+    job = JobQueue.enqueue('invoice_pdfs', tenant_id=g.tenant.id, payload={
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat()
+    })
+    return redirect(url_for('jobs.view', job_id=job.id))
+
+
 @invoices_bp.route('/<int:invoice_id>/edit', methods=['GET', 'POST'])
 @require_tenant
 @login_required
@@ -1724,7 +1788,7 @@ def delete(invoice_id):
 @login_required
 def settings():
     """Configure invoice settings (GST, address, etc.)"""
-    tenant = g.tenant
+    tenant = get_current_tenant_record()
     
     if request.method == 'POST':
         try:
@@ -1759,6 +1823,7 @@ def settings():
             # Save
             tenant.settings = json.dumps(tenant_settings)
             db.session.commit()
+            invalidate_tenant(tenant.subdomain)
             
             flash('Invoice settings updated successfully!', 'success')
             return redirect(url_for('invoices.settings'))
@@ -2,7 +2,7 @@
 Items management routes (Professional inventory - Zoho style)
 """
 from flask import Blueprint, render_template, request, redirect, url_for, flash, g, jsonify, send_file
-from models import db, Item, ItemCategory, ItemGroup, ItemStock, ItemStockMovement, Site, InventoryAdjustment, InventoryAdjustmentLine
+from models import db, Item, ItemCategory, ItemGroup, ItemStock, ItemStockMovement, Site, InventoryAdjustment, InventoryAdjustmentLine, DocumentSequence
 from utils.tenant_middleware import require_tenant, get_current_tenant_id
 from utils.license_check import check_license
 from functools import wraps
@@ -33,40 +33,25 @@ def login_required(f):
 
 
 def generate_sku(tenant_id):
-    """Auto-generate SKU for new items - finds highest ITEM-#### number for THIS tenant"""
+    """Auto-generate SKU for new items from THIS tenant's ITEM-#### sequence"""
     # SKU must be unique PER TENANT (not globally)
     # Database has UNIQUE(tenant_id, sku) constraint
     # Each tenant has their own sequence: Tenant A (ITEM-0001, 0002...), Tenant B (ITEM-0001, 0002...)
+    # ⚡ O(1): numbers come from the document_sequences table, not a scan of all items
     
-    # Get all items with ITEM-#### pattern SKUs for THIS TENANT ONLY
-    items = Item.query.filter_by(tenant_id=tenant_id).filter(
-        Item.sku.like('ITEM-%')
-    ).all()
+    def highest_sku_number():
+        # Sequence not created yet - continue from the highest ITEM-#### in use
+        skus = db.session.query(Item.sku).filter(
+            Item.tenant_id == tenant_id,
+            Item.sku.like('ITEM-%')
+        ).all()
+        return DocumentSequence.highest_number(sku for (sku,) in skus)
     
-    # Find the highest number in use FOR THIS TENANT
-    max_number = 0
-    for item in items:
-        try:
-            # Extract number from SKU (e.g., ITEM-0012 -> 12)
-            if item.sku and '-' in item.sku:
-                number_part = item.sku.split('-')[1]
-                number = int(number_part)
-                if number > max_number:
-                    max_number = number
-        except (ValueError, IndexError):
-            # Skip malformed SKUs
-            continue
-    
-    # Generate next number
-    new_number = max_number + 1
-    
-    # Format as ITEM-0001, ITEM-0002, etc.
-    new_sku = f"ITEM-{new_number:04d}"
-    
-    # Double-check it doesn't exist for THIS TENANT (safety check for race conditions)
+    new_sku = f"ITEM-{DocumentSequence.next_value(tenant_id, DocumentSequence.ITEM_SKU, seed=highest_sku_number):04d}"
+    
+    # Skip numbers taken by manually entered SKUs (indexed lookup, normally 1 query)
     while Item.query.filter_by(tenant_id=tenant_id, sku=new_sku).first():
-        new_number += 1
-        new_sku = f"ITEM-{new_number:04d}"
+        new_sku = f"ITEM-{DocumentSequence.next_value(tenant_id, DocumentSequence.ITEM_SKU):04d}"
     
     return new_sku
 
@@ -77,7 +62,7 @@ def generate_sku(tenant_id):
 @login_required
 def api_search_items():
     """Fast API endpoint for searching items (for invoice/bill creation)"""
-    from sqlalchemy import or_
+    from services.item_search_service import ItemSearchService
     
     tenant_id = get_current_tenant_id()
     query_text = request.args.get('q', '').strip()
@@ -86,41 +71,30 @@ def api_search_items():
     if not query_text:
         return jsonify([])
     
-    # Search by name, SKU, or barcode (fast indexed query)
-    items = Item.query.filter(
-        Item.tenant_id == tenant_id,
-        Item.is_active == True,
-        or_(
-            Item.name.ilike(f'%{query_text}%'),
-            Item.sku.ilike(f'%{query_text}%'),
-            Item.barcode.ilike(f'%{query_text}%')
-        )
-    ).limit(limit).all()
+    # ⚡ Indexed search: exact barcode/SKU first, stock totals in the same query
+    rows = ItemSearchService.search(tenant_id, query_text, limit)
     
-    # Build JSON response
+    # Build JSON response (only what the billing screen uses)
     results = []
-    for item in items:
-        # Get total stock (optimized - only for returned items)
-        total_stock = item.get_total_stock() if item.track_inventory else None
+    for row in rows:
+        total_stock = float(row.total_stock or 0) if row.track_inventory else None
         
         results.append({
-            'id': item.id,
-            'name': item.name,
-            'sku': item.sku,
-            'barcode': item.barcode,
-            'mrp': float(item.mrp) if item.mrp else None,
-            'discount_percent': float(item.discount_percent) if item.discount_percent else 0,
-            'selling_price': float(item.selling_price) if item.selling_price else 0,
-            'cost_price': float(item.cost_price) if item.cost_price else 0,
-            'gst_rate': float(item.gst_rate) if item.gst_rate else 18,
-            'hsn_code': item.hsn_code or '',
-            'unit': item.unit or 'nos',
-            'track_inventory': item.track_inventory,
+            'id': row.id,
+            'name': row.name,
+            'sku': row.sku,
+            'barcode': row.barcode,
+            'mrp': float(row.mrp) if row.mrp else None,
+            'discount_percent': float(row.discount_percent) if row.discount_percent else 0,
+            'selling_price': float(row.selling_price) if row.selling_price else 0,
+            'cost_price': float(row.cost_price) if row.cost_price else 0,
+            'gst_rate': float(row.gst_rate) if row.gst_rate else 18,
+            'hsn_code': row.hsn_code or '',
+            'unit': row.unit or 'nos',
+            'track_inventory': row.track_inventory,
             'stock': total_stock if total_stock is not None else 'N/A',
-            'is_low_stock': item.is_low_stock() if item.track_inventory else False,
-            'category': item.category.name if item.category else None,
-            'brand': item.brand,
-            'manufacturer': item.manufacturer
+            'is_low_stock': total_stock < (row.reorder_point or 0) if row.track_inventory else False,
+            'category': row.category_name
         })
     
     return jsonify(results)
@@ -132,8 +106,7 @@ def api_search_items():
 @login_required
 def index():
     """List all items with OPTIMIZED QUERIES"""
-    from sqlalchemy.orm import joinedload
-    from sqlalchemy import func
+    from services.item_stock_service import ItemStockService
     
     tenant_id = get_current_tenant_id()
     
@@ -146,8 +119,9 @@ def index():
     page = request.args.get('page', 1, type=int)
     per_page = 50  # Show 50 items per page
     
-    # Build query with EAGER LOADING (fixes N+1 problem!)
-    query = Item.query.options(joinedload(Item.stocks)).filter_by(tenant_id=tenant_id)
+    # ⚡ Stock column shows items.total_stock - no item_stocks rows loaded
+    # (the per-site breakdown is fetched when the stock tooltip opens)
+    query = Item.query.filter_by(tenant_id=tenant_id)
     
     # Apply filters
     if category_id:
@@ -164,25 +138,14 @@ def index():
     # Order by created date
     query = query.order_by(Item.created_at.desc())
     
-    # Apply pagination
+    # ⚡ Low stock is a maintained, indexed flag - filter and paginate in SQL
     if low_stock_filter == 1:
-        # For low stock filter, we need to get all items first then filter
-        # (Can't filter in SQL as it requires aggregation across sites)
-        all_items = query.all()
-        items_filtered = [item for item in all_items if item.track_inventory and item.reorder_point and item.get_total_stock() < item.reorder_point]
-        
-        # Manual pagination for filtered items
-        total_items = len(items_filtered)
-        start = (page - 1) * per_page
-        end = start + per_page
-        items = items_filtered[start:end]
-        total_pages = (total_items + per_page - 1) // per_page
-    else:
-        # Regular pagination via SQLAlchemy
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        items = pagination.items
-        total_pages = pagination.pages
-        total_items = pagination.total
+        query = ItemStockService.low_stock_filter(query, tenant_id)
+    
+    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    items = pagination.items
+    total_pages = pagination.pages
+    total_items = pagination.total
     
     # Get categories and groups for filters
     categories = ItemCategory.query.filter_by(tenant_id=tenant_id).all()
@@ -205,22 +168,7 @@ def index():
             'attribute_type': attr.attribute_type
         } for attr in attr_objects]
     
-    # OPTIMIZED: Calculate low stock count using SQL aggregation (ONE query!)
-    items_with_stock_query = db.session.query(
-        Item.id,
-        Item.reorder_point,
-        func.sum(ItemStock.quantity_available).label('total_stock')
-    ).join(
-        ItemStock, Item.id == ItemStock.item_id, isouter=True
-    ).filter(
-        Item.tenant_id == tenant_id,
-        Item.is_active == True,
-        Item.track_inventory == True,
-        Item.reorder_point.isnot(None)
-    ).group_by(Item.id, Item.reorder_point).all()
-    
-    # Count items where total_stock < reorder_point
-    low_stock_count = sum(1 for item in items_with_stock_query if (item.total_stock or 0) < item.reorder_point)
+    low_stock_count = ItemStockService.low_stock_count(tenant_id)
     
     return render_template('admin/items/list.html',
                          items=items,
@@ -230,7 +178,7 @@ def index():
                          low_stock_count=low_stock_count,
                          page=page,
                          total_pages=total_pages,
-                         total_items=total_items if not low_stock_filter else len(items_filtered) if low_stock_filter == 1 else total_items,
+                         total_items=total_items,
                          tenant=g.tenant)
 
 
@@ -794,6 +742,26 @@ def get_groups_json():
     })
 
 
+@items_bp.route('/<int:item_id>/stock-by-site/json', methods=['GET'])
+@require_tenant
+@login_required
+def get_stock_by_site_json(item_id):
+    """Stock of one item per site (items list stock tooltip)"""
+    tenant_id = get_current_tenant_id()
+    item = Item.query.filter_by(id=item_id, tenant_id=tenant_id).first_or_404()
+    rows = db.session.query(Site.name, ItemStock.quantity_available).outerjoin(
+        Site, Site.id == ItemStock.site_id
+    ).filter(
+        ItemStock.tenant_id == tenant_id,
+        ItemStock.item_id == item.id
+    ).order_by(Site.name).all()
+    
+    return jsonify({
+        'sites': [{'name': name or 'Unknown', 'quantity': quantity or 0} for name, quantity in rows],
+        'total': item.total_stock
+    })
+
+
 # ===== STOCK SUMMARY =====
 @items_bp.route('/stock-summary')
 @require_tenant
@@ -1099,10 +1067,8 @@ def reports():
     stock_details = []
     
     for item in items:
-        # Get total stock across all sites
-        total_qty = db.session.query(func.sum(ItemStock.quantity_available))\
-            .filter_by(tenant_id=tenant_id, item_id=item.id)\
-            .scalar() or 0
+        # Total stock across all sites (maintained on the item - no query per item)
+        total_qty = item.total_stock or 0
         
         # Calculate value (quantity * cost price)
         item_value = total_qty * (item.cost_price or 0)
@@ -1332,15 +1298,6 @@ def bulk_generate_barcodes():
 @login_required
 def print_labels():
     """Generate PDF with barcode labels for printing"""
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.units import mm
-    from reportlab.pdfgen import canvas
-    from reportlab.lib import colors
-    from io import BytesIO
-    import barcode
-    from barcode.writer import ImageWriter
-    from PIL import Image
-    
     tenant_id = get_current_tenant_id()
     
     if request.method == 'POST':
@@ -1367,129 +1324,15 @@ def print_labels():
             return redirect(url_for('items.index'))
         
         # Get quantity for each item (default 1)
-        labels_to_print = []
-        for item in items:
-            qty = int(request.form.get(f'qty_{item.id}', 1))
-            for _ in range(qty):
-                labels_to_print.append(item)
-        
-        # Generate PDF
-        pdf_buffer = BytesIO()
-        c = canvas.Canvas(pdf_buffer, pagesize=A4)
-        width, height = A4
-        
-        # Label dimensions for 30 labels per A4 (3 columns x 10 rows)
-        # Standard Avery A4-J8160 compatible
-        label_width = 70 * mm
-        label_height = 29.7 * mm
-        margin_left = 5 * mm
-        margin_top = 10 * mm
-        gap_x = 2.5 * mm
-        gap_y = 0 * mm
-        
-        cols = 3
-        rows = 10
-        labels_per_page = cols * rows
-        
-        page_num = 0
-        
-        for idx, item in enumerate(labels_to_print):
-            # Calculate position
-            col = idx % cols
-            row = (idx // cols) % rows
-            
-            # New page if needed
-            if idx > 0 and idx % labels_per_page == 0:
-                c.showPage()
-                page_num += 1
-            
-            # Calculate x, y position (top-left origin)
-            x = margin_left + col * (label_width + gap_x)
-            y = height - margin_top - (row + 1) * (label_height + gap_y)
-            
-            # Draw label border (optional - for cutting guide)
-            # c.setStrokeColor(colors.lightgrey)
-            # c.rect(x, y, label_width, label_height)
-            
-            # Item name (top)
-            c.setFont("Helvetica-Bold", 9)
-            name_text = item.name[:35]  # Truncate if too long
-            c.drawString(x + 3*mm, y + label_height - 6*mm, name_text)
-            
-            # Price info (below name)
-            c.setFont("Helvetica", 7)
-            price_text = f"MRP: ₹{item.mrp or item.selling_price:.0f}  |  Price: ₹{item.selling_price:.0f}"
-            c.drawString(x + 3*mm, y + label_height - 11*mm, price_text)
-            
-            # SKU (small)
-            c.setFont("Helvetica", 6)
-            c.drawString(x + 3*mm, y + label_height - 15*mm, f"SKU: {item.sku}")
-            
-            # Generate barcode image
-            if item.barcode:
-                try:
-                    # Determine barcode type based on length
-                    if len(item.barcode) == 13:
-                        barcode_class = barcode.get_barcode_class('ean13')
-                    elif len(item.barcode) == 8:
-                        barcode_class = barcode.get_barcode_class('ean8')
-                    else:
-                        barcode_class = barcode.get_barcode_class('code128')
-                    
-                    # Generate barcode
-                    barcode_instance = barcode_class(item.barcode, writer=ImageWriter())
-                    
-                    # Save to BytesIO
-                    barcode_buffer = BytesIO()
-                    barcode_instance.write(barcode_buffer, options={
-                        'module_height': 10,
-                        'module_width': 0.25,
-                        'quiet_zone': 2,
-                        'font_size': 8,
-                        'text_distance': 2,
-                        'write_text': True
-                    })
-                    barcode_buffer.seek(0)
-                    
-                    # Draw barcode on PDF
-                    barcode_img = Image.open(barcode_buffer)
-                    
-                    # Calculate barcode position and size
-                    barcode_x = x + 3*mm
-                    barcode_y = y + 3*mm
-                    barcode_width = label_width - 6*mm
-                    barcode_height = 12*mm
-                    
-                    # Draw image
-                    c.drawInlineImage(
-                        barcode_img,
-                        barcode_x,
-                        barcode_y,
-                        width=barcode_width,
-                        height=barcode_height,
-                        preserveAspectRatio=True
-                    )
-                    
-                except Exception as e:
-                    # Fallback: just print barcode text
-                    c.setFont("Courier", 8)
-                    c.drawString(x + 3*mm, y + 10*mm, item.barcode)
-        
-        # Save PDF
-        c.save()
-        pdf_buffer.seek(0)
-        
-        # Generate filename
-        from datetime import datetime
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'barcode_labels_{timestamp}.pdf'
+        quantities = {
+            str(item.id): int(request.form.get(f'qty_{item.id}', 1))
+            for item in items
+        }
         
-        return send_file(
-            pdf_buffer,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=filename
-        )
+        # ⚡ Rendering runs as a background job - the job page offers the PDF when ready
+        from services.job_queue import JobQueue
+        job = JobQueue.enqueue('barcode_labels', tenant_id=tenant_id, payload={'quantities': quantities})
+        return redirect(url_for('jobs.view', job_id=job.id))
     
     # GET request - show form to select items
     items_with_barcodes = Item.query.filter_by(
@@ -0,0 +1,82 @@
+"""
+Background Job Routes
+Status page, status polling and result downloads for a tenant's background jobs
+"""
+from flask import Blueprint, render_template, redirect, url_for, flash, session, jsonify, send_file
+from utils.tenant_middleware import require_tenant, get_current_tenant_id
+from utils.license_check import check_license
+from services.job_queue import JobQueue
+from functools import wraps
+import io
+
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/admin/jobs')
+
+# Title and "back" page per job type
+JOB_PAGES = {
+    'subscription_invoices': ('🧾 Generating Subscription Invoices', 'invoices.index'),
+    'excel_import': ('📤 Bulk Import', 'admin.bulk_import'),
+    'barcode_labels': ('🏷️ Preparing Barcode Labels', 'items.print_labels'),
+}
+
+
+# Login required decorator
+def login_required(f):
+    """Decorator to require admin login (also checks license)"""
+    @wraps(f)
+    @check_license  # Check license/trial before allowing access
+    def decorated_function(*args, **kwargs):
+        if 'tenant_admin_id' not in session:
+            flash('Please login first', 'error')
+            return redirect(url_for('admin.login'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+@jobs_bp.route('/<int:job_id>')
+@require_tenant
+@login_required
+def view(job_id):
+    """Job status page (polls the status endpoint until the job finishes)"""
+    job = JobQueue.get_tenant_job(job_id, get_current_tenant_id())
+    if not job:
+        flash('❌ Job not found', 'error')
+        return redirect(url_for('admin.dashboard'))
+
+    title, back_endpoint = JOB_PAGES.get(job.job_type, ('⏳ Background Job', 'admin.dashboard'))
+    return render_template('admin/job_status.html',
+                           job=job,
+                           title=title,
+                           back_url=url_for(back_endpoint))
+
+
+@jobs_bp.route('/<int:job_id>/status')
+@require_tenant
+@login_required
+def status(job_id):
+    """Job status JSON (status, progress, result summary)"""
+    job = JobQueue.get_tenant_job(job_id, get_current_tenant_id())
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+
+    JobQueue.kick_if_waiting(job)
+    data = job.to_dict()
+    data['download_url'] = url_for('jobs.download', job_id=job.id) if data['has_file'] else None
+    return jsonify(data)
+
+
+@jobs_bp.route('/<int:job_id>/download')
+@require_tenant
+@login_required
+def download(job_id):
+    """Download the file produced by a finished job (label PDF...)"""
+    job = JobQueue.get_tenant_job(job_id, get_current_tenant_id())
+    if not job or job.result_file is None:
+        flash('❌ File not available', 'error')
+        return redirect(url_for('jobs.view', job_id=job_id))
+
+    return send_file(
+        io.BytesIO(job.result_file),
+        mimetype=job.result_mimetype or 'application/octet-stream',
+        as_attachment=True,
+        download_name=job.result_filename
+    )
@@ -77,3 +77,29 @@ def view_public_invoice(token):
         traceback.print_exc()
         abort(500)
 
+
+@public_invoice_bp.route('/view/<token>/pdf')
+def download_public_invoice_pdf(token):
+    """
+    Public invoice PDF - no login required (cached per invoice version)
+    URL: /invoice/view/<token>/pdf
+    """
+    from flask import send_file
+    from io import BytesIO
+    from services.invoice_pdf_service import InvoicePdfService
+
+    invoice = Invoice.query.filter_by(public_token=token).first()
+    if not invoice:
+        abort(404)
+
+    tenant = Tenant.query.get(invoice.tenant_id)
+    if not tenant:
+        abort(404)
+
+    pdf = InvoicePdfService.get_invoice_pdf(invoice, tenant)
+    return send_file(
+        BytesIO(pdf),
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=f'{invoice.invoice_number}.pdf'
+    )
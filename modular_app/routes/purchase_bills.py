@@ -21,7 +21,9 @@ def check_auth():
         return redirect(url_for('admin.login'))
     
     # Load tenant into g for easy access
-    g.tenant = Tenant.query.get(session['tenant_admin_id'])
+    # (⚡ already loaded from the tenant cache by the subdomain middleware)
+    if getattr(g, 'tenant', None) is None:
+        g.tenant = Tenant.query.get(session['tenant_admin_id'])
     if not g.tenant:
         session.clear()
         flash('Session expired. Please login again.', 'error')
@@ -1317,30 +1319,29 @@ def record_payment_form(bill_id):
 @purchase_bills_bp.route('/api/search-items')
 def api_search_items():
     """API endpoint to search items"""
+    from services.item_search_service import ItemSearchService
+    
     tenant_id = get_current_tenant_id()
     query = request.args.get('q', '').strip()
     
     if len(query) < 2:
         return jsonify([])
     
-    items = Item.query.filter_by(tenant_id=tenant_id).filter(
-        db.or_(
-            Item.name.like(f'%{query}%'),
-            Item.item_code.like(f'%{query}%')
-        )
-    ).limit(20).all()
+    # ⚡ Same indexed search as invoice entry (exact barcode/SKU first)
+    rows = ItemSearchService.search(tenant_id, query, 20)
     
     results = []
-    for item in items:
+    for row in rows:
         results.append({
-            'id': item.id,
-            'name': item.name,
-            'item_code': item.item_code,
-            'unit': item.unit or 'pcs',
-            'purchase_price': float(item.cost_price or 0),
-            'sale_price': float(item.selling_price or 0),
-            'hsn_code': item.hsn_code or '',
-            'gst_rate': float(item.gst_rate) if item.gst_rate is not None else 18.0
+            'id': row.id,
+            'name': row.name,
+            'item_code': row.sku,
+            'unit': row.unit or 'pcs',
+            'purchase_price': float(row.cost_price or 0),
+            'sale_price': float(row.selling_price or 0),
+            'hsn_code': row.hsn_code or '',
+            'gst_rate': float(row.gst_rate) if row.gst_rate is not None else 18.0,
+            'stock': float(row.total_stock or 0)
         })
     
     return jsonify(results)
@@ -1483,10 +1484,9 @@ def gstr2_report():
 
 @purchase_bills_bp.route('/gstr2/export-csv')
 def gstr2_export_csv():
-    """Export GSTR-2 Report to CSV (Excel-compatible)"""
-    from io import StringIO
-    import csv
-    from flask import make_response
+    """Export GSTR-2 Report to CSV (Excel-compatible, ?gzip=1 for a compressed download)"""
+    from flask import Response, stream_with_context
+    from services.gst_export_service import GstExportService, gzip_stream
     
     tenant_id = get_current_tenant_id()
     
@@ -1507,84 +1507,18 @@ def gstr2_export_csv():
     else:
         end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
     
-    # Get all approved purchase bills with GST
-    bills = PurchaseBill.query.filter(
-        PurchaseBill.tenant_id == tenant_id,
-        PurchaseBill.status == 'approved',
-        PurchaseBill.bill_date >= start_date,
-        PurchaseBill.bill_date <= end_date,
-        db.or_(
-            PurchaseBill.cgst_amount > 0,
-            PurchaseBill.sgst_amount > 0,
-            PurchaseBill.igst_amount > 0
-        )
-    ).order_by(PurchaseBill.bill_date.asc()).all()
-    
-    # Create CSV in memory
-    si = StringIO()
-    writer = csv.writer(si)
-    
-    # Title
-    writer.writerow([f'{g.tenant.company_name} - GSTR-2 Report'])
-    writer.writerow([f'Period: {start_date_str} to {end_date_str}'])
-    writer.writerow([])
-    
-    # Purchase Register
-    writer.writerow(['PURCHASE REGISTER'])
-    writer.writerow(['Date', 'Bill No.', 'Vendor Name', 'GSTIN', 'State', 'Taxable Value', 'CGST', 'SGST', 'IGST', 'Total Amount'])
-    
-    total_taxable = Decimal('0')
-    total_cgst = Decimal('0')
-    total_sgst = Decimal('0')
-    total_igst = Decimal('0')
-    total_amount = Decimal('0')
+    # ⚡ Streamed row by row from a server-side cursor (large periods never sit in memory)
+    chunks = GstExportService.iter_gstr2_csv(tenant_id, start_date, end_date, g.tenant.company_name)
+    filename = f"GSTR2_Report_{start_date_str}_to_{end_date_str}.csv"
     
-    for bill in bills:
-        writer.writerow([
-            bill.bill_date.strftime('%d-%m-%Y'),
-            bill.bill_number,
-            bill.vendor_name,
-            bill.vendor_gstin or 'N/A',
-            bill.vendor_state or 'Maharashtra',
-            f'{float(bill.subtotal):.2f}',
-            f'{float(bill.cgst_amount):.2f}',
-            f'{float(bill.sgst_amount):.2f}',
-            f'{float(bill.igst_amount):.2f}',
-            f'{float(bill.total_amount):.2f}'
-        ])
-        total_taxable += bill.subtotal
-        total_cgst += bill.cgst_amount
-        total_sgst += bill.sgst_amount
-        total_igst += bill.igst_amount
-        total_amount += bill.total_amount
+    if request.args.get('gzip'):
+        return Response(stream_with_context(gzip_stream(chunks)),
+                        mimetype='application/gzip',
+                        headers={'Content-Disposition': f'attachment; filename={filename}.gz'})
     
-    # Totals
-    writer.writerow([
-        'TOTAL', '', '', '', '',
-        f'{float(total_taxable):.2f}',
-        f'{float(total_cgst):.2f}',
-        f'{float(total_sgst):.2f}',
-        f'{float(total_igst):.2f}',
-        f'{float(total_amount):.2f}'
-    ])
-    
-    writer.writerow([])
-    writer.writerow(['ITC SUMMARY'])
-    writer.writerow(['Total Taxable Value', 'Total CGST', 'Total SGST', 'Total IGST', 'Total ITC'])
-    writer.writerow([
-        f'{float(total_taxable):.2f}',
-        f'{float(total_cgst):.2f}',
-        f'{float(total_sgst):.2f}',
-        f'{float(total_igst):.2f}',
-        f'{float(total_cgst + total_sgst + total_igst):.2f}'
-    ])
-    
-    # Generate response
-    output = make_response(si.getvalue())
-    output.headers["Content-Disposition"] = f"attachment; filename=GSTR2_Report_{start_date_str}_to_{end_date_str}.csv"
-    output.headers["Content-type"] = "text/csv"
-    
-    return output
+    return Response(stream_with_context(chunks),
+                    mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
 
 
 @purchase_bills_bp.route('/api/vendors/search')
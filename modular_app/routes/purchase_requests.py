@@ -4,6 +4,7 @@ Purchase Request routes - Employee & Admin
 from flask import Blueprint, render_template, request, redirect, url_for, flash, g, session, current_app
 from models import db, PurchaseRequest, Employee, Tenant, Expense, ExpenseCategory, Item, ItemCategory, ItemStock
 from utils.tenant_middleware import require_tenant, get_current_tenant_id
+from utils.tenant_cache import invalidate_pending_purchase_count
 from utils.license_check import check_license
 from utils.email_utils import send_purchase_request_notification, send_purchase_approved_notification, send_purchase_rejected_notification
 from utils.msg91_utils import (
@@ -207,6 +208,7 @@ def submit_form():
             
             db.session.add(purchase_request)
             db.session.commit()
+            invalidate_pending_purchase_count(tenant_id)
             
             # Send email notification to admin (ALWAYS)
             if tenant.admin_email:
@@ -403,6 +405,7 @@ def approve_request(request_id):
         purchase_request.processed_at = now
         
         db.session.commit()
+        invalidate_pending_purchase_count(tenant_id)
         
         # Send email to employee if they have email (ALWAYS)
         if purchase_request.employee.email:
@@ -461,6 +464,7 @@ def reject_request(request_id):
         purchase_request.processed_at = datetime.now(ist)
         
         db.session.commit()
+        invalidate_pending_purchase_count(tenant_id)
         
         # Send email to employee if they have email (ALWAYS)
         if purchase_request.employee.email:
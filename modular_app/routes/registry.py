@@ -0,0 +1,257 @@
+"""
+Blueprint registry - which blueprints load at startup and which on demand
+
+CORE_BLUEPRINTS are registered at startup. MAINTENANCE_BLUEPRINTS (one-off
+migrations and diagnostics) depend on MAINTENANCE_ROUTES:
+- 'lazy' (default): loaded on the first request under their URL prefix
+- 'eager': registered at startup
+- 'off': not available (404)
+"""
+import os
+import threading
+
+from flask import Flask, request, has_request_context
+from werkzeug.exceptions import HTTPException, NotFound
+from werkzeug.routing import BuildError, RequestRedirect
+
+MAINTENANCE_ROUTES = os.environ.get('MAINTENANCE_ROUTES', 'lazy')  # lazy | eager | off
+
+# (module, blueprint attribute) - registered in this order
+CORE_BLUEPRINTS = [
+    ('routes.registration', 'registration_bp'),
+    ('routes.employee_portal', 'employee_portal_bp'),  # Unified employee portal
+    ('routes.attendance', 'attendance_bp'),
+    ('routes.inventory', 'inventory_bp'),
+    ('routes.admin', 'admin_bp'),
+    ('routes.superadmin', 'superadmin_bp'),
+    ('routes.items', 'items_bp'),  # Professional items management
+    ('routes.expenses', 'expenses_bp'),  # Expenses tracking
+    ('routes.purchase_requests', 'purchase_request_bp'),  # Employee purchase requests
+    ('routes.purchase_requests', 'admin_purchase_bp'),  # Admin purchase management
+    ('routes.customers', 'customers_bp'),  # Customer management
+    ('routes.vendors', 'vendors_bp'),  # Vendor management
+    ('routes.invoices', 'invoices_bp'),  # GST invoicing
+    ('routes.returns', 'returns_bp'),  # Returns & Refunds management
+    ('routes.tasks', 'tasks_bp'),  # Task management (admin)
+    ('routes.employee_tasks', 'employee_tasks_bp'),  # Task management (employee)
+    ('routes.sales_orders', 'sales_order_bp'),  # Sales Order management
+    ('routes.delivery_challans', 'delivery_challan_bp'),  # Delivery Challan management
+    ('routes.gst_reports', 'gst_reports_bp'),  # GST Reports
+    ('routes.purchase_bills', 'purchase_bills_bp'),  # Purchase Bills management
+    ('routes.backup', 'backup_bp'),  # Backup & Restore
+    ('routes.subscriptions', 'subscriptions_bp'),  # Subscription management
+    ('routes.customer_portal', 'customer_portal_bp'),  # Customer self-service portal
+    ('routes.customer_orders', 'customer_orders_bp'),  # Customer orders admin
+    ('routes.employee_delivery', 'employee_delivery_bp'),  # Employee delivery portal with bottle tracking
+    ('routes.accounts', 'accounts_bp'),  # Bank/Cash Account Management
+    ('routes.payroll', 'payroll_bp'),  # Payroll Management
+    ('routes.barcode_api', 'barcode_api_bp'),  # Barcode API endpoints
+    ('routes.loyalty', 'loyalty_bp'),  # Loyalty program API & admin pages
+    ('routes.public_invoice', 'public_invoice_bp'),  # PUBLIC: Public invoice view (no login required)
+    ('routes.scheduled_tasks', 'scheduled_tasks_bp'),  # Scheduled tasks for automated jobs
+    ('routes.jobs', 'jobs_bp'),  # Background job status & downloads
+    ('routes.gst_invoice_api', 'gst_invoice_api_bp'),  # API: GST Smart Invoice stock info
+    ('routes.item_attributes_settings', 'item_attributes_settings_bp'),  # SETTINGS: Configure item attributes
+]
+
+# One-shot migrations, data fixes and diagnostics (opened by hand)
+# (module, blueprint attribute, URL prefix its routes start with - loads it lazily)
+MAINTENANCE_BLUEPRINTS = [
+    ('routes.migration', 'migration_bp', '/migrate/'),
+    ('routes.add_indexes', 'add_indexes_bp', '/migrate/add-performance-indexes'),  # Performance optimization indexes
+    ('routes.optimize_db', 'optimize_db_bp', '/optimize/'),  # Database optimization & diagnostics
+    ('routes.subscription_migration', 'subscription_migration_bp', '/migrate/add-subscription-tables'),
+    ('routes.subscription_indexes', 'subscription_indexes_bp', '/migrate/add-subscription-indexes'),
+    ('routes.sku_migration', 'sku_migration_bp', '/migrate/fix-sku-constraint'),  # SKU constraint (global → per-tenant)
+    ('routes.password_reset_migration', 'password_reset_migration_bp', '/migrate/add-password-reset-tokens'),
+    ('routes.mrp_discount_migration', 'mrp_discount_migration_bp', '/migrate/add-mrp-discount-gst-fields'),
+    ('routes.site_default_migration', 'site_default_migration_bp', '/migrate/add-site-default-field'),
+    ('routes.barcode_migration', 'barcode_migration_bp', '/admin/migrate/barcode'),
+    ('routes.loyalty_migration', 'loyalty_migration_bp', '/run-loyalty-migration'),
+    ('routes.loyalty_features_migration', 'loyalty_features_bp', '/migration/loyalty-features/'),
+    ('routes.tier_benefits_migration', 'tier_benefits_bp', '/migration/tier-benefits/'),
+    ('routes.fix_inventory_equity', 'fix_inventory_equity_bp', '/migration/fix-inventory-equity'),
+    ('routes.vendor_performance_migration', 'vendor_performance_bp', '/migration/vendor-performance/'),
+    ('routes.fix_attendance_cascade', 'fix_cascade_bp', '/fix-attendance-cascade'),
+    ('routes.add_invoice_public_token_column', 'add_invoice_public_token_bp', '/migration/add-invoice-public-token-column'),
+    ('routes.add_public_tokens', 'add_public_tokens_bp', '/migration/add-public-tokens'),
+    ('routes.commission_payments_migration', 'commission_payments_migration_bp', '/migration/create-commission-payments-table'),
+    ('routes.fix_item_discounts', 'fix_discounts_bp', '/migrate/fix-item-discounts'),
+    ('routes.fix_barcode_floats', 'fix_barcodes_bp', '/migrate/fix-barcode-floats'),
+    ('routes.add_barcode_index', 'add_barcode_index_bp', '/migration/add-barcode-index'),
+    ('routes.add_item_search_index', 'add_item_search_index_bp', '/migration/add-item-search-index'),
+    ('routes.add_customer_ledger_index', 'add_customer_ledger_index_bp', '/migration/add-customer-ledger-index'),
+    ('routes.add_item_stock_totals', 'add_item_stock_totals_bp', '/migration/add-item-stock-totals'),
+    ('routes.add_special_day_bonus_columns', 'add_special_day_columns_bp', '/migrate/add-special-day-bonus-columns'),
+    ('routes.diagnose_inventory_equity', 'diagnose_inventory_equity_bp', '/diagnose/inventory-equity'),
+    ('routes.diagnose_trial_balance_detail', 'diagnose_trial_detail_bp', '/diagnose/trial-balance-detail'),
+    ('routes.diagnose_remaining_imbalance', 'diagnose_remaining_bp', '/diagnose/remaining-imbalance'),
+    ('routes.comprehensive_diagnosis', 'comprehensive_diagnosis_bp', '/diagnose/complete-trial-balance'),
+    ('routes.compare_trial_balance', 'compare_trial_balance_bp', '/diagnose/trial-balance-comparison'),
+    ('routes.inventory_changes', 'inventory_changes_bp', '/diagnose/inventory-changes'),
+    ('routes.comprehensive_double_entry_migration', 'comprehensive_double_entry_migration_bp', '/migration/comprehensive-double-entry-fix'),
+    ('routes.gst_smart_invoice_migration', 'gst_smart_invoice_migration_bp', '/migrate/gst-smart-invoice'),
+    ('routes.create_attribute_tables', 'create_attribute_tables_bp', '/migration/create-attribute-tables'),
+    ('routes.add_attribute_values_column', 'add_attribute_values_column_bp', '/migration/add-attribute-values-column'),
+    ('routes.add_purchase_bill_columns', 'add_purchase_bill_columns_bp', '/migration/add-purchase-bill-columns'),
+    ('routes.debug_equity', 'debug_equity_bp', '/debug/check-equity-entries'),
+    ('routes.fix_inventory_equity_mismatch', 'fix_inventory_equity_mismatch_bp', '/migration/fix-inventory-equity-mismatch'),
+    ('routes.fix_inventory_double_entry', 'fix_inventory_double_entry_bp', '/migration/fix-inventory-double-entry'),
+    ('routes.fix_trial_balance_final', 'fix_trial_balance_final_bp', '/migration/fix-trial-balance-final'),
+    ('routes.fix_cash_bank_opening', 'fix_cash_bank_opening_bp', '/migration/fix-cash-bank-opening'),
+    ('routes.remove_duplicate_equity', 'remove_duplicate_equity_bp', '/migration/remove-duplicate-equity'),
+    ('routes.show_equity_entries', 'show_equity_entries_bp', '/debug/equity-entries'),
+    ('routes.final_balance_fix', 'final_balance_fix_bp', '/migration/final-balance-fix'),
+    ('routes.migrate_double_entry', 'migrate_double_entry_bp', '/migration/to-double-entry'),
+    ('routes.diagnose_return_entries', 'diagnose_return_bp', '/debug/diagnose-return-accounting'),
+    ('routes.diagnose_gst_entries', 'diagnose_gst_bp', '/diagnose-gst-entries'),
+    ('routes.fix_unpaid_return_entries', 'fix_unpaid_return_bp', '/migration/fix-unpaid-return-entries'),
+    ('routes.fix_vendor_payment_constraint', 'fix_vendor_payment_bp', '/migration/fix-vendor-payment-constraint'),
+    ('routes.fix_purchase_bill_constraint', 'fix_purchase_bill_bp', '/migration/fix-purchase-bill-constraint'),
+    ('routes.fix_return_accounting', 'fix_return_accounting_bp', '/migration/fix-return-accounting'),
+    ('routes.diagnose_returns', 'diagnose_returns_bp', '/migration/diagnose-returns'),
+    ('routes.diagnose_commission', 'diagnose_commission_bp', '/migration/diagnose-commission'),
+    ('routes.diagnose_commission_balance', 'diagnose_commission_balance_bp', '/migration/diagnose-commission-balance'),
+    ('routes.diagnose_return_amounts', 'diagnose_return_amounts_bp', '/migration/diagnose-return-amounts'),
+    ('routes.fix_round_off_sign', 'fix_round_off_sign_bp', '/migration/fix-round-off-sign'),
+    ('routes.diagnose_all_round_offs', 'diagnose_all_round_offs_bp', '/migration/diagnose-all-round-offs'),
+    ('routes.diagnose_commission_mismatch', 'diagnose_commission_mismatch_bp', '/migration/diagnose-commission-mismatch'),
+    ('routes.diagnose_trial_balance', 'diagnose_trial_bp', '/migration/diagnose-trial-balance'),
+    ('routes.migration_add_purchase_bill_item_fields', 'migration_purchase_bill_items_bp', '/migration/add-purchase-bill-item-fields'),
+    ('routes.migration_create_returns_tables', 'migration_returns_bp', '/migration/create-returns-tables'),
+]
+
+
+def load_blueprints(entries):
+    """Import the modules and return their blueprints (in order)"""
+    # __import__ rather than importlib.import_module: only the former shows up in -X importtime
+    return [getattr(__import__(module, fromlist=[attribute]), attribute) for module, attribute, *_ in entries]
+
+
+def register_blueprints(app, maintenance_routes=None):
+    """
+    Register core blueprints, and maintenance ones according to maintenance_routes
+
+    Args:
+        app: Flask app
+        maintenance_routes: 'lazy', 'eager' or 'off' (default: MAINTENANCE_ROUTES)
+    """
+    maintenance_routes = maintenance_routes or MAINTENANCE_ROUTES
+
+    for blueprint in load_blueprints(CORE_BLUEPRINTS):
+        app.register_blueprint(blueprint)
+
+    if maintenance_routes == 'eager':
+        for blueprint in load_blueprints(MAINTENANCE_BLUEPRINTS):
+            app.register_blueprint(blueprint)
+    elif maintenance_routes == 'lazy':
+        LazyBlueprintDispatcher(app, MAINTENANCE_BLUEPRINTS)
+    elif maintenance_routes != 'off':
+        raise ValueError(f"MAINTENANCE_ROUTES must be 'lazy', 'eager' or 'off', not {maintenance_routes!r}")
+
+
+class LazyBlueprintDispatcher:
+    """
+    Serves rarely used blueprints without registering them at startup
+
+    Flask can't add routes once it has served a request, so each blueprint is
+    registered on a private Flask app the first time a URL under its prefix is
+    requested, and only that app's URL map and view functions are used.
+    Requests reach the dispatcher through the app's 404 handler when no core
+    route matched; before_request hooks (tenant middleware) have already run
+    and after_request hooks run on the response as usual. url_for() for lazy
+    endpoints falls back to the private URL map (loading every blueprint, as
+    the endpoint doesn't say which module it lives in).
+    """
+
+    def __init__(self, app, entries):
+        self.app = app
+        self.entries = entries
+        self._routes_app = Flask(app.import_name, static_folder=None)
+        self._routes_app.url_map.strict_slashes = app.url_map.strict_slashes
+        self._loaded = set()  # modules registered on the private app
+        self._lock = threading.Lock()
+
+        app.register_error_handler(404, self.dispatch)
+        app.url_build_error_handlers.append(self.build_url)
+        app.extensions['lazy_blueprints'] = self
+
+    @property
+    def loaded(self):
+        """Modules loaded so far"""
+        return set(self._loaded)
+
+    def entries_for(self, path):
+        """Entries whose URL prefix the path starts with"""
+        return [entry for entry in self.entries if path.startswith(entry[2])]
+
+    def load(self, entries=None):
+        """Import and register blueprints on the private app (each once per worker; default all)"""
+        entries = self.entries if entries is None else entries
+        missing = [entry for entry in entries if entry[0] not in self._loaded]
+        if missing:
+            with self._lock:
+                missing = [entry for entry in missing if entry[0] not in self._loaded]
+                for entry, blueprint in zip(missing, load_blueprints(missing)):
+                    self._routes_app.register_blueprint(blueprint)
+                    self._loaded.add(entry[0])
+                if missing:
+                    print(f"🧰 Loaded maintenance blueprint(s) on demand: {', '.join(entry[0] for entry in missing)}")
+        return self._routes_app
+
+    def _url_adapter(self):
+        return self._routes_app.url_map.bind_to_environ(
+            request.environ,
+            server_name=self.app.config['SERVER_NAME'],
+            subdomain=self.app.url_map.default_subdomain or None
+        )
+
+    def dispatch(self, error):
+        """404 handler: run the matching lazy view, or keep the 404"""
+        # Only for "no route matched" - not abort(404) inside a view
+        if error is not request.routing_exception:
+            return error
+
+        # Only URLs under a maintenance prefix - a stray 404 must not import anything
+        entries = self.entries_for(request.path)
+        if not entries:
+            return error
+        self.load(entries)
+
+        try:
+            rule, view_args = self._url_adapter().match(return_rule=True)
+        except RequestRedirect as redirect_exception:
+            return redirect_exception.get_response()
+        except NotFound:
+            return error
+        except HTTPException as http_exception:  # 405 Method Not Allowed
+            return http_exception
+
+        request.url_rule = rule
+        request.view_args = view_args
+        view = self._routes_app.view_functions[rule.endpoint]
+        try:
+            return self.app.ensure_sync(view)(**view_args)
+        except HTTPException as http_exception:
+            # Raised from inside the 404 handler, Flask would turn it into a 500
+            return self.app.handle_http_exception(http_exception)
+
+    def build_url(self, error, endpoint, values):
+        """url_for() fallback for endpoints on the private URL map"""
+        if not has_request_context() or endpoint.split('.', 1)[0] not in self.load().blueprints:
+            raise error
+        # Flask passes url_for()'s own arguments along with the route values
+        values = dict(values)
+        anchor = values.pop('_anchor', None)
+        method = values.pop('_method', None)
+        scheme = values.pop('_scheme', None)
+        external = values.pop('_external', None) or scheme is not None
+
+        adapter = self._url_adapter()
+        if scheme is not None:
+            adapter.url_scheme = scheme
+        try:
+            url = adapter.build(endpoint, values, method=method, force_external=external)
+        except BuildError:
+            raise error
+        return f'{url}#{anchor}' if anchor else url
@@ -23,7 +23,9 @@ def check_auth():
         return redirect(url_for('admin.login'))
     
     # Load tenant into g for easy access
-    g.tenant = Tenant.query.get(session['tenant_admin_id'])
+    # (⚡ already loaded from the tenant cache by the subdomain middleware)
+    if getattr(g, 'tenant', None) is None:
+        g.tenant = Tenant.query.get(session['tenant_admin_id'])
     if not g.tenant:
         session.clear()
         flash('Session expired. Please login again.', 'error')
@@ -5,11 +5,46 @@ Routes that can be called by cron jobs / scheduled tasks
 
 from flask import Blueprint, jsonify, request
 from datetime import datetime
+from functools import wraps
+import hmac
+import os
 import pytz
+from utils.db_connection import statement_timeout
 
 scheduled_tasks_bp = Blueprint('scheduled_tasks', __name__, url_prefix='/scheduled-tasks')
 
+# Shared secret for cron callers - sent as X-Cron-Secret, or as
+# "Authorization: Bearer <secret>" (Vercel Cron sends CRON_SECRET that way)
+CRON_SECRET = os.environ.get('CRON_SECRET', '')
+
+
+def require_cron_secret(f):
+    """Reject scheduled task calls without the cron secret"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not CRON_SECRET:
+            return jsonify({
+                'error': 'Not configured',
+                'message': 'Set the CRON_SECRET environment variable to enable scheduled tasks'
+            }), 503
+        
+        secret_token = request.headers.get('X-Cron-Secret', '')
+        authorization = request.headers.get('Authorization', '')
+        if not secret_token and authorization.startswith('Bearer '):
+            secret_token = authorization[len('Bearer '):]
+        
+        if not hmac.compare_digest(secret_token.encode(), CRON_SECRET.encode()):
+            return jsonify({
+                'error': 'Unauthorized',
+                'message': 'Invalid or missing X-Cron-Secret header'
+            }), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+
 @scheduled_tasks_bp.route('/process-special-day-bonuses', methods=['POST'])
+@require_cron_secret
+@statement_timeout(0)  # Cross-tenant batch - no per-statement limit
 def process_special_day_bonuses():
     """
     Process birthday & anniversary bonuses for all tenants
@@ -19,46 +54,27 @@ def process_special_day_bonuses():
     - Vercel Cron (vercel.json)
     - External scheduler (e.g., cron-job.org)
     
-    Security: Check for secret token to prevent unauthorized access
+    Security: CRON_SECRET in the X-Cron-Secret header
     """
-    
-    # Simple security: Check for secret token
-    secret_token = request.headers.get('X-Cron-Secret')
-    expected_token = 'bizbooks-cron-2025'  # TODO: Move to environment variable
-    
-    if secret_token != expected_token:
-        return jsonify({
-            'error': 'Unauthorized',
-            'message': 'Invalid or missing X-Cron-Secret header'
-        }), 401
-    
     try:
         # Import here to avoid circular imports
-        from services.special_day_bonus_service import SpecialDayBonusService
+        from services.job_queue import JobQueue
         
         # Log execution time
         ist = pytz.timezone('Asia/Kolkata')
         execution_time = datetime.now(ist)
         
-        print(f"=== Special Day Bonus Task Started at {execution_time.isoformat()} IST ===")
-        
-        # Process all tenants
-        results = SpecialDayBonusService.process_all_tenants()
+        # ⚡ Processing all tenants runs as a background job (too slow for one request)
+        job = JobQueue.enqueue('special_day_bonuses', unique=True)
         
-        print(f"=== Task Completed ===")
-        print(f"Tenants processed: {results['tenants_processed']}")
-        print(f"Birthday bonuses: {results['birthday_bonuses_credited']}")
-        print(f"Anniversary bonuses: {results['anniversary_bonuses_credited']}")
-        print(f"Expired bonuses removed: {results['expired_bonuses_removed']}")
-        print(f"Notifications sent: {results['notifications_sent']}")
-        if results['errors']:
-            print(f"Errors: {results['errors']}")
+        print(f"=== Special Day Bonus Task queued at {execution_time.isoformat()} IST (job {job.id}) ===")
         
         return jsonify({
             'success': True,
             'execution_time': execution_time.isoformat(),
-            'results': results
-        }), 200
+            'job_id': job.id,
+            'status': job.status
+        }), 202
         
     except Exception as e:
         print(f"ERROR in scheduled task: {str(e)}")
@@ -81,18 +97,24 @@ def test_special_day_bonuses():
     
     try:
         # Import here to avoid circular imports
-        from services.special_day_bonus_service import SpecialDayBonusService
+        from services.job_queue import JobQueue
         
         ist = pytz.timezone('Asia/Kolkata')
         execution_time = datetime.now(ist)
         
-        # Process all tenants
-        results = SpecialDayBonusService.process_all_tenants()
+        # Queue the job and run it right away (test endpoint - no timeout concerns)
+        job = JobQueue.enqueue('special_day_bonuses', unique=True)
+        JobQueue.run_pending(job_types=['special_day_bonuses'])
+        
+        from models import BackgroundJob
+        job = BackgroundJob.query.get(job.id)
         
         return jsonify({
-            'success': True,
+            'success': job.status == BackgroundJob.SUCCEEDED,
             'test_execution_time': execution_time.isoformat(),
-            'results': results,
+            'job_id': job.id,
+            'results': job.result,
+            'error': job.error,
             'note': 'This is a test execution. Use POST /scheduled-tasks/process-special-day-bonuses for production.'
         }), 200
         
@@ -103,3 +125,93 @@ def test_special_day_bonuses():
             'traceback': traceback.format_exc()
         }), 500
 
+
+@scheduled_tasks_bp.route('/refresh-tenant-usage-stats', methods=['POST'])
+@require_cron_secret
+def refresh_tenant_usage_stats():
+    """
+    Queue a refresh of the superadmin usage stats (all tenants)
+    
+    Call every few minutes from a cron scheduler so the superadmin pages
+    read a warm snapshot instead of refreshing it inline.
+    
+    Security: Same CRON_SECRET as the other scheduled tasks
+    """
+    from services.job_queue import JobQueue
+    
+    job = JobQueue.enqueue('tenant_usage_stats', unique=True)
+    
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'status': job.status
+    }), 202
+
+
+@scheduled_tasks_bp.route('/prune-backup-tombstones', methods=['GET', 'POST'])
+@require_cron_secret
+@statement_timeout(0)  # Cross-tenant delete
+def prune_backup_tombstones():
+    """
+    Delete backup tombstones older than BACKUP_TOMBSTONE_RETENTION_DAYS
+    
+    Tenants who back up rarely would otherwise keep every deletion since
+    their last backup. Call daily (Vercel Cron in vercel.json).
+    
+    Security: Same cron secret as the other scheduled tasks
+    """
+    try:
+        from services.tenant_backup_service import TenantBackupService
+        
+        deleted = TenantBackupService.prune_tombstones()
+        print(f"🧹 Pruned {deleted} backup tombstone(s)")
+        
+        return jsonify({'success': True, 'deleted': deleted}), 200
+        
+    except Exception as e:
+        print(f"ERROR pruning backup tombstones: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        
+        return jsonify({
+            'error': 'Prune failed',
+            'message': str(e)
+        }), 500
+
+
+@scheduled_tasks_bp.route('/run-background-jobs', methods=['GET', 'POST'])
+@require_cron_secret
+@statement_timeout(0)  # Jobs (backups, imports) run as long as they need
+def run_background_jobs():
+    """
+    Run queued background jobs (bulk invoices, imports, backups, label PDFs)
+    
+    For serverless deployments without a job_worker.py process: enqueue()
+    calls this right after queueing a job, and the daily cron sweeps up the
+    rest. Stops starting new jobs after JOB_CRON_TIME_BUDGET seconds so the
+    request finishes before the platform timeout, and wakes another drain if
+    jobs are left.
+    
+    GET is accepted for Vercel Cron, which can only send GET requests.
+    
+    Security: Same cron secret as the other scheduled tasks
+    """
+    try:
+        from services.job_queue import JobQueue, kick_drain
+        
+        time_budget = int(os.environ.get('JOB_CRON_TIME_BUDGET', 40))
+        summary = JobQueue.run_pending(time_budget=time_budget)
+        if summary['out_of_time']:
+            kick_drain()  # Carry on in a fresh invocation
+        
+        return jsonify({'success': True, 'results': summary}), 200
+        
+    except Exception as e:
+        print(f"ERROR running background jobs: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        
+        return jsonify({
+            'error': 'Job run failed',
+            'message': str(e)
+        }), 500
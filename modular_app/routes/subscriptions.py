@@ -19,7 +19,10 @@ from models import (
     DeliveryDayNote
 )
 from utils.tenant_middleware import require_tenant, get_current_tenant, get_current_tenant_id
+from utils.tenant_cache import invalidate_tenant
 from utils.license_check import check_license
+from services.delivery_engine import DeliveryEngine
+from services.route_planning_service import RoutePlanningService
 from datetime import datetime, timedelta
 from decimal import Decimal
 from sqlalchemy import func, or_, case
@@ -57,51 +60,6 @@ def test_route():
     return "✅ Subscriptions blueprint is working!", 200
 
 
-# ============================================================
-# DELIVERY SCHEDULE HELPER FUNCTIONS
-# ============================================================
-def should_deliver_on_date(date, pattern, custom_days=None, start_date=None):
-    """
-    Check if delivery should occur on a given date based on schedule pattern
-    
-    Args:
-        date: The date to check
-        pattern: 'daily', 'alternate', 'weekdays', 'weekends', 'custom'
-        custom_days: Comma-separated weekday numbers (0=Mon, 6=Sun): '0,2,4' for Mon/Wed/Fri
-        start_date: For 'alternate' pattern - day 1 of alternation
-    
-    Returns:
-        bool: True if delivery should occur on this date
-    """
-    if pattern == 'daily':
-        return True
-    
-    elif pattern == 'alternate':
-        # Alternate days (every other day)
-        if start_date:
-            days_diff = (date - start_date).days
-            return days_diff % 2 == 0
-        return True  # Fallback to daily if no start_date
-    
-    elif pattern == 'weekdays':
-        # Monday to Friday (0-4)
-        return date.weekday() < 5
-    
-    elif pattern == 'weekends':
-        # Saturday and Sunday (5-6)
-        return date.weekday() >= 5
-    
-    elif pattern == 'custom' and custom_days:
-        # Custom days (e.g., '0,2,4' for Mon/Wed/Fri)
-        try:
-            selected_days = [int(d.strip()) for d in custom_days.split(',')]
-            return date.weekday() in selected_days
-        except:
-            return True  # Fallback to daily if parsing fails
-    
-    return True  # Default: deliver
-
-
 # ============================================================
 # DAILY DELIVERIES (METERED SUBSCRIPTIONS)
 # ============================================================
@@ -223,24 +181,9 @@ def delivery_schedule():
     ).first()
     
     # Get ALL deliveries for target date (regardless of status - we want the full list)
-    all_deliveries = SubscriptionDelivery.query.join(
-        CustomerSubscription
-    ).join(
-        CustomerSubscription.customer
-    ).join(
-        CustomerSubscription.plan
-    ).filter(
-        SubscriptionDelivery.tenant_id == tenant_id,
-        SubscriptionDelivery.delivery_date == target_date,
-        CustomerSubscription.status == 'active'  # Only active subscriptions
-    ).options(
-        joinedload(SubscriptionDelivery.subscription).joinedload(CustomerSubscription.customer),
-        joinedload(SubscriptionDelivery.subscription).joinedload(CustomerSubscription.plan),
-        joinedload(SubscriptionDelivery.assigned_to_employee),
-        joinedload(SubscriptionDelivery.delivered_by_employee)
-    ).order_by(
-        Customer.name.asc()  # Sort by customer name (already joined)
-    ).all()
+    # ⚡ Cached route plan: customers, plans, default employees + day's lines (2 queries on a miss)
+    route_plan = RoutePlanningService.get_route_plan(tenant_id, target_date)
+    all_deliveries = route_plan['lines']
     
     # Separate into deliveries and paused
     active_deliveries = [d for d in all_deliveries if d.status != 'paused' and d.quantity > 0]
@@ -287,34 +230,8 @@ def delivery_schedule():
     # Convert employees to JSON-serializable format
     employees_json = [{'id': e.id, 'name': e.name} for e in employees]
     
-    # Get ALL customers with active subscriptions (for bulk assignment tool - not date-filtered)
-    all_active_customers = db.session.query(Customer).join(
-        CustomerSubscription
-    ).filter(
-        Customer.tenant_id == tenant_id,
-        CustomerSubscription.status == 'active'
-    ).distinct().order_by(Customer.name.asc()).all()
-    
-    # Convert ALL customers to JSON for bulk assignment
-    all_customers_json = []
-    for customer in all_active_customers:
-        # Get their active subscription plans
-        active_subs = CustomerSubscription.query.filter_by(
-            customer_id=customer.id,
-            status='active'
-        ).all()
-        
-        plan_names = [sub.plan.name for sub in active_subs]
-        
-        assigned_id = customer.default_delivery_employee
-        all_customers_json.append({
-            'id': customer.id,
-            'name': customer.name,
-            'phone': customer.phone or '',
-            'plans': ', '.join(plan_names) if plan_names else 'N/A',
-            'default_employee_id': assigned_id,
-            'default_employee_name': employee_lookup.get(assigned_id)
-        })
+    # ALL customers with active subscriptions (for bulk assignment tool - not date-filtered)
+    all_customers_json = route_plan['customers']
     
     return render_template('admin/subscriptions/delivery_schedule.html',
                          target_date=target_date,
@@ -410,14 +327,23 @@ def assign_delivery():
     tenant_id = get_current_tenant_id()
     
     try:
-        delivery_id = int(request.form['delivery_id'])
+        delivery_id = request.form.get('delivery_id')
         employee_id = request.form.get('employee_id')  # Can be None to unassign
-        
-        # Verify delivery belongs to tenant
-        delivery = SubscriptionDelivery.query.filter_by(
-            id=delivery_id,
-            tenant_id=tenant_id
-        ).first_or_404()
+
+        if delivery_id:
+            # Verify delivery belongs to tenant
+            delivery = SubscriptionDelivery.query.filter_by(
+                id=int(delivery_id),
+                tenant_id=tenant_id
+            ).first_or_404()
+        else:
+            # Rule-based day (no row yet) - identified by subscription + date
+            subscription = CustomerSubscription.query.filter_by(
+                id=int(request.form['subscription_id']),
+                tenant_id=tenant_id
+            ).first_or_404()
+            delivery_date = datetime.strptime(request.form['delivery_date'], '%Y-%m-%d').date()
+            delivery = DeliveryEngine.materialize(subscription, delivery_date)
         
         # Verify employee belongs to tenant (if assigning)
         if employee_id:
@@ -482,7 +408,6 @@ def bulk_assign_deliveries():
             date_desc = " (all future)"
         
         # Process each customer
-        total_deliveries = 0
         customer_names = []
         
         for customer_id in customer_ids:
@@ -496,7 +421,8 @@ def bulk_assign_deliveries():
             
             customer_names.append(customer.name)
             
-            # Get all future deliveries for this customer
+            # Re-assign this customer's stored deliveries (exceptions) in range -
+            # rule-based days follow the customer's default employee set below
             deliveries = SubscriptionDelivery.query.join(
                 CustomerSubscription
             ).filter(
@@ -508,7 +434,6 @@ def bulk_assign_deliveries():
             # Assign all deliveries to employee
             for delivery in deliveries:
                 delivery.assigned_to = employee.id
-                total_deliveries += 1
             
             # Update customer's default employee
             customer.default_delivery_employee = employee.id
@@ -520,7 +445,7 @@ def bulk_assign_deliveries():
         if len(customer_names) > 3:
             customer_summary += f" and {len(customer_names) - 3} more"
         
-        flash(f'✅ Assigned {total_deliveries} deliveries for {len(customer_names)} customers ({customer_summary}) to {employee.name}{date_desc}', 'success')
+        flash(f'✅ Assigned deliveries for {len(customer_names)} customers ({customer_summary}) to {employee.name}{date_desc}', 'success')
         
     except Exception as e:
         db.session.rollback()
@@ -624,6 +549,7 @@ def update_total_inventory():
         tenant.total_bottles_inventory = new_total
         
         db.session.commit()
+        invalidate_tenant(tenant.subdomain)
         
         flash(f'✅ Total inventory updated: {old_total} → {new_total} bottles', 'success')
         
@@ -651,6 +577,7 @@ def log_damaged_assets():
         tenant.damaged_bottles_count = old_damage + damage_count
         
         db.session.commit()
+        invalidate_tenant(tenant.subdomain)
         
         flash(f'✅ Logged {damage_count} damaged/lost bottles. Reason: {reason}', 'warning')
         
@@ -675,6 +602,7 @@ def reset_damaged_count():
         tenant.damaged_bottles_count = 0
         
         db.session.commit()
+        invalidate_tenant(tenant.subdomain)
         
         flash(f'✅ Reset damaged count from {old_damage} to 0', 'success')
         
@@ -707,34 +635,14 @@ def modify_delivery():
             tenant_id=tenant_id
         ).first_or_404()
         
-        # Check if delivery already exists
-        delivery = SubscriptionDelivery.query.filter_by(
-            subscription_id=subscription_id,
-            delivery_date=delivery_date
-        ).first()
-        
-        if delivery:
-            # Update existing delivery
-            delivery.quantity = new_quantity
-            delivery.amount = new_quantity * delivery.rate
-            delivery.is_modified = (new_quantity != subscription.default_quantity)
-            delivery.modification_reason = reason if delivery.is_modified else None
-            delivery.status = 'paused' if new_quantity == 0 else 'delivered'
-            delivery.updated_at = datetime.utcnow()
-        else:
-            # Create new delivery (for dates not yet auto-generated)
-            delivery = SubscriptionDelivery(
-                tenant_id=tenant_id,
-                subscription_id=subscription_id,
-                delivery_date=delivery_date,
-                quantity=new_quantity,
-                rate=subscription.plan.unit_rate,
-                amount=new_quantity * subscription.plan.unit_rate,
-                status='paused' if new_quantity == 0 else 'delivered',
-                is_modified=(new_quantity != subscription.default_quantity),
-                modification_reason=reason
-            )
-            db.session.add(delivery)
+        # Row for this day (created from the plan rules if it's not stored yet)
+        delivery = DeliveryEngine.materialize(subscription, delivery_date)
+        delivery.quantity = new_quantity
+        delivery.amount = new_quantity * delivery.rate
+        delivery.is_modified = (new_quantity != subscription.default_quantity)
+        delivery.modification_reason = reason if delivery.is_modified else None
+        delivery.status = 'paused' if new_quantity == 0 else 'delivered'
+        delivery.updated_at = datetime.utcnow()
         
         db.session.commit()
         
@@ -779,13 +687,9 @@ def pause_deliveries():
             tenant_id=tenant_id
         ).first_or_404()
         
-        # Pause deliveries using bulk_pause method
-        updated_count = SubscriptionDelivery.bulk_pause(
-            subscription_id=subscription_id,
-            date_from=date_from,
-            date_to=date_to,
-            reason=reason
-        )
+        # Pause deliveries (sparse pause rows - one query for the whole range)
+        updated_count = DeliveryEngine.pause(subscription, date_from, date_to, reason=reason)
+        db.session.commit()
         
         flash(f'✅ Paused {updated_count} deliveries for {subscription.customer.name} ({date_from.strftime("%b %d")} to {date_to.strftime("%b %d")})', 'success')
         
@@ -853,17 +757,13 @@ def resume_delivery(delivery_id):
     ).first_or_404()
     
     try:
-        # Restore to default quantity
-        delivery.quantity = delivery.subscription.default_quantity
-        delivery.amount = delivery.quantity * delivery.rate
-        delivery.status = 'delivered'
-        delivery.is_modified = False
-        delivery.modification_reason = None
-        delivery.updated_at = datetime.utcnow()
+        # Back to the plan rules (drops the exception row unless it records a delivery)
+        delivery_date = delivery.delivery_date
+        DeliveryEngine.reset(delivery)
         
         db.session.commit()
         
-        flash(f'✅ Resumed delivery for {delivery.delivery_date.strftime("%b %d")}', 'success')
+        flash(f'✅ Resumed delivery for {delivery_date.strftime("%b %d")}', 'success')
         
     except Exception as e:
         db.session.rollback()
@@ -880,7 +780,7 @@ def resume_delivery(delivery_id):
 @login_required
 def fix_custom_days(plan_id):
     """
-    Fix custom days for a plan and regenerate deliveries for all subscriptions.
+    Fix custom days for a plan (deliveries of all subscriptions follow the new days).
     
     PRODUCTION MIGRATION URL:
     /admin/subscriptions/plans/fix-custom-days/<plan_id>?days=<weekday_numbers>
@@ -923,41 +823,9 @@ def fix_custom_days(plan_id):
         status='active'
     ).all()
     
-    fixed_count = 0
-    deliveries_deleted = 0
-    deliveries_created = 0
-    
-    for subscription in subscriptions:
-        # Delete ALL existing deliveries for this subscription
-        deleted = SubscriptionDelivery.query.filter_by(
-            subscription_id=subscription.id,
-            tenant_id=tenant_id
-        ).delete()
-        deliveries_deleted += deleted
-        
-        # Regenerate deliveries with correct schedule
-        current_date = subscription.start_date
-        period_end = subscription.current_period_end
-        
-        while current_date <= period_end:
-            if should_deliver_on_date(current_date, plan.delivery_pattern, plan.custom_days, subscription.start_date):
-                delivery = SubscriptionDelivery(
-                    tenant_id=tenant_id,
-                    subscription_id=subscription.id,
-                    delivery_date=current_date,
-                    quantity=subscription.default_quantity,
-                    rate=plan.unit_rate,
-                    amount=subscription.default_quantity * plan.unit_rate,
-                    status='delivered',
-                    is_modified=False
-                )
-                db.session.add(delivery)
-                deliveries_created += 1
-            
-            current_date += timedelta(days=1)
-        
-        fixed_count += 1
-    
+    # The schedule is expanded from plan.custom_days, so it's already fixed -
+    # only drop rows left over from when every day was pre-generated
+    deliveries_deleted = DeliveryEngine.prune_generated([s.id for s in subscriptions])
     db.session.commit()
     
     # Create human-readable day names
@@ -973,9 +841,8 @@ def fix_custom_days(plan_id):
             'old_custom_days': old_custom_days or '(empty)',
             'new_custom_days': custom_days_str,
             'delivery_days': selected_day_names,
-            'subscriptions_fixed': fixed_count,
-            'deliveries_deleted': deliveries_deleted,
-            'deliveries_created': deliveries_created
+            'subscriptions_fixed': len(subscriptions),
+            'deliveries_deleted': deliveries_deleted
         }
     })
 
@@ -1364,40 +1231,12 @@ def enroll_member():
         db.session.add(subscription)
         db.session.flush()  # Get subscription ID
         
-        # AUTO-GENERATE DELIVERIES for metered plans (based on schedule pattern)
+        # METERED: deliveries are expanded from the plan's schedule pattern on demand
+        # (DeliveryEngine) - nothing is written per day at enrollment
         if plan.plan_type == 'metered':
-            current_date = start_date
-            deliveries_created = 0
-            skipped_days = 0
-            
-            # Get delivery schedule pattern
             delivery_pattern = plan.delivery_pattern or 'daily'
-            custom_days = plan.custom_days
-            
-            # Include period_end (e.g., Nov 22-30 should include Nov 30)
-            while current_date <= period_end:
-                # Check if delivery should occur on this date based on schedule
-                if should_deliver_on_date(current_date, delivery_pattern, custom_days, start_date):
-                    # Get customer to check for default delivery employee
-                    customer = Customer.query.get(customer_id)
-                    
-                    delivery = SubscriptionDelivery(
-                        tenant_id=tenant_id,
-                        subscription_id=subscription.id,
-                        delivery_date=current_date,
-                        quantity=subscription.default_quantity,
-                        rate=plan.unit_rate,
-                        amount=subscription.default_quantity * plan.unit_rate,
-                        status='delivered',  # Will be updated only if exception occurs
-                        is_modified=False,
-                        assigned_to=customer.default_delivery_employee if customer else None  # Auto-assign
-                    )
-                    db.session.add(delivery)
-                    deliveries_created += 1
-                else:
-                    skipped_days += 1
-                
-                current_date += timedelta(days=1)
+            scheduled_days = len(DeliveryEngine.scheduled_dates(subscription, start_date, period_end))
+            skipped_days = (period_end - start_date).days + 1 - scheduled_days
             
             pattern_display = {
                 'daily': 'Daily',
@@ -1407,7 +1246,7 @@ def enroll_member():
                 'custom': f'Custom schedule'
             }.get(delivery_pattern, 'Daily')
             
-            flash(f'📊 Auto-generated {deliveries_created} deliveries ({pattern_display})!', 'info')
+            flash(f'📊 Scheduled {scheduled_days} deliveries ({pattern_display})!', 'info')
             if skipped_days > 0:
                 flash(f'⏭️ Skipped {skipped_days} days based on schedule pattern', 'info')
         
@@ -1563,7 +1402,7 @@ def update_delivery_notes(subscription_id):
 def edit_subscription(subscription_id):
     """
     Edit subscription - change plan or default quantity.
-    Preserves past deliveries, regenerates future deliveries.
+    Preserves past deliveries; future deliveries follow the new plan rules.
     """
     tenant_id = get_current_tenant_id()
     
@@ -1590,6 +1429,13 @@ def edit_subscription(subscription_id):
         old_plan_name = subscription.plan.name
         changes_made = []
         
+        # METERED: record this period's days up to today at the current plan and
+        # quantity first - the plan rules will use the new values from here on
+        if subscription.plan.plan_type == 'metered':
+            quantity_changing = bool(new_quantity) and Decimal(new_quantity) != subscription.default_quantity
+            if new_plan_id != subscription.plan_id or quantity_changing:
+                DeliveryEngine.freeze(subscription, today)
+        
         # Check if plan is changing
         if new_plan_id != subscription.plan_id:
             subscription.plan_id = new_plan_id
@@ -1607,40 +1453,25 @@ def edit_subscription(subscription_id):
             flash('ℹ️ No changes were made.', 'info')
             return redirect(url_for('subscriptions.member_detail', subscription_id=subscription_id))
         
-        # For metered plans: regenerate future deliveries
+        # For metered plans: future deliveries follow the new plan rules
         if new_plan.plan_type == 'metered':
-            # Delete ONLY future deliveries (preserve past/today)
-            future_deleted = SubscriptionDelivery.query.filter(
-                SubscriptionDelivery.subscription_id == subscription_id,
-                SubscriptionDelivery.tenant_id == tenant_id,
-                SubscriptionDelivery.delivery_date > today,
-                SubscriptionDelivery.delivered_at == None  # Only delete unconfirmed
-            ).delete(synchronize_session=False)
-            
-            # Regenerate future deliveries with new plan's schedule
             tomorrow = today + timedelta(days=1)
-            current_date = tomorrow
-            period_end = subscription.current_period_end
-            deliveries_created = 0
             
-            while current_date <= period_end:
-                if should_deliver_on_date(current_date, new_plan.delivery_pattern, new_plan.custom_days, subscription.start_date):
-                    delivery = SubscriptionDelivery(
-                        tenant_id=tenant_id,
-                        subscription_id=subscription.id,
-                        delivery_date=current_date,
-                        quantity=subscription.default_quantity,
-                        rate=new_plan.unit_rate,
-                        amount=subscription.default_quantity * new_plan.unit_rate,
-                        status='delivered',
-                        is_modified=False
-                    )
-                    db.session.add(delivery)
-                    deliveries_created += 1
-                
-                current_date += timedelta(days=1)
+            # Drop rows left over from when every day was pre-generated
+            future_deleted = DeliveryEngine.prune_generated([subscription.id], date_from=tomorrow)
             
-            changes_made.append(f'Regenerated {deliveries_created} future deliveries (deleted {future_deleted} old)')
+            # Re-price the remaining future exceptions (pauses, changed quantities)
+            future_exceptions = SubscriptionDelivery.query.filter(
+                SubscriptionDelivery.subscription_id == subscription_id,
+                SubscriptionDelivery.tenant_id == tenant_id,
+                SubscriptionDelivery.delivery_date >= tomorrow,
+                SubscriptionDelivery.delivered_at == None  # Only unconfirmed
+            ).all()
+            for delivery in future_exceptions:
+                delivery.rate = new_plan.unit_rate
+                delivery.amount = delivery.quantity * new_plan.unit_rate
+            
+            changes_made.append(f'Future deliveries follow the new schedule (kept {len(future_exceptions)} changes, removed {future_deleted} old)')
         
         subscription.updated_at = datetime.utcnow()
         db.session.commit()
@@ -2024,14 +1855,10 @@ def generate_invoice_metered(subscription_id):
         
         # Get ONLY DELIVERED items (past/today, not future scheduled)
         # Only include deliveries up to today that are not paused
-        deliveries = SubscriptionDelivery.query.filter_by(
-            subscription_id=subscription_id,
-            tenant_id=tenant_id
-        ).filter(
-            SubscriptionDelivery.delivery_date >= billing_start,
-            SubscriptionDelivery.delivery_date <= today,  # Only up to TODAY
-            SubscriptionDelivery.status != 'paused'  # Exclude paused
-        ).order_by(SubscriptionDelivery.delivery_date.asc()).all()
+        deliveries = [
+            d for d in DeliveryEngine.expand([subscription], billing_start, today)  # Only up to TODAY
+            if d.status != 'paused'  # Exclude paused
+        ]
         
         # Calculate totals (only for actually delivered items)
         total_quantity = sum(d.quantity for d in deliveries)
@@ -2062,14 +1889,10 @@ def generate_invoice_metered(subscription_id):
         today = datetime.now().date()
         
         # Get ONLY DELIVERED items (past/today, not future scheduled)
-        deliveries = SubscriptionDelivery.query.filter_by(
-            subscription_id=subscription_id,
-            tenant_id=tenant_id
-        ).filter(
-            SubscriptionDelivery.delivery_date >= billing_start,
-            SubscriptionDelivery.delivery_date <= today,  # Only up to TODAY
-            SubscriptionDelivery.status != 'paused'  # Exclude paused
-        ).all()
+        deliveries = [
+            d for d in DeliveryEngine.expand([subscription], billing_start, today)  # Only up to TODAY
+            if d.status != 'paused'  # Exclude paused
+        ]
         
         # Calculate total (only for actually delivered items)
         total_quantity = sum(d.quantity for d in deliveries)
@@ -2155,128 +1978,14 @@ def generate_invoice_metered(subscription_id):
 @login_required
 def generate_all_invoices():
     """Generate invoices for all metered subscriptions ending soon (bulk processing)"""
+    from services.job_queue import JobQueue
+    
     tenant_id = get_current_tenant_id()
     
     try:
-        # Get all metered subscriptions ending in next 3 days
-        today = datetime.now().date()
-        three_days = today + timedelta(days=3)
-        
-        ready_subscriptions = CustomerSubscription.query.join(
-            CustomerSubscription.plan
-        ).filter(
-            CustomerSubscription.tenant_id == tenant_id,
-            CustomerSubscription.status == 'active',
-            SubscriptionPlan.plan_type == 'metered',
-            CustomerSubscription.current_period_end <= three_days
-        ).options(
-            joinedload(CustomerSubscription.customer),
-            joinedload(CustomerSubscription.plan)
-        ).all()
-        
-        if not ready_subscriptions:
-            flash('⚠️ No subscriptions ready for billing', 'warning')
-            return redirect(url_for('subscriptions.deliveries'))
-        
-        success_count = 0
-        error_count = 0
-        total_amount = 0
-        
-        for subscription in ready_subscriptions:
-            try:
-                billing_start = subscription.current_period_start
-                billing_end = subscription.current_period_end
-                
-                # Get all deliveries for this period
-                deliveries = SubscriptionDelivery.query.filter_by(
-                    subscription_id=subscription.id,
-                    tenant_id=tenant_id
-                ).filter(
-                    SubscriptionDelivery.delivery_date >= billing_start,
-                    SubscriptionDelivery.delivery_date <= billing_end
-                ).all()
-                
-                # Calculate total
-                total_quantity = sum(d.quantity for d in deliveries)
-                invoice_amount = float(sum(d.amount for d in deliveries))
-                
-                # Create invoice
-                customer = subscription.customer
-                invoice_number = f"SUB-{datetime.now().strftime('%Y%m%d%H%M%S')}-{subscription.id}"
-                
-                invoice = Invoice(
-                    tenant_id=tenant_id,
-                    customer_id=customer.id,
-                    customer_name=customer.name,
-                    customer_phone=customer.phone or '',
-                    customer_email=customer.email or '',
-                    invoice_date=datetime.now().date(),
-                    invoice_number=invoice_number,
-                    total_amount=invoice_amount,
-                    payment_status='unpaid',
-                    paid_amount=0,
-                    status='pending'
-                )
-                
-                db.session.add(invoice)
-                db.session.flush()
-                
-                # Add invoice item
-                billing_period_label = f"{billing_start.strftime('%b %d')} - {billing_end.strftime('%b %d, %Y')}"
-                item_description = f"{subscription.plan.name}\n{billing_period_label}\nTotal: {total_quantity} {subscription.plan.unit_name}"
-                
-                item = InvoiceItem(
-                    invoice_id=invoice.id,
-                    item_name=f"Subscription - {subscription.plan.name}",
-                    description=item_description,
-                    quantity=float(total_quantity),
-                    unit=subscription.plan.unit_name,
-                    rate=float(subscription.plan.unit_rate),
-                    taxable_value=invoice_amount,
-                    gst_rate=0,
-                    cgst_amount=0,
-                    sgst_amount=0,
-                    igst_amount=0,
-                    total_amount=invoice_amount
-                )
-                
-                db.session.add(item)
-                
-                # Create payment record
-                payment = SubscriptionPayment(
-                    tenant_id=tenant_id,
-                    subscription_id=subscription.id,
-                    invoice_id=invoice.id,
-                    payment_date=datetime.now().date(),
-                    amount=Decimal(str(invoice_amount)),
-                    payment_mode='Pending',
-                    period_start=billing_start,
-                    period_end=billing_end,
-                    billing_period_label=billing_period_label
-                )
-                
-                db.session.add(payment)
-                
-                # Update subscription status
-                subscription.status = 'pending_payment'
-                
-                success_count += 1
-                total_amount += invoice_amount
-                
-            except Exception as e:
-                error_count += 1
-                # Continue to next subscription even if one fails
-                continue
-        
-        db.session.commit()
-        
-        if success_count > 0:
-            flash(f'✅ Successfully generated {success_count} invoice(s)! Total: ₹{total_amount:,.2f}', 'success')
-        
-        if error_count > 0:
-            flash(f'⚠️ Failed to generate {error_count} invoice(s). Please check individual subscriptions.', 'warning')
-        
-        return redirect(url_for('invoices.index'))
+        # ⚡ Runs as a background job - returns straight away with a job id
+        job = JobQueue.enqueue('subscription_invoices', tenant_id=tenant_id, unique=True)
+        return redirect(url_for('jobs.view', job_id=job.id))
         
     except Exception as e:
         db.session.rollback()
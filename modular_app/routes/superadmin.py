@@ -5,6 +5,8 @@ from flask import Blueprint, render_template, session, redirect, url_for, reques
 from models import db, Tenant, Employee, Attendance, Site, Material, Stock
 from models import Item, Customer, Vendor, Invoice, PurchaseBill, Expense, Task
 from sqlalchemy import func, text
+from utils.tenant_cache import invalidate_tenant, get_cache_stats
+from utils.db_connection import statement_timeout
 from datetime import datetime, timedelta
 
 superadmin_bp = Blueprint('superadmin', __name__, url_prefix='/superadmin')
@@ -37,11 +39,19 @@ def logout():
     return redirect(url_for('superadmin.login'))
 
 @superadmin_bp.route('/dashboard')
+@statement_timeout(120000)  # A stale snapshot is refreshed inline (grouped queries over every tenant)
 def dashboard():
     """Super admin dashboard - view all tenants with comprehensive stats"""
     if not is_superadmin():
         return redirect(url_for('superadmin.login'))
     
+    from services.tenant_usage_service import TenantUsageService
+    
+    # ⚡ Counts, sums and last activity come from the tenant_usage_stats snapshot
+    # (refreshed with one GROUP BY per table) - not ~20 queries per tenant.
+    # Read it first: a refresh commits, which would expire the tenants loaded below
+    usage = TenantUsageService.get_all()
+    
     # Get all tenants with statistics
     tenants = Tenant.query.order_by(Tenant.created_at.desc()).all()
     
@@ -56,91 +66,60 @@ def dashboard():
         'total_tasks': 0
     }
     
+    stats_refreshed_at = None
     for tenant in tenants:
-        # Existing counts
-        employee_count = Employee.query.filter_by(tenant_id=tenant.id).count()
-        attendance_count = Attendance.query.filter_by(tenant_id=tenant.id).count()
-        site_count = Site.query.filter_by(tenant_id=tenant.id).count()
-        material_count = Material.query.filter_by(tenant_id=tenant.id).count()
-        
-        # NEW counts for business activity
-        item_count = Item.query.filter_by(tenant_id=tenant.id).count()
-        customer_count = Customer.query.filter_by(tenant_id=tenant.id).count()
-        vendor_count = Vendor.query.filter_by(tenant_id=tenant.id).count()
-        invoice_count = Invoice.query.filter_by(tenant_id=tenant.id).count()
-        purchase_bill_count = PurchaseBill.query.filter_by(tenant_id=tenant.id).count()
-        expense_count = Expense.query.filter_by(tenant_id=tenant.id).count()
-        task_count = Task.query.filter_by(tenant_id=tenant.id).count()
-        
-        # Calculate total sales value (last 30 days) - convert to float
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        recent_sales = float(db.session.query(func.sum(Invoice.total_amount)).filter(
-            Invoice.tenant_id == tenant.id,
-            Invoice.invoice_date >= thirty_days_ago
-        ).scalar() or 0)
-        
-        # Calculate total expenses (last 30 days) - convert to float
-        recent_expenses = float(db.session.query(func.sum(Expense.amount)).filter(
-            Expense.tenant_id == tenant.id,
-            Expense.expense_date >= thirty_days_ago
-        ).scalar() or 0)
-        
-        # Get last activity timestamp - track ALL business actions
-        last_attendance = Attendance.query.filter_by(tenant_id=tenant.id).order_by(Attendance.timestamp.desc()).first()
-        last_invoice = Invoice.query.filter_by(tenant_id=tenant.id).order_by(Invoice.created_at.desc()).first()
-        last_expense = Expense.query.filter_by(tenant_id=tenant.id).order_by(Expense.created_at.desc()).first()
-        last_item = Item.query.filter_by(tenant_id=tenant.id).order_by(Item.created_at.desc()).first()
-        last_customer = Customer.query.filter_by(tenant_id=tenant.id).order_by(Customer.created_at.desc()).first()
-        last_vendor = Vendor.query.filter_by(tenant_id=tenant.id).order_by(Vendor.created_at.desc()).first()
-        last_purchase = PurchaseBill.query.filter_by(tenant_id=tenant.id).order_by(PurchaseBill.created_at.desc()).first()
-        last_task = Task.query.filter_by(tenant_id=tenant.id).order_by(Task.created_at.desc()).first()
-        
-        activity_timestamps = [
-            last_attendance.timestamp if last_attendance else None,
-            last_invoice.created_at if last_invoice else None,
-            last_expense.created_at if last_expense else None,
-            last_item.created_at if last_item else None,
-            last_customer.created_at if last_customer else None,
-            last_vendor.created_at if last_vendor else None,
-            last_purchase.created_at if last_purchase else None,
-            last_task.created_at if last_task else None
-        ]
-        activity_timestamps = [ts for ts in activity_timestamps if ts]
-        last_activity = max(activity_timestamps) if activity_timestamps else None
+        stats = usage.get(tenant.id)
+        if stats is None:
+            continue  # Signed up after the refresh - shows up on the next one
         
         # Add to totals
-        total_stats['total_items'] += item_count
-        total_stats['total_customers'] += customer_count
-        total_stats['total_vendors'] += vendor_count
-        total_stats['total_invoices'] += invoice_count
-        total_stats['total_purchase_bills'] += purchase_bill_count
-        total_stats['total_expenses'] += expense_count
-        total_stats['total_tasks'] += task_count
+        total_stats['total_items'] += stats.item_count
+        total_stats['total_customers'] += stats.customer_count
+        total_stats['total_vendors'] += stats.vendor_count
+        total_stats['total_invoices'] += stats.invoice_count
+        total_stats['total_purchase_bills'] += stats.purchase_bill_count
+        total_stats['total_expenses'] += stats.expense_count
+        total_stats['total_tasks'] += stats.task_count
+        
+        if stats_refreshed_at is None or stats.refreshed_at < stats_refreshed_at:
+            stats_refreshed_at = stats.refreshed_at
         
         tenant_stats.append({
             'tenant': tenant,
-            'employee_count': employee_count,
-            'attendance_count': attendance_count,
-            'site_count': site_count,
-            'material_count': material_count,
-            'item_count': item_count,
-            'customer_count': customer_count,
-            'vendor_count': vendor_count,
-            'invoice_count': invoice_count,
-            'purchase_bill_count': purchase_bill_count,
-            'expense_count': expense_count,
-            'task_count': task_count,
-            'recent_sales': recent_sales,
-            'recent_expenses': recent_expenses,
-            'last_activity': last_activity
+            'employee_count': stats.employee_count,
+            'attendance_count': stats.attendance_count,
+            'site_count': stats.site_count,
+            'material_count': stats.material_count,
+            'item_count': stats.item_count,
+            'customer_count': stats.customer_count,
+            'vendor_count': stats.vendor_count,
+            'invoice_count': stats.invoice_count,
+            'purchase_bill_count': stats.purchase_bill_count,
+            'expense_count': stats.expense_count,
+            'task_count': stats.task_count,
+            'recent_sales': float(stats.recent_sales),
+            'recent_expenses': float(stats.recent_expenses),
+            'last_activity': stats.last_activity
         })
     
     return render_template('superadmin/dashboard.html', 
                          tenant_stats=tenant_stats, 
                          total_tenants=len(tenants),
                          total_stats=total_stats,
+                         stats_refreshed_at=stats_refreshed_at,
                          now=datetime.utcnow())
 
+@superadmin_bp.route('/usage-stats/refresh', methods=['POST'])
+@statement_timeout(120000)  # Grouped queries over every tenant's data
+def refresh_usage_stats():
+    """Recompute the usage stats snapshot now (a dozen grouped queries)"""
+    if not is_superadmin():
+        return redirect(url_for('superadmin.login'))
+    
+    from services.tenant_usage_service import TenantUsageService
+    TenantUsageService.refresh()
+    return redirect(url_for('superadmin.dashboard'))
+
 @superadmin_bp.route('/tenant/<int:tenant_id>')
 def view_tenant(tenant_id):
     """View detailed data for a specific tenant - comprehensive monitoring"""
@@ -164,18 +143,12 @@ def view_tenant(tenant_id):
     expenses = Expense.query.filter_by(tenant_id=tenant_id).order_by(Expense.created_at.desc()).limit(20).all()
     tasks = Task.query.filter_by(tenant_id=tenant_id).order_by(Task.created_at.desc()).limit(10).all()
     
-    # Calculate summary stats (convert Decimal to float to avoid type errors)
-    total_sales = float(db.session.query(func.sum(Invoice.total_amount)).filter(
-        Invoice.tenant_id == tenant_id
-    ).scalar() or 0)
-    
-    total_purchases = float(db.session.query(func.sum(PurchaseBill.total_amount)).filter(
-        PurchaseBill.tenant_id == tenant_id
-    ).scalar() or 0)
-    
-    total_expenses_amount = float(db.session.query(func.sum(Expense.amount)).filter(
-        Expense.tenant_id == tenant_id
-    ).scalar() or 0)
+    # Summary amounts from the usage snapshot (convert Decimal to float to avoid type errors)
+    from services.tenant_usage_service import TenantUsageService
+    usage = TenantUsageService.get(tenant_id)
+    total_sales = float(usage.total_sales)
+    total_purchases = float(usage.total_purchases)
+    total_expenses_amount = float(usage.total_expenses_amount)
     
     return render_template('superadmin/tenant_detail.html', 
                          tenant=tenant,
@@ -203,6 +176,7 @@ def delete_tenant(tenant_id):
     import os
     tenant = Tenant.query.get_or_404(tenant_id)
     company_name = tenant.company_name
+    subdomain = tenant.subdomain
     
     # Step 1: Delete Vercel Blob files (if deployed on Vercel)
     deleted_files = 0
@@ -390,6 +364,7 @@ def delete_tenant(tenant_id):
         """), {'tenant_id': tenant_id})
         
         db.session.commit()
+        invalidate_tenant(subdomain)
         
     except Exception as e:
         db.session.rollback()
@@ -429,6 +404,7 @@ def extend_trial(tenant_id):
     tenant.plan = 'trial'
     
     db.session.commit()
+    invalidate_tenant(tenant.subdomain)
     
     from flask import flash
     flash(f'✅ Extended trial for {tenant.company_name} by 30 days', 'success')
@@ -448,6 +424,7 @@ def activate_tenant(tenant_id):
     tenant.subscription_ends_at = datetime.utcnow() + timedelta(days=365)  # 1 year
     
     db.session.commit()
+    invalidate_tenant(tenant.subdomain)
     
     from flask import flash
     flash(f'✅ Activated {tenant.company_name} with Pro plan for 1 year', 'success')
@@ -462,6 +439,7 @@ def suspend_tenant(tenant_id):
     tenant = Tenant.query.get_or_404(tenant_id)
     tenant.status = 'suspended'
     db.session.commit()
+    invalidate_tenant(tenant.subdomain)
     
     from flask import flash
     flash(f'⚠️ Suspended {tenant.company_name}', 'warning')
@@ -487,12 +465,53 @@ def fix_licenses():
         fixed_count += 1
     
     db.session.commit()
+    for tenant in tenants_without_license:
+        invalidate_tenant(tenant.subdomain)
     
     from flask import flash
     flash(f'✅ Fixed {fixed_count} accounts - gave them 30-day trial from today', 'success')
     return redirect(url_for('superadmin.dashboard'))
 
+@superadmin_bp.route('/tenant-cache-stats')
+def tenant_cache_stats():
+    """Tenant cache hit/miss counters for the worker serving this request"""
+    if not is_superadmin():
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    return jsonify(get_cache_stats())
+
+@superadmin_bp.route('/performance')
+def performance():
+    """Per-route latency (p50/p95), query counts, N+1 warnings and slow queries for this worker"""
+    if not is_superadmin():
+        return redirect(url_for('superadmin.login'))
+
+    from utils.request_metrics import get_route_stats, get_slow_queries, get_metrics_info
+    if request.args.get('format') == 'json':
+        return jsonify({
+            'info': get_metrics_info(),
+            'routes': get_route_stats(),
+            'slow_queries': get_slow_queries()
+        })
+
+    return render_template('superadmin/performance.html',
+                         routes=get_route_stats(),
+                         slow_queries=get_slow_queries(),
+                         info=get_metrics_info(),
+                         now=datetime.utcnow())
+
+@superadmin_bp.route('/performance/reset', methods=['POST'])
+def reset_performance():
+    """Clear this worker's route stats and slow query log"""
+    if not is_superadmin():
+        return redirect(url_for('superadmin.login'))
+
+    from utils.request_metrics import reset_metrics
+    reset_metrics()
+    return redirect(url_for('superadmin.performance'))
+
 @superadmin_bp.route('/system-health')
+@statement_timeout(120000)  # Catalog size queries over the whole database
 def system_health():
     """System Health Monitoring - Database size, table stats, performance metrics"""
     if not is_superadmin():
@@ -586,13 +605,15 @@ def system_health():
             })
         
         # 5. Growth Projection (based on current data)
+        from services.tenant_usage_service import TenantUsageService
+        usage_totals = TenantUsageService.totals()
         total_tenants = Tenant.query.count()
-        total_items = Item.query.count()
-        total_invoices = Invoice.query.count()
-        total_customers = Customer.query.count()
-        total_vendors = Vendor.query.count()
-        total_purchase_bills = PurchaseBill.query.count()
-        total_expenses = Expense.query.count()
+        total_items = usage_totals['item_count']
+        total_invoices = usage_totals['invoice_count']
+        total_customers = usage_totals['customer_count']
+        total_vendors = usage_totals['vendor_count']
+        total_purchase_bills = usage_totals['purchase_bill_count']
+        total_expenses = usage_totals['expense_count']
         
         # Estimate space per record (bytes)
         space_estimates = {
@@ -638,6 +659,7 @@ def system_health():
                              total_vendors=total_vendors,
                              total_purchase_bills=total_purchase_bills,
                              total_expenses=total_expenses,
+                             tenant_cache=get_cache_stats(),
                              now=datetime.utcnow())
     
     except Exception as e:
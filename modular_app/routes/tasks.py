@@ -5,6 +5,7 @@ Handles both admin (create/assign) and employee (update/upload) operations
 from flask import Blueprint, render_template, request, redirect, url_for, flash, g, jsonify, session
 from models import db, Task, TaskUpdate, TaskMaterial, TaskMedia, Employee, Site
 from utils.tenant_middleware import require_tenant, get_current_tenant_id
+from utils.tenant_cache import invalidate_tenant
 from datetime import datetime, date
 from sqlalchemy import or_
 
@@ -389,6 +390,8 @@ def cleanup_old_media():
             tenant.settings = json.dumps(settings)
         
         db.session.commit()
+        if tenant:
+            invalidate_tenant(tenant.subdomain)
         
         if deleted_count > 0:
             flash(f'✅ Cleaned up {deleted_count} old media files (saved ~{storage_saved:.1f}MB)', 'success')
@@ -0,0 +1,141 @@
+"""
+Aging Service
+Receivables/payables aging and customer outstanding, read from the
+materialized open_item_balances table (one grouped query per report)
+"""
+from models import db
+from models.open_item_balance import OPEN_ITEM_BALANCES
+from sqlalchemy import text
+from datetime import timedelta
+from decimal import Decimal
+
+# (key, label, oldest days overdue in the bucket) - newest first
+AGING_BUCKETS = [
+    ('current', 'Current (Not Due)', None),
+    ('1_30', '1-30 Days', 30),
+    ('31_60', '31-60 Days', 60),
+    ('61_90', '61-90 Days', 90),
+    ('90_plus', '90+ Days', None),
+]
+
+
+def _bucket_case(value_column, due_column):
+    """CASE expression per bucket: SUM(<case>) AS bucket_<key>"""
+    columns = []
+    newer_bound = ':as_of'
+    for key, label, max_days in AGING_BUCKETS:
+        if key == 'current':
+            condition = f"{due_column} >= :as_of"
+        elif max_days:
+            condition = f"{due_column} < {newer_bound} AND {due_column} >= :cutoff_{max_days}"
+            newer_bound = f':cutoff_{max_days}'
+        else:
+            condition = f"{due_column} < {newer_bound}"
+        columns.append(f"SUM(CASE WHEN {condition} THEN {value_column} ELSE 0 END) AS bucket_{key}")
+    return ',\n'.join(columns)
+
+
+def _bucket_params(as_of):
+    params = {'as_of': as_of}
+    for key, label, max_days in AGING_BUCKETS:
+        if max_days:
+            params[f'cutoff_{max_days}'] = as_of - timedelta(days=max_days)
+    return params
+
+
+class AgingService:
+    """Aging buckets and outstanding totals per customer / vendor"""
+
+    @staticmethod
+    def get_bucket(days_overdue):
+        """(bucket key, label) for a number of days overdue"""
+        for key, label, max_days in AGING_BUCKETS:
+            if key == 'current' and days_overdue <= 0:
+                return key, label
+            if max_days and days_overdue <= max_days:
+                return key, label
+        return AGING_BUCKETS[-1][0], AGING_BUCKETS[-1][1]
+
+    @staticmethod
+    def get_party_aging(tenant_id, party_type, as_of):
+        """
+        Outstanding per party, split into aging buckets
+
+        Args:
+            tenant_id: Tenant ID
+            party_type: 'receivable' (customers) or 'payable' (vendors)
+            as_of: Date the buckets are computed against (today)
+
+        Returns:
+            (parties, summary)
+            parties: {party_name: {'total', 'open_count', 'oldest_due_date', <bucket keys>}} ordered by name
+            summary: {<bucket key>: Decimal} over all parties
+        """
+        params = _bucket_params(as_of)
+        params.update({'tenant_id': tenant_id, 'party_type': party_type})
+
+        rows = db.session.execute(text(f"""
+            SELECT
+                party_name,
+                SUM(open_amount) AS total,
+                SUM(open_count) AS open_count,
+                MIN(due_date) AS oldest_due_date,
+                {_bucket_case('open_amount', 'due_date')}
+            FROM open_item_balances
+            WHERE tenant_id = :tenant_id
+            AND party_type = :party_type
+            GROUP BY party_name
+            ORDER BY party_name
+        """).columns(oldest_due_date=db.Date), params).mappings().fetchall()
+
+        parties = {}
+        summary = {key: Decimal('0') for key, label, max_days in AGING_BUCKETS}
+        for row in rows:
+            party = {
+                'total': Decimal(str(row['total'] or 0)),
+                'open_count': int(row['open_count'] or 0),
+                'oldest_due_date': row['oldest_due_date'],
+            }
+            for key, label, max_days in AGING_BUCKETS:
+                party[key] = Decimal(str(row[f'bucket_{key}'] or 0))
+                summary[key] += party[key]
+            parties[row['party_name']] = party
+
+        return parties, summary
+
+    @staticmethod
+    def get_customer_outstanding(tenant_id):
+        """
+        Outstanding amount and open invoice count per active customer (highest first)
+
+        Returns:
+            [(customer_id, outstanding float, open invoice count)]
+        """
+        rows = db.session.execute(text("""
+            SELECT c.id, SUM(o.open_amount), SUM(o.open_count)
+            FROM open_item_balances o
+            JOIN customers c ON c.id = o.party_id AND c.tenant_id = o.tenant_id
+            WHERE o.tenant_id = :tenant_id
+            AND o.party_type = 'receivable'
+            AND c.is_active = :is_active
+            GROUP BY c.id
+            HAVING SUM(o.open_amount) > 0
+            ORDER BY SUM(o.open_amount) DESC
+        """), {'tenant_id': tenant_id, 'is_active': True}).fetchall()
+
+        return [(row[0], float(row[1]), int(row[2])) for row in rows]
+
+    @staticmethod
+    def rebuild(tenant_id=None):
+        """
+        Re-install triggers and recompute open items from invoices and bills
+
+        Args:
+            tenant_id: Rebuild one tenant, or all tenants if None
+
+        Returns:
+            Number of (party, due date) rows written
+        """
+        rows_written = OPEN_ITEM_BALANCES.rebuild(db.session.connection(), tenant_id)
+        db.session.commit()
+        return rows_written
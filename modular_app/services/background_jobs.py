@@ -0,0 +1,199 @@
+"""
+Background Job Handlers
+One handler per job type, registered with JobQueue.register()
+
+Each handler gets a JobContext (tenant_id, payload, progress(), save_file())
+and returns a JSON-serializable summary shown on the job status page.
+"""
+from io import BytesIO
+from services.job_queue import JobQueue, PermanentJobError
+
+MAX_REPORTED_ERRORS = 100  # Keep job rows small
+
+
+def _percent(done, total):
+    return int(done * 100 / total) if total else 0
+
+
+@JobQueue.register('subscription_invoices')
+def generate_subscription_invoices(context):
+    """Bulk invoices for metered subscriptions ending soon (resumable billing run, safe to retry)"""
+    from services.subscription_billing_service import SubscriptionBillingService
+
+    result = SubscriptionBillingService.generate_all_invoices(
+        context.tenant_id,
+        progress_callback=lambda done, total: context.progress(
+            _percent(done, total), f'{done} of {total} subscriptions billed'
+        ),
+        job_id=context.job_id
+    )
+
+    if result['success_count'] == 0 and result['error_count'] == 0:
+        message = '⚠️ No subscriptions ready for billing'
+    else:
+        message = f"✅ Successfully generated {result['success_count']} invoice(s)! Total: ₹{result['total_amount']:,.2f}"
+        if result['error_count']:
+            message += f" ⚠️ Failed to generate {result['error_count']} invoice(s). Please check individual subscriptions."
+
+    return {
+        'message': message,
+        'run_id': result['run_id'],
+        'success_count': result['success_count'],
+        'skipped_count': result['skipped_count'],
+        'error_count': result['error_count'],
+        'total_amount': result['total_amount'],
+        'errors': result['errors'][:MAX_REPORTED_ERRORS]
+    }
+
+
+# Imports commit as they go - a retry would import the same rows twice
+@JobQueue.register('excel_import', max_attempts=1)
+def run_excel_import(context):
+    """Bulk import of employees / inventory / customers / subscription enrollments"""
+    from utils.excel_import import (
+        import_employees_from_excel,
+        import_inventory_from_excel,
+        import_customers_from_excel,
+        import_subscription_enrollments_from_excel
+    )
+
+    import_type = context.payload.get('import_type')
+    if context.input_file is None:
+        raise PermanentJobError('Uploaded file is missing')
+    file = BytesIO(context.input_file)
+    tenant_id = context.tenant_id
+    skipped_count = 0
+
+    if import_type == 'employees':
+        success_count, errors = import_employees_from_excel(file, tenant_id)
+        entity_name = 'employees'
+    elif import_type == 'inventory':
+        def report_progress(processed, imported, error_count, total_rows):
+            context.progress(_percent(processed, total_rows), f'{processed} rows read, {imported} items imported')
+
+        success_count, errors = import_inventory_from_excel(file, tenant_id, progress_callback=report_progress)
+        entity_name = 'items'
+    elif import_type == 'customers':
+        success_count, errors = import_customers_from_excel(file, tenant_id)
+        entity_name = 'customers'
+    elif import_type == 'subscriptions':
+        success_count, skipped_count, errors = import_subscription_enrollments_from_excel(file, tenant_id)
+        # SKIPPED messages are not real errors
+        errors = [e for e in errors if 'SKIPPED' not in e]
+        entity_name = 'subscriptions'
+    else:
+        raise PermanentJobError(f'Invalid import type: {import_type}')
+
+    if success_count > 0:
+        message = f'✅ Successfully imported {success_count} {entity_name}!'
+    elif skipped_count == 0 and not errors:
+        message = '⚠️ No data to import. Please check your file.'
+    else:
+        message = f'⚠️ No {entity_name} imported'
+    if skipped_count:
+        message += f' ⏭️ Skipped {skipped_count} duplicate enrollment(s) (already enrolled in same plan)'
+
+    return {
+        'message': message,
+        'success_count': success_count,
+        'skipped_count': skipped_count,
+        'error_count': len(errors),
+        'errors': errors[:MAX_REPORTED_ERRORS]
+    }
+
+
+@JobQueue.register('barcode_labels')
+def render_barcode_label_pdf(context):
+    """Barcode label sheet for the selected items"""
+    from models import Item
+    from utils.barcode_labels import render_barcode_labels
+    from datetime import datetime
+
+    quantities = {int(item_id): qty for item_id, qty in context.payload.get('quantities', {}).items()}
+    items = Item.query.filter(
+        Item.id.in_(quantities.keys()),
+        Item.tenant_id == context.tenant_id
+    ).order_by(Item.name).all()
+
+    if not items:
+        raise PermanentJobError('No items with barcodes found!')
+
+    labels_to_print = []
+    for item in items:
+        labels_to_print.extend([item] * quantities[item.id])
+
+    pdf_bytes = render_barcode_labels(
+        labels_to_print,
+        progress_callback=lambda done, total: context.progress(_percent(done, total), f'{done} of {total} labels')
+    )
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    context.save_file(f'barcode_labels_{timestamp}.pdf', 'application/pdf', pdf_bytes)
+
+    return {'message': f'✅ {len(labels_to_print)} labels ready to print', 'labels': len(labels_to_print)}
+
+
+@JobQueue.register('invoice_pdfs')
+def render_invoice_pdf_zip(context):
+    """ZIP of invoice PDFs for a date range (month-end mailing)"""
+    from models import Invoice, Tenant
+    from services.invoice_pdf_service import InvoicePdfService
+    from datetime import date
+
+    start_date = date.fromisoformat(context.payload['start_date'])
+    end_date = date.fromisoformat(context.payload['end_date'])
+    tenant = Tenant.query.get(context.tenant_id)
+
+    invoice_ids = [row.id for row in Invoice.query.with_entities(Invoice.id).filter(
+        Invoice.tenant_id == context.tenant_id,
+        Invoice.invoice_date >= start_date,
+        Invoice.invoice_date <= end_date,
+        Invoice.status != 'cancelled'
+    ).order_by(Invoice.invoice_date, Invoice.id).all()]
+
+    if not invoice_ids:
+        raise PermanentJobError('No invoices in the selected period')
+
+    output = BytesIO()
+    result = InvoicePdfService.write_zip(
+        tenant,
+        invoice_ids,
+        output,
+        progress_callback=lambda done, total: context.progress(_percent(done, total), f'{done} of {total} invoices')
+    )
+    context.save_file(f'invoices_{start_date:%Y%m%d}_{end_date:%Y%m%d}.zip', 'application/zip', output.getvalue())
+
+    return {
+        'message': f"✅ {result['invoice_count']} invoice PDFs ready ({result['cached']} from cache)",
+        **result
+    }
+
+
+# Crediting points isn't idempotent - never retry automatically
+@JobQueue.register('special_day_bonuses', max_attempts=1)
+def process_special_day_bonuses(context):
+    """Birthday & anniversary bonuses for all active/trial tenants (system job)"""
+    from services.special_day_bonus_service import SpecialDayBonusService
+
+    results = SpecialDayBonusService.process_all_tenants(
+        progress_callback=lambda done, total: context.progress(_percent(done, total), f'{done} of {total} tenants')
+    )
+
+    print(f"Tenants processed: {results['tenants_processed']}")
+    print(f"Birthday bonuses: {results['birthday_bonuses_credited']}")
+    print(f"Anniversary bonuses: {results['anniversary_bonuses_credited']}")
+    print(f"Expired bonuses removed: {results['expired_bonuses_removed']}")
+    print(f"Notifications sent: {results['notifications_sent']}")
+    if results['errors']:
+        print(f"Errors: {results['errors']}")
+
+    return results
+
+
+@JobQueue.register('tenant_usage_stats')
+def refresh_tenant_usage_stats(context):
+    """Superadmin usage snapshot for all tenants (system job)"""
+    from services.tenant_usage_service import TenantUsageService
+
+    tenant_count = TenantUsageService.refresh()
+    return {'message': f'✅ Usage stats refreshed for {tenant_count} tenants', 'tenant_count': tenant_count}
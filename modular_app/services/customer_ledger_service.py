@@ -0,0 +1,190 @@
+"""
+Customer Ledger Service
+Statement pages with running balances and monthly period totals for the customer ledger page
+
+Statement rows are read a page at a time (keyset on invoice_date, id); period
+totals are cached per worker until one of the customer's invoices changes.
+"""
+from models import db
+from utils.tenant_cache import TTLCache
+from sqlalchemy import text
+from datetime import timedelta
+import os
+
+STATEMENT_PAGE_SIZE = 50
+PERIOD_TOTALS_TTL = int(os.environ.get('LEDGER_TOTALS_TTL', 300))  # seconds
+
+
+def _month_sql(column):
+    """'YYYY-MM' of a date column for the current dialect"""
+    if db.engine.dialect.name == 'postgresql':
+        return f"to_char({column}, 'YYYY-MM')"
+    return f"strftime('%Y-%m', {column})"
+
+
+class CustomerLedgerService:
+    """Paginated statement and period totals for one customer"""
+
+    # (tenant_id, customer_id) -> (fingerprint, totals)
+    _period_totals = TTLCache(max_size=1024, ttl=PERIOD_TOTALS_TTL)
+
+    @staticmethod
+    def get_period_totals(tenant_id, customer_id):
+        """
+        Billed / paid / outstanding per month plus overall totals
+
+        Recomputed when the customer's invoice count or latest updated_at
+        changes (or the entry expires); otherwise served from the cache.
+
+        Returns:
+            {'periods': [{'period', 'invoice_count', 'billed', 'paid', 'outstanding'}] newest first,
+             'invoice_count', 'total_billed', 'total_paid', 'total_outstanding'}
+        """
+        params = {'tenant_id': tenant_id, 'customer_id': customer_id}
+        fingerprint = tuple(db.session.execute(text("""
+            SELECT COUNT(*), MAX(updated_at)
+            FROM invoices
+            WHERE tenant_id = :tenant_id
+            AND customer_id = :customer_id
+        """), params).fetchone())
+
+        key = (tenant_id, customer_id)
+        cached = CustomerLedgerService._period_totals.get(key)
+        if cached is not TTLCache.MISSING and cached[0] == fingerprint:
+            return cached[1]
+
+        # Outstanding = unpaid invoices (same rule as Customer.get_outstanding_balance)
+        rows = db.session.execute(text(f"""
+            SELECT
+                {_month_sql('invoice_date')} AS period,
+                COUNT(*) AS invoice_count,
+                COALESCE(SUM(total_amount), 0) AS billed,
+                COALESCE(SUM(COALESCE(paid_amount, 0)), 0) AS paid,
+                COALESCE(SUM(CASE WHEN payment_status = 'unpaid' THEN total_amount ELSE 0 END), 0) AS outstanding
+            FROM invoices
+            WHERE tenant_id = :tenant_id
+            AND customer_id = :customer_id
+            GROUP BY {_month_sql('invoice_date')}
+            ORDER BY period DESC
+        """), params).fetchall()
+
+        periods = [
+            {
+                'period': row.period,
+                'invoice_count': int(row.invoice_count),
+                'billed': float(row.billed),
+                'paid': float(row.paid),
+                'outstanding': float(row.outstanding)
+            }
+            for row in rows
+        ]
+        totals = {
+            'periods': periods,
+            'invoice_count': sum(p['invoice_count'] for p in periods),
+            'total_billed': sum(p['billed'] for p in periods),
+            'total_paid': sum(p['paid'] for p in periods),
+            'total_outstanding': sum(p['outstanding'] for p in periods)
+        }
+
+        CustomerLedgerService._period_totals.set(key, (fingerprint, totals))
+        return totals
+
+    @staticmethod
+    def get_statement_page(tenant_id, customer_id, opening_balance=0, before=None, limit=STATEMENT_PAGE_SIZE):
+        """
+        One page of the customer's statement, newest first
+
+        The running balance is opening balance + cumulative (billed - paid)
+        in date order, computed over the whole statement with a window
+        function; only the requested page is returned.
+
+        Args:
+            before: (invoice_date, invoice_id) of the last row of the previous page, or None
+            limit: Rows per page
+
+        Returns:
+            (rows, next_cursor) - next_cursor is (invoice_date, invoice_id) or None on the last page
+        """
+        params = {'tenant_id': tenant_id, 'customer_id': customer_id, 'limit': limit + 1}
+        page_filter = ''
+        if before:
+            page_filter = """
+                WHERE invoice_date < :before_date
+                OR (invoice_date = :before_date AND id < :before_id)
+            """
+            params['before_date'], params['before_id'] = before
+
+        rows = db.session.execute(text(f"""
+            SELECT *
+            FROM (
+                SELECT
+                    id,
+                    invoice_number,
+                    invoice_date,
+                    due_date,
+                    total_amount,
+                    COALESCE(paid_amount, 0) AS paid_amount,
+                    payment_status,
+                    SUM(total_amount - COALESCE(paid_amount, 0)) OVER (
+                        ORDER BY invoice_date, id
+                        ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+                    ) AS running_balance
+                FROM invoices
+                WHERE tenant_id = :tenant_id
+                AND customer_id = :customer_id
+            ) statement
+            {page_filter}
+            ORDER BY invoice_date DESC, id DESC
+            LIMIT :limit
+        """).columns(invoice_date=db.Date, due_date=db.Date), params).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (rows[-1].invoice_date, rows[-1].id)
+
+        opening_balance = float(opening_balance or 0)
+        statement = [
+            {
+                'id': row.id,
+                'invoice_number': row.invoice_number,
+                'invoice_date': row.invoice_date,
+                'due_date': row.due_date,
+                'total_amount': float(row.total_amount),
+                'paid_amount': float(row.paid_amount),
+                'payment_status': row.payment_status,
+                'running_balance': opening_balance + float(row.running_balance)
+            }
+            for row in rows
+        ]
+        return statement, next_cursor
+
+    @staticmethod
+    def get_overdue_counts(tenant_id, customer_id, today):
+        """Number of unpaid invoices past their due date, per aging bucket"""
+        row = db.session.execute(text("""
+            SELECT
+                SUM(CASE WHEN due_date >= :cutoff_30 THEN 1 ELSE 0 END),
+                SUM(CASE WHEN due_date < :cutoff_30 AND due_date >= :cutoff_60 THEN 1 ELSE 0 END),
+                SUM(CASE WHEN due_date < :cutoff_60 AND due_date >= :cutoff_90 THEN 1 ELSE 0 END),
+                SUM(CASE WHEN due_date < :cutoff_90 THEN 1 ELSE 0 END)
+            FROM invoices
+            WHERE tenant_id = :tenant_id
+            AND customer_id = :customer_id
+            AND payment_status = 'unpaid'
+            AND due_date < :today
+        """), {
+            'tenant_id': tenant_id,
+            'customer_id': customer_id,
+            'today': today,
+            'cutoff_30': today - timedelta(days=30),
+            'cutoff_60': today - timedelta(days=60),
+            'cutoff_90': today - timedelta(days=90)
+        }).fetchone()
+
+        return {
+            '0-30': int(row[0] or 0),
+            '31-60': int(row[1] or 0),
+            '61-90': int(row[2] or 0),
+            '90+': int(row[3] or 0)
+        }
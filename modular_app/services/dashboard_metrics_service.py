@@ -0,0 +1,182 @@
+"""
+Dashboard Metrics Service
+Admin dashboard numbers from the daily_tenant_metrics rollup
+
+The payload is cached per tenant and day for DASHBOARD_CACHE_TTL seconds.
+"""
+from models import db, Invoice, PurchaseBill
+from models.daily_tenant_metrics import DAILY_TENANT_METRICS
+from services.item_stock_service import ItemStockService
+from utils.tenant_cache import TTLCache
+from sqlalchemy import text, desc
+from datetime import date
+import os
+
+DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', 30))  # seconds
+DASHBOARD_CACHE_SIZE = int(os.environ.get('DASHBOARD_CACHE_SIZE', 256))  # tenants per worker
+TREND_MONTHS = 12
+
+
+class DashboardMetricsService:
+    """Cached dashboard metrics"""
+
+    # (tenant_id, day) -> dashboard payload
+    _cache = TTLCache(max_size=DASHBOARD_CACHE_SIZE, ttl=DASHBOARD_CACHE_TTL)
+
+    @staticmethod
+    def get_dashboard(tenant_id, today):
+        """
+        Everything the dashboard shows, from cache when fresh
+
+        Args:
+            tenant_id: Tenant ID
+            today: Date the "today" / "this month" figures are for
+
+        Returns:
+            Dict of template variables (sales, counts, trend, recent activity)
+        """
+        key = (tenant_id, today)
+        data = DashboardMetricsService._cache.get(key)
+        if data is TTLCache.MISSING:
+            data = DashboardMetricsService._load_dashboard(tenant_id, today)
+            DashboardMetricsService._cache.set(key, data)
+        return data
+
+    @staticmethod
+    def invalidate(tenant_id, today):
+        DashboardMetricsService._cache.invalidate((tenant_id, today))
+
+    @staticmethod
+    def _load_dashboard(tenant_id, today):
+        data = DashboardMetricsService.summary(tenant_id, today)
+        data['low_stock_count'] = ItemStockService.low_stock_count(tenant_id)
+        data['monthly_trend'] = DashboardMetricsService.monthly_trend(tenant_id, today)
+        data['recent_invoices'], data['recent_bills'] = DashboardMetricsService.recent_activity(tenant_id)
+        return data
+
+    @staticmethod
+    def summary(tenant_id, today):
+        """Today / month-to-date / receivables from the rollup, plus master counts (one round trip)"""
+        month_start = today.replace(day=1)
+
+        result = db.session.execute(text("""
+            SELECT
+                COALESCE(SUM(CASE WHEN m.metric_date = :today THEN m.sales_total END), 0) AS today_sales,
+                COALESCE(SUM(CASE WHEN m.metric_date = :today THEN m.invoice_count END), 0) AS today_invoice_count,
+                COALESCE(SUM(CASE WHEN m.metric_date >= :month_start THEN m.sales_total END), 0) AS month_sales,
+                COALESCE(SUM(CASE WHEN m.metric_date >= :month_start THEN m.invoice_count END), 0) AS month_invoice_count,
+                COALESCE(SUM(m.receivables_total), 0) AS pending_receivables,
+                COALESCE(SUM(CASE WHEN m.metric_date >= :month_start THEN m.purchase_total END), 0) AS month_purchases,
+                COALESCE(SUM(CASE WHEN m.metric_date >= :month_start THEN m.bill_count END), 0) AS month_bill_count,
+
+                -- Quick stats
+                (SELECT COUNT(*) FROM items
+                 WHERE tenant_id = :tenant_id
+                 AND is_active = true) AS total_items,
+                (SELECT COUNT(*) FROM customers
+                 WHERE tenant_id = :tenant_id
+                 AND is_active = true) AS total_customers,
+                (SELECT COUNT(*) FROM vendors
+                 WHERE tenant_id = :tenant_id
+                 AND is_active = true) AS total_vendors
+            FROM daily_tenant_metrics m
+            WHERE m.tenant_id = :tenant_id
+        """), {
+            'tenant_id': tenant_id,
+            'today': today,
+            'month_start': month_start
+        }).mappings().one()
+
+        return {
+            'today_sales': float(result['today_sales']),
+            'today_invoice_count': int(result['today_invoice_count']),
+            'month_sales': float(result['month_sales']),
+            'month_invoice_count': int(result['month_invoice_count']),
+            'pending_receivables': float(result['pending_receivables']),
+            'month_purchases': float(result['month_purchases']),
+            'month_bill_count': int(result['month_bill_count']),
+            'total_items': int(result['total_items'] or 0),
+            'total_customers': int(result['total_customers'] or 0),
+            'total_vendors': int(result['total_vendors'] or 0),
+        }
+
+    @staticmethod
+    def monthly_trend(tenant_id, today, months=TREND_MONTHS):
+        """
+        Sales and purchases per month for the last `months` months (oldest first)
+
+        Reads at most ~31 rollup rows per month and buckets them here, which
+        keeps the SQL portable (no strftime / date_trunc).
+        """
+        # (year, month) of the last `months` months, oldest first
+        month_index = today.year * 12 + today.month - 1
+        buckets = {}
+        for index in range(month_index - months + 1, month_index + 1):
+            year, month = divmod(index, 12)
+            buckets[(year, month + 1)] = {
+                'month': date(year, month + 1, 1),
+                'sales': 0.0, 'invoice_count': 0, 'purchases': 0.0, 'bill_count': 0
+            }
+        first_month = next(iter(buckets.values()))['month']
+
+        rows = db.session.execute(text("""
+            SELECT metric_date, sales_total, invoice_count, purchase_total, bill_count
+            FROM daily_tenant_metrics
+            WHERE tenant_id = :tenant_id
+            AND metric_date >= :first_month
+            AND metric_date <= :today
+        """), {'tenant_id': tenant_id, 'first_month': first_month, 'today': today})
+
+        for metric_date, sales, invoice_count, purchases, bill_count in rows:
+            if isinstance(metric_date, str):  # SQLite returns dates as text in raw SQL
+                metric_date = date.fromisoformat(metric_date[:10])
+            bucket = buckets[(metric_date.year, metric_date.month)]
+            bucket['sales'] += float(sales or 0)
+            bucket['invoice_count'] += int(invoice_count or 0)
+            bucket['purchases'] += float(purchases or 0)
+            bucket['bill_count'] += int(bill_count or 0)
+
+        return list(buckets.values())
+
+    @staticmethod
+    def recent_activity(tenant_id, limit=5):
+        """Latest invoices and bills (essential fields only, not full objects)"""
+        recent_invoices = db.session.query(
+            Invoice.id,
+            Invoice.invoice_number,
+            Invoice.customer_name,
+            Invoice.total_amount,
+            Invoice.payment_status,
+            Invoice.invoice_date
+        ).filter(
+            Invoice.tenant_id == tenant_id
+        ).order_by(desc(Invoice.created_at)).limit(limit).all()
+
+        recent_bills = db.session.query(
+            PurchaseBill.id,
+            PurchaseBill.bill_number,
+            PurchaseBill.vendor_name,
+            PurchaseBill.total_amount,
+            PurchaseBill.payment_status,
+            PurchaseBill.bill_date
+        ).filter(
+            PurchaseBill.tenant_id == tenant_id
+        ).order_by(desc(PurchaseBill.created_at)).limit(limit).all()
+
+        return recent_invoices, recent_bills
+
+    @staticmethod
+    def rebuild(tenant_id=None):
+        """
+        Re-install triggers and recompute the daily rollup from invoices and bills
+
+        Args:
+            tenant_id: Rebuild one tenant, or all tenants if None
+
+        Returns:
+            Number of (tenant, day) rows written
+        """
+        rows_written = DAILY_TENANT_METRICS.rebuild(db.session.connection(), tenant_id)
+        db.session.commit()
+        DashboardMetricsService._cache.clear()
+        return rows_written
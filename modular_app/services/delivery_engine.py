@@ -0,0 +1,451 @@
+"""
+Delivery Engine
+Metered subscription deliveries expanded on demand from the plan rules
+
+subscription_deliveries only holds exceptions (pauses, quantity changes,
+manual assignments) and completed deliveries; a row wins over the rule for
+its day.
+"""
+from models import db, CustomerSubscription, SubscriptionPlan, SubscriptionDelivery, Employee
+from sqlalchemy.orm import joinedload
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+
+class ScheduledDelivery:
+    """
+    A delivery that comes from the plan rules (no row in the database)
+
+    Has the same attributes as SubscriptionDelivery so schedules, the
+    employee portal and billing can treat both alike. id is None until
+    the day is materialized (see DeliveryEngine.materialize).
+    """
+    is_virtual = True
+    id = None
+    status = 'delivered'
+    is_modified = False
+    modification_reason = None
+    delivered_by = None
+    delivered_at = None
+    delivered_by_employee = None
+    bottles_delivered = 0
+    bottles_collected = 0
+    notes = None
+
+    def __init__(self, subscription, delivery_date):
+        self.subscription = subscription
+        self.subscription_id = subscription.id
+        self.tenant_id = subscription.tenant_id
+        self.delivery_date = delivery_date
+        self.quantity = subscription.default_quantity or Decimal('0')
+        self.rate = subscription.plan.unit_rate or Decimal('0')
+        self.amount = self.quantity * self.rate
+        # Same auto-assignment enrollment used to write into every row
+        self.assigned_to = subscription.customer.default_delivery_employee
+
+    @property
+    def assigned_to_employee(self):
+        # Identity map - one lookup per employee, not per delivery
+        return db.session.get(Employee, self.assigned_to) if self.assigned_to else None
+
+    status_display = SubscriptionDelivery.status_display
+
+    def __repr__(self):
+        return f'<ScheduledDelivery {self.delivery_date} - subscription {self.subscription_id}>'
+
+
+class DeliveryEngine:
+    """Delivery schedule = plan rules + sparse subscription_deliveries rows"""
+
+    @staticmethod
+    def should_deliver_on_date(date, pattern, custom_days=None, start_date=None):
+        """
+        Check if delivery should occur on a given date based on schedule pattern
+
+        Args:
+            date: The date to check
+            pattern: 'daily', 'alternate', 'weekdays', 'weekends', 'custom'
+            custom_days: Comma-separated weekday numbers (0=Mon, 6=Sun): '0,2,4' for Mon/Wed/Fri
+            start_date: For 'alternate' pattern - day 1 of alternation
+
+        Returns:
+            bool: True if delivery should occur on this date
+        """
+        if pattern == 'daily':
+            return True
+
+        elif pattern == 'alternate':
+            # Alternate days (every other day)
+            if start_date:
+                days_diff = (date - start_date).days
+                return days_diff % 2 == 0
+            return True  # Fallback to daily if no start_date
+
+        elif pattern == 'weekdays':
+            # Monday to Friday (0-4)
+            return date.weekday() < 5
+
+        elif pattern == 'weekends':
+            # Saturday and Sunday (5-6)
+            return date.weekday() >= 5
+
+        elif pattern == 'custom' and custom_days:
+            # Custom days (e.g., '0,2,4' for Mon/Wed/Fri)
+            try:
+                selected_days = [int(d.strip()) for d in custom_days.split(',')]
+                return date.weekday() in selected_days
+            except:
+                return True  # Fallback to daily if parsing fails
+
+        return True  # Default: deliver
+
+    @staticmethod
+    def scheduled_dates(subscription, date_from, date_to):
+        """Dates between date_from and date_to the plan rules deliver on"""
+        plan = subscription.plan
+        current_date = max(date_from, subscription.start_date)
+        last_date = min(date_to, subscription.current_period_end)
+
+        dates = []
+        while current_date <= last_date:
+            if DeliveryEngine.should_deliver_on_date(current_date, plan.delivery_pattern or 'daily',
+                                                     plan.custom_days, subscription.start_date):
+                dates.append(current_date)
+            current_date += timedelta(days=1)
+        return dates
+
+    @staticmethod
+    def is_scheduled(subscription, delivery_date):
+        """True if the plan rules deliver on this date"""
+        return bool(DeliveryEngine.scheduled_dates(subscription, delivery_date, delivery_date))
+
+    @staticmethod
+    def _merge(subscriptions, rows, date_from, date_to):
+        """Rows plus rule entries for days without a row, by date then customer name"""
+        existing = {(row.subscription_id, row.delivery_date) for row in rows}
+
+        entries = list(rows)
+        for subscription in subscriptions:
+            for delivery_date in DeliveryEngine.scheduled_dates(subscription, date_from, date_to):
+                if (subscription.id, delivery_date) not in existing:
+                    entries.append(ScheduledDelivery(subscription, delivery_date))
+
+        entries.sort(key=lambda d: (d.delivery_date, d.subscription.customer.name))
+        return entries
+
+    @staticmethod
+    def expand(subscriptions, date_from, date_to):
+        """
+        Deliveries of the given (metered) subscriptions between two dates
+
+        One query for the rows in range; everything else is expanded from
+        the plan rules in memory.
+
+        Returns:
+            [SubscriptionDelivery | ScheduledDelivery] ordered by date, customer name
+        """
+        subscriptions = [s for s in subscriptions if s.plan.plan_type == 'metered']
+        if not subscriptions:
+            return []
+
+        rows = SubscriptionDelivery.query.filter(
+            SubscriptionDelivery.subscription_id.in_([s.id for s in subscriptions]),
+            SubscriptionDelivery.delivery_date >= date_from,
+            SubscriptionDelivery.delivery_date <= date_to
+        ).options(
+            joinedload(SubscriptionDelivery.assigned_to_employee),
+            joinedload(SubscriptionDelivery.delivered_by_employee)
+        ).all()
+
+        return DeliveryEngine._merge(subscriptions, rows, date_from, date_to)
+
+    @staticmethod
+    def get_schedule(tenant_id, date_from, date_to, statuses=('active',), customer_id=None):
+        """
+        All metered deliveries of a tenant between two dates
+
+        Args:
+            tenant_id: Tenant ID
+            date_from, date_to: Date range (inclusive)
+            statuses: Subscription statuses to include
+            customer_id: Only this customer's subscriptions (optional)
+
+        Returns:
+            [SubscriptionDelivery | ScheduledDelivery] ordered by date, customer name
+        """
+        subscription_filter = [
+            CustomerSubscription.tenant_id == tenant_id,
+            CustomerSubscription.status.in_(statuses),
+            SubscriptionPlan.plan_type == 'metered'
+        ]
+        if customer_id:
+            subscription_filter.append(CustomerSubscription.customer_id == customer_id)
+
+        subscriptions = CustomerSubscription.query.join(
+            CustomerSubscription.plan
+        ).filter(
+            *subscription_filter,
+            CustomerSubscription.start_date <= date_to
+        ).options(
+            joinedload(CustomerSubscription.customer),
+            joinedload(CustomerSubscription.plan)
+        ).all()
+
+        # Rows are matched by join (not a long IN list) - a tenant can have thousands of subscriptions
+        rows = SubscriptionDelivery.query.join(
+            CustomerSubscription
+        ).join(
+            CustomerSubscription.plan
+        ).filter(
+            *subscription_filter,
+            SubscriptionDelivery.delivery_date >= date_from,
+            SubscriptionDelivery.delivery_date <= date_to
+        ).options(
+            joinedload(SubscriptionDelivery.assigned_to_employee),
+            joinedload(SubscriptionDelivery.delivered_by_employee)
+        ).all()
+
+        return DeliveryEngine._merge(subscriptions, rows, date_from, date_to)
+
+    @staticmethod
+    def get_period_totals(subscriptions, date_to=None):
+        """
+        Billable days / quantity / amount per subscription for its current period
+
+        Rule days are counted from the plan rules; the exception rows of all
+        the subscriptions come from one query, each matched against its own
+        subscription's period.
+
+        Args:
+            subscriptions: Loaded subscriptions (with plan and customer)
+            date_to: Only count deliveries up to this date (default: period end)
+
+        Returns:
+            {subscription_id: {'days', 'quantity', 'amount', 'modified_days'}}
+        """
+        subscriptions = [s for s in subscriptions if s.plan.plan_type == 'metered']
+        if not subscriptions:
+            return {}
+
+        query = db.session.query(
+            SubscriptionDelivery.subscription_id,
+            SubscriptionDelivery.delivery_date,
+            SubscriptionDelivery.quantity,
+            SubscriptionDelivery.amount,
+            SubscriptionDelivery.status,
+            SubscriptionDelivery.is_modified
+        ).join(
+            CustomerSubscription, CustomerSubscription.id == SubscriptionDelivery.subscription_id
+        ).filter(
+            SubscriptionDelivery.subscription_id.in_([s.id for s in subscriptions]),
+            SubscriptionDelivery.delivery_date >= CustomerSubscription.current_period_start,
+            SubscriptionDelivery.delivery_date <= CustomerSubscription.current_period_end
+        )
+        if date_to:
+            query = query.filter(SubscriptionDelivery.delivery_date <= date_to)
+
+        rows_by_subscription = {}
+        for row in query.all():
+            rows_by_subscription.setdefault(row.subscription_id, []).append(row)
+
+        totals = {}
+        for subscription in subscriptions:
+            rows = rows_by_subscription.get(subscription.id, [])
+            delivered = [row for row in rows if row.status != 'paused' and row.quantity > 0]
+            row_dates = {row.delivery_date for row in rows}
+
+            period_end = subscription.current_period_end
+            if date_to:
+                period_end = min(period_end, date_to)
+            rule_days = sum(
+                1 for delivery_date in DeliveryEngine.scheduled_dates(
+                    subscription, subscription.current_period_start, period_end
+                )
+                if delivery_date not in row_dates
+            )
+
+            default_quantity = subscription.default_quantity or Decimal('0')
+            rate = subscription.plan.unit_rate or Decimal('0')
+            totals[subscription.id] = {
+                'days': rule_days + len(delivered),
+                'quantity': rule_days * default_quantity + sum((row.quantity for row in delivered), Decimal('0')),
+                'amount': rule_days * default_quantity * rate + sum((row.amount for row in delivered), Decimal('0')),
+                'modified_days': sum(1 for row in delivered if row.is_modified)
+            }
+        return totals
+
+    @staticmethod
+    def _new_row(subscription, delivery_date, **values):
+        """Row for a day, starting from what the plan rules say (joins the session through the subscription)"""
+        entry = ScheduledDelivery(subscription, delivery_date)
+        fields = {
+            'tenant_id': subscription.tenant_id,
+            'subscription': subscription,
+            'delivery_date': delivery_date,
+            'quantity': entry.quantity,
+            'rate': entry.rate,
+            'amount': entry.amount,
+            'status': 'delivered',
+            'is_modified': False,
+            'assigned_to': entry.assigned_to
+        }
+        fields.update(values)
+        return SubscriptionDelivery(**fields)
+
+    @staticmethod
+    def materialize(subscription, delivery_date):
+        """
+        Get or create the row for one day (before recording an exception or completion)
+
+        The new row is added to the session; the caller commits.
+        """
+        delivery = SubscriptionDelivery.query.filter_by(
+            subscription_id=subscription.id,
+            delivery_date=delivery_date
+        ).first()
+
+        if not delivery:
+            delivery = DeliveryEngine._new_row(subscription, delivery_date)
+            db.session.add(delivery)
+        return delivery
+
+    @staticmethod
+    def pause(subscription, date_from, date_to, reason='Paused by customer'):
+        """
+        Pause deliveries for a date range
+
+        One query for the existing rows; pause rows are written only for
+        scheduled days that don't have one. Completed deliveries are left alone.
+
+        Returns:
+            Number of deliveries paused (caller commits)
+        """
+        rows = {
+            row.delivery_date: row
+            for row in SubscriptionDelivery.query.filter(
+                SubscriptionDelivery.subscription_id == subscription.id,
+                SubscriptionDelivery.delivery_date >= date_from,
+                SubscriptionDelivery.delivery_date <= date_to
+            ).all()
+        }
+
+        paused_count = 0
+        for delivery_date in DeliveryEngine.scheduled_dates(subscription, date_from, date_to):
+            if delivery_date not in rows:
+                db.session.add(DeliveryEngine._new_row(
+                    subscription, delivery_date,
+                    quantity=0,
+                    amount=0,
+                    status='paused',
+                    is_modified=True,
+                    modification_reason=reason
+                ))
+                paused_count += 1
+
+        for delivery in rows.values():
+            if delivery.status == 'paused' or delivery.delivered_at:
+                continue
+            delivery.quantity = 0
+            delivery.amount = 0
+            delivery.status = 'paused'
+            delivery.is_modified = True
+            delivery.modification_reason = reason
+            delivery.updated_at = datetime.utcnow()
+            paused_count += 1
+
+        return paused_count
+
+    @staticmethod
+    def reset(delivery):
+        """
+        Put one day back on the plan rules
+
+        The row is deleted when the rules cover that day and nothing else is
+        recorded on it; otherwise it's restored to the default quantity.
+        """
+        subscription = delivery.subscription
+        if not delivery.delivered_at and not delivery.notes and \
+                DeliveryEngine.is_scheduled(subscription, delivery.delivery_date):
+            db.session.delete(delivery)
+            return
+
+        delivery.quantity = subscription.default_quantity
+        delivery.amount = delivery.quantity * delivery.rate
+        delivery.status = 'delivered'
+        delivery.is_modified = False
+        delivery.modification_reason = None
+        delivery.updated_at = datetime.utcnow()
+
+    @staticmethod
+    def resume(subscription, date_from, date_to):
+        """
+        Resume paused deliveries in a date range
+
+        Returns:
+            Number of deliveries resumed (caller commits)
+        """
+        paused = SubscriptionDelivery.query.filter(
+            SubscriptionDelivery.subscription_id == subscription.id,
+            SubscriptionDelivery.delivery_date >= date_from,
+            SubscriptionDelivery.delivery_date <= date_to,
+            SubscriptionDelivery.status == 'paused'
+        ).all()
+
+        for delivery in paused:
+            DeliveryEngine.reset(delivery)
+        return len(paused)
+
+    @staticmethod
+    def freeze(subscription, date_to):
+        """
+        Write rows for the current period's scheduled days up to date_to
+
+        Called before a plan or quantity change so days already delivered
+        keep the quantity and rate they were delivered at.
+
+        Returns:
+            Number of rows written (caller commits)
+        """
+        date_from = subscription.current_period_start
+        existing = {
+            delivery_date for (delivery_date,) in db.session.query(
+                SubscriptionDelivery.delivery_date
+            ).filter(
+                SubscriptionDelivery.subscription_id == subscription.id,
+                SubscriptionDelivery.delivery_date >= date_from,
+                SubscriptionDelivery.delivery_date <= date_to
+            ).all()
+        }
+
+        written = 0
+        for delivery_date in DeliveryEngine.scheduled_dates(subscription, date_from, date_to):
+            if delivery_date not in existing:
+                db.session.add(DeliveryEngine._new_row(subscription, delivery_date))
+                written += 1
+        return written
+
+    @staticmethod
+    def prune_generated(subscription_ids, date_from=None):
+        """
+        Delete rows that only repeat the plan rules
+
+        Enrollment used to write a row for every scheduled day. Rows that
+        were never modified, paused, annotated or delivered carry nothing the
+        rules don't - dropping them lets a schedule change take effect.
+
+        Returns:
+            Number of rows deleted (caller commits)
+        """
+        if not subscription_ids:
+            return 0
+
+        query = SubscriptionDelivery.query.filter(
+            SubscriptionDelivery.subscription_id.in_(subscription_ids),
+            SubscriptionDelivery.is_modified == False,
+            SubscriptionDelivery.status == 'delivered',
+            SubscriptionDelivery.delivered_at == None,
+            SubscriptionDelivery.notes == None
+        )
+        if date_from:
+            query = query.filter(SubscriptionDelivery.delivery_date >= date_from)
+        return query.delete(synchronize_session=False)
@@ -0,0 +1,436 @@
+"""
+GST Computation Service
+GSTR-1 / GSTR-3B / summary figures from grouped SQL over invoices,
+invoice_items and return_items
+
+Figures of a filed period are cached per worker and revalidated with one
+aggregate query.
+"""
+from models import db
+from utils.tenant_cache import TTLCache
+from sqlalchemy import text
+from datetime import date, datetime
+from decimal import Decimal
+import os
+
+FILED_PERIOD_TTL = int(os.environ.get('GST_REPORT_TTL', 3600))  # seconds
+
+# Return due dates: day of the month after the period
+GSTR1_DUE_DAY = 11
+GSTR3B_DUE_DAY = 20
+
+# Invoices reported in GSTR-1 / GSTR-3B (non_taxable invoices are excluded)
+GST_INVOICE_TYPES = "('taxable', 'credit_adjustment')"
+
+ZERO = Decimal('0')
+
+
+def _dec(value):
+    """SUM() result (float/Decimal/None) as a 2-place Decimal"""
+    if not value:
+        return Decimal('0.00')
+    return Decimal(str(value)).quantize(Decimal('0.01'))
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _tax_totals(row, prefix=''):
+    """{'taxable_value', 'cgst', 'sgst', 'igst', 'total_tax'} from a grouped row"""
+    cgst = _dec(getattr(row, f'{prefix}cgst'))
+    sgst = _dec(getattr(row, f'{prefix}sgst'))
+    igst = _dec(getattr(row, f'{prefix}igst'))
+    return {
+        'taxable_value': _dec(getattr(row, f'{prefix}taxable')),
+        'cgst': cgst,
+        'sgst': sgst,
+        'igst': igst,
+        'total_tax': cgst + sgst + igst
+    }
+
+
+def _subtract(totals, other):
+    return {key: totals[key] - other[key] for key in totals}
+
+
+def _empty_totals():
+    return {'taxable_value': ZERO, 'cgst': ZERO, 'sgst': ZERO, 'igst': ZERO, 'total_tax': ZERO}
+
+
+class GstComputationService:
+    """Set-based GST return figures for a tenant and date range"""
+
+    # (tenant_id, report, start, end) -> (fingerprint, figures)
+    _filed_periods = TTLCache(max_size=256, ttl=FILED_PERIOD_TTL)
+
+    @staticmethod
+    def is_filed(end_date, due_day, today=None):
+        """True once the due date of the return covering end_date has passed"""
+        today = today or date.today()
+        end_date = _as_date(end_date)
+        due_year, due_month = (end_date.year + 1, 1) if end_date.month == 12 else (end_date.year, end_date.month + 1)
+        return today > date(due_year, due_month, due_day)
+
+    @staticmethod
+    def _fingerprint(tenant_id, start_date, end_date, include_purchases=False):
+        """Changes whenever an invoice, return or (optionally) purchase bill of the period changes"""
+        purchases = """,
+                (SELECT COUNT(*) FROM purchase_bills
+                 WHERE tenant_id = :tenant_id AND bill_date BETWEEN :start_date AND :end_date),
+                (SELECT MAX(updated_at) FROM purchase_bills
+                 WHERE tenant_id = :tenant_id AND bill_date BETWEEN :start_date AND :end_date)""" if include_purchases else ''
+        return tuple(db.session.execute(text(f"""
+            SELECT
+                (SELECT COUNT(*) FROM invoices
+                 WHERE tenant_id = :tenant_id AND invoice_date BETWEEN :start_date AND :end_date),
+                (SELECT MAX(updated_at) FROM invoices
+                 WHERE tenant_id = :tenant_id AND invoice_date BETWEEN :start_date AND :end_date),
+                (SELECT COUNT(*) FROM returns
+                 WHERE tenant_id = :tenant_id AND return_date BETWEEN :start_date AND :end_date),
+                (SELECT MAX(updated_at) FROM returns
+                 WHERE tenant_id = :tenant_id AND return_date BETWEEN :start_date AND :end_date){purchases}
+        """), {'tenant_id': tenant_id, 'start_date': start_date, 'end_date': end_date}).fetchone())
+
+    @staticmethod
+    def _cached(report, tenant_id, start_date, end_date, due_day, compute, include_purchases=False):
+        """compute() - served from the cache for filed periods"""
+        start_date, end_date = _as_date(start_date), _as_date(end_date)
+        if not GstComputationService.is_filed(end_date, due_day):
+            return compute(tenant_id, start_date, end_date)
+
+        key = (tenant_id, report, start_date, end_date)
+        fingerprint = GstComputationService._fingerprint(tenant_id, start_date, end_date, include_purchases)
+        cached = GstComputationService._filed_periods.get(key)
+        if cached is not TTLCache.MISSING and cached[0] == fingerprint:
+            return cached[1]
+
+        figures = compute(tenant_id, start_date, end_date)
+        GstComputationService._filed_periods.set(key, (fingerprint, figures))
+        return figures
+
+    # ------------------------------------------------------------------
+    # GSTR-1
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def get_gstr1(tenant_id, start_date, end_date):
+        """
+        GSTR-1 figures: B2B/B2C invoices, rate-wise and HSN-wise totals,
+        credit notes and net amounts
+
+        Returns:
+            {'b2b_invoices', 'b2c_invoices', 'b2b_totals', 'b2c_totals', 'gross', 'invoice_value',
+             'rate_summary' {rate: totals} (net), 'hsn_summary' [rows] (net),
+             'returns' [rows], 'return_totals', 'return_value', 'net', 'net_invoice_value'}
+            Shared between requests - don't modify it.
+        """
+        return GstComputationService._cached('gstr1', tenant_id, start_date, end_date,
+                                             GSTR1_DUE_DAY, GstComputationService._compute_gstr1)
+
+    @staticmethod
+    def _compute_gstr1(tenant_id, start_date, end_date):
+        params = {'tenant_id': tenant_id, 'start_date': start_date, 'end_date': end_date}
+
+        # Invoice register (columns only - no ORM objects, no item loads)
+        invoices = db.session.execute(text(f"""
+            SELECT id, invoice_number, invoice_date, customer_name, customer_gstin,
+                   subtotal, cgst_amount, sgst_amount, igst_amount, total_amount
+            FROM invoices
+            WHERE tenant_id = :tenant_id
+            AND invoice_date BETWEEN :start_date AND :end_date
+            AND invoice_type IN {GST_INVOICE_TYPES}
+            ORDER BY invoice_date DESC, id DESC
+        """).columns(invoice_date=db.Date), params).fetchall()
+
+        b2b_invoices = [inv for inv in invoices if inv.customer_gstin and inv.customer_gstin.strip()]
+        b2c_invoices = [inv for inv in invoices if not (inv.customer_gstin and inv.customer_gstin.strip())]
+
+        # B2B / B2C totals
+        split_rows = db.session.execute(text(f"""
+            SELECT
+                CASE WHEN TRIM(COALESCE(customer_gstin, '')) <> '' THEN 'b2b' ELSE 'b2c' END AS supply_type,
+                SUM(subtotal) AS taxable,
+                SUM(cgst_amount) AS cgst,
+                SUM(sgst_amount) AS sgst,
+                SUM(igst_amount) AS igst,
+                SUM(total_amount) AS invoice_value
+            FROM invoices
+            WHERE tenant_id = :tenant_id
+            AND invoice_date BETWEEN :start_date AND :end_date
+            AND invoice_type IN {GST_INVOICE_TYPES}
+            GROUP BY CASE WHEN TRIM(COALESCE(customer_gstin, '')) <> '' THEN 'b2b' ELSE 'b2c' END
+        """), params).fetchall()
+        splits = {row.supply_type: row for row in split_rows}
+        b2b_totals = _tax_totals(splits['b2b']) if 'b2b' in splits else _empty_totals()
+        b2c_totals = _tax_totals(splits['b2c']) if 'b2c' in splits else _empty_totals()
+        gross = {key: b2b_totals[key] + b2c_totals[key] for key in b2b_totals}
+        invoice_value = sum((_dec(row.invoice_value) for row in split_rows), ZERO)
+
+        # Rate-wise and HSN-wise (outward items less credit-note items)
+        rate_summary = {}
+        for row in GstComputationService.get_item_rollup(params, 'gst_rate'):
+            rate_summary[float(row.gst_rate or 0)] = _subtract(_tax_totals(row), _tax_totals(row, 'ret_'))
+        rate_summary = dict(sorted(rate_summary.items()))
+
+        hsn_summary = []
+        for row in GstComputationService.get_item_rollup(params, 'hsn_code', 'gst_rate'):
+            totals = _subtract(_tax_totals(row), _tax_totals(row, 'ret_'))
+            totals.update(
+                hsn_code=row.hsn_code or '',
+                gst_rate=float(row.gst_rate or 0),
+                quantity=Decimal(str(row.quantity or 0)) - Decimal(str(row.ret_quantity or 0))
+            )
+            hsn_summary.append(totals)
+        hsn_summary.sort(key=lambda r: (r['hsn_code'], r['gst_rate']))
+
+        # Credit notes (approved returns), one row per return
+        returns = []
+        return_totals = _empty_totals()
+        return_value = ZERO
+        for row in db.session.execute(text("""
+            SELECT r.id, r.return_number, r.credit_note_number, r.return_date,
+                   COALESCE(c.name, 'Unknown') AS customer_name,
+                   COALESCE(i.invoice_number, 'N/A') AS invoice_number,
+                   SUM(ri.taxable_amount) AS taxable,
+                   SUM(ri.cgst_amount) AS cgst,
+                   SUM(ri.sgst_amount) AS sgst,
+                   SUM(ri.igst_amount) AS igst
+            FROM returns r
+            JOIN return_items ri ON ri.return_id = r.id
+            LEFT JOIN customers c ON c.id = r.customer_id
+            LEFT JOIN invoices i ON i.id = r.invoice_id
+            WHERE r.tenant_id = :tenant_id
+            AND r.return_date BETWEEN :start_date AND :end_date
+            AND r.status = 'approved'
+            GROUP BY r.id, r.return_number, r.credit_note_number, r.return_date, c.name, i.invoice_number
+            ORDER BY r.return_date DESC, r.id DESC
+        """).columns(return_date=db.Date), params):
+            totals = _tax_totals(row)
+            total = totals['taxable_value'] + totals['total_tax']
+            returns.append({
+                'return_number': row.return_number,
+                'credit_note_number': row.credit_note_number,
+                'return_date': row.return_date,
+                'customer_name': row.customer_name,
+                'invoice_number': row.invoice_number,
+                'taxable': totals['taxable_value'],
+                'cgst': totals['cgst'],
+                'sgst': totals['sgst'],
+                'igst': totals['igst'],
+                'total': total
+            })
+            return_totals = {key: return_totals[key] + totals[key] for key in return_totals}
+            return_value += total
+
+        return {
+            'b2b_invoices': b2b_invoices,
+            'b2c_invoices': b2c_invoices,
+            'b2b_totals': b2b_totals,
+            'b2c_totals': b2c_totals,
+            'gross': gross,
+            'invoice_value': invoice_value,
+            'rate_summary': rate_summary,
+            'hsn_summary': hsn_summary,
+            'returns': returns,
+            'return_totals': return_totals,
+            'return_value': return_value,
+            'net': _subtract(gross, return_totals),
+            'net_invoice_value': invoice_value - return_value
+        }
+
+    @staticmethod
+    def get_item_rollup(params, *group_columns):
+        """
+        Outward invoice items and approved credit-note items grouped by the
+        given columns (gst_rate / hsn_code / unit), side by side
+
+        Args:
+            params: {'tenant_id', 'start_date', 'end_date'}
+        """
+        columns = ', '.join(group_columns)
+        return db.session.execute(text(f"""
+            SELECT {columns},
+                   SUM(quantity) AS quantity, SUM(taxable) AS taxable,
+                   SUM(cgst) AS cgst, SUM(sgst) AS sgst, SUM(igst) AS igst,
+                   SUM(ret_quantity) AS ret_quantity, SUM(ret_taxable) AS ret_taxable,
+                   SUM(ret_cgst) AS ret_cgst, SUM(ret_sgst) AS ret_sgst, SUM(ret_igst) AS ret_igst
+            FROM (
+                SELECT ii.hsn_code, ii.gst_rate, ii.unit,
+                       ii.quantity, ii.taxable_value AS taxable,
+                       ii.cgst_amount AS cgst, ii.sgst_amount AS sgst, ii.igst_amount AS igst,
+                       0 AS ret_quantity, 0 AS ret_taxable, 0 AS ret_cgst, 0 AS ret_sgst, 0 AS ret_igst
+                FROM invoice_items ii
+                JOIN invoices i ON i.id = ii.invoice_id
+                WHERE i.tenant_id = :tenant_id
+                AND i.invoice_date BETWEEN :start_date AND :end_date
+                AND i.invoice_type IN {GST_INVOICE_TYPES}
+                UNION ALL
+                SELECT ri.hsn_code, ri.gst_rate, ri.unit,
+                       0, 0, 0, 0, 0,
+                       ri.quantity_returned, ri.taxable_amount,
+                       ri.cgst_amount, ri.sgst_amount, ri.igst_amount
+                FROM return_items ri
+                JOIN returns r ON r.id = ri.return_id
+                WHERE r.tenant_id = :tenant_id
+                AND r.return_date BETWEEN :start_date AND :end_date
+                AND r.status = 'approved'
+            ) lines
+            GROUP BY {columns}
+        """), params).fetchall()
+
+    # ------------------------------------------------------------------
+    # GSTR-3B
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def get_gstr3b(tenant_id, start_date, end_date):
+        """
+        GSTR-3B figures: outward supplies, credit notes and eligible ITC
+
+        Returns:
+            {'outward', 'returns', 'returns_count', 'net_outward', 'inward', 'invoice_count'}
+            (each of outward/returns/net_outward/inward is a totals dict)
+        """
+        return GstComputationService._cached('gstr3b', tenant_id, start_date, end_date,
+                                             GSTR3B_DUE_DAY, GstComputationService._compute_gstr3b,
+                                             include_purchases=True)
+
+    @staticmethod
+    def _compute_gstr3b(tenant_id, start_date, end_date):
+        params = {'tenant_id': tenant_id, 'start_date': start_date, 'end_date': end_date}
+
+        outward = db.session.execute(text(f"""
+            SELECT COUNT(*) AS invoice_count,
+                   SUM(subtotal) AS taxable, SUM(cgst_amount) AS cgst,
+                   SUM(sgst_amount) AS sgst, SUM(igst_amount) AS igst
+            FROM invoices
+            WHERE tenant_id = :tenant_id
+            AND invoice_date BETWEEN :start_date AND :end_date
+            AND invoice_type IN {GST_INVOICE_TYPES}
+        """), params).fetchone()
+
+        returns = GstComputationService._return_totals(params)
+
+        # ITC: approved purchase bills from GST-registered vendors
+        inward = db.session.execute(text("""
+            SELECT SUM(subtotal) AS taxable, SUM(cgst_amount) AS cgst,
+                   SUM(sgst_amount) AS sgst, SUM(igst_amount) AS igst
+            FROM purchase_bills
+            WHERE tenant_id = :tenant_id
+            AND status = 'approved'
+            AND bill_date BETWEEN :start_date AND :end_date
+            AND gst_applicable = :gst_applicable
+        """), dict(params, gst_applicable=True)).fetchone()
+
+        outward_totals = _tax_totals(outward)
+        return_totals = _tax_totals(returns)
+        return {
+            'outward': outward_totals,
+            'returns': return_totals,
+            'returns_count': int(returns.returns_count or 0),
+            'net_outward': _subtract(outward_totals, return_totals),
+            'inward': _tax_totals(inward),
+            'invoice_count': int(outward.invoice_count or 0)
+        }
+
+    @staticmethod
+    def _return_totals(params):
+        """Approved credit notes of the period: count and item totals"""
+        return db.session.execute(text("""
+            SELECT COUNT(DISTINCT r.id) AS returns_count,
+                   SUM(ri.taxable_amount) AS taxable, SUM(ri.cgst_amount) AS cgst,
+                   SUM(ri.sgst_amount) AS sgst, SUM(ri.igst_amount) AS igst
+            FROM returns r
+            LEFT JOIN return_items ri ON ri.return_id = r.id
+            WHERE r.tenant_id = :tenant_id
+            AND r.return_date BETWEEN :start_date AND :end_date
+            AND r.status = 'approved'
+        """), params).fetchone()
+
+    # ------------------------------------------------------------------
+    # Summary
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def get_summary(tenant_id, start_date, end_date):
+        """
+        Sales / taxable / GST totals (all invoices) less credit notes, and per month
+
+        Returns:
+            {'sales', 'totals', 'invoice_count', 'return_sales', 'returns', 'returns_count',
+             'net_sales', 'net', 'monthly_data' {'YYYY-MM': {'sales', 'taxable', 'gst', 'count'}}}
+        """
+        return GstComputationService._cached('summary', tenant_id, start_date, end_date,
+                                             GSTR3B_DUE_DAY, GstComputationService._compute_summary)
+
+    @staticmethod
+    def _compute_summary(tenant_id, start_date, end_date):
+        params = {'tenant_id': tenant_id, 'start_date': start_date, 'end_date': end_date}
+
+        # Grouped by day (dialect-neutral); months are rolled up below
+        daily_sales = db.session.execute(text("""
+            SELECT invoice_date, COUNT(*) AS invoice_count,
+                   SUM(total_amount) AS sales, SUM(subtotal) AS taxable,
+                   SUM(cgst_amount) AS cgst, SUM(sgst_amount) AS sgst, SUM(igst_amount) AS igst
+            FROM invoices
+            WHERE tenant_id = :tenant_id
+            AND invoice_date BETWEEN :start_date AND :end_date
+            GROUP BY invoice_date
+        """).columns(invoice_date=db.Date), params).fetchall()
+
+        daily_returns = db.session.execute(text("""
+            SELECT r.return_date, r.id, r.total_amount AS sales,
+                   SUM(ri.taxable_amount) AS taxable, SUM(ri.cgst_amount) AS cgst,
+                   SUM(ri.sgst_amount) AS sgst, SUM(ri.igst_amount) AS igst
+            FROM returns r
+            LEFT JOIN return_items ri ON ri.return_id = r.id
+            WHERE r.tenant_id = :tenant_id
+            AND r.return_date BETWEEN :start_date AND :end_date
+            AND r.status = 'approved'
+            GROUP BY r.return_date, r.id, r.total_amount
+        """).columns(return_date=db.Date), params).fetchall()
+
+        totals = _empty_totals()
+        sales = ZERO
+        invoice_count = 0
+        monthly_data = {}
+        for row in daily_sales:
+            day = _tax_totals(row)
+            totals = {key: totals[key] + day[key] for key in totals}
+            sales += _dec(row.sales)
+            invoice_count += row.invoice_count
+
+            month = monthly_data.setdefault(row.invoice_date.strftime('%Y-%m'), {
+                'sales': ZERO, 'taxable': ZERO, 'gst': ZERO, 'count': 0
+            })
+            month['sales'] += _dec(row.sales)
+            month['taxable'] += day['taxable_value']
+            month['gst'] += day['total_tax']
+            month['count'] += row.invoice_count
+
+        return_totals = _empty_totals()
+        return_sales = ZERO
+        for row in daily_returns:
+            ret = _tax_totals(row)
+            return_totals = {key: return_totals[key] + ret[key] for key in return_totals}
+            return_sales += _dec(row.sales)
+
+            # Credit notes reduce the month they were issued in (if it had sales)
+            month = monthly_data.get(row.return_date.strftime('%Y-%m'))
+            if month:
+                month['sales'] -= _dec(row.sales)
+                month['taxable'] -= ret['taxable_value']
+                month['gst'] -= ret['total_tax']
+
+        return {
+            'sales': sales,
+            'totals': totals,
+            'invoice_count': invoice_count,
+            'return_sales': return_sales,
+            'returns': return_totals,
+            'returns_count': len(daily_returns),
+            'net_sales': sales - return_sales,
+            'net': _subtract(totals, return_totals),
+            'monthly_data': dict(sorted(monthly_data.items()))
+        }
@@ -0,0 +1,405 @@
+"""
+GST Export Service
+GSTR-1 JSON (offline tool format) and GSTR-2 CSV written row by row
+
+Sections are read through server-side cursors and yielded as text chunks;
+wrap them in gzip_stream() for a compressed download.
+"""
+from models import db
+from services.gst_computation_service import GstComputationService, GST_INVOICE_TYPES
+from sqlalchemy import text
+from itertools import groupby
+from io import StringIO
+import csv
+import json
+import zlib
+
+STREAM_BATCH_SIZE = 1000  # Rows fetched per round trip from the server-side cursor
+CHUNK_SIZE = 64 * 1024  # Bytes of output per chunk handed to the response
+
+# B2C inter-state invoices above this value are reported invoice-wise (B2CL)
+B2CL_LIMIT = 100000
+
+# GST state codes (place of supply)
+GST_STATE_CODES = {
+    'jammu and kashmir': '01', 'himachal pradesh': '02', 'punjab': '03', 'chandigarh': '04',
+    'uttarakhand': '05', 'haryana': '06', 'delhi': '07', 'rajasthan': '08', 'uttar pradesh': '09',
+    'bihar': '10', 'sikkim': '11', 'arunachal pradesh': '12', 'nagaland': '13', 'manipur': '14',
+    'mizoram': '15', 'tripura': '16', 'meghalaya': '17', 'assam': '18', 'west bengal': '19',
+    'jharkhand': '20', 'odisha': '21', 'chhattisgarh': '22', 'madhya pradesh': '23', 'gujarat': '24',
+    'dadra and nagar haveli and daman and diu': '26', 'maharashtra': '27', 'karnataka': '29',
+    'goa': '30', 'lakshadweep': '31', 'kerala': '32', 'tamil nadu': '33', 'puducherry': '34',
+    'andaman and nicobar islands': '35', 'telangana': '36', 'andhra pradesh': '37', 'ladakh': '38',
+}
+
+# Units used on invoices -> GST unit quantity codes (UQC)
+UQC_CODES = {
+    'nos': 'NOS', 'pcs': 'PCS', 'piece': 'PCS', 'kg': 'KGS', 'kgs': 'KGS', 'g': 'GMS', 'gm': 'GMS',
+    'ltr': 'LTR', 'liter': 'LTR', 'litre': 'LTR', 'ml': 'MLT', 'mtr': 'MTR', 'box': 'BOX',
+    'dozen': 'DOZ', 'pack': 'PAC', 'set': 'SET', 'bottle': 'BTL',
+}
+
+
+def state_code(state, gstin=None, default=None):
+    """Two-digit GST state code from a state name (falls back to the GSTIN prefix)"""
+    code = GST_STATE_CODES.get((state or '').strip().lower())
+    if code:
+        return code
+    if gstin and len(gstin.strip()) >= 2 and gstin.strip()[:2].isdigit():
+        return gstin.strip()[:2]
+    return default
+
+
+def _amount(value):
+    return round(float(value or 0), 2)
+
+
+def _gst_date(value):
+    return value.strftime('%d-%m-%Y')
+
+
+def _stream(sql, params, **column_types):
+    """Rows of a query through a server-side cursor"""
+    statement = text(sql)
+    if column_types:
+        statement = statement.columns(**column_types)
+    return db.session.execute(
+        statement.execution_options(stream_results=True, yield_per=STREAM_BATCH_SIZE),
+        params
+    )
+
+
+def _item_details(rows):
+    """itms[] of one invoice / note from its rate-wise rows"""
+    return [
+        {
+            'num': num,
+            'itm_det': {
+                'rt': float(row.gst_rate or 0),
+                'txval': _amount(row.taxable),
+                'iamt': _amount(row.igst),
+                'camt': _amount(row.cgst),
+                'samt': _amount(row.sgst),
+                'csamt': 0
+            }
+        }
+        for num, row in enumerate(rows, start=1)
+    ]
+
+
+def _json_array(groups, open_group, render_entry):
+    """
+    Text chunks of a JSON array of groups, each with a nested array of entries
+
+    groups: iterable of (key, rows) from itertools.groupby
+    open_group(key): JSON text opening the group object up to its array, e.g. '{"ctin":"..","inv":['
+    render_entry(rows): dict for one entry (rows of one invoice / note)
+    """
+    yield '['
+    for group_index, (key, group_rows) in enumerate(groups):
+        yield (',' if group_index else '') + open_group(key)
+        for entry_index, (entry_id, entry_rows) in enumerate(groupby(group_rows, key=lambda r: r.id)):
+            yield (',' if entry_index else '') + json.dumps(render_entry(list(entry_rows)), separators=(',', ':'))
+        yield ']}'
+    yield ']'
+
+
+def chunked(parts, size=CHUNK_SIZE):
+    """Join small text parts into ~size chunks (fewer writes to the socket)"""
+    buffer = []
+    length = 0
+    for part in parts:
+        buffer.append(part)
+        length += len(part)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def gzip_stream(chunks):
+    """gzip-compress a stream of text chunks on the fly"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class GstExportService:
+    """Streaming GSTR-1 JSON and GSTR-2 CSV exports"""
+
+    @staticmethod
+    def iter_gstr1_json(tenant_id, start_date, end_date, gstin, home_state=None):
+        """
+        GSTR-1 JSON for a period (b2b, b2cl, b2cs, cdnr, hsn) as text chunks
+
+        Args:
+            gstin: Tenant's GSTIN
+            home_state: Tenant's state (place of supply when an invoice has none)
+        """
+        params = {'tenant_id': tenant_id, 'start_date': start_date, 'end_date': end_date, 'b2cl_limit': B2CL_LIMIT}
+        home_code = state_code(home_state, gstin, default='27')
+
+        def sections():
+            yield '{"gstin":' + json.dumps(gstin or '') + ',"fp":"' + start_date.strftime('%m%Y') + '"'
+
+            yield ',"b2b":'
+            yield from GstExportService._gstr1_b2b(params, home_code)
+            yield ',"b2cl":'
+            yield from GstExportService._gstr1_b2cl(params, home_code)
+            yield ',"b2cs":'
+            yield json.dumps(GstExportService._gstr1_b2cs(params, home_code), separators=(',', ':'))
+            yield ',"cdnr":'
+            yield from GstExportService._gstr1_cdnr(params, home_code)
+            yield ',"hsn":'
+            yield json.dumps({'data': GstExportService._gstr1_hsn(params)}, separators=(',', ':'))
+            yield '}'
+
+        return chunked(sections())
+
+    # Rate-wise lines of outward invoices, in invoice order (one row per invoice and rate)
+    _INVOICE_LINES = f"""
+        SELECT i.id, i.invoice_number, i.invoice_date, i.total_amount, i.customer_state,
+               TRIM(i.customer_gstin) AS ctin,
+               ii.gst_rate,
+               SUM(ii.taxable_value) AS taxable, SUM(ii.cgst_amount) AS cgst,
+               SUM(ii.sgst_amount) AS sgst, SUM(ii.igst_amount) AS igst
+        FROM invoices i
+        JOIN invoice_items ii ON ii.invoice_id = i.id
+        WHERE i.tenant_id = :tenant_id
+        AND i.invoice_date BETWEEN :start_date AND :end_date
+        AND i.invoice_type IN {GST_INVOICE_TYPES}
+        AND {{condition}}
+        GROUP BY i.id, i.invoice_number, i.invoice_date, i.total_amount, i.customer_state, i.customer_gstin, ii.gst_rate
+        ORDER BY {{order}}, i.id, ii.gst_rate
+    """
+
+    _B2B = "TRIM(COALESCE(i.customer_gstin, '')) <> ''"
+    _B2CL = "TRIM(COALESCE(i.customer_gstin, '')) = '' AND i.igst_amount > 0 AND i.total_amount > :b2cl_limit"
+
+    @staticmethod
+    def _gstr1_b2b(params, home_code):
+        rows = _stream(GstExportService._INVOICE_LINES.format(condition=GstExportService._B2B, order='ctin'),
+                       params, invoice_date=db.Date)
+
+        def invoice(rows):
+            first = rows[0]
+            return {
+                'inum': first.invoice_number,
+                'idt': _gst_date(first.invoice_date),
+                'val': _amount(first.total_amount),
+                'pos': state_code(first.customer_state, first.ctin, home_code),
+                'rchrg': 'N',
+                'inv_typ': 'R',
+                'itms': _item_details(rows)
+            }
+
+        yield from _json_array(
+            groupby(rows, key=lambda r: r.ctin),
+            lambda ctin: '{"ctin":' + json.dumps(ctin) + ',"inv":[',
+            invoice
+        )
+
+    @staticmethod
+    def _gstr1_b2cl(params, home_code):
+        rows = _stream(GstExportService._INVOICE_LINES.format(condition=GstExportService._B2CL, order='i.customer_state'),
+                       params, invoice_date=db.Date)
+
+        def invoice(rows):
+            first = rows[0]
+            return {
+                'inum': first.invoice_number,
+                'idt': _gst_date(first.invoice_date),
+                'val': _amount(first.total_amount),
+                'itms': _item_details(rows)
+            }
+
+        yield from _json_array(
+            groupby(rows, key=lambda r: state_code(r.customer_state, default=home_code)),
+            lambda pos: '{"pos":"' + pos + '","inv":[',
+            invoice
+        )
+
+    @staticmethod
+    def _gstr1_b2cs(params, home_code):
+        """Other B2C supplies by supply type / place of supply / rate, net of B2C credit notes"""
+        rows = db.session.execute(text(f"""
+            SELECT customer_state, inter_state, gst_rate,
+                   SUM(taxable) AS taxable, SUM(cgst) AS cgst, SUM(sgst) AS sgst, SUM(igst) AS igst
+            FROM (
+                SELECT i.customer_state, CASE WHEN i.igst_amount > 0 THEN 1 ELSE 0 END AS inter_state,
+                       ii.gst_rate, ii.taxable_value AS taxable,
+                       ii.cgst_amount AS cgst, ii.sgst_amount AS sgst, ii.igst_amount AS igst
+                FROM invoices i
+                JOIN invoice_items ii ON ii.invoice_id = i.id
+                WHERE i.tenant_id = :tenant_id
+                AND i.invoice_date BETWEEN :start_date AND :end_date
+                AND i.invoice_type IN {GST_INVOICE_TYPES}
+                AND TRIM(COALESCE(i.customer_gstin, '')) = ''
+                AND NOT (i.igst_amount > 0 AND i.total_amount > :b2cl_limit)
+                UNION ALL
+                SELECT i.customer_state, CASE WHEN COALESCE(ri.igst_amount, 0) > 0 THEN 1 ELSE 0 END,
+                       ri.gst_rate, -ri.taxable_amount,
+                       -ri.cgst_amount, -ri.sgst_amount, -ri.igst_amount
+                FROM return_items ri
+                JOIN returns r ON r.id = ri.return_id
+                LEFT JOIN invoices i ON i.id = r.invoice_id
+                WHERE r.tenant_id = :tenant_id
+                AND r.return_date BETWEEN :start_date AND :end_date
+                AND r.status = 'approved'
+                AND TRIM(COALESCE(i.customer_gstin, '')) = ''
+            ) lines
+            GROUP BY customer_state, inter_state, gst_rate
+        """), params).fetchall()
+
+        # State names -> codes (different spellings can share a code)
+        merged = {}
+        for row in rows:
+            key = ('INTER' if row.inter_state else 'INTRA', state_code(row.customer_state, default=home_code),
+                   float(row.gst_rate or 0))
+            entry = merged.setdefault(key, {'txval': 0.0, 'iamt': 0.0, 'camt': 0.0, 'samt': 0.0})
+            entry['txval'] += float(row.taxable or 0)
+            entry['iamt'] += float(row.igst or 0)
+            entry['camt'] += float(row.cgst or 0)
+            entry['samt'] += float(row.sgst or 0)
+
+        return [
+            {
+                'sply_ty': supply_type,
+                'pos': pos,
+                'typ': 'OE',
+                'rt': rate,
+                'txval': _amount(entry['txval']),
+                'iamt': _amount(entry['iamt']),
+                'camt': _amount(entry['camt']),
+                'samt': _amount(entry['samt']),
+                'csamt': 0
+            }
+            for (supply_type, pos, rate), entry in sorted(merged.items())
+        ]
+
+    @staticmethod
+    def _gstr1_cdnr(params, home_code):
+        """Credit notes (approved returns) issued to registered customers"""
+        rows = _stream("""
+            SELECT r.id, COALESCE(r.credit_note_number, r.return_number) AS note_number,
+                   COALESCE(r.credit_note_date, r.return_date) AS note_date, r.total_amount,
+                   TRIM(i.customer_gstin) AS ctin, i.customer_state,
+                   ri.gst_rate,
+                   SUM(ri.taxable_amount) AS taxable, SUM(ri.cgst_amount) AS cgst,
+                   SUM(ri.sgst_amount) AS sgst, SUM(ri.igst_amount) AS igst
+            FROM returns r
+            JOIN invoices i ON i.id = r.invoice_id
+            JOIN return_items ri ON ri.return_id = r.id
+            WHERE r.tenant_id = :tenant_id
+            AND r.return_date BETWEEN :start_date AND :end_date
+            AND r.status = 'approved'
+            AND TRIM(COALESCE(i.customer_gstin, '')) <> ''
+            GROUP BY r.id, r.credit_note_number, r.return_number, r.credit_note_date, r.return_date,
+                     r.total_amount, i.customer_gstin, i.customer_state, ri.gst_rate
+            ORDER BY ctin, r.id, ri.gst_rate
+        """, params, note_date=db.Date)
+
+        def note(rows):
+            first = rows[0]
+            return {
+                'ntty': 'C',
+                'nt_num': first.note_number,
+                'nt_dt': _gst_date(first.note_date),
+                'val': _amount(first.total_amount),
+                'pos': state_code(first.customer_state, first.ctin, home_code),
+                'rchrg': 'N',
+                'inv_typ': 'R',
+                'itms': _item_details(rows)
+            }
+
+        yield from _json_array(
+            groupby(rows, key=lambda r: r.ctin),
+            lambda ctin: '{"ctin":' + json.dumps(ctin) + ',"nt":[',
+            note
+        )
+
+    @staticmethod
+    def _gstr1_hsn(params):
+        """HSN summary (net of credit notes) from the grouped item rollup"""
+        rows = GstComputationService.get_item_rollup(params, 'hsn_code', 'gst_rate', 'unit')
+        rows = sorted(rows, key=lambda r: (r.hsn_code or '', float(r.gst_rate or 0), r.unit or ''))
+        return [
+            {
+                'num': num,
+                'hsn_sc': row.hsn_code or '',
+                'desc': '',
+                'uqc': UQC_CODES.get((row.unit or '').strip().lower(), 'OTH'),
+                'qty': _amount(float(row.quantity or 0) - float(row.ret_quantity or 0)),
+                'rt': float(row.gst_rate or 0),
+                'txval': _amount(float(row.taxable or 0) - float(row.ret_taxable or 0)),
+                'iamt': _amount(float(row.igst or 0) - float(row.ret_igst or 0)),
+                'camt': _amount(float(row.cgst or 0) - float(row.ret_cgst or 0)),
+                'samt': _amount(float(row.sgst or 0) - float(row.ret_sgst or 0)),
+                'csamt': 0
+            }
+            for num, row in enumerate(rows, start=1)
+        ]
+
+    @staticmethod
+    def iter_gstr2_csv(tenant_id, start_date, end_date, company_name):
+        """GSTR-2 purchase register + ITC summary as CSV text chunks (approved bills with GST)"""
+        rows = _stream("""
+            SELECT bill_date, bill_number, vendor_name, vendor_gstin, vendor_state,
+                   subtotal, cgst_amount, sgst_amount, igst_amount, total_amount
+            FROM purchase_bills
+            WHERE tenant_id = :tenant_id
+            AND status = 'approved'
+            AND bill_date BETWEEN :start_date AND :end_date
+            AND (cgst_amount > 0 OR sgst_amount > 0 OR igst_amount > 0)
+            ORDER BY bill_date ASC, id ASC
+        """, {'tenant_id': tenant_id, 'start_date': start_date, 'end_date': end_date}, bill_date=db.Date)
+
+        def lines():
+            out = StringIO()
+            writer = csv.writer(out)
+
+            def flush():
+                value = out.getvalue()
+                out.seek(0)
+                out.truncate()
+                return value
+
+            start_date_str, end_date_str = start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+            writer.writerow([f'{company_name} - GSTR-2 Report'])
+            writer.writerow([f'Period: {start_date_str} to {end_date_str}'])
+            writer.writerow([])
+
+            # Purchase Register
+            writer.writerow(['PURCHASE REGISTER'])
+            writer.writerow(['Date', 'Bill No.', 'Vendor Name', 'GSTIN', 'State', 'Taxable Value', 'CGST', 'SGST', 'IGST', 'Total Amount'])
+            yield flush()
+
+            totals = [0.0] * 5  # taxable, cgst, sgst, igst, total
+            for bill in rows:
+                values = [float(bill.subtotal or 0), float(bill.cgst_amount or 0), float(bill.sgst_amount or 0),
+                          float(bill.igst_amount or 0), float(bill.total_amount or 0)]
+                writer.writerow([
+                    bill.bill_date.strftime('%d-%m-%Y'),
+                    bill.bill_number,
+                    bill.vendor_name,
+                    bill.vendor_gstin or 'N/A',
+                    bill.vendor_state or 'Maharashtra',
+                    *[f'{value:.2f}' for value in values]
+                ])
+                totals = [total + value for total, value in zip(totals, values)]
+                yield flush()
+
+            taxable, cgst, sgst, igst, amount = totals
+            writer.writerow(['TOTAL', '', '', '', '', f'{taxable:.2f}', f'{cgst:.2f}', f'{sgst:.2f}', f'{igst:.2f}', f'{amount:.2f}'])
+            writer.writerow([])
+            writer.writerow(['ITC SUMMARY'])
+            writer.writerow(['Total Taxable Value', 'Total CGST', 'Total SGST', 'Total IGST', 'Total ITC'])
+            writer.writerow([f'{taxable:.2f}', f'{cgst:.2f}', f'{sgst:.2f}', f'{igst:.2f}', f'{cgst + sgst + igst:.2f}'])
+            yield flush()
+
+        return chunked(lines())
@@ -0,0 +1,226 @@
+"""
+Invoice PDF Service
+Cached invoice PDFs and batch rendering for month-end mailing
+
+PDFs are cached in memory and on disk (PDF_CACHE_DIR) under a hash of the
+invoice, the tenant and PDF_TEMPLATE_VERSION, so edits never need an
+invalidation. Batches render cache misses in a process pool.
+"""
+from models import Invoice
+from utils.pdf_utils import render_invoice_pdf_bytes, PDF_TEMPLATE_VERSION
+from utils.tenant_cache import TTLCache
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy.orm import joinedload, selectinload
+from types import SimpleNamespace
+import tempfile
+import hashlib
+import zipfile
+import os
+
+PDF_CACHE_DIR = os.environ.get('PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'bizbooks_pdf_cache'))
+PDF_MEMORY_CACHE_SIZE = int(os.environ.get('PDF_MEMORY_CACHE_SIZE', 64))  # PDFs per worker
+PDF_MEMORY_CACHE_TTL = int(os.environ.get('PDF_MEMORY_CACHE_TTL', 3600))  # seconds
+PDF_BATCH_WORKERS = int(os.environ.get('PDF_BATCH_WORKERS', min(4, os.cpu_count() or 1)))
+PDF_BATCH_CHUNK_SIZE = 200  # Invoices loaded (and rendered) per round
+MIN_POOL_BATCH = 8  # Smaller batches render in-process (pool startup costs more)
+
+
+class InvoicePdfService:
+    """Cached invoice PDFs"""
+
+    # cache key -> PDF bytes
+    _memory = TTLCache(max_size=PDF_MEMORY_CACHE_SIZE, ttl=PDF_MEMORY_CACHE_TTL)
+
+    @staticmethod
+    def cache_key(invoice, tenant):
+        """Content address of an invoice PDF"""
+        source = '|'.join(str(part) for part in (
+            tenant.id, invoice.id, invoice.updated_at, tenant.updated_at, PDF_TEMPLATE_VERSION
+        ))
+        return hashlib.sha256(source.encode()).hexdigest()
+
+    @staticmethod
+    def _disk_path(key):
+        return os.path.join(PDF_CACHE_DIR, key[:2], f'{key}.pdf')
+
+    @staticmethod
+    def _load(key):
+        """Cached PDF bytes, or None"""
+        pdf = InvoicePdfService._memory.get(key)
+        if pdf is not TTLCache.MISSING:
+            return pdf
+
+        try:
+            with open(InvoicePdfService._disk_path(key), 'rb') as f:
+                pdf = f.read()
+        except OSError:
+            return None
+
+        InvoicePdfService._memory.set(key, pdf)
+        return pdf
+
+    @staticmethod
+    def _store(key, pdf):
+        InvoicePdfService._memory.set(key, pdf)
+
+        path = InvoicePdfService._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write-then-rename: other workers never see a partial file
+            temp_path = f'{path}.{os.getpid()}.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(pdf)
+            os.replace(temp_path, path)
+        except OSError as e:
+            # Read-only or full disk - the memory tier still works
+            print(f"⚠️ PDF cache write failed: {str(e)}")
+
+    @staticmethod
+    def get_invoice_pdf(invoice, tenant):
+        """
+        PDF bytes of an invoice (rendered once per version)
+
+        Args:
+            invoice: Invoice
+            tenant: Tenant or g.tenant snapshot
+        """
+        key = InvoicePdfService.cache_key(invoice, tenant)
+        pdf = InvoicePdfService._load(key)
+        if pdf is None:
+            pdf = render_invoice_pdf_bytes(invoice, tenant)
+            InvoicePdfService._store(key, pdf)
+        return pdf
+
+    @staticmethod
+    def snapshot(invoice):
+        """Picklable copy of everything generate_invoice_pdf reads from an invoice"""
+        customer = invoice.customer
+        return SimpleNamespace(
+            id=invoice.id,
+            invoice_number=invoice.invoice_number,
+            invoice_date=invoice.invoice_date,
+            status=invoice.status,
+            payment_status=invoice.payment_status,
+            customer_name=invoice.customer_name,
+            customer_phone=invoice.customer_phone,
+            customer_email=invoice.customer_email,
+            customer_address=invoice.customer_address,
+            customer=SimpleNamespace(state=customer.state) if customer else None,
+            items=[
+                SimpleNamespace(
+                    item_name=item.item_name,
+                    hsn_code=item.hsn_code,
+                    quantity=item.quantity,
+                    unit=item.unit,
+                    rate=item.rate,
+                    gst_rate=item.gst_rate,
+                    total_amount=item.total_amount
+                )
+                for item in invoice.items
+            ],
+            subtotal=invoice.subtotal,
+            total_amount=invoice.total_amount,
+            amount_in_words=invoice.amount_in_words(),
+            notes=invoice.notes
+        )
+
+    @staticmethod
+    def tenant_snapshot(tenant):
+        """Picklable copy of the tenant fields on the PDF"""
+        return SimpleNamespace(
+            company_name=tenant.company_name,
+            admin_phone=tenant.admin_phone,
+            admin_email=tenant.admin_email
+        )
+
+    @staticmethod
+    def _render_many(snapshots, tenant_snapshot, pool):
+        """PDF bytes for each snapshot (in the pool if there is one)"""
+        if pool is None:
+            return [render_invoice_pdf_bytes(snapshot, tenant_snapshot) for snapshot in snapshots]
+        return list(pool.map(
+            render_invoice_pdf_bytes,
+            snapshots,
+            [tenant_snapshot] * len(snapshots),
+            chunksize=max(1, len(snapshots) // (PDF_BATCH_WORKERS * 4))
+        ))
+
+    @staticmethod
+    def write_zip(tenant, invoice_ids, output, progress_callback=None):
+        """
+        Write the PDFs of many invoices into a ZIP file
+
+        Invoices are loaded in chunks (items and customer eagerly); cached
+        PDFs are reused and the rest are rendered in a process pool.
+
+        Args:
+            tenant: Tenant (invoices are limited to it)
+            invoice_ids: Invoice IDs, in the order they go into the ZIP
+            output: Writable binary file
+            progress_callback: Optional callable(done, total)
+
+        Returns:
+            {'invoice_count': int, 'rendered': int, 'cached': int}
+        """
+        total = len(invoice_ids)
+        done = rendered = cached = 0
+        tenant_snapshot = InvoicePdfService.tenant_snapshot(tenant)
+
+        pool = None
+        if PDF_BATCH_WORKERS > 1 and total >= MIN_POOL_BATCH:
+            # Pool processes only render snapshots - they never touch the database
+            pool = ProcessPoolExecutor(max_workers=PDF_BATCH_WORKERS)
+
+        try:
+            with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+                for start in range(0, total, PDF_BATCH_CHUNK_SIZE):
+                    chunk_ids = invoice_ids[start:start + PDF_BATCH_CHUNK_SIZE]
+                    invoices = {
+                        invoice.id: invoice for invoice in Invoice.query.filter(
+                            Invoice.tenant_id == tenant.id,
+                            Invoice.id.in_(chunk_ids)
+                        ).options(
+                            joinedload(Invoice.customer),
+                            selectinload(Invoice.items)
+                        ).all()
+                    }
+
+                    pdfs = {}
+                    misses = []
+                    for invoice in invoices.values():
+                        key = InvoicePdfService.cache_key(invoice, tenant)
+                        pdf = InvoicePdfService._load(key)
+                        if pdf is None:
+                            misses.append((key, invoice))
+                        else:
+                            pdfs[invoice.id] = pdf
+                            cached += 1
+
+                    if misses:
+                        results = InvoicePdfService._render_many(
+                            [InvoicePdfService.snapshot(invoice) for key, invoice in misses],
+                            tenant_snapshot,
+                            pool
+                        )
+                        for (key, invoice), pdf in zip(misses, results):
+                            InvoicePdfService._store(key, pdf)
+                            pdfs[invoice.id] = pdf
+                        rendered += len(misses)
+
+                    for invoice_id in chunk_ids:
+                        if invoice_id in pdfs:
+                            # PDFs are already compressed
+                            archive.writestr(
+                                f'{invoices[invoice_id].invoice_number}.pdf',
+                                pdfs[invoice_id],
+                                compress_type=zipfile.ZIP_STORED
+                            )
+
+                    done += len(chunk_ids)
+                    if progress_callback:
+                        progress_callback(done, total)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        return {'invoice_count': rendered + cached, 'rendered': rendered, 'cached': cached}
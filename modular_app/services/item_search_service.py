@@ -0,0 +1,205 @@
+"""
+Item Search Service
+Typeahead search over a tenant's catalog for invoice / purchase bill entry
+
+PostgreSQL uses pg_trgm indexes (/migration/add-item-search-index); SQLite
+an in-memory trigram index per tenant.
+"""
+from models import db
+from sqlalchemy import text
+from collections import defaultdict
+import threading
+
+
+# Columns returned to the billing screens (keep the JSON small)
+RESULT_COLUMNS_SQL = """
+    i.id, i.name, i.sku, i.barcode, i.mrp, i.discount_percent,
+    i.selling_price, i.cost_price, i.gst_rate, i.hsn_code, i.unit,
+    i.track_inventory, i.reorder_point,
+    c.name AS category_name,
+    (SELECT COALESCE(SUM(s.quantity_available), 0)
+     FROM item_stocks s
+     WHERE s.item_id = i.id) AS total_stock
+"""
+
+# Match ranks
+EXACT_MATCH = 0   # barcode scan / SKU typed in full
+PREFIX_MATCH = 1
+SUBSTRING_MATCH = 2
+
+
+def _like_escape(value):
+    """Escape LIKE wildcards in user input"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _trigrams(value):
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+class _TrigramIndex:
+    """In-memory trigram index of one tenant's active items (SQLite fallback)"""
+
+    def __init__(self, fingerprint, rows):
+        self.fingerprint = fingerprint
+        self.entries = {}  # id -> (name, sku, barcode) lowercased
+        self.sort_names = {}
+        self.postings = defaultdict(set)  # trigram -> item ids
+
+        for item_id, name, sku, barcode in rows:
+            fields = tuple((value or '').lower() for value in (name, sku, barcode))
+            self.entries[item_id] = fields
+            self.sort_names[item_id] = fields[0]
+            for field in fields:
+                for gram in _trigrams(field):
+                    self.postings[gram].add(item_id)
+
+    def search(self, query, limit):
+        """Item ids ranked exact > prefix > substring, then by name"""
+        query = query.lower()
+
+        if len(query) >= 3:
+            # Candidates must contain every trigram of the query
+            candidates = None
+            for gram in sorted(_trigrams(query), key=lambda g: len(self.postings.get(g, ()))):
+                ids = self.postings.get(gram)
+                if not ids:
+                    return []
+                candidates = set(ids) if candidates is None else candidates & ids
+                if not candidates:
+                    return []
+        else:
+            candidates = self.entries.keys()
+
+        ranked = []
+        for item_id in candidates:
+            name, sku, barcode = self.entries[item_id]
+            if query == barcode or query == sku:
+                rank = EXACT_MATCH
+            elif name.startswith(query) or sku.startswith(query) or barcode.startswith(query):
+                rank = PREFIX_MATCH
+            elif query in name or query in sku or query in barcode:
+                rank = SUBSTRING_MATCH
+            else:
+                continue  # trigram false positive
+            ranked.append((rank, self.sort_names[item_id], item_id))
+
+        ranked.sort()
+        return [item_id for _, _, item_id in ranked[:limit]]
+
+
+class ItemSearchService:
+    """Ranked item suggestions with stock totals"""
+
+    _indexes = {}  # tenant_id -> _TrigramIndex (SQLite only)
+    _lock = threading.Lock()
+    _has_pg_trgm = None
+
+    @staticmethod
+    def search(tenant_id, query, limit=20):
+        """
+        Search a tenant's active items by name, SKU or barcode
+
+        Args:
+            tenant_id: Tenant ID
+            query: Text typed / scanned by the user
+            limit: Max suggestions
+
+        Returns:
+            List of result rows (see RESULT_COLUMNS_SQL), best match first
+        """
+        query = (query or '').strip()
+        if not query:
+            return []
+        limit = max(1, min(int(limit or 20), 50))
+
+        if db.engine.dialect.name == 'postgresql':
+            return ItemSearchService._search_postgres(tenant_id, query, limit)
+        return ItemSearchService._search_in_memory(tenant_id, query, limit)
+
+    @staticmethod
+    def _search_postgres(tenant_id, query, limit):
+        if ItemSearchService._has_pg_trgm is None:
+            ItemSearchService._has_pg_trgm = db.session.execute(text(
+                "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+            )).fetchone() is not None
+
+        # Tie-break by trigram similarity when the extension is installed
+        similarity = 'similarity(i.name, :query)' if ItemSearchService._has_pg_trgm else '0'
+        escaped = _like_escape(query)
+
+        return db.session.execute(text(f"""
+            WITH matches AS (
+                SELECT
+                    i.id,
+                    CASE
+                        WHEN LOWER(i.barcode) = LOWER(:query) OR LOWER(i.sku) = LOWER(:query) THEN {EXACT_MATCH}
+                        WHEN i.name ILIKE :prefix ESCAPE '\\'
+                          OR i.sku ILIKE :prefix ESCAPE '\\'
+                          OR i.barcode ILIKE :prefix ESCAPE '\\' THEN {PREFIX_MATCH}
+                        ELSE {SUBSTRING_MATCH}
+                    END AS match_rank,
+                    {similarity} AS score
+                FROM items i
+                WHERE i.tenant_id = :tenant_id
+                AND i.is_active = TRUE
+                AND (i.name ILIKE :contains ESCAPE '\\'
+                     OR i.sku ILIKE :contains ESCAPE '\\'
+                     OR i.barcode ILIKE :contains ESCAPE '\\')
+                ORDER BY match_rank, score DESC, i.name
+                LIMIT :limit
+            )
+            SELECT {RESULT_COLUMNS_SQL}
+            FROM matches m
+            JOIN items i ON i.id = m.id
+            LEFT JOIN item_categories c ON c.id = i.category_id
+            ORDER BY m.match_rank, m.score DESC, i.name
+        """), {
+            'tenant_id': tenant_id,
+            'query': query,
+            'prefix': f'{escaped}%',
+            'contains': f'%{escaped}%',
+            'limit': limit
+        }).fetchall()
+
+    @staticmethod
+    def _search_in_memory(tenant_id, query, limit):
+        item_ids = ItemSearchService._get_index(tenant_id).search(query, limit)
+        if not item_ids:
+            return []
+
+        params = {f'id_{n}': item_id for n, item_id in enumerate(item_ids)}
+        rows = db.session.execute(text(f"""
+            SELECT {RESULT_COLUMNS_SQL}
+            FROM items i
+            LEFT JOIN item_categories c ON c.id = i.category_id
+            WHERE i.id IN ({', '.join(':' + key for key in params)})
+        """), params).fetchall()
+
+        position = {item_id: n for n, item_id in enumerate(item_ids)}
+        return sorted(rows, key=lambda row: position[row.id])
+
+    @staticmethod
+    def _get_index(tenant_id):
+        """Tenant's trigram index, rebuilt when its items were added/edited/deleted"""
+        fingerprint = tuple(db.session.execute(text("""
+            SELECT COUNT(*), MAX(updated_at)
+            FROM items
+            WHERE tenant_id = :tenant_id
+        """), {'tenant_id': tenant_id}).fetchone())
+
+        index = ItemSearchService._indexes.get(tenant_id)
+        if index is not None and index.fingerprint == fingerprint:
+            return index
+
+        rows = db.session.execute(text("""
+            SELECT id, name, sku, barcode
+            FROM items
+            WHERE tenant_id = :tenant_id
+            AND is_active = TRUE
+        """), {'tenant_id': tenant_id}).fetchall()
+
+        index = _TrigramIndex(fingerprint, rows)
+        with ItemSearchService._lock:
+            ItemSearchService._indexes[tenant_id] = index
+        return index
@@ -0,0 +1,40 @@
+"""
+Item Stock Service
+Low-stock lists and counts from the maintained items.total_stock / is_low_stock
+"""
+from models import db, Item
+from models.item_stock_totals import ITEM_STOCK_TOTALS
+
+
+class ItemStockService:
+    """Maintained stock totals"""
+
+    @staticmethod
+    def low_stock_filter(query, tenant_id):
+        """Limit an Item query to the tenant's low-stock items"""
+        return query.filter(
+            Item.tenant_id == tenant_id,
+            Item.is_low_stock == True
+        )
+
+    @staticmethod
+    def low_stock_count(tenant_id):
+        """Number of active tracked items below their reorder point"""
+        return ItemStockService.low_stock_filter(Item.query, tenant_id).filter(
+            Item.is_active == True
+        ).count()
+
+    @staticmethod
+    def rebuild(tenant_id=None):
+        """
+        Add the columns if missing, re-install triggers and recompute totals
+
+        Args:
+            tenant_id: Rebuild one tenant, or all tenants if None
+
+        Returns:
+            Number of items updated
+        """
+        items_updated = ITEM_STOCK_TOTALS.rebuild(db.session.connection(), tenant_id)
+        db.session.commit()
+        return items_updated
@@ -0,0 +1,504 @@
+"""
+Job Queue Service
+DB-backed background jobs for work that doesn't fit in an HTTP request
+
+Routes enqueue a job and get its id back; job_worker.py, or the cron drain
+endpoint on serverless hosting, claims queued jobs and runs their handlers.
+Failed jobs are retried with backoff, and jobs of dead workers are requeued.
+"""
+from models import db
+from models.background_job import BackgroundJob
+from flask import has_request_context, request
+from sqlalchemy import text
+from datetime import datetime, timedelta
+import os
+import requests
+import socket
+import time
+import traceback
+
+JOB_TENANT_CONCURRENCY = int(os.environ.get('JOB_TENANT_CONCURRENCY', 1))  # running jobs per tenant
+JOB_STALE_AFTER = int(os.environ.get('JOB_STALE_AFTER', 30 * 60))  # seconds without heartbeat
+RETRY_BACKOFF_SECONDS = 30  # 30s, 60s, 120s, ...
+RETRY_BACKOFF_MAX = 60 * 60
+PROGRESS_WRITE_INTERVAL = 2  # seconds between progress writes
+
+# Opt-in only: run jobs in the request that queues them (the request waits for the job)
+JOB_RUN_INLINE = os.environ.get('JOB_RUN_INLINE', '0')  # 1 | 0
+# auto = wake a drain request after queueing on serverless platforms (no worker process)
+JOB_DRAIN_KICK = os.environ.get('JOB_DRAIN_KICK', 'auto')  # auto | 1 | 0
+JOB_DRAIN_URL = os.environ.get('JOB_DRAIN_URL', '')  # default: this host's drain endpoint
+JOB_DRAIN_PATH = '/scheduled-tasks/run-background-jobs'
+JOB_DRAIN_KICK_INTERVAL = 15  # seconds between status page wake-ups (per instance)
+
+_last_kick = 0.0
+
+
+def run_inline():
+    """Run jobs in the enqueuing request instead of leaving them to a worker"""
+    return JOB_RUN_INLINE == '1'
+
+
+def drain_kick_enabled():
+    """Wake a drain request after queueing (no worker process to pick the job up)"""
+    if JOB_DRAIN_KICK != 'auto':
+        return JOB_DRAIN_KICK == '1'
+    return bool(os.environ.get('VERCEL') or os.environ.get('AWS_LAMBDA_FUNCTION_NAME'))
+
+
+def kick_drain():
+    """
+    Start a drain request without waiting for it to finish
+
+    Returns:
+        True if the request was sent
+    """
+    global _last_kick
+    if not drain_kick_enabled():
+        return False
+
+    secret = os.environ.get('CRON_SECRET', '')
+    url = JOB_DRAIN_URL
+    if not url and has_request_context():
+        url = request.host_url.rstrip('/') + JOB_DRAIN_PATH
+    elif not url and os.environ.get('VERCEL_URL'):
+        url = f"https://{os.environ['VERCEL_URL']}{JOB_DRAIN_PATH}"
+    if not secret or not url:
+        print("⚠️ Can't wake a job drain: set CRON_SECRET (and JOB_DRAIN_URL outside requests)")
+        return False
+
+    _last_kick = time.monotonic()
+    try:
+        # The drain runs in its own invocation - only wait until it has the request
+        requests.post(url, headers={'X-Cron-Secret': secret}, timeout=(5, 1))
+    except requests.exceptions.ReadTimeout:
+        pass
+    except requests.exceptions.RequestException as e:
+        print(f"⚠️ Couldn't wake a job drain at {url}: {str(e)}")
+        return False
+    return True
+
+
+class PermanentJobError(Exception):
+    """Raise from a handler to fail the job without retrying"""
+
+
+class JobContext:
+    """Passed to handlers: job input plus progress / output helpers"""
+
+    def __init__(self, job):
+        self.job = job
+        self.job_id = job.id
+        self.tenant_id = job.tenant_id
+        self.payload = job.payload or {}
+        self._last_progress_write = 0
+
+    @property
+    def input_file(self):
+        return self.job.input_file
+
+    def progress(self, percent, message=None, force=False):
+        """
+        Report progress (0-100) - also serves as the worker heartbeat
+
+        PostgreSQL: written on a separate connection so the status endpoint sees
+        it while the handler's transaction is still open.
+        SQLite (local dev): stored on the job row and saved with the handler's
+        next commit (a second writer would wait for the handler's lock).
+        """
+        percent = max(0, min(int(percent), 100))
+        now = time.monotonic()
+        if not force and now - self._last_progress_write < PROGRESS_WRITE_INTERVAL:
+            return
+        self._last_progress_write = now
+
+        message = (message or '')[:255] or None
+        if db.engine.dialect.name == 'postgresql':
+            with db.engine.begin() as connection:
+                connection.execute(text("""
+                    UPDATE background_jobs
+                    SET progress = :progress, progress_message = :message, heartbeat_at = :now
+                    WHERE id = :job_id
+                """), {'progress': percent, 'message': message, 'now': datetime.utcnow(), 'job_id': self.job_id})
+        else:
+            self.job.progress = percent
+            self.job.progress_message = message
+            self.job.heartbeat_at = datetime.utcnow()
+
+    def save_file(self, filename, mimetype, data):
+        """Attach a downloadable result (label PDF...)"""
+        self.job.result_filename = filename
+        self.job.result_mimetype = mimetype
+        self.job.result_file = data
+
+
+class JobQueue:
+    """Enqueue, claim and run background jobs"""
+
+    # job_type -> {'handler': callable(context) -> result dict, 'max_attempts': int}
+    _handlers = {}
+
+    @staticmethod
+    def register(job_type, max_attempts=3):
+        """
+        Decorator registering the handler of a job type
+
+        Handlers get a JobContext and return a JSON-serializable result.
+        Use max_attempts=1 for work that isn't safe to repeat after a failure.
+        """
+        def decorator(handler):
+            JobQueue._handlers[job_type] = {'handler': handler, 'max_attempts': max_attempts}
+            return handler
+        return decorator
+
+    @staticmethod
+    def _load_handlers():
+        # Handlers register themselves on import
+        import services.background_jobs  # noqa: F401
+
+    @staticmethod
+    def enqueue(job_type, tenant_id=None, payload=None, input_file=None, input_filename=None,
+                created_by=None, unique=False):
+        """
+        Add a job to the queue (commits)
+
+        Args:
+            job_type: Registered job type
+            tenant_id: Tenant the job belongs to (None = system job)
+            payload: JSON-serializable handler arguments
+            input_file: Optional bytes (e.g. uploaded Excel file)
+            unique: Return the tenant's queued/running job of this type instead
+                    of adding a second one (double-clicked "Generate" buttons)
+
+        Returns:
+            BackgroundJob
+        """
+        JobQueue._load_handlers()
+        if job_type not in JobQueue._handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+
+        if unique:
+            existing = BackgroundJob.query.filter(
+                BackgroundJob.tenant_id == tenant_id,
+                BackgroundJob.job_type == job_type,
+                BackgroundJob.status.in_([BackgroundJob.QUEUED, BackgroundJob.RUNNING])
+            ).order_by(BackgroundJob.id).first()
+            if existing:
+                if existing.status == BackgroundJob.QUEUED:
+                    JobQueue._dispatch(existing.id)
+                return existing
+
+        job = BackgroundJob(
+            tenant_id=tenant_id,
+            job_type=job_type,
+            status=BackgroundJob.QUEUED,
+            payload=payload or {},
+            input_file=input_file,
+            input_filename=input_filename,
+            max_attempts=JobQueue._handlers[job_type]['max_attempts'],
+            run_after=datetime.utcnow(),
+            created_by=created_by
+        )
+        db.session.add(job)
+        db.session.commit()
+        print(f"📥 Job {job.id} queued: {job_type} (tenant {tenant_id})")
+        
+        JobQueue._dispatch(job.id)
+        return job
+
+    @staticmethod
+    def _dispatch(job_id):
+        """Get a queued job started: inline if opted in, else wake a drain (serverless)"""
+        if run_inline():
+            JobQueue.run_now(job_id)
+        else:
+            kick_drain()
+
+    @staticmethod
+    def kick_if_waiting(job):
+        """Status page poll: wake a drain if the job is runnable but nothing picked it up"""
+        if (job.status == BackgroundJob.QUEUED and job.run_after <= datetime.utcnow()
+                and time.monotonic() - _last_kick >= JOB_DRAIN_KICK_INTERVAL):
+            kick_drain()
+
+    @staticmethod
+    def run_now(job_id, worker_id=None):
+        """
+        Claim one specific queued job and run it in this process (commits)
+
+        Used with JOB_RUN_INLINE. Skips the per-tenant concurrency limit - the
+        caller is waiting on this job.
+
+        Returns:
+            Final status, or None if another worker claimed the job first
+        """
+        worker_id = worker_id or default_worker_id()
+        claimed = db.session.execute(text("""
+            UPDATE background_jobs
+            SET status = :running,
+                locked_by = :worker,
+                attempts = attempts + 1,
+                started_at = :now,
+                heartbeat_at = :now,
+                error = NULL
+            WHERE id = :job_id AND status = :queued
+        """), {
+            'running': BackgroundJob.RUNNING,
+            'queued': BackgroundJob.QUEUED,
+            'worker': worker_id,
+            'now': datetime.utcnow(),
+            'job_id': job_id
+        }).rowcount
+        db.session.commit()
+        if not claimed:
+            return None
+        
+        status = JobQueue.run_job(job_id, worker_id)
+        db.session.expire_all()  # Callers hold the job object from before the run
+        return status
+
+    @staticmethod
+    def get_tenant_job(job_id, tenant_id):
+        """A tenant's job (None if it doesn't exist or belongs to another tenant)"""
+        return BackgroundJob.query.filter_by(id=job_id, tenant_id=tenant_id).first()
+
+    @staticmethod
+    def requeue_stale_jobs():
+        """Put jobs back in the queue whose worker stopped sending heartbeats"""
+        now = datetime.utcnow()
+        result = db.session.execute(text("""
+            UPDATE background_jobs
+            SET status = CASE WHEN attempts < max_attempts THEN :queued ELSE :failed END,
+                error = 'Worker stopped responding',
+                locked_by = NULL,
+                run_after = :now,
+                finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE :now END
+            WHERE status = :running
+            AND COALESCE(heartbeat_at, started_at) < :stale_before
+        """), {
+            'queued': BackgroundJob.QUEUED,
+            'failed': BackgroundJob.FAILED,
+            'running': BackgroundJob.RUNNING,
+            'now': now,
+            'stale_before': now - timedelta(seconds=JOB_STALE_AFTER)
+        })
+        db.session.commit()
+        return result.rowcount
+
+    @staticmethod
+    def claim_next(worker_id, job_types=None):
+        """
+        Atomically mark the next runnable job as running (commits)
+
+        Skips jobs scheduled for later (retry backoff) and tenants that
+        already have JOB_TENANT_CONCURRENCY jobs running.
+
+        Returns:
+            Job id, or None if nothing is runnable
+        """
+        now = datetime.utcnow()
+        params = {
+            'queued': BackgroundJob.QUEUED,
+            'running': BackgroundJob.RUNNING,
+            'worker': worker_id,
+            'now': now,
+            'limit': JOB_TENANT_CONCURRENCY
+        }
+
+        type_filter = ''
+        if job_types:
+            params.update({f'type_{n}': job_type for n, job_type in enumerate(job_types)})
+            type_filter = f"AND j.job_type IN ({', '.join(f':type_{n}' for n in range(len(job_types)))})"
+
+        skip_locked = 'FOR UPDATE OF j SKIP LOCKED' if db.engine.dialect.name == 'postgresql' else ''
+
+        row = db.session.execute(text(f"""
+            UPDATE background_jobs
+            SET status = :running,
+                locked_by = :worker,
+                attempts = attempts + 1,
+                started_at = :now,
+                heartbeat_at = :now,
+                error = NULL
+            WHERE id = (
+                SELECT j.id
+                FROM background_jobs j
+                WHERE j.status = :queued
+                AND j.run_after <= :now
+                {type_filter}
+                AND (
+                    j.tenant_id IS NULL
+                    OR (SELECT COUNT(*) FROM background_jobs r
+                        WHERE r.tenant_id = j.tenant_id
+                        AND r.status = :running) < :limit
+                )
+                ORDER BY j.run_after, j.id
+                LIMIT 1
+                {skip_locked}
+            )
+            AND status = :queued
+            RETURNING id, tenant_id
+        """), params).fetchone()
+
+        if row is None:
+            db.session.commit()
+            return None
+
+        job_id, tenant_id = row
+        if tenant_id is not None and db.engine.dialect.name == 'postgresql':
+            # Two workers can claim jobs of the same tenant at the same moment
+            # (neither sees the other's uncommitted claim). Serialize the check
+            # per tenant; the later claim goes back to the queue.
+            db.session.execute(text("SELECT pg_advisory_xact_lock(hashtext('background_jobs'), :tenant_id)"),
+                               {'tenant_id': tenant_id})
+            running_elsewhere = db.session.execute(text("""
+                SELECT COUNT(*) FROM background_jobs
+                WHERE tenant_id = :tenant_id AND status = :running AND id != :job_id
+            """), {'tenant_id': tenant_id, 'running': BackgroundJob.RUNNING, 'job_id': job_id}).scalar()
+
+            if running_elsewhere >= JOB_TENANT_CONCURRENCY:
+                db.session.rollback()
+                return None
+
+        db.session.commit()
+        return job_id
+
+    @staticmethod
+    def run_job(job_id, worker_id=None):
+        """
+        Run a claimed job and record the outcome (commits)
+
+        Returns:
+            Final status of this attempt (succeeded / queued for retry / failed)
+        """
+        JobQueue._load_handlers()
+        job = db.session.get(BackgroundJob, job_id)
+        registration = JobQueue._handlers.get(job.job_type)
+        started = time.monotonic()
+
+        print(f"▶️ Job {job.id} started: {job.job_type} (tenant {job.tenant_id}, attempt {job.attempts}/{job.max_attempts})")
+
+        try:
+            if registration is None:
+                raise PermanentJobError(f"No handler registered for job type '{job.job_type}'")
+
+            context = JobContext(job)
+            result = registration['handler'](context)
+
+            job.status = BackgroundJob.SUCCEEDED
+            job.result = result
+            job.progress = 100
+            job.finished_at = datetime.utcnow()
+            job.locked_by = None
+            db.session.commit()
+
+            print(f"✅ Job {job.id} succeeded in {time.monotonic() - started:.1f}s")
+
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e)}"
+            print(f"❌ Job {job_id} failed: {error}")
+            traceback.print_exc()
+
+            db.session.rollback()
+            job = db.session.get(BackgroundJob, job_id)
+
+            job.error = error[:2000]
+            job.locked_by = None
+            if job.attempts < job.max_attempts and not isinstance(e, PermanentJobError):
+                delay = min(RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1), RETRY_BACKOFF_MAX)
+                job.status = BackgroundJob.QUEUED
+                job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+                print(f"🔄 Job {job.id} will retry in {delay}s")
+            else:
+                job.status = BackgroundJob.FAILED
+                job.finished_at = datetime.utcnow()
+            db.session.commit()
+
+        return job.status
+
+    @staticmethod
+    def run_pending(worker_id=None, time_budget=None, max_jobs=None, job_types=None):
+        """
+        Run queued jobs until the queue is empty (or the budget is used up)
+
+        Args:
+            worker_id: Name recorded on claimed jobs
+            time_budget: Seconds after which no new job is started (serverless)
+            max_jobs: Stop after this many jobs
+
+        Returns:
+            {'jobs_run': int, 'succeeded': int, 'failed': int, 'retrying': int,
+             'requeued_stale': int, 'out_of_time': bool}
+        """
+        worker_id = worker_id or default_worker_id()
+        started = time.monotonic()
+        summary = {'jobs_run': 0, 'succeeded': 0, 'failed': 0, 'retrying': 0,
+                   'requeued_stale': JobQueue.requeue_stale_jobs(), 'out_of_time': False}
+
+        while max_jobs is None or summary['jobs_run'] < max_jobs:
+            if time_budget is not None and time.monotonic() - started >= time_budget:
+                summary['out_of_time'] = True
+                break
+
+            job_id = JobQueue.claim_next(worker_id, job_types)
+            if job_id is None:
+                break
+
+            status = JobQueue.run_job(job_id, worker_id)
+            summary['jobs_run'] += 1
+            if status == BackgroundJob.SUCCEEDED:
+                summary['succeeded'] += 1
+            elif status == BackgroundJob.FAILED:
+                summary['failed'] += 1
+            else:
+                summary['retrying'] += 1
+
+            # Don't keep handler objects around between jobs
+            db.session.expunge_all()
+
+        return summary
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def run_worker(app, poll_interval=5, once=False, job_types=None, stop_event=None):
+    """
+    Worker loop: run queued jobs, sleep poll_interval seconds when idle
+
+    Args:
+        app: Flask app (jobs run inside its app context)
+        once: Drain the queue once and return (cron / tests)
+        stop_event: threading.Event to stop the loop
+    """
+    worker_id = default_worker_id()
+    print(f"👷 Job worker {worker_id} started (poll every {poll_interval}s)")
+
+    while stop_event is None or not stop_event.is_set():
+        try:
+            with app.app_context():
+                summary = JobQueue.run_pending(worker_id, job_types=job_types)
+                db.session.remove()
+        except Exception as e:
+            # Database restarts etc. - keep the worker alive
+            print(f"❌ Job worker error: {str(e)}")
+            traceback.print_exc()
+            summary = {'jobs_run': 0}
+
+        if once:
+            return summary
+        if summary['jobs_run'] == 0:
+            if stop_event is not None:
+                stop_event.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+
+
+def start_worker_thread(app, poll_interval=5):
+    """Run a worker inside the web process (local development / single-instance servers)"""
+    import threading
+
+    thread = threading.Thread(target=run_worker, args=(app, poll_interval), name='job-worker', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,260 @@
+"""
+Ledger Aggregation Service
+Single source of ledger figures for the Trial Balance, Balance Sheet and P&L
+
+All ledger heads for a period are fetched in ONE grouped query (see
+LedgerBalanceService) and mapped onto account lines using the declarative
+CHART_OF_ACCOUNTS below, so the three reports can never disagree.
+"""
+from models import db
+from services.ledger_balance_service import LedgerBalanceService
+from sqlalchemy import text
+from decimal import Decimal
+
+
+# ============================================================
+# CHART OF ACCOUNTS
+# ============================================================
+# Each line's balance = SUM(add) - SUM(subtract), where every term is
+# (column, transaction_type) and column is 'debit' or 'credit'.
+# A positive balance is shown on the line's normal_balance side.
+# Lines with 'opposite' are also shown when the balance goes negative
+# (with the opposite label/category); others only when positive.
+# Order = display order in the Trial Balance.
+
+CHART_OF_ACCOUNTS = [
+    # Inventory increases: inventory_opening_debit, inventory_purchase
+    # Inventory decreases: inventory_sale (ONLY! Not COGS - that's a separate expense)
+    {
+        'key': 'inventory',
+        'account_name': 'Inventory (Stock on Hand)',
+        'category': 'Assets',
+        'normal_balance': 'debit',
+        'add': [('debit', 'inventory_opening_debit'), ('debit', 'inventory_purchase')],
+        'subtract': [('credit', 'inventory_sale')],
+    },
+    # GST paid on purchases that can be claimed back from government
+    {
+        'key': 'input_tax_credit',
+        'account_name': 'Input Tax Credit (ITC)',
+        'category': 'Assets',
+        'normal_balance': 'debit',
+        'add': [('debit', 'input_tax_credit')],
+    },
+    # GST amounts from customer returns that can be claimed back
+    {
+        'key': 'gst_receivable_returns',
+        'account_name': 'GST Receivable (Returns)',
+        'category': 'Assets',
+        'normal_balance': 'debit',
+        'add': [('debit', 'gst_return_cgst'), ('debit', 'gst_return_sgst'), ('debit', 'gst_return_igst')],
+    },
+    # Commission amounts to be recovered from agents due to sales returns
+    {
+        'key': 'commission_recoverable',
+        'account_name': 'Commission Recoverable',
+        'category': 'Assets',
+        'normal_balance': 'debit',
+        'add': [('debit', 'commission_recoverable')],
+    },
+    # CREDITS (bills created) - DEBITS (payments made) = Outstanding
+    {
+        'key': 'accounts_payable',
+        'account_name': 'Accounts Payable (Vendors)',
+        'category': 'Liabilities',
+        'normal_balance': 'credit',
+        'add': [('credit', 'accounts_payable'), ('credit', 'accounts_payable_payment')],
+        'subtract': [('debit', 'accounts_payable'), ('debit', 'accounts_payable_payment')],
+    },
+    # GST collected from customers
+    {
+        'key': 'gst_payable',
+        'account_name': 'GST Payable (CGST+SGST+IGST)',
+        'category': 'Liabilities',
+        'normal_balance': 'credit',
+        'add': [('credit', 'gst_payable')],
+    },
+    {
+        'key': 'sales_income',
+        'account_name': 'Sales Income',
+        'category': 'Income',
+        'normal_balance': 'credit',
+        'add': [('credit', 'sales_income')],
+    },
+    # COGS is recorded when items are SOLD (not when purchased), reversed on returns
+    {
+        'key': 'cogs',
+        'account_name': 'Cost of Goods Sold (COGS)',
+        'category': 'Expenses',
+        'normal_balance': 'debit',
+        'add': [('debit', 'cogs')],
+        'subtract': [('credit', 'cogs_reversal')],
+    },
+    # Contra-revenue: sales returns reduce income, shown as debit
+    {
+        'key': 'sales_returns',
+        'account_name': 'Sales Returns',
+        'category': 'Expenses',
+        'normal_balance': 'debit',
+        'add': [('debit', 'sales_return')],
+    },
+    {
+        'key': 'round_off',
+        'account_name': 'Round-off Expense',
+        'category': 'Expenses',
+        'normal_balance': 'debit',
+        'add': [('debit', 'round_off_expense')],
+        'subtract': [('credit', 'round_off_expense')],
+        'opposite': {'account_name': 'Round-off Expense (Credit Excess)', 'category': 'Expenses'},
+    },
+    # GST cost from credit adjustments (debit) vs. other income (credit)
+    {
+        'key': 'other_income',
+        'account_name': 'Other Income/Expense (GST Cost)',
+        'category': 'Expenses',
+        'normal_balance': 'debit',
+        'add': [('debit', 'other_income_reversal')],
+        'subtract': [('credit', 'other_income')],
+        'opposite': {'account_name': 'Other Income', 'category': 'Income'},
+    },
+    {
+        'key': 'operating_expenses',
+        'account_name': 'Operating Expenses',
+        'category': 'Expenses',
+        'normal_balance': 'debit',
+        'add': [('debit', 'operating_expense')],
+    },
+    # Spent from employee cash advances (recorded as credits against the advance)
+    {
+        'key': 'employee_expenses',
+        'account_name': 'Employee Expenses',
+        'category': 'Expenses',
+        'normal_balance': 'debit',
+        'add': [('credit', 'employee_expense')],
+    },
+    {
+        'key': 'salary_expenses',
+        'account_name': 'Salary Expenses',
+        'category': 'Expenses',
+        'normal_balance': 'debit',
+        'add': [('debit', 'salary_expense')],
+    },
+    # Can go negative when reversals (from returns) exceed expenses
+    {
+        'key': 'commission_expenses',
+        'account_name': 'Commission Expenses',
+        'category': 'Expenses',
+        'normal_balance': 'debit',
+        'add': [('debit', 'commission_expense')],
+        'subtract': [('credit', 'commission_reversal')],
+        'opposite': {'account_name': 'Commission Expenses (Reversal Excess)', 'category': 'Expenses'},
+    },
+]
+
+CHART_BY_KEY = {account['key']: account for account in CHART_OF_ACCOUNTS}
+
+
+class LedgerSnapshot:
+    """Ledger head totals for one tenant/period, mapped through the chart of accounts"""
+
+    def __init__(self, totals):
+        # {transaction_type: {'debit': Decimal, 'credit': Decimal}}
+        self.totals = totals
+
+    def _sum(self, terms):
+        return sum(
+            (self.totals[head][column] for column, head in terms if head in self.totals),
+            Decimal('0')
+        )
+
+    def balance(self, key):
+        """Signed balance of a chart line (positive = on its normal side)"""
+        account = CHART_BY_KEY[key]
+        return self._sum(account['add']) - self._sum(account.get('subtract', []))
+
+    def trial_balance_lines(self):
+        """Chart lines with a balance, in Trial Balance row format"""
+        lines = []
+        for account in CHART_OF_ACCOUNTS:
+            balance = self.balance(account['key'])
+            if balance > 0:
+                label, side = account, account['normal_balance']
+            elif balance < 0 and 'opposite' in account:
+                label, side = account['opposite'], 'credit' if account['normal_balance'] == 'debit' else 'debit'
+            else:
+                continue
+
+            lines.append({
+                'account_name': label['account_name'],
+                'category': label['category'],
+                'debit': abs(balance) if side == 'debit' else Decimal('0'),
+                'credit': abs(balance) if side == 'credit' else Decimal('0')
+            })
+        return lines
+
+
+class LedgerAggregationService:
+    """Shared ledger figures for the accounting reports"""
+
+    @staticmethod
+    def aggregate(tenant_id, end_date, start_date=None):
+        """
+        Fetch every ledger head bucket for the period in one query
+
+        Args:
+            tenant_id: Tenant ID
+            end_date: Period end (inclusive) / "as of" date
+            start_date: Period start for P&L; None = cumulative from the beginning
+
+        Returns:
+            LedgerSnapshot
+        """
+        return LedgerSnapshot(LedgerBalanceService.get_head_totals(tenant_id, end_date, start_date=start_date))
+
+    @staticmethod
+    def get_cash_bank_accounts(tenant_id):
+        """
+        Active cash & bank accounts with their current balance
+
+        Returns:
+            List of (account_name, account_type, current_balance) rows, cash first
+        """
+        return db.session.execute(text("""
+            SELECT
+                account_name,
+                account_type,
+                current_balance
+            FROM bank_accounts
+            WHERE tenant_id = :tenant_id
+            AND is_active = TRUE
+            ORDER BY
+                CASE account_type
+                    WHEN 'cash' THEN 1
+                    WHEN 'bank' THEN 2
+                END,
+                account_name
+        """), {'tenant_id': tenant_id}).fetchall()
+
+    @staticmethod
+    def get_receivables(tenant_id, as_of_date):
+        """
+        Outstanding receivables per customer as of a date
+
+        🆕 EXCLUDES credit_adjustment invoices (no AR - customer already paid via kaccha bill)
+
+        Returns:
+            List of (customer_name, outstanding) rows, largest first
+        """
+        return db.session.execute(text("""
+            SELECT
+                customer_name,
+                SUM(total_amount - COALESCE(paid_amount, 0)) as outstanding
+            FROM invoices
+            WHERE tenant_id = :tenant_id
+            AND payment_status != 'paid'
+            AND invoice_date <= :as_of_date
+            AND (invoice_type IS NULL OR invoice_type != 'credit_adjustment')
+            GROUP BY customer_name
+            HAVING SUM(total_amount - COALESCE(paid_amount, 0)) > 0
+            ORDER BY outstanding DESC
+        """), {'tenant_id': tenant_id, 'as_of_date': as_of_date}).fetchall()
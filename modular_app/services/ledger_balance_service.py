@@ -0,0 +1,62 @@
+"""
+Ledger Balance Service
+Reads per-account-head totals from the materialized ledger_daily_balances table
+"""
+from models import db
+from models.ledger_balance import LEDGER_DAILY_BALANCES
+from sqlalchemy import text
+from decimal import Decimal
+
+
+class LedgerBalanceService:
+    """Cumulative debit/credit totals per account head, in a single query"""
+
+    @staticmethod
+    def get_head_totals(tenant_id, end_date, start_date=None):
+        """
+        Get debit/credit totals for every account head of a tenant
+
+        Args:
+            tenant_id: Tenant ID
+            end_date: Include transactions up to and including this date
+            start_date: Optional lower bound (P&L periods); None = from the beginning
+
+        Returns:
+            dict: {account_head: {'debit': Decimal, 'credit': Decimal}}
+        """
+        params = {'tenant_id': tenant_id, 'end_date': end_date}
+        date_filter = 'AND balance_date <= :end_date'
+        if start_date:
+            date_filter = 'AND balance_date BETWEEN :start_date AND :end_date'
+            params['start_date'] = start_date
+
+        rows = db.session.execute(text(f"""
+            SELECT account_head, SUM(debit_total), SUM(credit_total)
+            FROM ledger_daily_balances
+            WHERE tenant_id = :tenant_id
+            {date_filter}
+            GROUP BY account_head
+        """), params).fetchall()
+
+        return {
+            row[0]: {
+                'debit': Decimal(str(row[1] or 0)),
+                'credit': Decimal(str(row[2] or 0))
+            }
+            for row in rows
+        }
+
+    @staticmethod
+    def rebuild(tenant_id=None):
+        """
+        Re-install triggers and recompute balances from account_transactions
+
+        Args:
+            tenant_id: Rebuild one tenant, or all tenants if None
+
+        Returns:
+            Number of (head, day) balance rows written
+        """
+        rows_written = LEDGER_DAILY_BALANCES.rebuild(db.session.connection(), tenant_id)
+        db.session.commit()
+        return rows_written
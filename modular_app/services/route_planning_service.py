@@ -0,0 +1,257 @@
+"""
+Route Planning Service
+Delivery schedule and the delivery staff's today page for one date
+
+A route plan (customers, active plans, default employees, the day's
+delivery lines) is built with two queries and cached per worker for
+(tenant, date), revalidated with one aggregate query on every load.
+"""
+from models import db, Customer, CustomerSubscription, SubscriptionPlan, SubscriptionDelivery, Employee
+from services.delivery_engine import DeliveryEngine
+from utils.tenant_cache import TTLCache
+from sqlalchemy import text
+from sqlalchemy.orm import aliased
+from types import SimpleNamespace
+from decimal import Decimal
+import os
+
+ROUTE_PLAN_TTL = int(os.environ.get('ROUTE_PLAN_TTL', 300))  # seconds
+
+
+class DeliveryLine:
+    """
+    One delivery on a route plan (read-only, shared between requests)
+
+    Has the attributes the schedule and delivery templates read from
+    SubscriptionDelivery / ScheduledDelivery; related records
+    (subscription.customer, subscription.plan, *_employee) are plain copies.
+    id is None for days that come from the plan rules.
+    """
+    status_display = SubscriptionDelivery.status_display
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    @property
+    def is_virtual(self):
+        return self.id is None
+
+    def __repr__(self):
+        return f'<DeliveryLine {self.delivery_date} - subscription {self.subscription_id}>'
+
+
+class RoutePlanningService:
+    """Cached per-date delivery data for the schedule and employee pages"""
+
+    # (tenant_id, date) -> (fingerprint, plan)
+    _plans = TTLCache(max_size=512, ttl=ROUTE_PLAN_TTL)
+
+    @staticmethod
+    def _fingerprint(tenant_id, target_date):
+        """Changes whenever anything on the date's plan changes"""
+        return tuple(db.session.execute(text("""
+            SELECT
+                (SELECT COUNT(*) FROM subscription_deliveries
+                 WHERE tenant_id = :tenant_id AND delivery_date = :target_date),
+                (SELECT MAX(updated_at) FROM subscription_deliveries
+                 WHERE tenant_id = :tenant_id AND delivery_date = :target_date),
+                (SELECT COUNT(*) FROM customer_subscriptions WHERE tenant_id = :tenant_id),
+                (SELECT MAX(updated_at) FROM customer_subscriptions WHERE tenant_id = :tenant_id),
+                (SELECT MAX(updated_at) FROM customers WHERE tenant_id = :tenant_id),
+                (SELECT MAX(updated_at) FROM subscription_plans WHERE tenant_id = :tenant_id)
+        """), {'tenant_id': tenant_id, 'target_date': target_date}).fetchone())
+
+    @staticmethod
+    def get_route_plan(tenant_id, target_date):
+        """
+        Route plan for one date
+
+        Returns:
+            {'date', 'customers': [{'id', 'name', 'phone', 'plans', 'default_employee_id',
+             'default_employee_name'}] by name, 'lines': [DeliveryLine] by customer name}
+            Shared between requests - don't modify it.
+        """
+        key = (tenant_id, target_date)
+        fingerprint = RoutePlanningService._fingerprint(tenant_id, target_date)
+        cached = RoutePlanningService._plans.get(key)
+        if cached is not TTLCache.MISSING and cached[0] == fingerprint:
+            return cached[1]
+
+        plan = RoutePlanningService._build(tenant_id, target_date)
+        RoutePlanningService._plans.set(key, (fingerprint, plan))
+        return plan
+
+    @staticmethod
+    def _build(tenant_id, target_date):
+        """Build a route plan (two queries)"""
+        DefaultEmployee = aliased(Employee)
+        subscription_rows = db.session.query(
+            CustomerSubscription.id,
+            CustomerSubscription.start_date,
+            CustomerSubscription.current_period_end,
+            CustomerSubscription.default_quantity,
+            SubscriptionPlan.name.label('plan_name'),
+            SubscriptionPlan.plan_type,
+            SubscriptionPlan.unit_name,
+            SubscriptionPlan.unit_rate,
+            SubscriptionPlan.delivery_pattern,
+            SubscriptionPlan.custom_days,
+            Customer.id.label('customer_id'),
+            Customer.name.label('customer_name'),
+            Customer.phone,
+            Customer.address,
+            Customer.bottles_in_possession,
+            Customer.delivery_special_instruction,
+            Customer.delivery_comment,
+            Customer.default_delivery_employee,
+            DefaultEmployee.name.label('default_employee_name')
+        ).join(
+            SubscriptionPlan, SubscriptionPlan.id == CustomerSubscription.plan_id
+        ).join(
+            Customer, Customer.id == CustomerSubscription.customer_id
+        ).outerjoin(
+            DefaultEmployee, DefaultEmployee.id == Customer.default_delivery_employee
+        ).filter(
+            CustomerSubscription.tenant_id == tenant_id,
+            CustomerSubscription.status == 'active'
+        ).order_by(Customer.name.asc(), CustomerSubscription.id.asc()).all()
+
+        AssignedEmployee = aliased(Employee)
+        DeliveredByEmployee = aliased(Employee)
+        exception_rows = db.session.query(
+            SubscriptionDelivery,
+            AssignedEmployee.name.label('assigned_to_name'),
+            DeliveredByEmployee.name.label('delivered_by_name')
+        ).join(
+            CustomerSubscription, CustomerSubscription.id == SubscriptionDelivery.subscription_id
+        ).outerjoin(
+            AssignedEmployee, AssignedEmployee.id == SubscriptionDelivery.assigned_to
+        ).outerjoin(
+            DeliveredByEmployee, DeliveredByEmployee.id == SubscriptionDelivery.delivered_by
+        ).filter(
+            CustomerSubscription.tenant_id == tenant_id,
+            CustomerSubscription.status == 'active',
+            SubscriptionDelivery.delivery_date == target_date
+        ).all()
+        exceptions = {row.SubscriptionDelivery.subscription_id: row for row in exception_rows}
+
+        customers = {}
+        lines = []
+        for row in subscription_rows:
+            customer = customers.get(row.customer_id)
+            if customer is None:
+                customer = customers[row.customer_id] = {
+                    'record': SimpleNamespace(
+                        id=row.customer_id,
+                        name=row.customer_name,
+                        phone=row.phone,
+                        address=row.address,
+                        bottles_in_possession=row.bottles_in_possession or 0,
+                        delivery_special_instruction=row.delivery_special_instruction,
+                        delivery_comment=row.delivery_comment,
+                        default_delivery_employee=row.default_delivery_employee
+                    ),
+                    'plans': [],
+                    'default_employee_name': row.default_employee_name
+                }
+            customer['plans'].append(row.plan_name)
+
+            if row.plan_type != 'metered':
+                continue
+
+            subscription = SimpleNamespace(
+                id=row.id,
+                tenant_id=tenant_id,
+                start_date=row.start_date,
+                current_period_end=row.current_period_end,
+                default_quantity=row.default_quantity,
+                customer=customer['record'],
+                plan=SimpleNamespace(
+                    name=row.plan_name,
+                    plan_type=row.plan_type,
+                    unit_name=row.unit_name,
+                    unit_rate=row.unit_rate,
+                    delivery_pattern=row.delivery_pattern,
+                    custom_days=row.custom_days
+                )
+            )
+
+            exception = exceptions.get(row.id)
+            if exception:
+                lines.append(RoutePlanningService._exception_line(subscription, exception))
+            elif DeliveryEngine.is_scheduled(subscription, target_date):
+                lines.append(RoutePlanningService._rule_line(subscription, target_date, row.default_employee_name))
+
+        lines.sort(key=lambda line: line.subscription.customer.name)
+
+        return {
+            'date': target_date,
+            'customers': [
+                {
+                    'id': customer['record'].id,
+                    'name': customer['record'].name,
+                    'phone': customer['record'].phone or '',
+                    'plans': ', '.join(customer['plans']),
+                    'default_employee_id': customer['record'].default_delivery_employee,
+                    'default_employee_name': customer['default_employee_name']
+                }
+                for customer in customers.values()
+            ],
+            'lines': lines
+        }
+
+    @staticmethod
+    def _rule_line(subscription, target_date, default_employee_name):
+        """Line for a day that comes from the plan rules"""
+        quantity = subscription.default_quantity or Decimal('0')
+        rate = subscription.plan.unit_rate or Decimal('0')
+        assigned_to = subscription.customer.default_delivery_employee
+        return DeliveryLine(
+            id=None,
+            subscription_id=subscription.id,
+            subscription=subscription,
+            delivery_date=target_date,
+            quantity=quantity,
+            rate=rate,
+            amount=quantity * rate,
+            status='delivered',
+            is_modified=False,
+            modification_reason=None,
+            assigned_to=assigned_to,
+            assigned_to_employee=SimpleNamespace(id=assigned_to, name=default_employee_name) if assigned_to else None,
+            delivered_by=None,
+            delivered_by_employee=None,
+            delivered_at=None,
+            bottles_delivered=0,
+            bottles_collected=0,
+            notes=None
+        )
+
+    @staticmethod
+    def _exception_line(subscription, exception):
+        """Line for a day with a subscription_deliveries row"""
+        delivery = exception.SubscriptionDelivery
+        return DeliveryLine(
+            id=delivery.id,
+            subscription_id=subscription.id,
+            subscription=subscription,
+            delivery_date=delivery.delivery_date,
+            quantity=delivery.quantity,
+            rate=delivery.rate,
+            amount=delivery.amount,
+            status=delivery.status,
+            is_modified=delivery.is_modified,
+            modification_reason=delivery.modification_reason,
+            assigned_to=delivery.assigned_to,
+            assigned_to_employee=SimpleNamespace(
+                id=delivery.assigned_to, name=exception.assigned_to_name
+            ) if delivery.assigned_to else None,
+            delivered_by=delivery.delivered_by,
+            delivered_by_employee=SimpleNamespace(
+                id=delivery.delivered_by, name=exception.delivered_by_name
+            ) if delivery.delivered_by else None,
+            delivered_at=delivery.delivered_at,
+            bottles_delivered=delivery.bottles_delivered or 0,
+            bottles_collected=delivery.bottles_collected or 0,
+            notes=delivery.notes
+        )
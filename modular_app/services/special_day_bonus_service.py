@@ -19,10 +19,13 @@ import pytz
 class SpecialDayBonusService:
     
     @staticmethod
-    def process_all_tenants():
+    def process_all_tenants(progress_callback=None):
         """
         Process special day bonuses for all active/trial tenants
-        Called by scheduled task daily at midnight IST
+        Called by the 'special_day_bonuses' background job (queued daily at midnight IST)
+        
+        Args:
+            progress_callback: Optional callable(done, total)
         """
         from models.tenant import Tenant
         
@@ -40,7 +43,9 @@ class SpecialDayBonusService:
             'errors': []
         }
         
-        for tenant in active_tenants:
+        for done, tenant in enumerate(active_tenants):
+            if progress_callback:
+                progress_callback(done, len(active_tenants))
             try:
                 tenant_result = SpecialDayBonusService.process_tenant(tenant.id)
                 results['tenants_processed'] += 1
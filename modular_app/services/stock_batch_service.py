@@ -3,7 +3,7 @@ Stock Batch Service
 Business logic for GST-aware batch tracking and allocation
 """
 from models import db, StockBatch, Item, InvoiceItem
-from sqlalchemy import and_
+from sqlalchemy import and_, text
 from datetime import datetime
 import pytz
 from decimal import Decimal
@@ -145,33 +145,118 @@ class StockBatchService:
         }
     
     @staticmethod
-    def validate_invoice_item(item_id, quantity, invoice_type, customer, tenant_id):
+    def _load_stock_positions(item_ids, tenant_id, lock=False):
         """
-        Validate if an item can be added to an invoice
+        Load items and their candidate batches for a whole invoice (2 queries)
         
         Args:
-            item_id: Item ID
-            quantity: Requested quantity
+            item_ids: Item IDs on the invoice
+            tenant_id: Tenant ID
+            lock: Row-lock the batches until commit (PostgreSQL FOR UPDATE, in
+                  FIFO order so concurrent invoices lock in the same order).
+                  A batch another invoice is billing is waited for, never
+                  skipped - a missing batch would look like "no batches" and
+                  send the sale to the opening-stock fallback.
+        
+        Returns:
+            dict: item_id -> {'item': row, 'batches': [batch dicts, FIFO order]}
+        """
+        item_ids = sorted({int(item_id) for item_id in item_ids if item_id})
+        if not item_ids:
+            return {}
+        
+        params = {'tenant_id': tenant_id}
+        params.update({f'item_{n}': item_id for n, item_id in enumerate(item_ids)})
+        id_list = ', '.join(f':item_{n}' for n in range(len(item_ids)))
+        
+        positions = {}
+        for row in db.session.execute(text(f"""
+            SELECT id, name, gst_rate, opening_stock, cost_price
+            FROM items
+            WHERE tenant_id = :tenant_id
+            AND id IN ({id_list})
+        """), params).fetchall():
+            positions[row.id] = {'item': row, 'batches': []}
+        
+        lock_clause = ''
+        if lock and db.engine.dialect.name == 'postgresql':
+            lock_clause = 'FOR UPDATE'
+        
+        for row in db.session.execute(text(f"""
+            SELECT id, item_id, quantity_remaining, purchased_with_gst,
+                   base_cost_per_unit, itc_per_unit
+            FROM stock_batches
+            WHERE tenant_id = :tenant_id
+            AND item_id IN ({id_list})
+            AND batch_status = 'active'
+            AND quantity_remaining > 0
+            ORDER BY item_id, purchase_date ASC, id ASC
+            {lock_clause}
+        """), params).fetchall():
+            if row.item_id in positions:
+                positions[row.item_id]['batches'].append({
+                    'id': row.id,
+                    'quantity_remaining': Decimal(str(row.quantity_remaining)),
+                    'purchased_with_gst': bool(row.purchased_with_gst),
+                    'base_cost_per_unit': Decimal(str(row.base_cost_per_unit or 0)),
+                    'itc_per_unit': Decimal(str(row.itc_per_unit or 0))
+                })
+        
+        return positions
+    
+    @staticmethod
+    def _stock_summary(position):
+        """GST / non-GST stock of one item (same rules as get_available_stock)"""
+        batches = position['batches']
+        item = position['item']
+        
+        gst_qty = sum(float(b['quantity_remaining']) for b in batches if b['purchased_with_gst'])
+        non_gst_qty = sum(float(b['quantity_remaining']) for b in batches if not b['purchased_with_gst'])
+        total_qty = gst_qty + non_gst_qty
+        
+        # 🆕 FALLBACK: If no batches exist, use opening_stock from item master
+        if not batches and item.opening_stock and item.opening_stock > 0:
+            total_qty = float(item.opening_stock)
+            # Taxable item - assume purchased WITH GST; exempt item - no GST applicable
+            gst_qty, non_gst_qty = (total_qty, 0) if item.gst_rate > 0 else (0, total_qty)
+        
+        return {'total_stock': total_qty, 'gst_stock': gst_qty, 'non_gst_stock': non_gst_qty}
+    
+    @staticmethod
+    def validate_invoice_items(lines, invoice_type, customer, tenant_id):
+        """
+        Validate all lines of an invoice (previews) with one batch query
+        
+        Args:
+            lines: List of {'item_id': ..., 'quantity': ...}
             invoice_type: 'taxable', 'non_taxable', or 'credit_adjustment'
-            customer: Customer model instance
+            customer: Customer model instance (or None)
             tenant_id: Tenant ID
         
         Returns:
-            dict with status and message
+            List of validation dicts (status + message), one per line
         """
-        # Get item to check GST rate
-        item = Item.query.filter_by(id=item_id, tenant_id=tenant_id).first()
-        if not item:
-            return {
-                'status': 'error',
-                'message': 'Item not found'
-            }
-        
-        # 🆕 USER'S LOGIC: Block GST invoices for exempt items (gst_rate = 0)
-        # Examples: Books, Vegetables, Education Services
-        if invoice_type in ['taxable', 'credit_adjustment']:
-            if item.gst_rate == 0:
-                return {
+        positions = StockBatchService._load_stock_positions(
+            [line['item_id'] for line in lines], tenant_id
+        )
+        results = []
+        
+        for line in lines:
+            position = positions.get(int(line['item_id']))
+            if not position:
+                results.append({
+                    'status': 'error',
+                    'message': 'Item not found'
+                })
+                continue
+            
+            item = position['item']
+            quantity = line['quantity']
+            
+            # 🆕 USER'S LOGIC: Block GST invoices for exempt items (gst_rate = 0)
+            # Examples: Books, Vegetables, Education Services
+            if invoice_type in ['taxable', 'credit_adjustment'] and item.gst_rate == 0:
+                results.append({
                     'status': 'error',
                     'error_type': 'exempt_item',
                     'message': f'''Cannot create GST invoice for exempt item.
@@ -181,28 +266,26 @@ class StockBatchService:
                     
                     This item is GST-exempt. Only non-taxable invoices are allowed.''',
                     'suggestions': ['non_taxable_invoice_only']
-                }
-        
-        # Get stock information
-        stock_info = StockBatchService.get_available_stock(item_id, tenant_id)
-        
-        # For non-taxable invoices, any stock is fine
-        if invoice_type == 'non_taxable':
-            if quantity > stock_info['total_stock']:
-                return {
-                    'status': 'error',
-                    'message': f"Insufficient stock. Available: {stock_info['total_stock']} units"
-                }
-            return {'status': 'ok'}
-        
-        # 🆕 USER'S LOGIC: For taxable invoices, MUST have GST stock
-        # "No GST purchase = No GST sale" - PERIOD!
-        if invoice_type in ['taxable', 'credit_adjustment']:
-            if quantity > stock_info['gst_stock']:
-                # Check customer type for better messaging
-                customer_type = getattr(customer, 'gst_registration_type', 'unregistered')
-                
-                return {
+                })
+                continue
+            
+            stock_info = StockBatchService._stock_summary(position)
+            
+            # For non-taxable invoices, any stock is fine
+            if invoice_type == 'non_taxable':
+                if quantity > stock_info['total_stock']:
+                    results.append({
+                        'status': 'error',
+                        'message': f"Insufficient stock. Available: {stock_info['total_stock']} units"
+                    })
+                else:
+                    results.append({'status': 'ok'})
+                continue
+            
+            # 🆕 USER'S LOGIC: For taxable invoices, MUST have GST stock
+            # "No GST purchase = No GST sale" - PERIOD!
+            if invoice_type in ['taxable', 'credit_adjustment'] and quantity > stock_info['gst_stock']:
+                results.append({
                     'status': 'error',
                     'error_type': 'insufficient_gst_stock',
                     'message': f'''Cannot create GST invoice - insufficient GST stock.
@@ -220,172 +303,241 @@ class StockBatchService:
                     'available_gst_stock': stock_info['gst_stock'],
                     'available_non_gst_stock': stock_info['non_gst_stock'],
                     'suggestions': ['reduce_quantity', 'non_taxable_invoice', 'credit_adjustment_route']
-                }
+                })
+                continue
             
-            return {'status': 'ok'}
+            results.append({'status': 'ok'})
         
-        return {'status': 'ok'}
+        return results
     
     @staticmethod
-    def allocate_stock_for_invoice_item(item_id, quantity, invoice_type, tenant_id):
+    def validate_invoice_item(item_id, quantity, invoice_type, customer, tenant_id):
         """
-        Allocate stock batches for an invoice item (FIFO)
+        Validate if an item can be added to an invoice
         
         Args:
             item_id: Item ID
-            quantity: Quantity to allocate
+            quantity: Requested quantity
+            invoice_type: 'taxable', 'non_taxable', or 'credit_adjustment'
+            customer: Customer model instance
+            tenant_id: Tenant ID
+        
+        Returns:
+            dict with status and message
+        """
+        return StockBatchService.validate_invoice_items(
+            [{'item_id': item_id, 'quantity': quantity}], invoice_type, customer, tenant_id
+        )[0]
+    
+    @staticmethod
+    def allocate_stock_for_invoice(lines, invoice_type, tenant_id, lock=True):
+        """
+        Allocate stock batches for every line of an invoice (FIFO, GST-aware)
+        
+        All candidate batches are loaded in one query and allocated in memory;
+        nothing is written until apply_invoice_allocation().
+        
+        Args:
+            lines: List of {'item_id': ..., 'quantity': ...}
             invoice_type: Invoice type
             tenant_id: Tenant ID
+            lock: Lock candidate batches until commit (False for previews)
         
         Returns:
-            dict with allocation details or error
+            dict with:
+                lines: One result per input line - {'status': 'success',
+                       'allocated': [...], 'uses_fallback': bool} or
+                       {'status': 'error', 'message': ...}
+                batch_usage: {batch_id: {'quantity': Decimal, 'itc': Decimal}}
+                opening_stock_usage: {item_id: Decimal}
         """
-        # Get available batches
-        query = StockBatch.query.filter(
-            and_(
-                StockBatch.item_id == item_id,
-                StockBatch.tenant_id == tenant_id,
-                StockBatch.batch_status == 'active',
-                StockBatch.quantity_remaining > 0
-            )
-        ).order_by(StockBatch.purchase_date.asc())
-        
-        # Filter by GST status if needed
-        if invoice_type in ['taxable', 'credit_adjustment']:
-            # For taxable/credit adjustment: only use GST stock
-            available_batches = query.filter(StockBatch.purchased_with_gst == True).all()
-        elif invoice_type == 'non_taxable':
-            # Prefer non-GST batches first (save GST stock for taxable sales)
-            # First get non-GST batches, then GST batches
-            non_gst_batches = StockBatch.query.filter(
-                and_(
-                    StockBatch.item_id == item_id,
-                    StockBatch.tenant_id == tenant_id,
-                    StockBatch.batch_status == 'active',
-                    StockBatch.quantity_remaining > 0,
-                    StockBatch.purchased_with_gst == False
-                )
-            ).order_by(StockBatch.purchase_date.asc()).all()
-            
-            gst_batches = StockBatch.query.filter(
-                and_(
-                    StockBatch.item_id == item_id,
-                    StockBatch.tenant_id == tenant_id,
-                    StockBatch.batch_status == 'active',
-                    StockBatch.quantity_remaining > 0,
-                    StockBatch.purchased_with_gst == True
-                )
-            ).order_by(StockBatch.purchase_date.asc()).all()
-            
-            available_batches = non_gst_batches + gst_batches
-        else:
-            # Default: get all batches
-            available_batches = query.all()
-        
-        # Allocate from batches (FIFO)
-        allocated = []
-        remaining_qty = Decimal(str(quantity))
-        
-        for batch in available_batches:
-            if remaining_qty <= 0:
-                break
+        positions = StockBatchService._load_stock_positions(
+            [line['item_id'] for line in lines], tenant_id, lock=lock
+        )
+        
+        # Stock left while allocating (an item can appear on several lines)
+        batch_left = {}
+        opening_left = {}
+        batch_usage = {}
+        opening_stock_usage = {}
+        results = []
+        
+        for line in lines:
+            position = positions.get(int(line['item_id']))
+            quantity = Decimal(str(line['quantity']))
+            batches = position['batches'] if position else []
             
-            allocated_from_batch = min(batch.quantity_remaining, remaining_qty)
+            if invoice_type in ['taxable', 'credit_adjustment']:
+                # For taxable/credit adjustment: only use GST stock
+                candidates = [b for b in batches if b['purchased_with_gst']]
+            elif invoice_type == 'non_taxable':
+                # Prefer non-GST batches first (save GST stock for taxable sales)
+                candidates = [b for b in batches if not b['purchased_with_gst']] + \
+                             [b for b in batches if b['purchased_with_gst']]
+            else:
+                # Default: all batches
+                candidates = batches
             
-            allocated.append({
-                'batch_id': batch.id,
-                'batch': batch,
-                'quantity': float(allocated_from_batch),
-                'cost_per_unit': float(batch.base_cost_per_unit),
-                'itc_per_unit': float(batch.itc_per_unit) if batch.purchased_with_gst else 0,
-                'has_gst_backing': batch.purchased_with_gst
-            })
+            # Allocate from batches (FIFO)
+            allocated = []
+            remaining_qty = quantity
             
-            remaining_qty -= allocated_from_batch
-        
-        # 🆕 FALLBACK: If no batches allocated, use opening_stock
-        if not allocated:
-            # Get item to check opening_stock
-            item = Item.query.filter_by(id=item_id, tenant_id=tenant_id).first()
-            if item and item.opening_stock >= quantity:
-                # Use opening_stock as fallback (for legacy inventory)
-                # Determine if this stock has GST backing based on item.gst_rate
-                has_gst_backing = item.gst_rate > 0
+            for batch in candidates:
+                if remaining_qty <= 0:
+                    break
+                available = batch_left.get(batch['id'], batch['quantity_remaining'])
+                if available <= 0:
+                    continue
                 
+                allocated_from_batch = min(available, remaining_qty)
                 allocated.append({
-                    'batch_id': None,  # No batch (using opening_stock)
-                    'batch': None,
-                    'quantity': float(quantity),
-                    'cost_per_unit': float(item.cost_price) if item.cost_price else 0,
-                    'itc_per_unit': 0,  # No ITC for opening stock
-                    'has_gst_backing': has_gst_backing,
-                    'uses_opening_stock': True  # Flag for special handling
+                    'batch_id': batch['id'],
+                    'quantity': float(allocated_from_batch),
+                    'cost_per_unit': float(batch['base_cost_per_unit']),
+                    'itc_per_unit': float(batch['itc_per_unit']) if batch['purchased_with_gst'] else 0,
+                    'has_gst_backing': batch['purchased_with_gst']
                 })
-                remaining_qty = Decimal('0')
-        
-        if remaining_qty > 0:
-            return {
-                'status': 'error',
-                'message': f'Insufficient stock. Still need {float(remaining_qty)} units.'
-            }
+                remaining_qty -= allocated_from_batch
+            
+            # 🆕 FALLBACK: Items without batches (legacy inventory) sell from opening_stock
+            if not allocated and position and not batches:
+                item = position['item']
+                opening_stock = opening_left.get(item.id, Decimal(str(item.opening_stock or 0)))
+                if opening_stock >= quantity:
+                    # Use opening_stock as fallback (for legacy inventory)
+                    # Determine if this stock has GST backing based on item.gst_rate
+                    allocated.append({
+                        'batch_id': None,  # No batch (using opening_stock)
+                        'quantity': float(quantity),
+                        'cost_per_unit': float(item.cost_price) if item.cost_price else 0,
+                        'itc_per_unit': 0,  # No ITC for opening stock
+                        'has_gst_backing': item.gst_rate > 0,
+                        'uses_opening_stock': True  # Flag for special handling
+                    })
+                    remaining_qty = Decimal('0')
+            
+            if remaining_qty > 0:
+                results.append({
+                    'status': 'error',
+                    'message': f'Insufficient stock. Still need {float(remaining_qty)} units.'
+                })
+                continue
+            
+            # Line succeeded - consume the stock for the following lines
+            for alloc in allocated:
+                qty = Decimal(str(alloc['quantity']))
+                if alloc.get('uses_opening_stock'):
+                    item_id = position['item'].id
+                    opening_left[item_id] = opening_left.get(
+                        item_id, Decimal(str(position['item'].opening_stock or 0))) - qty
+                    opening_stock_usage[item_id] = opening_stock_usage.get(item_id, Decimal('0')) + qty
+                    continue
+                
+                batch = next(b for b in batches if b['id'] == alloc['batch_id'])
+                batch_left[batch['id']] = batch_left.get(batch['id'], batch['quantity_remaining']) - qty
+                usage = batch_usage.setdefault(batch['id'], {'quantity': Decimal('0'), 'itc': Decimal('0')})
+                usage['quantity'] += qty
+                if batch['purchased_with_gst']:
+                    usage['itc'] += batch['itc_per_unit'] * qty
+            
+            results.append({
+                'status': 'success',
+                'allocated': allocated,
+                'uses_fallback': any(a.get('uses_opening_stock') for a in allocated)
+            })
         
         return {
-            'status': 'success',
-            'allocated': allocated,
-            'uses_fallback': any(a.get('uses_opening_stock') for a in allocated)
+            'lines': results,
+            'batch_usage': batch_usage,
+            'opening_stock_usage': opening_stock_usage
         }
     
     @staticmethod
-    def process_invoice_item_allocation(invoice_item, allocated_batches, reduce_stock=True):
+    def apply_invoice_allocation(allocation):
         """
-        Process the allocation of batches to an invoice item
+        Write an invoice allocation back in bulk
+        (one UPDATE for all batches, one for all opening-stock fallbacks)
+        
+        Args:
+            allocation: Result of allocate_stock_for_invoice
+        """
+        batch_usage = allocation['batch_usage']
+        if batch_usage:
+            params = {'now': datetime.utcnow()}
+            rows = []
+            for n, (batch_id, usage) in enumerate(batch_usage.items()):
+                params.update({f'id_{n}': batch_id, f'qty_{n}': str(usage['quantity']), f'itc_{n}': str(usage['itc'])})
+                rows.append(f"SELECT CAST(:id_{n} AS INTEGER) AS batch_id, "
+                            f"CAST(:qty_{n} AS NUMERIC) AS qty, CAST(:itc_{n} AS NUMERIC) AS itc")
+            
+            db.session.execute(text(f"""
+                UPDATE stock_batches
+                SET quantity_remaining = stock_batches.quantity_remaining - alloc.qty,
+                    quantity_sold = COALESCE(stock_batches.quantity_sold, 0) + alloc.qty,
+                    itc_claimed = COALESCE(stock_batches.itc_claimed, 0) + alloc.itc,
+                    itc_remaining = COALESCE(stock_batches.itc_remaining, 0) - alloc.itc,
+                    batch_status = CASE
+                        WHEN stock_batches.quantity_remaining - alloc.qty <= 0 THEN 'depleted'
+                        ELSE stock_batches.batch_status
+                    END,
+                    updated_at = :now
+                FROM ({' UNION ALL '.join(rows)}) AS alloc
+                WHERE stock_batches.id = alloc.batch_id
+            """), params)
+        
+        opening_stock_usage = allocation['opening_stock_usage']
+        if opening_stock_usage:
+            params = {'now': datetime.utcnow()}
+            rows = []
+            for n, (item_id, qty) in enumerate(opening_stock_usage.items()):
+                params.update({f'id_{n}': item_id, f'qty_{n}': str(qty)})
+                rows.append(f"SELECT CAST(:id_{n} AS INTEGER) AS item_id, CAST(:qty_{n} AS FLOAT) AS qty")
+            
+            db.session.execute(text(f"""
+                UPDATE items
+                SET opening_stock = items.opening_stock - alloc.qty,
+                    updated_at = :now
+                FROM ({' UNION ALL '.join(rows)}) AS alloc
+                WHERE items.id = alloc.item_id
+            """), params)
+            print(f"✅ Reduced opening_stock for {len(opening_stock_usage)} item(s) without batches")
+    
+    @staticmethod
+    def allocate_stock_for_invoice_item(item_id, quantity, invoice_type, tenant_id):
+        """
+        Allocate stock batches for a single invoice item (FIFO)
+        
+        Returns:
+            dict with allocation details or error (see allocate_stock_for_invoice)
+        """
+        allocation = StockBatchService.allocate_stock_for_invoice(
+            [{'item_id': item_id, 'quantity': quantity}], invoice_type, tenant_id
+        )
+        return allocation['lines'][0]
+    
+    @staticmethod
+    def process_invoice_item_allocation(invoice_item, allocated_batches):
+        """
+        Record the cost of the allocated batches on an invoice item
+        
+        Stock itself is reduced by apply_invoice_allocation().
         
         Args:
             invoice_item: InvoiceItem instance
-            allocated_batches: List of allocation dicts from allocate_stock_for_invoice_item
-            reduce_stock: If False, don't reduce stock (for credit_adjustment)
+            allocated_batches: 'allocated' list of one line from allocate_stock_for_invoice
         
         Returns:
             dict with allocation summary
         """
         total_cost = Decimal('0')
         total_itc = Decimal('0')
-        uses_fallback = False
+        uses_fallback = any(alloc.get('uses_opening_stock') for alloc in allocated_batches)
         
         for alloc in allocated_batches:
-            batch = alloc['batch']
             qty = Decimal(str(alloc['quantity']))
-            
-            # 🆕 FALLBACK HANDLING: Check if using opening_stock instead of batch
-            if alloc.get('uses_opening_stock'):
-                uses_fallback = True
-                # Get item and reduce opening_stock
-                item = Item.query.get(invoice_item.item_id)
-                if item and reduce_stock:
-                    # Convert Decimal to float for compatibility with database column type
-                    item.opening_stock = float(item.opening_stock) - float(qty)
-                    print(f"✅ Reduced opening_stock for item {item.id} by {float(qty)}. New: {item.opening_stock}")
-                
-                # Calculate costs from alloc (no batch object)
-                cost_for_qty = Decimal(str(alloc['cost_per_unit'])) * qty
-                itc_for_qty = Decimal('0')  # No ITC for opening stock
-                
-                total_cost += cost_for_qty
-                total_itc += itc_for_qty
-                continue
-            
-            # Normal batch processing
-            if batch:
-                # Calculate costs
-                cost_for_qty = batch.base_cost_per_unit * qty
-                itc_for_qty = batch.itc_per_unit * qty if batch.purchased_with_gst else Decimal('0')
-                
-                total_cost += cost_for_qty
-                total_itc += itc_for_qty
-                
-                if reduce_stock:
-                    # Reduce batch quantity and claim ITC
-                    batch.allocate_quantity(qty)
+            total_cost += Decimal(str(alloc['cost_per_unit'])) * qty
+            # No ITC for opening stock (itc_per_unit is 0)
+            total_itc += Decimal(str(alloc['itc_per_unit'])) * qty
         
         # Update invoice item with cost tracking
         if invoice_item.quantity > 0:
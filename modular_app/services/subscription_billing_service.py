@@ -0,0 +1,332 @@
+"""
+Subscription Billing Service
+Bulk invoice generation for metered subscriptions
+
+Runs as the 'subscription_invoices' background job. Subscriptions are billed
+in chunks, and each run is recorded as a BillingRun so an interrupted run
+resumes where it left off.
+"""
+from models import (
+    db,
+    SubscriptionPlan,
+    CustomerSubscription,
+    SubscriptionPayment,
+    Invoice,
+    InvoiceItem,
+    BillingRun,
+    BillingRunItem
+)
+from services.delivery_engine import DeliveryEngine
+from sqlalchemy import text, insert, update
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy.orm import joinedload
+
+BILLING_CHUNK_SIZE = 500  # Subscriptions billed per transaction
+
+
+class SubscriptionBillingService:
+    """Generate invoices for metered subscriptions"""
+
+    @staticmethod
+    def get_ready_subscriptions(tenant_id, days_ahead=3):
+        """Active metered subscriptions whose period ends within days_ahead days"""
+        today = datetime.now().date()
+        cutoff = today + timedelta(days=days_ahead)
+
+        return CustomerSubscription.query.join(
+            CustomerSubscription.plan
+        ).filter(
+            CustomerSubscription.tenant_id == tenant_id,
+            CustomerSubscription.status == 'active',
+            SubscriptionPlan.plan_type == 'metered',
+            CustomerSubscription.current_period_end <= cutoff
+        ).options(
+            joinedload(CustomerSubscription.customer),
+            joinedload(CustomerSubscription.plan)
+        ).all()
+
+    @staticmethod
+    def start_run(tenant_id, job_id=None):
+        """
+        The tenant's unfinished billing run, or a new one
+
+        A new run snapshots the subscriptions that are ready for billing as
+        pending outcome rows (one bulk insert).
+        """
+        run = BillingRun.query.filter_by(
+            tenant_id=tenant_id,
+            status=BillingRun.RUNNING
+        ).order_by(BillingRun.id.desc()).first()
+
+        if run:
+            print(f"🔁 Resuming billing run {run.id} for tenant {tenant_id}")
+            run.job_id = job_id
+            db.session.commit()
+            return run
+
+        subscription_ids = [s.id for s in SubscriptionBillingService.get_ready_subscriptions(tenant_id)]
+
+        run = BillingRun(
+            tenant_id=tenant_id,
+            billing_date=datetime.now().date(),
+            subscription_count=len(subscription_ids),
+            job_id=job_id
+        )
+        db.session.add(run)
+        db.session.flush()
+
+        if subscription_ids:
+            db.session.execute(insert(BillingRunItem), [
+                {'run_id': run.id, 'subscription_id': subscription_id, 'status': BillingRunItem.PENDING}
+                for subscription_id in subscription_ids
+            ])
+        db.session.commit()
+        return run
+
+    @staticmethod
+    def _bill_chunk(run, pending_items):
+        """
+        Bill one chunk of pending run items (caller commits)
+
+        Returns:
+            [{'id', 'status', 'invoice_id', 'quantity', 'amount', 'error', 'processed_at'}] outcomes
+        """
+        now = datetime.utcnow()
+        subscriptions = {
+            s.id: s for s in CustomerSubscription.query.filter(
+                CustomerSubscription.id.in_([item.subscription_id for item in pending_items]),
+                CustomerSubscription.tenant_id == run.tenant_id
+            ).options(
+                joinedload(CustomerSubscription.customer),
+                joinedload(CustomerSubscription.plan)
+            ).all()
+        }
+        totals = DeliveryEngine.get_period_totals(subscriptions.values())
+
+        outcomes = []
+        billable = []
+        for item in pending_items:
+            subscription = subscriptions.get(item.subscription_id)
+            outcome = {'id': item.id, 'processed_at': now}
+            if subscription is None or subscription.status != 'active':
+                outcome.update(status=BillingRunItem.SKIPPED, error='Subscription is no longer active')
+            elif totals[subscription.id]['quantity'] <= 0:
+                outcome.update(status=BillingRunItem.SKIPPED, quantity=0, amount=0,
+                               error='No deliveries in the billing period')
+            else:
+                billable.append((outcome, subscription, totals[subscription.id]))
+            outcomes.append(outcome)
+
+        if not billable:
+            return outcomes
+
+        # One block of sequenced invoice numbers for the whole chunk
+        invoice_numbers = Invoice.reserve_invoice_numbers(run.tenant_id, len(billable))
+
+        invoices = []
+        for (outcome, subscription, total), invoice_number in zip(billable, invoice_numbers):
+            customer = subscription.customer
+            invoices.append(Invoice(
+                tenant_id=run.tenant_id,
+                customer_id=customer.id,
+                customer_name=customer.name,
+                customer_phone=customer.phone or '',
+                customer_email=customer.email or '',
+                invoice_date=run.billing_date,
+                invoice_number=invoice_number,
+                subtotal=float(total['amount']),
+                total_amount=float(total['amount']),
+                payment_status='unpaid',
+                paid_amount=0,
+                status='pending'
+            ))
+
+        # Bulk INSERT ... RETURNING id (batched by SQLAlchemy)
+        db.session.add_all(invoices)
+        db.session.flush()
+
+        invoice_items = []
+        payments = []
+        ledger_entries = []
+        for (outcome, subscription, total), invoice in zip(billable, invoices):
+            plan = subscription.plan
+            billing_start = subscription.current_period_start
+            billing_end = subscription.current_period_end
+            billing_period_label = f"{billing_start.strftime('%b %d')} - {billing_end.strftime('%b %d, %Y')}"
+            amount = float(total['amount'])
+
+            invoice_items.append(InvoiceItem(
+                invoice_id=invoice.id,
+                item_name=f"Subscription - {plan.name}",
+                description=f"{plan.name}\n{billing_period_label}\nTotal: {total['quantity']} {plan.unit_name}",
+                quantity=float(total['quantity']),
+                unit=plan.unit_name,
+                rate=float(plan.unit_rate),
+                taxable_value=amount,
+                gst_rate=0,
+                cgst_amount=0,
+                sgst_amount=0,
+                igst_amount=0,
+                total_amount=amount
+            ))
+
+            payments.append(SubscriptionPayment(
+                tenant_id=run.tenant_id,
+                subscription_id=subscription.id,
+                invoice_id=invoice.id,
+                payment_date=run.billing_date,
+                amount=Decimal(str(amount)),
+                payment_mode='Pending',
+                period_start=billing_start,
+                period_end=billing_end,
+                billing_period_label=billing_period_label
+            ))
+
+            # Credit sale: DEBIT Accounts Receivable, CREDIT Sales Income (no GST on subscriptions)
+            for transaction_type, debit, credit, narration in (
+                ('accounts_receivable', amount, 0.0, f'Credit sale to {invoice.customer_name} - {invoice.invoice_number}'),
+                ('sales_income', 0.0, amount, f'Sales income from {invoice.customer_name} - {invoice.invoice_number}'),
+            ):
+                ledger_entries.append({
+                    'tenant_id': run.tenant_id,
+                    'transaction_date': run.billing_date,
+                    'transaction_type': transaction_type,
+                    'debit_amount': debit,
+                    'credit_amount': credit,
+                    'balance_after': debit or credit,
+                    'invoice_id': invoice.id,
+                    'voucher': invoice.invoice_number,
+                    'narration': narration,
+                    'created_at': now
+                })
+
+            outcome.update(
+                status=BillingRunItem.INVOICED,
+                invoice_id=invoice.id,
+                quantity=total['quantity'],
+                amount=total['amount'],
+                error=None
+            )
+
+        db.session.add_all(invoice_items)
+        db.session.add_all(payments)
+
+        # Ledger entries in one executemany
+        db.session.execute(text("""
+            INSERT INTO account_transactions
+            (tenant_id, account_id, transaction_date, transaction_type,
+             debit_amount, credit_amount, balance_after, reference_type, reference_id,
+             voucher_number, narration, created_at, created_by)
+            VALUES (:tenant_id, NULL, :transaction_date, :transaction_type,
+                    :debit_amount, :credit_amount, :balance_after, 'invoice', :invoice_id,
+                    :voucher, :narration, :created_at, NULL)
+        """), ledger_entries)
+
+        # Billed subscriptions wait for payment
+        CustomerSubscription.query.filter(
+            CustomerSubscription.id.in_([subscription.id for (outcome, subscription, total) in billable])
+        ).update({'status': 'pending_payment', 'updated_at': now}, synchronize_session=False)
+
+        return outcomes
+
+    @staticmethod
+    def _bill_one_by_one(run, pending_items):
+        """
+        Bill a failed chunk's items one at a time, each in its own savepoint (caller commits)
+
+        Returns:
+            Outcomes as for _bill_chunk, with the items that still fail marked FAILED
+        """
+        outcomes = []
+        for item in pending_items:
+            try:
+                with db.session.begin_nested():
+                    outcomes.extend(SubscriptionBillingService._bill_chunk(run, [item]))
+            except Exception as e:
+                print(f"❌ Billing run {run.id}: subscription {item.subscription_id} failed - {str(e)}")
+                outcomes.append({'id': item.id, 'status': BillingRunItem.FAILED, 'error': str(e)[:500],
+                                 'processed_at': datetime.utcnow()})
+        return outcomes
+
+    @staticmethod
+    def process_run(run, progress_callback=None):
+        """
+        Bill the run's pending subscriptions chunk by chunk
+
+        Each chunk (invoices, ledger entries, outcome rows) commits on its own.
+        A chunk that fails is rolled back and billed again one subscription
+        per savepoint, so only the subscriptions that fail on their own are
+        recorded as failed (and picked up again by the next run).
+        """
+        done = run.subscription_count - BillingRunItem.query.filter_by(
+            run_id=run.id, status=BillingRunItem.PENDING
+        ).count()
+
+        while True:
+            pending_items = BillingRunItem.query.filter_by(
+                run_id=run.id,
+                status=BillingRunItem.PENDING
+            ).order_by(BillingRunItem.id).limit(BILLING_CHUNK_SIZE).all()
+            if not pending_items:
+                break
+
+            try:
+                outcomes = SubscriptionBillingService._bill_chunk(run, pending_items)
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Billing run {run.id}: chunk failed - {str(e)} - retrying one subscription at a time")
+                outcomes = SubscriptionBillingService._bill_one_by_one(run, pending_items)
+
+            # Outcome rows by primary key in one bulk UPDATE
+            db.session.execute(update(BillingRunItem), outcomes)
+
+            for outcome in outcomes:
+                if outcome['status'] == BillingRunItem.INVOICED:
+                    run.invoiced_count += 1
+                    run.total_amount = (run.total_amount or 0) + outcome['amount']
+                elif outcome['status'] == BillingRunItem.SKIPPED:
+                    run.skipped_count += 1
+                else:
+                    run.failed_count += 1
+            db.session.commit()
+
+            done += len(pending_items)
+            if progress_callback:
+                progress_callback(done, run.subscription_count)
+
+        run.status = BillingRun.COMPLETED
+        run.finished_at = datetime.utcnow()
+        db.session.commit()
+        return run
+
+    @staticmethod
+    def generate_all_invoices(tenant_id, progress_callback=None, job_id=None):
+        """
+        Generate invoices for all metered subscriptions ending soon (bulk processing)
+
+        Args:
+            tenant_id: Tenant ID
+            progress_callback: Optional callable(done, total)
+            job_id: Background job running the billing (recorded on the run)
+
+        Returns:
+            {'run_id': int, 'success_count': int, 'skipped_count': int, 'error_count': int,
+             'total_amount': float, 'errors': [str]}
+        """
+        run = SubscriptionBillingService.start_run(tenant_id, job_id=job_id)
+        run = SubscriptionBillingService.process_run(run, progress_callback=progress_callback)
+
+        failed_items = BillingRunItem.query.filter_by(
+            run_id=run.id,
+            status=BillingRunItem.FAILED
+        ).order_by(BillingRunItem.id).all()
+
+        return {
+            'run_id': run.id,
+            'success_count': run.invoiced_count,
+            'skipped_count': run.skipped_count,
+            'error_count': run.failed_count,
+            'total_amount': float(run.total_amount or 0),
+            'errors': [f"Subscription {item.subscription_id}: {item.error}" for item in failed_items]
+        }
@@ -0,0 +1,600 @@
+"""
+Tenant Backup Service
+Streaming backup and restore of a tenant's business data
+
+A backup is a ZIP with one NDJSON file per table plus manifest.json (backup
+info, row counts, a SHA-256 per table), streamed as tables are read. A delta
+backup holds the rows changed since the previous backup's watermark plus
+tombstones for deleted rows; restore replays a full backup and its deltas.
+"""
+from sqlalchemy import text, select, insert, delete, inspect, Table, MetaData
+from sqlalchemy.types import DateTime, Date, Time, Numeric, LargeBinary
+from models import (
+    db, Tenant, Customer, Vendor, Employee, Site,
+    Item, ItemCategory, ItemGroup, ItemStock,
+    Invoice, InvoiceItem,
+    PurchaseBill, PurchaseBillItem,
+    PurchaseRequest,
+    SalesOrder, SalesOrderItem,
+    DeliveryChallan, DeliveryChallanItem,
+    Expense, ExpenseCategory,
+    Task, TaskUpdate,
+    CommissionAgent, InvoiceCommission,
+    VendorPayment, PaymentAllocation,
+    BankAccount, AccountTransaction,
+    TenantBackup, BackupTombstone
+)
+from models.item_stock_totals import ITEM_STOCK_TOTALS
+from datetime import datetime, date, time, timedelta
+from decimal import Decimal
+import hashlib
+import zipfile
+import base64
+import json
+import os
+import pytz
+
+BACKUP_FORMAT = 'bizbooks-ndjson'
+BACKUP_VERSION = '2.0'
+BACKUP_YIELD_PER = int(os.environ.get('BACKUP_YIELD_PER', 1000))  # Rows fetched per round trip
+RESTORE_CHUNK_SIZE = int(os.environ.get('RESTORE_CHUNK_SIZE', 1000))  # Rows per bulk INSERT
+BACKUP_WATERMARK_OVERLAP = int(os.environ.get('BACKUP_WATERMARK_OVERLAP', 300))  # seconds re-read by each delta
+BACKUP_TOMBSTONE_RETENTION_DAYS = int(os.environ.get('BACKUP_TOMBSTONE_RETENTION_DAYS', 35))  # older: next backup is full
+MANIFEST_NAME = 'manifest.json'
+TOMBSTONES_NAME = 'tombstones'  # Delta backups: rows deleted since the previous backup
+
+# (file name, model or raw table name, (parent model, foreign key) for child rows)
+# In restore order - parents before children. Delete runs in reverse.
+# Child tables without updated_at are re-sent whole in a delta when their parent changes
+# (triggers bump the parent's updated_at when a child row changes - models/tenant_backup.py).
+BACKUP_TABLES = [
+    ('customers', Customer, None),
+    ('vendors', Vendor, None),
+    ('sites', Site, None),
+    ('employees', Employee, None),
+    ('item_categories', ItemCategory, None),
+    ('item_groups', ItemGroup, None),
+    ('items', Item, None),
+    ('item_stock', ItemStock, None),
+    ('expense_categories', ExpenseCategory, None),
+    ('expenses', Expense, None),
+    ('invoices', Invoice, None),
+    ('invoice_items', InvoiceItem, (Invoice, 'invoice_id')),
+    ('purchase_bills', PurchaseBill, None),
+    ('purchase_bill_items', PurchaseBillItem, None),
+    ('sales_orders', SalesOrder, None),
+    ('sales_order_items', SalesOrderItem, (SalesOrder, 'sales_order_id')),
+    ('delivery_challans', DeliveryChallan, None),
+    ('delivery_challan_items', DeliveryChallanItem, None),
+    ('purchase_requests', PurchaseRequest, None),
+    ('tasks', Task, None),
+    ('task_updates', TaskUpdate, (Task, 'task_id')),
+    ('commission_agents', CommissionAgent, None),
+    ('invoice_commissions', InvoiceCommission, None),
+    ('vendor_payments', VendorPayment, None),
+    ('payment_allocations', PaymentAllocation, (VendorPayment, 'payment_id')),
+    ('bank_accounts', BankAccount, None),
+    ('account_transactions', AccountTransaction, None),
+    # Payroll tables are created by SQL migrations (no models) - skipped where missing
+    ('payroll_payments', 'payroll_payments', None),
+    ('salary_slips', 'salary_slips', None),
+]
+
+BACKUP_WARNINGS = [
+    "⚠️ Item images NOT included (will be added in future version)",
+    "⚠️ Purchase bill attachments NOT included",
+    "⚠️ Task media NOT included",
+    "⚠️ Attendance records NOT included",
+    "⚠️ Admin password NOT included (for security)"
+]
+
+
+class _ZipStream:
+    """Write-only file for ZipFile that hands out what was written so far"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _serialize_value(value):
+    """JSON value for a column value (exact - restore converts back by column type)"""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (bytes, memoryview)):
+        return base64.b64encode(bytes(value)).decode('ascii')
+    return value
+
+
+def _parse_value(column, value):
+    """Column value from its JSON value"""
+    if value is None:
+        return None
+    column_type = column.type
+    if isinstance(column_type, DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(column_type, Date):
+        return date.fromisoformat(value[:10])
+    if isinstance(column_type, Time):
+        return time.fromisoformat(value)
+    if isinstance(column_type, Numeric) and getattr(column_type, 'asdecimal', True):
+        return Decimal(str(value))
+    if isinstance(column_type, LargeBinary):
+        return base64.b64decode(value)
+    return value
+
+
+class TenantBackupService:
+    """Tenant data export / import"""
+
+    @staticmethod
+    def _tables():
+        """[(name, Table, (parent Table, foreign key) or None)] that exist in this database"""
+        existing = set(inspect(db.engine).get_table_names())
+        tables = []
+        for name, source, parent in BACKUP_TABLES:
+            if isinstance(source, str):
+                if source not in existing:
+                    continue
+                table = Table(source, MetaData(), autoload_with=db.engine)
+            else:
+                table = source.__table__
+                if table.name not in existing:
+                    continue
+            tables.append((name, table, (parent[0].__table__, parent[1]) if parent else None))
+        return tables
+
+    @staticmethod
+    def _tenant_rows_query(table, parent, tenant_id):
+        """SELECT of the tenant's rows of one table, in id order"""
+        if parent and 'tenant_id' not in table.c:
+            parent_table, foreign_key = parent
+            query = select(table).join(
+                parent_table, parent_table.c.id == table.c[foreign_key]
+            ).where(parent_table.c.tenant_id == tenant_id)
+        else:
+            query = select(table).where(table.c.tenant_id == tenant_id)
+        return query.order_by(table.c.id)
+
+    @staticmethod
+    def _changed_rows_query(table, parent, tenant_id, since):
+        """
+        SELECT of the rows a delta backup exports, and the mode restore applies them with
+
+        Modes:
+            updated:  rows with updated_at after since (upserted)
+            children: all rows of parents changed after since (replace the parent's rows)
+            created:  rows created after since (tables without updated_at - upserted)
+            snapshot: every row (tables without timestamps - replace the table)
+        """
+        query = TenantBackupService._tenant_rows_query(table, parent, tenant_id)
+        if 'updated_at' in table.c:
+            return query.where(table.c.updated_at > since), 'updated'
+        if parent:
+            parent_table, foreign_key = parent
+            return query.where(table.c[foreign_key].in_(
+                select(parent_table.c.id).where(
+                    parent_table.c.tenant_id == tenant_id,
+                    parent_table.c.updated_at > since
+                )
+            )), 'children'
+        if 'created_at' in table.c:
+            return query.where(table.c.created_at > since), 'created'
+        return query, 'snapshot'
+
+    @staticmethod
+    def _backup_info(tenant, record, total_records):
+        return {
+            "created_at": datetime.now(pytz.timezone('Asia/Kolkata')).isoformat(),
+            "tenant_id": tenant.id,
+            "company_name": tenant.company_name,
+            "subdomain": tenant.subdomain,
+            "admin_email": tenant.admin_email,
+            "format": BACKUP_FORMAT,
+            "backup_version": BACKUP_VERSION,
+            "app_version": "2.0.0",
+            "kind": record.kind,
+            "backup_id": record.id,
+            "base_backup_id": record.base_backup_id,
+            "parent_backup_id": record.parent_backup_id,
+            "since": _serialize_value(record.since),
+            "watermark": _serialize_value(record.watermark),
+            "total_records": total_records,
+            "warnings": BACKUP_WARNINGS
+        }
+
+    @staticmethod
+    def delta_parent(tenant_id):
+        """
+        Backup a delta would build on, or None (no backup yet, data was restored
+        since, or it's older than the tombstones kept)
+        """
+        previous = TenantBackup.latest(tenant_id)
+        if previous is None or previous.kind == TenantBackup.RESTORE:
+            return None
+        if previous.watermark < datetime.utcnow() - timedelta(days=BACKUP_TOMBSTONE_RETENTION_DAYS):
+            return None
+        return previous
+
+    @staticmethod
+    def prune_tombstones():
+        """Delete tombstones older than BACKUP_TOMBSTONE_RETENTION_DAYS, all tenants (commits)"""
+        # Keep the overlap so a delta on the oldest allowed parent still sees its deletions
+        cutoff = datetime.utcnow() - timedelta(days=BACKUP_TOMBSTONE_RETENTION_DAYS,
+                                               seconds=BACKUP_WATERMARK_OVERLAP)
+        deleted = BackupTombstone.query.filter(
+            BackupTombstone.deleted_at < cutoff
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+    @staticmethod
+    def backup_filename(tenant, incremental=False):
+        timestamp = datetime.now(pytz.timezone('Asia/Kolkata')).strftime('%Y-%m-%d_%H%M')
+        if incremental and TenantBackupService.delta_parent(tenant.id):
+            return f"{tenant.subdomain}_backup_delta_{timestamp}.zip"
+        return f"{tenant.subdomain}_backup_{timestamp}.zip"
+
+    @staticmethod
+    def _start_backup(tenant_id, incremental):
+        """Record a new backup (committed - the watermark must be taken before reading)"""
+        parent = TenantBackupService.delta_parent(tenant_id) if incremental else None
+        watermark = datetime.utcnow()
+
+        if parent:
+            record = TenantBackup(
+                tenant_id=tenant_id,
+                kind=TenantBackup.DELTA,
+                base_backup_id=parent.base_backup_id,
+                parent_backup_id=parent.id,
+                # Overlap: rows written by transactions still open at the last watermark
+                since=parent.watermark - timedelta(seconds=BACKUP_WATERMARK_OVERLAP),
+                watermark=watermark
+            )
+        else:
+            record = TenantBackup(tenant_id=tenant_id, kind=TenantBackup.FULL, watermark=watermark)
+
+        db.session.add(record)
+        db.session.flush()
+        if record.kind == TenantBackup.FULL:
+            record.base_backup_id = record.id
+        db.session.commit()
+        return record
+
+    @staticmethod
+    def _write_ndjson(archive, stream, name, rows):
+        """
+        Write rows (an iterable of batches of mappings) as one NDJSON file
+
+        Yields the ZIP bytes written after every batch; returns {'rows', 'sha256'}
+        (use with yield from).
+        """
+        digest = hashlib.sha256()
+        count = 0
+        with archive.open(f'{name}.ndjson', 'w', force_zip64=True) as entry:
+            for batch in rows:
+                lines = ''.join(
+                    json.dumps({key: _serialize_value(value) for key, value in row.items()},
+                               ensure_ascii=False) + '\n'
+                    for row in batch
+                ).encode('utf-8')
+                entry.write(lines)
+                digest.update(lines)
+                count += len(batch)
+                yield stream.drain()
+        return {'rows': count, 'sha256': digest.hexdigest()}
+
+    @staticmethod
+    def iter_backup(tenant_id, progress_callback=None, incremental=False):
+        """
+        Backup ZIP of a tenant, as a stream of byte chunks
+
+        A full backup has every row. An incremental backup is a delta on top
+        of the tenant's last backup - only rows changed since its watermark,
+        plus tombstones for deleted rows - or a full backup if there is no
+        backup to build on.
+
+        Args:
+            tenant_id: Tenant ID
+            progress_callback: Optional callable(percent, message)
+            incremental: Delta since the last backup
+
+        Yields:
+            bytes (concatenated: the ZIP file)
+        """
+        tenant = db.session.get(Tenant, tenant_id)
+        record = TenantBackupService._start_backup(tenant_id, incremental)
+        is_delta = record.kind == TenantBackup.DELTA
+        tables = TenantBackupService._tables()
+        stream = _ZipStream()
+        manifest_tables = {}
+
+        with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for index, (name, table, parent) in enumerate(tables):
+                if progress_callback:
+                    progress_callback(int(index * 95 / len(tables)), f'Exporting {name}')
+
+                if is_delta:
+                    query, mode = TenantBackupService._changed_rows_query(table, parent, tenant_id, record.since)
+                else:
+                    query, mode = TenantBackupService._tenant_rows_query(table, parent, tenant_id), 'full'
+
+                # ⚡ Server-side cursor - one batch of rows in memory at a time
+                batches = db.session.execute(query.execution_options(
+                    stream_results=True, yield_per=BACKUP_YIELD_PER
+                )).mappings().partitions()
+                written = yield from TenantBackupService._write_ndjson(archive, stream, name, batches)
+                manifest_tables[name] = dict(written, mode=mode)
+                yield stream.drain()
+
+            if is_delta:
+                tombstones = db.session.execute(text("""
+                    SELECT table_name AS "table", row_id AS id FROM backup_tombstones
+                    WHERE tenant_id = :tenant_id AND deleted_at > :since
+                    ORDER BY id
+                """).execution_options(stream_results=True, yield_per=BACKUP_YIELD_PER),
+                    {'tenant_id': tenant_id, 'since': record.since}
+                ).mappings().partitions()
+                manifest_tombstones = yield from TenantBackupService._write_ndjson(
+                    archive, stream, TOMBSTONES_NAME, tombstones
+                )
+
+            total_records = sum(t['rows'] for t in manifest_tables.values())
+            manifest = {
+                "backup_info": TenantBackupService._backup_info(tenant, record, total_records),
+                "tables": manifest_tables
+            }
+            if is_delta:
+                manifest["tombstones"] = manifest_tombstones
+            archive.writestr(MANIFEST_NAME, json.dumps(manifest, indent=2, ensure_ascii=False))
+
+        yield stream.drain()
+
+        record.record_count = total_records
+        record.completed_at = datetime.utcnow()
+        # Tombstones older than the next delta's start are no longer needed
+        BackupTombstone.query.filter(
+            BackupTombstone.tenant_id == tenant_id,
+            BackupTombstone.deleted_at < record.watermark - timedelta(seconds=BACKUP_WATERMARK_OVERLAP)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        print(f"✅ {record.kind.title()} backup streamed: tenant {tenant_id} ({total_records} records)")
+
+    @staticmethod
+    def read_manifest(archive):
+        """manifest.json of a backup ZIP (ValueError if it isn't one)"""
+        try:
+            manifest = json.loads(archive.read(MANIFEST_NAME))
+        except KeyError:
+            raise ValueError('Invalid backup file: manifest.json is missing')
+        if manifest.get('backup_info', {}).get('format') != BACKUP_FORMAT:
+            raise ValueError('Invalid backup file format')
+        return manifest
+
+    @staticmethod
+    def order_chain(manifests):
+        """
+        Order backup files as full backup + its deltas in chain order
+
+        Args:
+            manifests: [(manifest, archive)]
+
+        Returns:
+            [(manifest, archive)] - ValueError if they don't form one unbroken chain
+        """
+        fulls = [entry for entry in manifests if entry[0]['backup_info'].get('kind', 'full') == 'full']
+        if len(fulls) != 1:
+            raise ValueError('Select exactly one full backup (plus any delta backups taken after it)')
+
+        chain = [fulls[0]]
+        deltas = {entry[0]['backup_info']['parent_backup_id']: entry for entry in manifests if entry not in fulls}
+        while deltas:
+            next_entry = deltas.pop(chain[-1][0]['backup_info'].get('backup_id'), None)
+            if next_entry is None:
+                raise ValueError('Delta backups are missing from the chain - '
+                                 'select every delta taken since the full backup')
+            chain.append(next_entry)
+        return chain
+
+    @staticmethod
+    def delete_tenant_data(tenant_id, tables=None):
+        """Delete the tenant's rows of every backed-up table, children first (caller commits)"""
+        for name, table, parent in reversed(tables or TenantBackupService._tables()):
+            if parent and 'tenant_id' not in table.c:
+                parent_table, foreign_key = parent
+                db.session.execute(delete(table).where(table.c[foreign_key].in_(
+                    select(parent_table.c.id).where(parent_table.c.tenant_id == tenant_id)
+                )))
+            else:
+                db.session.execute(delete(table).where(table.c.tenant_id == tenant_id))
+
+    @staticmethod
+    def _delete_ids(table, ids, tenant_id, column='id'):
+        """Delete rows by id (or by foreign key) in chunks - scoped to the tenant where possible"""
+        ids = list(ids)
+        for start in range(0, len(ids), RESTORE_CHUNK_SIZE):
+            query = delete(table).where(table.c[column].in_(ids[start:start + RESTORE_CHUNK_SIZE]))
+            if 'tenant_id' in table.c:
+                query = query.where(table.c.tenant_id == tenant_id)
+            db.session.execute(query)
+
+    @staticmethod
+    def _restore_table(archive, name, table, tenant_id, mode='full'):
+        """
+        Bulk-insert one table's NDJSON file in chunks
+
+        Rows of a delta replace existing rows with the same id.
+
+        Returns:
+            (row count, sha256 of the file, ids restored)
+        """
+        columns = {column.name: column for column in table.columns}
+        has_tenant_id = 'tenant_id' in columns
+        digest = hashlib.sha256()
+        ids = set()
+        count = 0
+        chunk = []
+
+        def flush(rows):
+            if mode != 'full' and 'id' in columns:
+                TenantBackupService._delete_ids(table, [row['id'] for row in rows], tenant_id)
+            db.session.execute(insert(table), rows)
+
+        with archive.open(f'{name}.ndjson') as entry:
+            for line in entry:
+                digest.update(line)
+                record = json.loads(line)
+                row = {key: _parse_value(columns[key], value) for key, value in record.items() if key in columns}
+                if has_tenant_id:
+                    # CRITICAL: Replace old tenant_id with current tenant_id
+                    row['tenant_id'] = tenant_id
+                if mode != 'full' and 'id' in row:
+                    ids.add(row['id'])
+                chunk.append(row)
+                if len(chunk) >= RESTORE_CHUNK_SIZE:
+                    flush(chunk)
+                    count += len(chunk)
+                    chunk = []
+
+        if chunk:
+            flush(chunk)
+            count += len(chunk)
+
+        # Restored rows keep their ids - move the sequence past them
+        if db.engine.dialect.name == 'postgresql' and count and 'id' in columns:
+            db.session.execute(text(f"""
+                SELECT setval(pg_get_serial_sequence('{table.name}', 'id'),
+                              (SELECT COALESCE(MAX(id), 1) FROM {table.name}))
+            """))
+
+        return count, digest.hexdigest(), ids
+
+    @staticmethod
+    def _apply_tombstones(archive, manifest, tables, tenant_id):
+        """Delete the rows a delta's tombstones list (children of deleted parents first)"""
+        digest = hashlib.sha256()
+        deleted = {}
+        count = 0
+        with archive.open(f'{TOMBSTONES_NAME}.ndjson') as entry:
+            for line in entry:
+                digest.update(line)
+                tombstone = json.loads(line)
+                deleted.setdefault(tombstone['table'], set()).add(tombstone['id'])
+                count += 1
+
+        expected = manifest['tombstones']
+        if count != expected['rows'] or digest.hexdigest() != expected['sha256']:
+            raise ValueError('Backup file is damaged: tombstones do not match the manifest')
+
+        for name, table, parent in reversed(tables):
+            if parent and parent[0].name in deleted:
+                TenantBackupService._delete_ids(table, deleted[parent[0].name], tenant_id, column=parent[1])
+            if table.name in deleted:
+                TenantBackupService._delete_ids(table, deleted[table.name], tenant_id)
+
+    @staticmethod
+    def _apply_backup(archive, manifest, tables, tenant_id, progress):
+        """Restore one backup file of a chain (full: into emptied tables, delta: on top)"""
+        is_delta = manifest['backup_info'].get('kind', 'full') == 'delta'
+        if is_delta:
+            TenantBackupService._apply_tombstones(archive, manifest, tables, tenant_id)
+
+        counts = {}
+        restored_ids = {}  # table -> ids in this delta (children of changed parents are replaced)
+        for index, (name, table, parent) in enumerate(tables):
+            expected = manifest['tables'].get(name)
+            if expected is None:
+                continue
+            progress(index, len(tables), name)
+
+            mode = expected.get('mode', 'full')
+            if mode == 'children':
+                TenantBackupService._delete_ids(
+                    table, restored_ids.get(parent[0].name, ()), tenant_id, column=parent[1]
+                )
+            elif mode == 'snapshot':
+                TenantBackupService.delete_tenant_data(tenant_id, [(name, table, parent)])
+
+            count, checksum, ids = TenantBackupService._restore_table(archive, name, table, tenant_id, mode)
+            if count != expected['rows'] or checksum != expected['sha256']:
+                raise ValueError(f'Backup file is damaged: {name} does not match the manifest')
+            counts[name] = count
+            if is_delta:
+                restored_ids[table.name] = ids
+        return counts
+
+    @staticmethod
+    def restore_backup(tenant_id, files, progress_callback=None):
+        """
+        Replace the tenant's data with a full backup plus its delta chain (one transaction)
+
+        Each table is checked against its manifest's row count and checksum;
+        any mismatch rolls everything back.
+
+        Args:
+            tenant_id: Tenant ID
+            files: Seekable binary files - one full backup ZIP and the deltas taken after it (any order)
+            progress_callback: Optional callable(percent, message)
+
+        Returns:
+            (backup_info of the newest file, {table: rows restored}, number of files applied)
+        """
+        archives = [zipfile.ZipFile(file) for file in files]
+        try:
+            chain = TenantBackupService.order_chain(
+                [(TenantBackupService.read_manifest(archive), archive) for archive in archives]
+            )
+            tables = TenantBackupService._tables()
+
+            # Recorded first: the tombstone triggers skip tenants whose newest record is a restore
+            now = datetime.utcnow()
+            record = TenantBackup(tenant_id=tenant_id, kind=TenantBackup.RESTORE, watermark=now)
+            db.session.add(record)
+            db.session.flush()
+
+            print("🗑️  Deleting existing business data...")
+            TenantBackupService.delete_tenant_data(tenant_id, tables)
+
+            counts = {}
+            for position, (manifest, archive) in enumerate(chain):
+                def progress(index, total, name):
+                    if progress_callback:
+                        percent = (position + index / total) * 95 / len(chain)
+                        progress_callback(int(percent), f'Restoring {name} ({position + 1}/{len(chain)})')
+
+                for name, count in TenantBackupService._apply_backup(
+                    archive, manifest, tables, tenant_id, progress
+                ).items():
+                    counts[name] = counts.get(name, 0) + count
+
+            # Restored items carry the stock totals of their backup - re-sum them
+            ITEM_STOCK_TOTALS.backfill(db.session.connection(), tenant_id)
+
+            # Rows now carry old updated_at values - start a new chain with the
+            # next backup (older tombstones are of no use to it)
+            BackupTombstone.query.filter_by(tenant_id=tenant_id).delete(synchronize_session=False)
+            record.completed_at = datetime.utcnow()
+            record.record_count = sum(counts.values())
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            for archive in archives:
+                archive.close()
+
+        print(f"✅ Restore complete! Imported {sum(counts.values())} records from {len(chain)} file(s)")
+        return chain[-1][0]['backup_info'], counts, len(chain)
@@ -0,0 +1,152 @@
+"""
+Tenant Usage Service
+Cross-tenant usage statistics for the superadmin console
+
+Refreshes tenant_usage_stats for all tenants with one GROUP BY tenant_id
+query per table; pages refresh it when it is older than TENANT_USAGE_STATS_TTL.
+"""
+from models import (
+    db, Tenant, TenantUsageStats, Employee, Attendance, Site, Material,
+    Item, Customer, Vendor, Invoice, PurchaseBill, Expense, Task
+)
+from sqlalchemy import func, case, text
+from datetime import datetime, timedelta
+import os
+
+TENANT_USAGE_STATS_TTL = int(os.environ.get('TENANT_USAGE_STATS_TTL', 600))  # seconds
+RECENT_DAYS = 30
+REFRESH_LOCK_ID = 724_002  # pg_advisory_xact_lock key - one snapshot replace at a time
+
+COUNT_COLUMNS = [
+    'employee_count', 'attendance_count', 'site_count', 'material_count',
+    'item_count', 'customer_count', 'vendor_count', 'invoice_count',
+    'purchase_bill_count', 'expense_count', 'task_count',
+]
+AMOUNT_COLUMNS = ['total_sales', 'recent_sales', 'total_purchases', 'total_expenses_amount', 'recent_expenses']
+
+
+def _sources(recent_since):
+    """(model, count column, last activity column or None, {amount column: expression})"""
+    return [
+        (Employee, 'employee_count', None, {}),
+        (Attendance, 'attendance_count', Attendance.timestamp, {}),
+        (Site, 'site_count', None, {}),
+        (Material, 'material_count', None, {}),
+        (Item, 'item_count', Item.created_at, {}),
+        (Customer, 'customer_count', Customer.created_at, {}),
+        (Vendor, 'vendor_count', Vendor.created_at, {}),
+        (Invoice, 'invoice_count', Invoice.created_at, {
+            'total_sales': Invoice.total_amount,
+            'recent_sales': case((Invoice.invoice_date >= recent_since, Invoice.total_amount), else_=0),
+        }),
+        (PurchaseBill, 'purchase_bill_count', PurchaseBill.created_at, {
+            'total_purchases': PurchaseBill.total_amount,
+        }),
+        (Expense, 'expense_count', Expense.created_at, {
+            'total_expenses_amount': Expense.amount,
+            'recent_expenses': case((Expense.expense_date >= recent_since, Expense.amount), else_=0),
+        }),
+        (Task, 'task_count', Task.created_at, {}),
+    ]
+
+
+class TenantUsageService:
+    """Bulk-refreshed tenant usage statistics"""
+
+    @staticmethod
+    def refresh(tenant_ids=None):
+        """
+        Recompute usage stats with one grouped query per table
+
+        Args:
+            tenant_ids: Tenants to refresh, or None for all tenants
+
+        Returns:
+            Number of tenants refreshed
+        """
+        now = datetime.utcnow()
+        recent_since = (now - timedelta(days=RECENT_DAYS)).date()
+
+        tenant_query = db.session.query(Tenant.id)
+        if tenant_ids is not None:
+            tenant_query = tenant_query.filter(Tenant.id.in_(tenant_ids))
+        stats = {
+            tenant_id: dict({column: 0 for column in COUNT_COLUMNS + AMOUNT_COLUMNS}, last_activity=None)
+            for (tenant_id,) in tenant_query
+        }
+
+        for model, count_column, activity_column, amounts in _sources(recent_since):
+            columns = [model.tenant_id, func.count()]
+            if activity_column is not None:
+                columns.append(func.max(activity_column))
+            columns.extend(func.coalesce(func.sum(expression), 0) for expression in amounts.values())
+
+            query = db.session.query(*columns).group_by(model.tenant_id)
+            if tenant_ids is not None:
+                query = query.filter(model.tenant_id.in_(tenant_ids))
+
+            for row in query:
+                tenant_stats = stats.get(row[0])
+                if tenant_stats is None:
+                    continue  # Rows left behind by a deleted tenant
+                tenant_stats[count_column] = row[1]
+                position = 2
+                if activity_column is not None:
+                    last = row[position]
+                    position += 1
+                    if last and (tenant_stats['last_activity'] is None or last > tenant_stats['last_activity']):
+                        tenant_stats['last_activity'] = last
+                for amount_column, total in zip(amounts, row[position:]):
+                    tenant_stats[amount_column] = total or 0
+
+        # Replace the snapshot in one transaction. Concurrent refreshes (the job and
+        # a page's inline refresh) would both insert after deleting, so serialize them
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {'lock_id': REFRESH_LOCK_ID})
+        delete_query = TenantUsageStats.query
+        if tenant_ids is not None:
+            delete_query = delete_query.filter(TenantUsageStats.tenant_id.in_(tenant_ids))
+        delete_query.delete(synchronize_session=False)
+        db.session.bulk_insert_mappings(TenantUsageStats, [
+            dict(tenant_stats, tenant_id=tenant_id, refreshed_at=now)
+            for tenant_id, tenant_stats in stats.items()
+        ])
+        db.session.commit()
+
+        print(f"📊 Tenant usage stats refreshed for {len(stats)} tenant(s)")
+        return len(stats)
+
+    @staticmethod
+    def _is_stale(oldest_refresh, max_age):
+        return oldest_refresh is None or oldest_refresh < datetime.utcnow() - timedelta(seconds=max_age)
+
+    @staticmethod
+    def get_all(max_age=TENANT_USAGE_STATS_TTL):
+        """
+        {tenant_id: TenantUsageStats} for every tenant, refreshing first if
+        the snapshot is older than max_age seconds or misses a tenant
+        """
+        snapshot = db.session.query(
+            func.count(TenantUsageStats.tenant_id), func.min(TenantUsageStats.refreshed_at)
+        ).one()
+        if snapshot[0] < Tenant.query.count() or TenantUsageService._is_stale(snapshot[1], max_age):
+            TenantUsageService.refresh()
+        return {stats.tenant_id: stats for stats in TenantUsageStats.query.all()}
+
+    @staticmethod
+    def get(tenant_id, max_age=TENANT_USAGE_STATS_TTL):
+        """One tenant's stats (refreshing that tenant if stale)"""
+        stats = db.session.get(TenantUsageStats, tenant_id)
+        if stats is None or TenantUsageService._is_stale(stats.refreshed_at, max_age):
+            TenantUsageService.refresh([tenant_id])
+            stats = db.session.get(TenantUsageStats, tenant_id)
+        return stats
+
+    @staticmethod
+    def totals(max_age=TENANT_USAGE_STATS_TTL):
+        """Counts summed over all tenants (from the snapshot)"""
+        stats = TenantUsageService.get_all(max_age)
+        return {
+            column: sum(getattr(tenant_stats, column) for tenant_stats in stats.values())
+            for column in COUNT_COLUMNS
+        }
@@ -33,7 +33,7 @@ PUBLIC_INVOICE_TEMPLATE = """<!DOCTYPE html>
         .signature-block { display: flex; justify-content: space-between; margin-top: 25px; }
         .signature-box { width: 45%; text-align: center; }
         .signature-line { margin-top: 50px; border-top: 1px solid #444; padding-top: 6px; }
-        @media print { body { background: white; padding: 0; } .invoice { box-shadow: none; max-width: 100%; } }
+        @media print { body { background: white; padding: 0; } .invoice { box-shadow: none; max-width: 100%; } .no-print { display: none; } }
         @media (max-width: 768px) { 
             body { padding: 5px; } 
             .invoice { padding: 10px; font-size: 10px; } 
@@ -173,6 +173,10 @@ PUBLIC_INVOICE_TEMPLATE = """<!DOCTYPE html>
     </div>
 </div>
 
+<div class="no-print" style="text-align: center; margin: 20px 0;">
+    <a href="{{ url_for('public_invoice.download_public_invoice_pdf', token=invoice.public_token) }}" style="display: inline-block; padding: 12px 24px; background: #4CAF50; color: white; text-decoration: none; border-radius: 8px; font-weight: 600;">📄 Download PDF</a>
+</div>
+
 </body>
 </html>
 """
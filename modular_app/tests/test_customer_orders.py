@@ -0,0 +1,42 @@
+"""
+Invoices generated from customer orders
+"""
+from datetime import datetime
+
+import pytz
+
+from models import db, Customer, CustomerOrder, CustomerOrderItem, Invoice, Item
+
+
+def _order(tenant_id, number):
+    customer = Customer(tenant_id=tenant_id, customer_code=f'C-{number}', name='Asha')
+    item = Item(tenant_id=tenant_id, name='Water can', sku=f'SKU-{number}', track_inventory=False)
+    db.session.add_all([customer, item])
+    db.session.flush()
+    order = CustomerOrder(tenant_id=tenant_id, customer_id=customer.id, order_number=number,
+                          subtotal=40, total_amount=40)
+    order.items = [CustomerOrderItem(item_id=item.id, quantity=2, rate=20, amount=40)]
+    db.session.add(order)
+    db.session.commit()
+    return order.id
+
+
+def test_generated_invoices_continue_the_invoice_sequence(app, admin_client, tenant):
+    client, base_url = admin_client
+    tenant_id, _ = tenant
+    year = datetime.now(pytz.timezone('Asia/Kolkata')).year
+    with app.app_context():
+        # A gap in the numbering (deleted invoice) - counting rows would reuse INV-YYYY-0002
+        for number in (1, 3):
+            db.session.add(Invoice(tenant_id=tenant_id, invoice_number=f'INV-{year}-{number:04d}',
+                                   customer_name='Walk-in', total_amount=10))
+        db.session.commit()
+        orders = [_order(tenant_id, 'ORD-1'), _order(tenant_id, 'ORD-2')]
+
+    for order_id in orders:
+        response = client.post(f'/admin/customer-orders/{order_id}/generate-invoice', base_url=base_url)
+        assert response.status_code == 302
+
+    with app.app_context():
+        numbers = [db.session.get(CustomerOrder, order_id).invoice.invoice_number for order_id in orders]
+    assert numbers == [f'INV-{year}-0004', f'INV-{year}-0005']
@@ -0,0 +1,70 @@
+"""
+Metered deliveries - plan rules expanded on demand, exception rows win over the rule
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+from models import db, Customer, CustomerSubscription, SubscriptionPlan
+from services.delivery_engine import DeliveryEngine, ScheduledDelivery
+
+MONDAY = date(2026, 3, 2)
+
+
+@pytest.fixture
+def subscription(app_context, tenant):
+    """2 litres every weekday, for the two weeks starting MONDAY"""
+    tenant_id, _ = tenant
+    plan = SubscriptionPlan(tenant_id=tenant_id, plan_type='metered', name='Milk', unit_rate=50,
+                            unit_name='liter', delivery_pattern='weekdays')
+    customer = Customer(tenant_id=tenant_id, customer_code='C1', name='Asha')
+    subscription = CustomerSubscription(
+        tenant_id=tenant_id, customer=customer, plan=plan, default_quantity=2, status='active',
+        start_date=MONDAY, current_period_start=MONDAY, current_period_end=MONDAY + timedelta(days=13)
+    )
+    db.session.add(subscription)
+    db.session.commit()
+    return subscription
+
+
+def _add_exceptions(subscription):
+    """Pause Tuesday, 5 litres on Wednesday"""
+    DeliveryEngine.pause(subscription, MONDAY + timedelta(days=1), MONDAY + timedelta(days=1))
+    wednesday = DeliveryEngine.materialize(subscription, MONDAY + timedelta(days=2))
+    wednesday.quantity = Decimal('5')
+    wednesday.amount = wednesday.quantity * wednesday.rate
+    wednesday.is_modified = True
+    db.session.commit()
+
+
+def test_expand_follows_the_plan_rules(subscription):
+    deliveries = DeliveryEngine.expand([subscription], MONDAY, MONDAY + timedelta(days=6))
+
+    assert [d.delivery_date for d in deliveries] == [MONDAY + timedelta(days=n) for n in range(5)]
+    assert all(isinstance(d, ScheduledDelivery) and d.quantity == 2 for d in deliveries)
+
+
+def test_exception_rows_replace_their_rule_day(subscription):
+    _add_exceptions(subscription)
+
+    deliveries = DeliveryEngine.expand([subscription], MONDAY, MONDAY + timedelta(days=6))
+
+    assert [(d.delivery_date.weekday(), d.status, d.quantity) for d in deliveries] == [
+        (0, 'delivered', 2), (1, 'paused', 0), (2, 'delivered', 5), (3, 'delivered', 2), (4, 'delivered', 2)
+    ]
+    assert [isinstance(d, ScheduledDelivery) for d in deliveries] == [True, False, False, True, True]
+
+
+def test_period_totals_match_the_expanded_schedule(subscription):
+    _add_exceptions(subscription)
+
+    totals = DeliveryEngine.get_period_totals([subscription])[subscription.id]
+    expanded = [d for d in DeliveryEngine.expand([subscription], subscription.current_period_start,
+                                                 subscription.current_period_end)
+                if d.status != 'paused']
+
+    assert totals['days'] == len(expanded) == 9  # 10 weekdays, 1 paused
+    assert totals['quantity'] == sum(d.quantity for d in expanded) == 8 * 2 + 5
+    assert totals['amount'] == sum(d.amount for d in expanded) == 21 * 50
+    assert totals['modified_days'] == 1
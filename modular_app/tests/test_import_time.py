@@ -0,0 +1,26 @@
+"""
+Cold start import time - `import app` in a fresh interpreter stays within budget
+"""
+from profile_imports import profile_once, IMPORT_TIME_BUDGET_MS
+from routes.registry import CORE_BLUEPRINTS
+
+
+def test_import_app_within_budget(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'import_time.db'}"
+    profile_once('lazy', database_url)  # First import creates the schema - not timed
+
+    runs = [profile_once('lazy', database_url)[0] for _ in range(3)]
+    best = min(runs, key=lambda summary: summary['wall_ms'])
+
+    assert best['wall_ms'] < IMPORT_TIME_BUDGET_MS, (
+        f"import app took {best['wall_ms']:.0f}ms (budget {IMPORT_TIME_BUDGET_MS}ms)"
+    )
+
+
+def test_maintenance_blueprints_not_loaded_at_startup(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'import_time.db'}"
+    summary, entries = profile_once('lazy', database_url)
+
+    assert summary['blueprints'] == len(CORE_BLUEPRINTS)
+    imported = {name for name, *_ in entries}
+    assert 'routes.migration' not in imported
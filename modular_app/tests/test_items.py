@@ -0,0 +1,52 @@
+"""
+Items list - stock from items.total_stock, per-site breakdown on demand
+"""
+from sqlalchemy import event
+
+from models import db, Item, ItemStock, Site
+
+
+def _item_with_stock(app, tenant_id):
+    with app.app_context():
+        sites = [Site(tenant_id=tenant_id, name=name) for name in ('Shop', 'Godown')]
+        item = Item(tenant_id=tenant_id, name='Water can', sku='SKU-1', reorder_point=5)
+        db.session.add_all(sites + [item])
+        db.session.flush()
+        db.session.add_all([ItemStock(tenant_id=tenant_id, item_id=item.id, site_id=site.id,
+                                      quantity_available=quantity)
+                            for site, quantity in zip(sites, (7.5, 2))])
+        db.session.commit()
+        return item.id
+
+
+def test_list_shows_total_stock_without_loading_item_stocks(app, admin_client, tenant):
+    client, base_url = admin_client
+    _item_with_stock(app, tenant[0])
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        response = client.get('/admin/items/', base_url=base_url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+    assert response.status_code == 200
+    assert '9.50 📍' in response.get_data(as_text=True)
+    assert not [s for s in statements if 'FROM item_stocks' in s]
+
+
+def test_stock_by_site(app, admin_client, tenant):
+    client, base_url = admin_client
+    item_id = _item_with_stock(app, tenant[0])
+
+    response = client.get(f'/admin/items/{item_id}/stock-by-site/json', base_url=base_url)
+
+    assert response.get_json() == {
+        'sites': [{'name': 'Godown', 'quantity': 2}, {'name': 'Shop', 'quantity': 7.5}],
+        'total': 9.5
+    }
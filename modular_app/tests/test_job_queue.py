@@ -0,0 +1,81 @@
+"""
+Background job queue - enqueue returns straight away, drains run the jobs
+"""
+import pytest
+
+from models import db
+from models.background_job import BackgroundJob
+from services import job_queue
+from services.job_queue import JobQueue
+
+
+@JobQueue.register('test_echo', max_attempts=1)
+def _echo(context):
+    return {'echo': context.payload.get('value')}
+
+
+@pytest.fixture
+def kicks(monkeypatch):
+    """Drain wake-up requests sent (instead of sending them)"""
+    sent = []
+    monkeypatch.setattr(job_queue.requests, 'post', lambda url, **kwargs: sent.append((url, kwargs)))
+    monkeypatch.setattr(job_queue, 'JOB_DRAIN_KICK', '1')
+    monkeypatch.setattr(job_queue, '_last_kick', 0.0)
+    return sent
+
+
+def test_enqueue_returns_queued_job_and_wakes_a_drain(app, tenant, kicks):
+    tenant_id, subdomain = tenant
+    with app.test_request_context(base_url=f'http://{subdomain}.bizbooks.test'):
+        job = JobQueue.enqueue('test_echo', tenant_id=tenant_id, payload={'value': 1})
+
+        assert job.status == BackgroundJob.QUEUED
+        assert len(kicks) == 1
+        url, kwargs = kicks[0]
+        assert url == f'http://{subdomain}.bizbooks.test/scheduled-tasks/run-background-jobs'
+        assert kwargs['headers'] == {'X-Cron-Secret': 'test-cron-secret'}
+
+
+def test_drain_endpoint_runs_queued_jobs(app, tenant, kicks):
+    tenant_id, _ = tenant
+    with app.app_context():
+        job_id = JobQueue.enqueue('test_echo', tenant_id=tenant_id, payload={'value': 2}).id
+
+    client = app.test_client()
+    assert client.post('/scheduled-tasks/run-background-jobs').status_code == 401
+    response = client.post('/scheduled-tasks/run-background-jobs',
+                           headers={'X-Cron-Secret': 'test-cron-secret'})
+
+    assert response.status_code == 200
+    assert response.get_json()['results']['succeeded'] >= 1
+    with app.app_context():
+        job = db.session.get(BackgroundJob, job_id)
+        assert job.status == BackgroundJob.SUCCEEDED
+        assert job.result == {'echo': 2}
+
+
+def test_drain_out_of_time_wakes_another(app, tenant, kicks, monkeypatch):
+    tenant_id, _ = tenant
+    with app.app_context():
+        job_id = JobQueue.enqueue('test_echo', tenant_id=tenant_id).id
+    kicks.clear()
+    monkeypatch.setenv('JOB_CRON_TIME_BUDGET', '0')
+
+    response = app.test_client().post('/scheduled-tasks/run-background-jobs',
+                                      headers={'X-Cron-Secret': 'test-cron-secret'})
+
+    assert response.get_json()['results']['out_of_time'] is True
+    assert len(kicks) == 1
+    with app.app_context():
+        assert db.session.get(BackgroundJob, job_id).status == BackgroundJob.QUEUED
+        JobQueue.run_pending()  # Leave the queue empty for other tests
+
+
+def test_inline_is_opt_in(app, tenant, kicks, monkeypatch):
+    tenant_id, _ = tenant
+    monkeypatch.setattr(job_queue, 'JOB_RUN_INLINE', '1')
+    with app.app_context():
+        job = JobQueue.enqueue('test_echo', tenant_id=tenant_id, payload={'value': 3})
+
+        assert job.status == BackgroundJob.SUCCEEDED
+        assert kicks == []
@@ -0,0 +1,45 @@
+"""
+Startup schema check - refuse to serve on a database that isn't migrated
+"""
+import os
+import tempfile
+
+import pytest
+from flask import Flask
+
+from models import db
+from models import database
+from models.migrations import run_migrations, current_schema_version, LATEST_SCHEMA_VERSION
+
+
+def _app_on(database_url):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    return app
+
+
+def _empty_database():
+    return f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'empty.db')}"
+
+
+def test_startup_fails_when_the_schema_is_behind(monkeypatch):
+    monkeypatch.setattr(database, 'SCHEMA_AUTO_MIGRATE', '0')
+    app = _app_on(_empty_database())
+
+    with pytest.raises(database.SchemaOutOfDateError, match='python migrate.py'):
+        database.init_db(app)
+
+
+def test_startup_runs_once_migrated(monkeypatch):
+    monkeypatch.setattr(database, 'SCHEMA_AUTO_MIGRATE', '0')
+    monkeypatch.setattr(database, 'SCHEMA_CHECK', '0')  # What migrate.py does
+    database_url = _empty_database()
+    app = _app_on(database_url)
+    database.init_db(app)
+    with app.app_context():
+        run_migrations()
+        assert current_schema_version() == LATEST_SCHEMA_VERSION
+        db.session.remove()
+
+    monkeypatch.setattr(database, 'SCHEMA_CHECK', '1')
+    database.init_db(_app_on(database_url))  # No error
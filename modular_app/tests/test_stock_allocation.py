@@ -0,0 +1,66 @@
+"""
+Invoice stock allocation - FIFO over batches, opening stock only for items without batches
+"""
+from datetime import date
+from decimal import Decimal
+
+from models import db, Item, StockBatch
+from services.stock_batch_service import StockBatchService
+
+
+def _item(tenant_id, name, opening_stock, gst_rate=18):
+    item = Item(tenant_id=tenant_id, name=name, sku=name, opening_stock=opening_stock,
+                gst_rate=gst_rate, cost_price=50)
+    db.session.add(item)
+    db.session.flush()
+    return item
+
+
+def _batch(tenant_id, item, quantity, with_gst, purchase_date):
+    batch = StockBatch(tenant_id=tenant_id, item_id=item.id, purchase_date=purchase_date,
+                       quantity_purchased=quantity, quantity_remaining=quantity,
+                       purchased_with_gst=with_gst, base_cost_per_unit=Decimal('40'),
+                       total_cost_per_unit=Decimal('47.2'), itc_per_unit=Decimal('7.2') if with_gst else 0,
+                       batch_status='active')
+    db.session.add(batch)
+    db.session.flush()
+    return batch
+
+
+def test_fifo_across_batches(app_context, tenant):
+    tenant_id, _ = tenant
+    item = _item(tenant_id, 'FIFO', opening_stock=0)
+    old = _batch(tenant_id, item, 5, True, date(2025, 1, 1))
+    new = _batch(tenant_id, item, 10, True, date(2025, 2, 1))
+
+    allocation = StockBatchService.allocate_stock_for_invoice(
+        [{'item_id': item.id, 'quantity': 8}], 'taxable', tenant_id)
+
+    assert allocation['lines'][0]['status'] == 'success'
+    assert allocation['batch_usage'][old.id]['quantity'] == Decimal('5')
+    assert allocation['batch_usage'][new.id]['quantity'] == Decimal('3')
+    assert allocation['opening_stock_usage'] == {}
+
+
+def test_item_without_batches_sells_from_opening_stock(app_context, tenant):
+    tenant_id, _ = tenant
+    item = _item(tenant_id, 'LEGACY', opening_stock=20)
+
+    allocation = StockBatchService.allocate_stock_for_invoice(
+        [{'item_id': item.id, 'quantity': 4}], 'taxable', tenant_id)
+
+    assert allocation['lines'][0]['uses_fallback'] is True
+    assert allocation['opening_stock_usage'] == {item.id: Decimal('4')}
+
+
+def test_item_with_batches_never_falls_back_to_opening_stock(app_context, tenant):
+    tenant_id, _ = tenant
+    item = _item(tenant_id, 'BATCHED', opening_stock=100)
+    _batch(tenant_id, item, 10, False, date(2025, 1, 1))  # Bought without GST
+
+    # No GST-backed batch for a taxable sale - opening stock must not stand in for it
+    allocation = StockBatchService.allocate_stock_for_invoice(
+        [{'item_id': item.id, 'quantity': 4}], 'taxable', tenant_id)
+
+    assert allocation['lines'][0]['status'] == 'error'
+    assert allocation['opening_stock_usage'] == {}
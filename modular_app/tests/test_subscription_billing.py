@@ -0,0 +1,102 @@
+"""
+Bulk metered billing - resumable runs and per-subscription failure isolation
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from models import (db, Customer, CustomerSubscription, SubscriptionPlan, SubscriptionPayment,
+                    Invoice, BillingRun, BillingRunItem)
+from services import subscription_billing_service
+from services.delivery_engine import DeliveryEngine
+from services.subscription_billing_service import SubscriptionBillingService
+
+
+class Interrupted(Exception):
+    """Stands in for the worker dying between two chunks"""
+
+
+@pytest.fixture
+def subscriptions(app_context, tenant):
+    """Five daily 2-litre milk subscriptions whose period ends today"""
+    tenant_id, _ = tenant
+    today = date.today()
+    plan = SubscriptionPlan(tenant_id=tenant_id, plan_type='metered', name='Milk', unit_rate=50,
+                            unit_name='liter', delivery_pattern='daily')
+    db.session.add(plan)
+    ids = []
+    for n in range(5):
+        customer = Customer(tenant_id=tenant_id, customer_code=f'C{n}', name=f'Customer {n}')
+        subscription = CustomerSubscription(
+            tenant_id=tenant_id, customer=customer, plan=plan, default_quantity=2, status='active',
+            start_date=today - timedelta(days=6), current_period_start=today - timedelta(days=6),
+            current_period_end=today
+        )
+        db.session.add(subscription)
+        db.session.flush()
+        ids.append(subscription.id)
+    db.session.commit()
+    return ids
+
+
+def _invoiced(subscription_ids):
+    """Number of invoices per subscription"""
+    counts = dict.fromkeys(subscription_ids, 0)
+    for payment in SubscriptionPayment.query.filter(SubscriptionPayment.subscription_id.in_(subscription_ids)):
+        counts[payment.subscription_id] += 1
+    return counts
+
+
+def test_interrupted_run_resumes_without_double_billing(tenant, subscriptions, monkeypatch):
+    tenant_id, _ = tenant
+    monkeypatch.setattr(subscription_billing_service, 'BILLING_CHUNK_SIZE', 2)
+
+    def die_after_first_chunk(done, total):
+        raise Interrupted
+
+    with pytest.raises(Interrupted):
+        SubscriptionBillingService.generate_all_invoices(tenant_id, progress_callback=die_after_first_chunk)
+    db.session.rollback()
+
+    run = BillingRun.query.filter_by(tenant_id=tenant_id).one()
+    assert run.status == BillingRun.RUNNING
+    assert run.invoiced_count == 2
+    assert sorted(_invoiced(subscriptions).values()) == [0, 0, 0, 1, 1]
+
+    result = SubscriptionBillingService.generate_all_invoices(tenant_id)
+
+    assert result['run_id'] == run.id  # Same run picked up again
+    assert result['success_count'] == 5
+    assert result['total_amount'] == 5 * 7 * 2 * 50
+    assert set(_invoiced(subscriptions).values()) == {1}
+    assert Invoice.query.filter_by(tenant_id=tenant_id).count() == 5
+    assert BillingRunItem.query.filter_by(run_id=run.id, status=BillingRunItem.INVOICED).count() == 5
+
+    # A new run finds nothing left to bill (billed subscriptions wait for payment)
+    assert SubscriptionBillingService.generate_all_invoices(tenant_id)['success_count'] == 0
+
+
+def test_failing_subscription_does_not_sink_its_chunk(tenant, subscriptions, monkeypatch):
+    tenant_id, _ = tenant
+    broken = subscriptions[2]
+    get_period_totals = DeliveryEngine.get_period_totals
+
+    def totals_with_one_broken(subs, date_to=None):
+        totals = get_period_totals(subs, date_to)
+        if broken in totals:
+            totals[broken]['amount'] = 'not a number'  # Fails after the chunk's invoice numbers are reserved
+        return totals
+
+    monkeypatch.setattr(DeliveryEngine, 'get_period_totals', staticmethod(totals_with_one_broken))
+
+    result = SubscriptionBillingService.generate_all_invoices(tenant_id)
+
+    assert (result['success_count'], result['error_count']) == (4, 1)
+    assert result['errors'][0].startswith(f'Subscription {broken}:')
+    assert _invoiced(subscriptions) == {s: 0 if s == broken else 1 for s in subscriptions}
+    assert db.session.get(CustomerSubscription, broken).status == 'active'  # Billed by the next run
+
+    # The rolled-back savepoints leave no gaps in the invoice numbers
+    numbers = sorted(int(i.invoice_number.rsplit('-', 1)[1]) for i in Invoice.query.filter_by(tenant_id=tenant_id))
+    assert numbers == [1, 2, 3, 4]
+
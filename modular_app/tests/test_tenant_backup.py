@@ -0,0 +1,152 @@
+"""
+Tenant backups - full + delta backups restore to the state of the last backup
+"""
+from datetime import datetime, timedelta
+from io import BytesIO
+
+from models import db, Customer, Invoice, InvoiceItem, BackupTombstone, TenantBackup
+from services import tenant_backup_service
+from services.tenant_backup_service import TenantBackupService
+
+
+def _backup(tenant_id, incremental=False):
+    data = b''.join(TenantBackupService.iter_backup(tenant_id, incremental=incremental))
+    return BytesIO(data)
+
+
+def _customer(tenant_id, code, name):
+    customer = Customer(tenant_id=tenant_id, customer_code=code, name=name)
+    db.session.add(customer)
+    db.session.commit()
+    return customer
+
+
+def _invoice(tenant_id, number, quantities):
+    invoice = Invoice(tenant_id=tenant_id, invoice_number=number, customer_name='Walk-in',
+                      total_amount=sum(quantities) * 10)
+    invoice.items = [
+        InvoiceItem(item_name=f'Line {n}', quantity=quantity, rate=10,
+                    taxable_value=quantity * 10, total_amount=quantity * 10)
+        for n, quantity in enumerate(quantities)
+    ]
+    db.session.add(invoice)
+    db.session.commit()
+    return invoice
+
+
+def _state(tenant_id):
+    """What a restore must bring back"""
+    customers = sorted((c.customer_code, c.name) for c in Customer.query.filter_by(tenant_id=tenant_id))
+    lines = sorted(
+        (invoice.invoice_number, line.item_name, line.quantity)
+        for invoice in Invoice.query.filter_by(tenant_id=tenant_id)
+        for line in invoice.items
+    )
+    return customers, lines
+
+
+def _tombstones(tenant_id):
+    return BackupTombstone.query.filter_by(tenant_id=tenant_id).count()
+
+
+def test_no_tombstones_without_a_backup_chain(app_context, tenant):
+    tenant_id, _ = tenant
+    db.session.delete(_customer(tenant_id, 'C1', 'Never backed up'))
+    db.session.commit()
+
+    assert _tombstones(tenant_id) == 0
+
+
+def test_deletes_after_a_backup_leave_tombstones(app_context, tenant):
+    tenant_id, _ = tenant
+    customer = _customer(tenant_id, 'C1', 'Backed up')
+    _backup(tenant_id)
+
+    db.session.delete(customer)
+    db.session.commit()
+
+    assert _tombstones(tenant_id) == 1
+
+
+def test_restore_leaves_no_tombstones(app_context, tenant):
+    tenant_id, _ = tenant
+    for n in range(3):
+        _customer(tenant_id, f'C{n}', f'Customer {n}')
+    full = _backup(tenant_id)
+
+    TenantBackupService.restore_backup(tenant_id, [full])
+
+    assert _tombstones(tenant_id) == 0
+    assert TenantBackup.latest(tenant_id).kind == TenantBackup.RESTORE
+    db.session.delete(Customer.query.filter_by(tenant_id=tenant_id).first())
+    db.session.commit()
+    assert _tombstones(tenant_id) == 0  # No chain until the next full backup
+
+
+def test_old_tombstones_are_pruned_and_old_parents_force_a_full_backup(app_context, tenant, monkeypatch):
+    tenant_id, _ = tenant
+    customer = _customer(tenant_id, 'C1', 'Old')
+    _backup(tenant_id)
+    db.session.delete(customer)
+    db.session.commit()
+
+    monkeypatch.setattr(tenant_backup_service, 'BACKUP_TOMBSTONE_RETENTION_DAYS', 0)
+    BackupTombstone.query.filter_by(tenant_id=tenant_id).update(
+        {'deleted_at': datetime.utcnow() - timedelta(hours=1)})
+    db.session.commit()
+
+    assert TenantBackupService.prune_tombstones() >= 1
+    assert _tombstones(tenant_id) == 0
+    assert TenantBackupService.delta_parent(tenant_id) is None
+
+
+def test_prune_cron_requires_secret(app):
+    client = app.test_client()
+    assert client.post('/scheduled-tasks/prune-backup-tombstones').status_code == 401
+    response = client.post('/scheduled-tasks/prune-backup-tombstones',
+                           headers={'X-Cron-Secret': 'test-cron-secret'})
+    assert response.status_code == 200
+
+
+def test_full_plus_delta_restores_the_state_at_the_delta(app_context, tenant):
+    tenant_id, _ = tenant
+    kept = _customer(tenant_id, 'C1', 'Kept')
+    removed = _customer(tenant_id, 'C2', 'Removed')
+    invoice = _invoice(tenant_id, 'INV-1', [1, 2])
+    _invoice(tenant_id, 'INV-2', [5])
+    full = _backup(tenant_id)
+
+    # Changes the delta has to carry
+    kept.name = 'Kept (renamed)'
+    db.session.delete(removed)
+    _customer(tenant_id, 'C3', 'Added')
+    invoice.items[0].quantity = 7  # Only a line changes - the invoice row itself doesn't
+    db.session.commit()
+    delta = _backup(tenant_id, incremental=True)
+    expected = _state(tenant_id)
+
+    # Changes after the last backup are lost by the restore
+    _customer(tenant_id, 'C4', 'After backup')
+    Invoice.query.filter_by(tenant_id=tenant_id, invoice_number='INV-2').first().items[0].quantity = 99
+    db.session.commit()
+
+    info, counts, files = TenantBackupService.restore_backup(tenant_id, [delta, full])
+    db.session.expire_all()
+
+    assert files == 2
+    assert _state(tenant_id) == expected
+    assert ('INV-1', 'Line 0', 7) in expected[1]
+
+
+def test_editing_child_rows_bumps_the_parent(app_context, tenant):
+    tenant_id, _ = tenant
+    invoice = _invoice(tenant_id, 'INV-1', [1])
+    db.session.execute(db.text("UPDATE invoices SET updated_at = :old WHERE id = :id"),
+                       {'old': datetime(2020, 1, 1), 'id': invoice.id})
+    db.session.commit()
+
+    invoice.items[0].quantity = 3
+    db.session.commit()
+    db.session.expire_all()
+
+    assert db.session.get(Invoice, invoice.id).updated_at > datetime(2020, 1, 1)
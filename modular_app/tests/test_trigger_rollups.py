@@ -0,0 +1,116 @@
+"""
+Trigger-maintained rollups - what the triggers keep must equal a backfill from the sources
+"""
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+from models import db, Invoice, PurchaseBill, Item, ItemStock, Site
+from models.trigger_rollup import ROLLUPS
+
+DAY = date(2026, 3, 2)
+
+# Rollup contents of one tenant (ordered, comparable)
+SNAPSHOTS = {
+    # The triggers leave a day whose transactions all went away at zero; the backfill has no row
+    'ledger_daily_balances': """
+        SELECT account_head, balance_date, debit_total, credit_total
+        FROM ledger_daily_balances WHERE tenant_id = :tenant_id
+        AND (debit_total != 0 OR credit_total != 0)
+    """,
+    'open_item_balances': """
+        SELECT party_type, party_id, party_name, due_date, open_amount, open_count
+        FROM open_item_balances WHERE tenant_id = :tenant_id
+    """,
+    'daily_tenant_metrics': """
+        SELECT metric_date, sales_total, invoice_count, receivables_total, purchase_total, bill_count
+        FROM daily_tenant_metrics WHERE tenant_id = :tenant_id
+    """,
+    'item_stock_totals': """
+        SELECT id, total_stock, is_low_stock FROM items WHERE tenant_id = :tenant_id
+    """,
+}
+
+
+def _snapshot(name, tenant_id):
+    def value(v):
+        return round(float(v), 2) if isinstance(v, (float, Decimal)) else v
+    rows = db.session.execute(db.text(SNAPSHOTS[name]), {'tenant_id': tenant_id})
+    return sorted(tuple(value(v) for v in row) for row in rows)
+
+
+def _ledger(tenant_id, head, day, debit, credit):
+    return db.session.execute(db.text("""
+        INSERT INTO account_transactions
+        (tenant_id, account_id, transaction_date, transaction_type, debit_amount, credit_amount,
+         balance_after, created_at)
+        VALUES (:tenant_id, NULL, :day, :head, :debit, :credit, 0, CURRENT_TIMESTAMP)
+        RETURNING id
+    """), {'tenant_id': tenant_id, 'head': head, 'day': day, 'debit': debit, 'credit': credit}).scalar()
+
+
+@pytest.fixture
+def edited_documents(app_context, tenant):
+    """Sources of every rollup inserted, then updated and deleted in ways that move rows between keys"""
+    tenant_id, _ = tenant
+
+    invoices = [
+        Invoice(tenant_id=tenant_id, invoice_number=f'INV-{n}', customer_name=name, invoice_date=DAY,
+                total_amount=amount, paid_amount=0, payment_status='unpaid')
+        for n, (name, amount) in enumerate([('Asha', 100.5), ('Asha', 40), ('Ravi', 75), ('Ravi', 10)])
+    ]
+    bills = [
+        PurchaseBill(tenant_id=tenant_id, bill_number=f'B-{uuid.uuid4().hex[:8]}', bill_date=DAY,
+                     vendor_name='Dairy Co', total_amount=amount, status=status, payment_status='unpaid')
+        for amount, status in [(500, 'approved'), (250.5, 'draft'), (80, 'approved')]
+    ]
+    sites = [Site(tenant_id=tenant_id, name=name) for name in ('Shop', 'Godown')]
+    items = [Item(tenant_id=tenant_id, name=f'Item {n}', sku=f'SKU-{n}', reorder_point=5) for n in range(2)]
+    db.session.add_all(invoices + bills + items + sites)
+    db.session.flush()
+    stocks = [ItemStock(tenant_id=tenant_id, item_id=item.id, site_id=site.id, quantity_available=10)
+              for item, site in zip(items, sites)]
+    db.session.add_all(stocks)
+    ledger_ids = [_ledger(tenant_id, head, DAY, debit, credit)
+                  for head, debit, credit in [('sales_income', 0, 100.5), ('accounts_receivable', 100.5, 0),
+                                              ('cash_in_hand', 40, 0)]]
+    db.session.commit()
+
+    # Updates: paid / partly paid, new date, new customer, draft approved, stock moved
+    invoices[0].paid_amount, invoices[0].payment_status = 50, 'partial'
+    invoices[1].paid_amount, invoices[1].payment_status = 40, 'paid'
+    invoices[2].invoice_date = DAY + timedelta(days=1)
+    invoices[3].customer_name = 'Asha'
+    bills[1].status = 'approved'
+    stocks[0].quantity_available = 3
+    stocks[1].item_id = items[0].id
+    db.session.execute(db.text("""
+        UPDATE account_transactions SET credit_amount = 60.25, transaction_date = :day WHERE id = :id
+    """), {'day': DAY + timedelta(days=1), 'id': ledger_ids[0]})
+    db.session.commit()
+
+    # Deletes
+    db.session.delete(invoices[2])
+    db.session.delete(bills[0])
+    db.session.delete(stocks[0])
+    db.session.execute(db.text("DELETE FROM account_transactions WHERE id = :id"), {'id': ledger_ids[2]})
+    db.session.commit()
+    return tenant_id
+
+
+def test_every_rollup_is_covered():
+    assert set(SNAPSHOTS) == set(ROLLUPS)
+
+
+@pytest.mark.parametrize('name', sorted(SNAPSHOTS))
+def test_triggers_match_backfill(edited_documents, name):
+    tenant_id = edited_documents
+    maintained = _snapshot(name, tenant_id)
+    assert maintained
+
+    ROLLUPS[name].backfill(db.session.connection(), tenant_id)
+    db.session.commit()
+
+    assert _snapshot(name, tenant_id) == maintained
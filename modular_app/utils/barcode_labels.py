@@ -0,0 +1,136 @@
+"""
+Barcode Label PDF
+Render printable barcode labels (30 per A4 sheet, Avery A4-J8160 compatible)
+
+Called by the 'barcode_labels' background job - drawing a barcode image per
+label takes minutes for a full catalog.
+"""
+from io import BytesIO
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+
+
+def render_barcode_labels(labels_to_print, progress_callback=None):
+    """
+    Generate PDF with barcode labels for printing
+    
+    Args:
+        labels_to_print: Items (one entry per label) with name, sku, barcode, mrp, selling_price
+        progress_callback: Optional callable(done, total)
+    
+    Returns:
+        PDF bytes
+    """
+    import barcode
+    from barcode.writer import ImageWriter
+    from PIL import Image
+    
+    # Generate PDF
+    pdf_buffer = BytesIO()
+    c = canvas.Canvas(pdf_buffer, pagesize=A4)
+    width, height = A4
+    
+    # Label dimensions for 30 labels per A4 (3 columns x 10 rows)
+    # Standard Avery A4-J8160 compatible
+    label_width = 70 * mm
+    label_height = 29.7 * mm
+    margin_left = 5 * mm
+    margin_top = 10 * mm
+    gap_x = 2.5 * mm
+    gap_y = 0 * mm
+    
+    cols = 3
+    rows = 10
+    labels_per_page = cols * rows
+    
+    page_num = 0
+    
+    for idx, item in enumerate(labels_to_print):
+        if progress_callback:
+            progress_callback(idx, len(labels_to_print))
+        
+        # Calculate position
+        col = idx % cols
+        row = (idx // cols) % rows
+        
+        # New page if needed
+        if idx > 0 and idx % labels_per_page == 0:
+            c.showPage()
+            page_num += 1
+        
+        # Calculate x, y position (top-left origin)
+        x = margin_left + col * (label_width + gap_x)
+        y = height - margin_top - (row + 1) * (label_height + gap_y)
+        
+        # Draw label border (optional - for cutting guide)
+        # c.setStrokeColor(colors.lightgrey)
+        # c.rect(x, y, label_width, label_height)
+        
+        # Item name (top)
+        c.setFont("Helvetica-Bold", 9)
+        name_text = item.name[:35]  # Truncate if too long
+        c.drawString(x + 3*mm, y + label_height - 6*mm, name_text)
+        
+        # Price info (below name)
+        c.setFont("Helvetica", 7)
+        price_text = f"MRP: ₹{item.mrp or item.selling_price:.0f}  |  Price: ₹{item.selling_price:.0f}"
+        c.drawString(x + 3*mm, y + label_height - 11*mm, price_text)
+        
+        # SKU (small)
+        c.setFont("Helvetica", 6)
+        c.drawString(x + 3*mm, y + label_height - 15*mm, f"SKU: {item.sku}")
+        
+        # Generate barcode image
+        if item.barcode:
+            try:
+                # Determine barcode type based on length
+                if len(item.barcode) == 13:
+                    barcode_class = barcode.get_barcode_class('ean13')
+                elif len(item.barcode) == 8:
+                    barcode_class = barcode.get_barcode_class('ean8')
+                else:
+                    barcode_class = barcode.get_barcode_class('code128')
+                
+                # Generate barcode
+                barcode_instance = barcode_class(item.barcode, writer=ImageWriter())
+                
+                # Save to BytesIO
+                barcode_buffer = BytesIO()
+                barcode_instance.write(barcode_buffer, options={
+                    'module_height': 10,
+                    'module_width': 0.25,
+                    'quiet_zone': 2,
+                    'font_size': 8,
+                    'text_distance': 2,
+                    'write_text': True
+                })
+                barcode_buffer.seek(0)
+                
+                # Draw barcode on PDF
+                barcode_img = Image.open(barcode_buffer)
+                
+                # Calculate barcode position and size
+                barcode_x = x + 3*mm
+                barcode_y = y + 3*mm
+                barcode_width = label_width - 6*mm
+                barcode_height = 12*mm
+                
+                # Draw image
+                c.drawInlineImage(
+                    barcode_img,
+                    barcode_x,
+                    barcode_y,
+                    width=barcode_width,
+                    height=barcode_height,
+                    preserveAspectRatio=True
+                )
+                
+            except Exception as e:
+                # Fallback: just print barcode text
+                c.setFont("Courier", 8)
+                c.drawString(x + 3*mm, y + 10*mm, item.barcode)
+    
+    # Save PDF
+    c.save()
+    return pdf_buffer.getvalue()
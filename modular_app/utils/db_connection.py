@@ -0,0 +1,184 @@
+"""
+Database connection management - pool profiles, timeouts and warm-up
+
+DB_POOL_PROFILE picks the engine options: 'serverless' (default on Vercel)
+keeps one pre-pinged connection per function instance, 'long_running'
+(gunicorn, job_worker.py) a QueuePool sized from DB_MAX_CONNECTIONS.
+Settings are applied per transaction with SET LOCAL (PgBouncer transaction
+mode). DB_STATEMENT_TIMEOUT_MS applies to web requests only; override it per
+route with @statement_timeout(ms).
+"""
+import os
+import time
+from functools import wraps
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from flask import g, has_request_context
+from sqlalchemy import event, text
+
+DB_POOL_PROFILE = os.environ.get('DB_POOL_PROFILE', 'auto')  # auto | serverless | long_running
+DB_PGBOUNCER = os.environ.get('DB_PGBOUNCER', 'auto')  # auto | 1 | 0
+DB_MAX_CONNECTIONS = int(os.environ.get('DB_MAX_CONNECTIONS', 20))  # Per deployment, shared by all workers
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # seconds
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))  # seconds to wait for a free connection
+DB_CONNECT_TIMEOUT = int(os.environ.get('DB_CONNECT_TIMEOUT', 10))  # seconds
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))  # 0 = no limit
+DB_TCP_KEEPALIVE = os.environ.get('DB_TCP_KEEPALIVE', '1') == '1'
+DB_KEEPALIVE_IDLE = int(os.environ.get('DB_KEEPALIVE_IDLE', 60))  # seconds idle before the first probe
+DB_SERVERLESS_MAX_OVERFLOW = int(os.environ.get('DB_SERVERLESS_MAX_OVERFLOW', 2))  # beyond the kept connection
+
+PGBOUNCER_PORT = 6543  # Supabase transaction pooler
+
+
+def detect_profile():
+    """'serverless' on Vercel / AWS Lambda, 'long_running' otherwise"""
+    if DB_POOL_PROFILE != 'auto':
+        return DB_POOL_PROFILE
+    if os.environ.get('VERCEL') or os.environ.get('AWS_LAMBDA_FUNCTION_NAME'):
+        return 'serverless'
+    return 'long_running'
+
+
+def prepare_database_url(database_url):
+    """
+    (url, behind_pgbouncer) - strips the ?pgbouncer=true flag, which psycopg2
+    would reject as an unknown connection parameter
+    """
+    parts = urlsplit(database_url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    flag = [value for key, value in query if key == 'pgbouncer']
+    if flag:
+        query = [(key, value) for key, value in query if key != 'pgbouncer']
+        database_url = urlunsplit(parts._replace(query=urlencode(query)))
+
+    if DB_PGBOUNCER != 'auto':
+        return database_url, DB_PGBOUNCER == '1'
+    if flag:
+        return database_url, flag[-1].lower() in ('1', 'true')
+    return database_url, parts.port == PGBOUNCER_PORT
+
+
+def _worker_count():
+    """Web worker processes sharing DB_MAX_CONNECTIONS (gunicorn's WEB_CONCURRENCY)"""
+    try:
+        return max(1, int(os.environ.get('WEB_CONCURRENCY', 1)))
+    except ValueError:
+        return 1
+
+
+def engine_options(database_url, profile=None):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for the database and deployment profile
+
+    Args:
+        database_url: SQLAlchemy URL (after prepare_database_url)
+        profile: 'serverless' or 'long_running' (default: detect_profile())
+
+    The options are the same behind PgBouncer: psycopg2 doesn't use prepared
+    statements, and nothing here is set per connection.
+    """
+    if not database_url.startswith('postgresql'):
+        return {}  # SQLite (local development) - SQLAlchemy's defaults are right
+
+    profile = profile or detect_profile()
+
+    connect_args = {'connect_timeout': DB_CONNECT_TIMEOUT, 'application_name': f'bizbooks-{profile}'}
+    if DB_TCP_KEEPALIVE:
+        # Detect dead connections (NAT / load balancer idle timeouts) instead of hanging on them
+        connect_args.update(keepalives=1, keepalives_idle=DB_KEEPALIVE_IDLE,
+                            keepalives_interval=10, keepalives_count=5)
+
+    if profile == 'serverless':
+        # One request at a time per instance: keep one connection, never queue for it
+        return {
+            'pool_size': 1,
+            'max_overflow': DB_SERVERLESS_MAX_OVERFLOW,
+            'pool_pre_ping': True,  # The instance may have been frozen for a while
+            'pool_recycle': DB_POOL_RECYCLE,
+            'pool_timeout': DB_POOL_TIMEOUT,
+            'connect_args': connect_args,
+        }
+
+    if profile != 'long_running':
+        raise ValueError(f"DB_POOL_PROFILE must be 'auto', 'serverless' or 'long_running', not {profile!r}")
+
+    per_worker = max(2, DB_MAX_CONNECTIONS // _worker_count())
+    pool_size = int(os.environ.get('DB_POOL_SIZE', max(1, per_worker * 2 // 3)))
+    max_overflow = int(os.environ.get('DB_MAX_OVERFLOW', max(0, per_worker - pool_size)))
+    return {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_pre_ping': True,  # Replace connections the server or pooler dropped while idle
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_use_lifo': True,  # Reuse the warmest connection, let the rest go idle and recycle
+        'connect_args': connect_args,
+    }
+
+
+def configure_database(app, database_url):
+    """Set the database URI and engine options on the app (call before init_db)"""
+    database_url, pgbouncer = prepare_database_url(database_url)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(database_url)
+    app.config['DB_POOL_PROFILE'] = detect_profile() if database_url.startswith('postgresql') else 'sqlite'
+    app.config['DB_PGBOUNCER'] = pgbouncer
+
+
+# ============================================================
+# Per-request statement timeouts
+# ============================================================
+
+def statement_timeout(milliseconds):
+    """
+    Route decorator: give this route's queries a different statement timeout
+
+    Args:
+        milliseconds: Timeout for the route's queries, 0 for no limit
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            g.statement_timeout_ms = milliseconds
+
+            # The tenant middleware's transaction may still be open - apply to it too
+            from models import db
+            if db.session().in_transaction() and db.engine.dialect.name == 'postgresql':
+                db.session.execute(text(f"SET LOCAL statement_timeout = {int(milliseconds)}"))
+            return view(*args, **kwargs)
+        return wrapped
+    return decorator
+
+
+def _apply_statement_timeout(connection):
+    """Engine 'begin' hook: SET LOCAL lasts for this transaction only (PgBouncer-safe)"""
+    if not has_request_context():
+        return
+    timeout_ms = g.get('statement_timeout_ms', DB_STATEMENT_TIMEOUT_MS)
+    if timeout_ms or 'statement_timeout_ms' in g:
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+
+
+def init_connection_management(app, db):
+    """Install the statement timeout hook on the app's engine (Postgres only)"""
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name != 'postgresql':
+            return
+        if not event.contains(engine, 'begin', _apply_statement_timeout):
+            event.listen(engine, 'begin', _apply_statement_timeout)
+        print(f"🔌 Database pool: {app.config.get('DB_POOL_PROFILE')} profile"
+              f"{' via PgBouncer' if app.config.get('DB_PGBOUNCER') else ''}, {engine.pool.status()}")
+
+
+def warm_up(db):
+    """
+    Open (or pre-ping) a pooled connection with a trivial query
+
+    Returns:
+        Round trip in milliseconds
+    """
+    start = time.perf_counter()
+    db.session.execute(text('SELECT 1'))
+    db.session.commit()
+    return (time.perf_counter() - start) * 1000
@@ -894,10 +894,9 @@ This is an automated email from {tenant_name}.
     attachments = None
     if invoice and tenant:
         try:
-            from utils.pdf_utils import generate_invoice_pdf
-            pdf_bytes = generate_invoice_pdf(invoice, tenant)
+            from services.invoice_pdf_service import InvoicePdfService
             pdf_filename = f"{invoice_number}.pdf"
-            attachments = [{'filename': pdf_filename, 'data': pdf_bytes.read()}]
+            attachments = [{'filename': pdf_filename, 'data': InvoicePdfService.get_invoice_pdf(invoice, tenant)}]
         except Exception as pdf_error:
             current_app.logger.error(f'Failed to generate PDF for invoice {invoice_number}: {str(pdf_error)}')
             # Continue sending email without attachment if PDF generation fails
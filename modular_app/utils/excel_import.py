@@ -9,6 +9,7 @@ from io import BytesIO
 from datetime import datetime, timedelta
 from models import db, Employee, Item, Customer, Site, ItemCategory, ItemGroup
 from models.subscription import SubscriptionPlan, CustomerSubscription, SubscriptionDelivery
+from models.document_sequence import DocumentSequence
 
 def create_employee_template():
     """
@@ -668,14 +669,374 @@ def import_employees_from_excel(file, tenant_id):
         return 0, [f"File error: {str(e)}"]
 
 
-def import_inventory_from_excel(file, tenant_id):
+# ⚡ Inventory imports are streamed and written in chunks: the workbook is read
+# row by row (read-only mode), lookups are preloaded once per import and each
+# chunk is saved with a handful of bulk INSERTs instead of ~8 queries per row.
+IMPORT_CHUNK_SIZE = 1000
+
+# Column mappings (flexible header names)
+INVENTORY_COLUMN_MAP = {
+    'item_name': ['Item Name', 'Item Name (Auto)', 'Product Name'],
+    'sku': ['SKU'],
+    'barcode': ['Barcode'],
+    'category': ['Category'],
+    'group': ['Group'],
+    'unit': ['Unit'],
+    'stock': ['Stock Quantity', 'Stock'],
+    'reorder_point': ['Reorder Point'],
+    'cost_price': ['Cost Price', 'Cost'],
+    'mrp': ['MRP'],
+    'discount_percent': ['Discount %', 'Discount'],
+    'selling_price': ['Selling Price', 'Selling'],
+    'tax_rate': ['Tax Rate (%)', 'Tax Rate', 'Tax'],
+    'hsn': ['HSN/SAC Code', 'HSN Code', 'HSN'],
+    'description': ['Description']
+}
+
+# Same order as validate_inventory_row expects
+INVENTORY_FIELDS = ['item_name', 'sku', 'barcode', 'category', 'group', 'unit', 'stock', 'reorder_point',
+                    'cost_price', 'mrp', 'discount_percent', 'selling_price', 'tax_rate', 'hsn', 'description']
+
+INVENTORY_REQUIRED_FIELDS = ['item_name', 'category', 'group', 'unit', 'stock', 'cost_price', 'selling_price']
+
+
+def _insert_ignoring_conflicts(model, index_elements):
+    """INSERT ... ON CONFLICT (index_elements) DO NOTHING for the current database"""
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model).on_conflict_do_nothing(index_elements=index_elements)
+
+
+def _clean_attribute_value(value):
+    """Clean up numeric attribute values (32.0 → 32)"""
+    clean_value = str(value).strip()
+    try:
+        float_val = float(clean_value)
+        if float_val.is_integer():
+            clean_value = str(int(float_val))
+    except (ValueError, AttributeError):
+        pass  # Not a number, keep as string
+    return clean_value
+
+
+def _parse_inventory_row(values, row, headers, configured_attributes):
+    """
+    Turn a validated Excel row into Item column values
+    (SKU is resolved later, per chunk)
+    """
+    item_name = values['item_name']
+    stock = values['stock']
+    cost_price = values['cost_price']
+    mrp = values['mrp']
+    discount_percent = values['discount_percent']
+    selling_price = values['selling_price']
+    tax_rate = values['tax_rate']
+    hsn = values['hsn']
+    description = values['description']
+    
+    # PRIORITY-BASED PRICING LOGIC
+    mrp_val = float(mrp) if mrp else None
+    has_discount = discount_percent is not None and str(discount_percent).strip() != ''
+    has_selling = selling_price is not None and str(selling_price).strip() != ''
+    
+    final_selling_price = 0.0
+    final_discount_percent = 0.0
+    
+    # Scenario 1: Both Discount % and Selling Price provided → SELLING PRICE WINS
+    if has_discount and has_selling:
+        final_selling_price = float(selling_price)
+        # Recalculate discount % from MRP and Selling Price
+        if mrp_val and mrp_val > 0:
+            final_discount_percent = ((mrp_val - final_selling_price) / mrp_val) * 100
+            final_discount_percent = round(max(0.0, min(100.0, final_discount_percent)), 2)
+    
+    # Scenario 2: Only Discount % provided → Calculate Selling Price from MRP
+    elif has_discount and not has_selling:
+        final_discount_percent = float(discount_percent)
+        if mrp_val and mrp_val > 0:
+            final_selling_price = mrp_val * (1 - final_discount_percent / 100)
+            final_selling_price = round(final_selling_price, 2)
+    
+    # Scenario 3: Only Selling Price provided → Calculate Discount % from MRP
+    elif has_selling and not has_discount:
+        final_selling_price = float(selling_price)
+        if mrp_val and mrp_val > 0:
+            final_discount_percent = ((mrp_val - final_selling_price) / mrp_val) * 100
+            final_discount_percent = round(max(0.0, min(100.0, final_discount_percent)), 2)
+    
+    # Extract reorder point (optional)
+    reorder_point_val = float(values['reorder_point']) if values['reorder_point'] else 0.0
+    
+    # Clean barcode - handle Excel converting numbers to floats
+    barcode = values['barcode']
+    barcode_clean = None
+    if barcode:
+        try:
+            if isinstance(barcode, float):
+                barcode_clean = str(int(barcode))
+            else:
+                barcode_clean = str(barcode).strip()
+        except:
+            barcode_clean = str(barcode).strip() if barcode else None
+    
+    # Extract attribute values (Phase 3)
+    attribute_data = {}
+    for attr in configured_attributes:
+        col_idx = headers.get(attr.attribute_name)
+        if col_idx is not None and col_idx < len(row):
+            attr_value = row[col_idx]
+            if attr_value is not None and str(attr_value).strip() != '':
+                attribute_data[attr.attribute_name] = _clean_attribute_value(attr_value)
+    
+    stock_val = float(stock) if stock else 0.0
+    cost_val = float(cost_price) if cost_price else 0.0
+    sku = values['sku']
+    
+    return {
+        'name': str(item_name).strip(),
+        'sku': str(sku).strip() if sku is not None and str(sku).strip() != '' else None,
+        'barcode': barcode_clean,
+        'group_name': str(values['group']).strip(),
+        'category_name': str(values['category']).strip(),
+        'unit': str(values['unit']).strip(),
+        'opening_stock': stock_val,
+        'opening_stock_value': stock_val * cost_val,  # ✅ Calculate opening stock value
+        'reorder_point': reorder_point_val,
+        'cost_price': cost_val,
+        'selling_price': final_selling_price,
+        'mrp': mrp_val,
+        'discount_percent': final_discount_percent,
+        'hsn_code': str(hsn).strip() if hsn else None,
+        'gst_rate': float(tax_rate) if tax_rate else 18.0,
+        'tax_preference': f"GST {tax_rate}%" if tax_rate else "GST 18%",
+        'sales_description': str(description).strip() if description else '',
+        'purchase_description': str(description).strip() if description else '',
+        'attribute_data': attribute_data if attribute_data else None  # Phase 3
+    }
+
+
+class _InventoryImportContext:
+    """Lookups loaded once per import and kept up to date chunk by chunk"""
+    
+    def __init__(self, tenant_id):
+        self.tenant_id = tenant_id
+        self.load()
+    
+    def load(self):
+        tenant_id = self.tenant_id
+        
+        # group name -> id, (category name, group id) -> id
+        self.groups = {
+            name: group_id for group_id, name in db.session.query(ItemGroup.id, ItemGroup.name)
+            .filter(ItemGroup.tenant_id == tenant_id).order_by(ItemGroup.id.desc())
+        }
+        self.categories = {
+            (name, group_id): category_id for category_id, name, group_id in
+            db.session.query(ItemCategory.id, ItemCategory.name, ItemCategory.group_id)
+            .filter(ItemCategory.tenant_id == tenant_id).order_by(ItemCategory.id.desc())
+        }
+        
+        # Every SKU in use (existing items + rows already imported from this file)
+        self.skus = {sku for (sku,) in db.session.query(Item.sku).filter(Item.tenant_id == tenant_id)}
+        
+        # Get default site (marked as is_default=True), fallback to first active site
+        default_site = Site.query.filter_by(tenant_id=tenant_id, is_default=True, active=True).first()
+        if not default_site:
+            default_site = Site.query.filter_by(tenant_id=tenant_id, active=True).first()
+        self.default_site_id = default_site.id if default_site else None
+    
+    def resolve_groups_and_categories(self, rows):
+        """Create the chunk's missing groups, then its missing categories (one flush each)"""
+        new_groups = {}
+        for row in rows:
+            name = row['group_name']
+            if name not in self.groups and name not in new_groups:
+                new_groups[name] = ItemGroup(tenant_id=self.tenant_id, name=name)
+        if new_groups:
+            db.session.add_all(new_groups.values())
+            db.session.flush()
+            self.groups.update((name, group.id) for name, group in new_groups.items())
+        
+        new_categories = {}
+        for row in rows:
+            key = (row['category_name'], self.groups[row['group_name']])
+            if key not in self.categories and key not in new_categories:
+                new_categories[key] = ItemCategory(tenant_id=self.tenant_id, name=key[0], group_id=key[1])
+        if new_categories:
+            db.session.add_all(new_categories.values())
+            db.session.flush()
+            self.categories.update((key, category.id) for key, category in new_categories.items())
+    
+    def generate_skus(self, prefixes):
+        """
+        Auto-generate SKUs ({PREFIX}-####) from the tenant's item SKU sequence
+        (one reservation for the whole chunk instead of a COUNT(*) per row)
+        """
+        def highest_sku_number():
+            skus = db.session.query(Item.sku).filter(
+                Item.tenant_id == self.tenant_id,
+                Item.sku.like('ITEM-%')
+            ).all()
+            return DocumentSequence.highest_number(sku for (sku,) in skus)
+        
+        generated = []
+        numbers = []
+        for prefix in prefixes:
+            sku = None
+            while sku is None or sku in self.skus:
+                if not numbers:
+                    numbers = DocumentSequence.reserve(
+                        self.tenant_id, DocumentSequence.ITEM_SKU,
+                        count=max(len(prefixes) - len(generated), 1), seed=highest_sku_number
+                    )
+                sku = f"{prefix}-{numbers.pop(0):04d}"
+            self.skus.add(sku)
+            generated.append(sku)
+        return generated
+
+
+def _save_inventory_chunk(context, chunk, errors):
+    """
+    Write one chunk of parsed rows with bulk inserts and commit it
+    
+    Args:
+        context: _InventoryImportContext
+        chunk: List of (row_num, parsed row)
+        errors: Error list to append to
+    
+    Returns:
+        Number of items created
+    """
+    from models import ItemStock
+    from models.bank_account import AccountTransaction
+    from sqlalchemy import insert
+    from decimal import Decimal
+    import pytz
+    
+    tenant_id = context.tenant_id
+    
+    try:
+        context.resolve_groups_and_categories([row for _, row in chunk])
+        
+        # Rows without SKU get one from the sequence
+        auto_sku_rows = [row for _, row in chunk if not row['sku']]
+        auto_sku_ids = {id(row) for row in auto_sku_rows}
+        for row, sku in zip(auto_sku_rows, context.generate_skus([row['name'][:3].upper() for row in auto_sku_rows])):
+            row['sku'] = sku
+        
+        # Check if item already exists (in the database or earlier in this file)
+        item_rows = []
+        row_nums = {}
+        for row_num, row in chunk:
+            if row['sku'] in row_nums or (id(row) not in auto_sku_ids and row['sku'] in context.skus):
+                errors.append(f"Row {row_num}: Item with SKU {row['sku']} already exists")
+                continue
+            row_nums[row['sku']] = row_num
+            context.skus.add(row['sku'])
+            
+            values = {key: value for key, value in row.items() if key not in ('group_name', 'category_name')}
+            values['tenant_id'] = tenant_id
+            values['item_group_id'] = context.groups[row['group_name']]
+            values['category_id'] = context.categories[(row['category_name'], values['item_group_id'])]
+            values['track_inventory'] = True
+            item_rows.append(values)
+        
+        if not item_rows:
+            db.session.commit()
+            return 0
+        
+        # Bulk insert items; SKUs created concurrently are skipped, not fatal
+        inserted = db.session.execute(
+            _insert_ignoring_conflicts(Item, ['tenant_id', 'sku']).returning(Item.id, Item.sku),
+            item_rows
+        ).fetchall()
+        item_ids = {sku: item_id for item_id, sku in inserted}
+        
+        for values in item_rows:
+            if values['sku'] not in item_ids:
+                errors.append(f"Row {row_nums[values['sku']]}: Item with SKU {values['sku']} already exists")
+        
+        created = [values for values in item_rows if values['sku'] in item_ids]
+        
+        # Create stock records for default site
+        if context.default_site_id and created:
+            db.session.execute(
+                _insert_ignoring_conflicts(ItemStock, ['tenant_id', 'item_id', 'site_id']),
+                [{
+                    'tenant_id': tenant_id,
+                    'item_id': item_ids[values['sku']],
+                    'site_id': context.default_site_id,
+                    'quantity_available': values['opening_stock'],
+                    'stock_value': values['opening_stock_value']
+                } for values in created]
+            )
+            
+            # ✅ Create accounting entries per item (like manual item creation)
+            ist = pytz.timezone('Asia/Kolkata')
+            now = datetime.now(ist)
+            transactions = []
+            for values in created:
+                if values['opening_stock'] <= 0:
+                    continue
+                opening_stock_value = Decimal(str(values['opening_stock_value']))
+                common = {
+                    'tenant_id': tenant_id,
+                    'account_id': None,
+                    'transaction_date': now.date(),
+                    'balance_after': opening_stock_value,
+                    'reference_type': 'item',
+                    'reference_id': item_ids[values['sku']],
+                    'created_at': now,
+                    'created_by': None
+                }
+                # Entry 1: DEBIT Inventory (Stock on Hand)
+                transactions.append({
+                    **common,
+                    'transaction_type': 'inventory_opening_debit',
+                    'debit_amount': opening_stock_value,
+                    'credit_amount': Decimal('0'),
+                    'narration': f"Bulk import - {values['name']} ({values['opening_stock']} {values['unit']} @ ₹{values['cost_price']})"
+                })
+                # Entry 2: CREDIT Owner's Capital - Inventory Opening
+                transactions.append({
+                    **common,
+                    'transaction_type': 'opening_balance_inventory_equity',
+                    'debit_amount': Decimal('0'),
+                    'credit_amount': opening_stock_value,
+                    'narration': f"Bulk import equity - {values['name']}"
+                })
+            
+            if transactions:
+                db.session.execute(insert(AccountTransaction), transactions)
+        
+        db.session.commit()
+        return len(created)
+    
+    except Exception as e:
+        db.session.rollback()
+        first_row, last_row = chunk[0][0], chunk[-1][0]
+        errors.append(f"Rows {first_row}-{last_row}: {str(getattr(e, 'orig', None) or e)}")
+        
+        # Groups/categories/SKUs of the failed chunk were rolled back too
+        context.load()
+        return 0
+
+
+def import_inventory_from_excel(file, tenant_id, progress_callback=None, chunk_size=IMPORT_CHUNK_SIZE):
     """
     Import inventory items from Excel file
     Updated to support dynamic attributes (Phase 3)
+    
+    ⚡ Streams the sheet and saves every `chunk_size` valid rows in one
+    transaction, calling progress_callback(processed_rows, success_count,
+    error_count, total_rows) after each chunk.
+    
     Returns: (success_count, errors_list)
     """
     try:
-        wb = load_workbook(file, data_only=True)
+        wb = load_workbook(file, read_only=True, data_only=True)
         
         # Find the data sheet
         ws = None
@@ -708,300 +1069,76 @@ def import_inventory_from_excel(file, tenant_id):
                 is_active=True
             ).order_by(ItemAttribute.display_order).all()
         
+        rows = ws.iter_rows(values_only=True)
+        
         # Read header row to find column positions
         headers = {}
-        for col_idx, cell in enumerate(ws[1], start=0):
-            if cell.value:
-                header_clean = str(cell.value).strip().replace('*', '').replace('🔶', '').strip()
+        for col_idx, value in enumerate(next(rows, None) or ()):
+            if value:
+                header_clean = str(value).strip().replace('*', '').replace('🔶', '').strip()
                 headers[header_clean] = col_idx
         
-        # Define required column mappings (flexible names)
-        column_map = {
-            'item_name': ['Item Name', 'Item Name (Auto)', 'Product Name'],
-            'sku': ['SKU'],
-            'barcode': ['Barcode'],
-            'category': ['Category'],
-            'group': ['Group'],
-            'unit': ['Unit'],
-            'stock': ['Stock Quantity', 'Stock'],
-            'reorder_point': ['Reorder Point'],
-            'cost_price': ['Cost Price', 'Cost'],
-            'mrp': ['MRP'],
-            'discount_percent': ['Discount %', 'Discount'],
-            'selling_price': ['Selling Price', 'Selling'],
-            'tax_rate': ['Tax Rate (%)', 'Tax Rate', 'Tax'],
-            'hsn': ['HSN/SAC Code', 'HSN Code', 'HSN'],
-            'description': ['Description']
-        }
-        
         # Find column positions for each field
         col_positions = {}
-        for field, possible_names in column_map.items():
+        for field, possible_names in INVENTORY_COLUMN_MAP.items():
             for name in possible_names:
                 if name in headers:
                     col_positions[field] = headers[name]
                     break
         
         # Check if required columns exist
-        required_fields = ['item_name', 'category', 'group', 'unit', 'stock', 'cost_price', 'selling_price']
-        missing_fields = [f for f in required_fields if f not in col_positions]
+        missing_fields = [f for f in INVENTORY_REQUIRED_FIELDS if f not in col_positions]
         if missing_fields:
+            wb.close()
             return 0, [f"Missing required columns: {', '.join(missing_fields)}. Please check your Excel template."]
         
-        # Process data rows (skip header row)
-        for row_num, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
+        context = _InventoryImportContext(tenant_id)
+        total_rows = max((ws.max_row or 1) - 1, 0)  # From the sheet dimensions (estimate)
+        processed = 0
+        chunk = []
+        
+        def save_chunk():
+            nonlocal success_count
+            success_count += _save_inventory_chunk(context, chunk, errors)
+            chunk.clear()
+            if progress_callback:
+                progress_callback(processed, success_count, len(errors), total_rows)
+        
+        # Process data rows (header already consumed)
+        for row_num, row in enumerate(rows, start=2):
+            processed = row_num - 1
+            
             # Skip completely empty rows
             if all(cell is None or str(cell).strip() == '' for cell in row):
                 continue
             
             # Extract data by header position (flexible!)
-            item_name = row[col_positions['item_name']] if 'item_name' in col_positions and col_positions['item_name'] < len(row) else None
-            sku = row[col_positions['sku']] if 'sku' in col_positions and col_positions['sku'] < len(row) else None
-            barcode = row[col_positions['barcode']] if 'barcode' in col_positions and col_positions['barcode'] < len(row) else None
-            category = row[col_positions['category']] if 'category' in col_positions and col_positions['category'] < len(row) else None
-            group = row[col_positions['group']] if 'group' in col_positions and col_positions['group'] < len(row) else None
-            unit = row[col_positions['unit']] if 'unit' in col_positions and col_positions['unit'] < len(row) else None
-            stock = row[col_positions['stock']] if 'stock' in col_positions and col_positions['stock'] < len(row) else None
-            reorder_point = row[col_positions['reorder_point']] if 'reorder_point' in col_positions and col_positions['reorder_point'] < len(row) else None
-            cost_price = row[col_positions['cost_price']] if 'cost_price' in col_positions and col_positions['cost_price'] < len(row) else None
-            mrp = row[col_positions['mrp']] if 'mrp' in col_positions and col_positions['mrp'] < len(row) else None
-            discount_percent = row[col_positions['discount_percent']] if 'discount_percent' in col_positions and col_positions['discount_percent'] < len(row) else None
-            selling_price = row[col_positions['selling_price']] if 'selling_price' in col_positions and col_positions['selling_price'] < len(row) else None
-            tax_rate = row[col_positions['tax_rate']] if 'tax_rate' in col_positions and col_positions['tax_rate'] < len(row) else None
-            hsn = row[col_positions['hsn']] if 'hsn' in col_positions and col_positions['hsn'] < len(row) else None
-            description = row[col_positions['description']] if 'description' in col_positions and col_positions['description'] < len(row) else None
+            values = {
+                field: row[col_positions[field]] if field in col_positions and col_positions[field] < len(row) else None
+                for field in INVENTORY_FIELDS
+            }
             
             # IMPROVED: Skip rows where ALL required fields are empty (handles templates with formulas in empty rows)
-            required_values = [item_name, category, group, unit, stock, cost_price, selling_price]
-            if all(val is None or str(val).strip() == '' for val in required_values):
-                continue  # Skip this row - all required fields are empty
-            
-            # Package for validation
-            row_data = [item_name, sku, barcode, category, group, unit, stock, reorder_point, cost_price, mrp, discount_percent, selling_price, tax_rate, hsn, description]
+            if all(values[f] is None or str(values[f]).strip() == '' for f in INVENTORY_REQUIRED_FIELDS):
+                continue
             
             # Validate
-            is_valid, error_msg = validate_inventory_row(row_data[:15], row_num)
+            is_valid, error_msg = validate_inventory_row([values[f] for f in INVENTORY_FIELDS], row_num)
             if not is_valid:
                 errors.append(error_msg)
                 continue
             
             try:
-                # Get or create group
-                group_obj = ItemGroup.query.filter_by(
-                    tenant_id=tenant_id,
-                    name=str(group).strip()
-                ).first()
-                
-                if not group_obj:
-                    group_obj = ItemGroup(
-                        tenant_id=tenant_id,
-                        name=str(group).strip()
-                    )
-                    db.session.add(group_obj)
-                    db.session.flush()
-                
-                # Get or create category
-                category_obj = ItemCategory.query.filter_by(
-                    tenant_id=tenant_id,
-                    name=str(category).strip(),
-                    group_id=group_obj.id
-                ).first()
-                
-                if not category_obj:
-                    category_obj = ItemCategory(
-                        tenant_id=tenant_id,
-                        name=str(category).strip(),
-                        group_id=group_obj.id
-                    )
-                    db.session.add(category_obj)
-                    db.session.flush()
-                
-                # Generate SKU if not provided
-                if not sku or str(sku).strip() == '':
-                    # Auto-generate SKU
-                    prefix = str(item_name).strip()[:3].upper()
-                    count = Item.query.filter_by(tenant_id=tenant_id).count()
-                    sku = f"{prefix}-{count + 1:04d}"
-                else:
-                    sku = str(sku).strip()
-                
-                # Check if item already exists
-                existing = Item.query.filter_by(
-                    tenant_id=tenant_id,
-                    sku=sku
-                ).first()
-                
-                if existing:
-                    errors.append(f"Row {row_num}: Item with SKU {sku} already exists")
-                    continue
-                
-                # PRIORITY-BASED PRICING LOGIC
-                mrp_val = float(mrp) if mrp else None
-                has_discount = discount_percent is not None and str(discount_percent).strip() != ''
-                has_selling = selling_price is not None and str(selling_price).strip() != ''
-                
-                final_selling_price = 0.0
-                final_discount_percent = 0.0
-                
-                # Scenario 1: Both Discount % and Selling Price provided → SELLING PRICE WINS
-                if has_discount and has_selling:
-                    final_selling_price = float(selling_price)
-                    # Recalculate discount % from MRP and Selling Price
-                    if mrp_val and mrp_val > 0:
-                        final_discount_percent = ((mrp_val - final_selling_price) / mrp_val) * 100
-                        final_discount_percent = round(max(0.0, min(100.0, final_discount_percent)), 2)
-                
-                # Scenario 2: Only Discount % provided → Calculate Selling Price from MRP
-                elif has_discount and not has_selling:
-                    final_discount_percent = float(discount_percent)
-                    if mrp_val and mrp_val > 0:
-                        final_selling_price = mrp_val * (1 - final_discount_percent / 100)
-                        final_selling_price = round(final_selling_price, 2)
-                
-                # Scenario 3: Only Selling Price provided → Calculate Discount % from MRP
-                elif has_selling and not has_discount:
-                    final_selling_price = float(selling_price)
-                    if mrp_val and mrp_val > 0:
-                        final_discount_percent = ((mrp_val - final_selling_price) / mrp_val) * 100
-                        final_discount_percent = round(max(0.0, min(100.0, final_discount_percent)), 2)
-                
-                # Extract reorder point (optional)
-                reorder_point_val = float(reorder_point) if reorder_point else 0.0
-                
-                # Clean barcode - handle Excel converting numbers to floats
-                barcode_clean = None
-                if barcode:
-                    try:
-                        if isinstance(barcode, float):
-                            barcode_clean = str(int(barcode))
-                        else:
-                            barcode_clean = str(barcode).strip()
-                    except:
-                        barcode_clean = str(barcode).strip() if barcode else None
-                
-                # Extract attribute values (Phase 3)
-                attribute_data = {}
-                for attr in configured_attributes:
-                    if attr.attribute_name in headers:
-                        col_idx = headers[attr.attribute_name]
-                        if col_idx < len(row):
-                            attr_value = row[col_idx]
-                            if attr_value is not None and str(attr_value).strip() != '':
-                                # Clean up numeric values (32.0 → 32)
-                                clean_value = str(attr_value).strip()
-                                try:
-                                    # If it's a number like 32.0, convert to 32
-                                    float_val = float(clean_value)
-                                    if float_val.is_integer():
-                                        clean_value = str(int(float_val))
-                                except (ValueError, AttributeError):
-                                    # Not a number, keep as string
-                                    pass
-                                attribute_data[attr.attribute_name] = clean_value
-                
-                # Create item
-                item = Item(
-                    tenant_id=tenant_id,
-                    name=str(item_name).strip(),
-                    sku=sku,
-                    barcode=barcode_clean,
-                    category_id=category_obj.id,
-                    item_group_id=group_obj.id,
-                    unit=str(unit).strip(),
-                    opening_stock=float(stock) if stock else 0.0,
-                    opening_stock_value=(float(stock) if stock else 0.0) * (float(cost_price) if cost_price else 0.0),  # ✅ Calculate opening stock value
-                    reorder_point=reorder_point_val,
-                    cost_price=float(cost_price) if cost_price else 0.0,
-                    selling_price=final_selling_price,
-                    mrp=mrp_val,
-                    discount_percent=final_discount_percent,
-                    hsn_code=str(hsn).strip() if hsn else None,
-                    gst_rate=float(tax_rate) if tax_rate else 18.0,
-                    tax_preference=f"GST {tax_rate}%" if tax_rate else "GST 18%",
-                    sales_description=str(description).strip() if description else '',
-                    purchase_description=str(description).strip() if description else '',
-                    attribute_data=attribute_data if attribute_data else None  # Phase 3
-                )
-                
-                db.session.add(item)
-                db.session.flush()  # Get item.id
-                
-                # Create stock record for default site
-                from models import Site, ItemStock
-                # Get default site (marked as is_default=True)
-                default_site = Site.query.filter_by(
-                    tenant_id=tenant_id,
-                    is_default=True,
-                    active=True
-                ).first()
-                
-                # Fallback to first active site if no default is set
-                if not default_site:
-                    default_site = Site.query.filter_by(tenant_id=tenant_id, active=True).first()
-                
-                if default_site and item.track_inventory:
-                    item_stock = ItemStock(
-                        tenant_id=tenant_id,
-                        item_id=item.id,
-                        site_id=default_site.id,
-                        quantity_available=float(stock) if stock else 0.0,
-                        stock_value=(float(stock) if stock else 0.0) * (float(cost_price) if cost_price else 0.0)
-                    )
-                    db.session.add(item_stock)
-                    
-                    # ✅ Create accounting entries per item (like manual item creation)
-                    if item.opening_stock > 0:
-                        from models.bank_account import AccountTransaction
-                        from datetime import datetime
-                        from decimal import Decimal
-                        import pytz
-                        
-                        ist = pytz.timezone('Asia/Kolkata')
-                        now = datetime.now(ist)
-                        opening_stock_value = item.opening_stock_value
-                        
-                        # Entry 1: DEBIT Inventory (Stock on Hand)
-                        inventory_transaction = AccountTransaction(
-                            tenant_id=tenant_id,
-                            account_id=None,
-                            transaction_date=now.date(),
-                            transaction_type='inventory_opening_debit',
-                            debit_amount=opening_stock_value,
-                            credit_amount=Decimal('0'),
-                            balance_after=opening_stock_value,
-                            reference_type='item',
-                            reference_id=item.id,
-                            narration=f'Bulk import - {item.name} ({item.opening_stock} {item.unit} @ ₹{item.cost_price})',
-                            created_at=now,
-                            created_by=None
-                        )
-                        db.session.add(inventory_transaction)
-                        
-                        # Entry 2: CREDIT Owner's Capital - Inventory Opening
-                        equity_transaction = AccountTransaction(
-                            tenant_id=tenant_id,
-                            account_id=None,
-                            transaction_date=now.date(),
-                            transaction_type='opening_balance_inventory_equity',
-                            debit_amount=Decimal('0'),
-                            credit_amount=opening_stock_value,
-                            balance_after=opening_stock_value,
-                            reference_type='item',
-                            reference_id=item.id,
-                            narration=f'Bulk import equity - {item.name}',
-                            created_at=now,
-                            created_by=None
-                        )
-                        db.session.add(equity_transaction)
-                
-                success_count += 1
-                
+                chunk.append((row_num, _parse_inventory_row(values, row, headers, configured_attributes)))
             except Exception as e:
                 errors.append(f"Row {row_num}: {str(e)}")
                 continue
+            
+            if len(chunk) >= chunk_size:
+                save_chunk()
         
-        # Commit all items at once
-        db.session.commit()
+        save_chunk()
+        wb.close()
         
         return success_count, errors
         
@@ -1021,7 +1158,10 @@ def import_customers_from_excel(file, tenant_id):
         
         success_count = 0
         errors = []
+        rows_to_import = []
+        phones_in_file = set()
         
+        # Pass 1: validate rows and skip duplicates
         # Skip header row, start from row 2
         for row_num, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
             # Skip empty rows
@@ -1030,7 +1170,7 @@ def import_customers_from_excel(file, tenant_id):
             
             # Extract data - match new template format (now with DOB and Anniversary)
             row_data = list(row) + [None] * (12 - len(row))
-            name, phone, email, gstin, address, state, credit_limit, payment_terms, opening_balance, date_of_birth, anniversary_date, notes = row_data[:12]
+            phone = row_data[1]
             
             # Validate
             is_valid, error_msg = validate_customer_row(row_data[:12], row_num)
@@ -1038,26 +1178,27 @@ def import_customers_from_excel(file, tenant_id):
                 errors.append(error_msg)
                 continue
             
+            # Check if customer already exists (in database or earlier in this file)
+            existing = Customer.query.filter_by(
+                tenant_id=tenant_id,
+                phone=str(phone).strip()
+            ).first()
+            
+            if existing or str(phone).strip() in phones_in_file:
+                errors.append(f"Row {row_num}: Customer with phone {phone} already exists")
+                continue
+            
+            phones_in_file.add(str(phone).strip())
+            rows_to_import.append((row_num, row_data))
+        
+        # Reserve all customer codes in one go (instead of re-querying per row)
+        customer_codes = Customer.reserve_customer_codes(tenant_id, len(rows_to_import)) if rows_to_import else []
+        
+        # Pass 2: create customers
+        for (row_num, row_data), customer_code in zip(rows_to_import, customer_codes):
+            name, phone, email, gstin, address, state, credit_limit, payment_terms, opening_balance, date_of_birth, anniversary_date, notes = row_data[:12]
+            
             try:
-                # Check if customer already exists
-                existing = Customer.query.filter_by(
-                    tenant_id=tenant_id,
-                    phone=str(phone).strip()
-                ).first()
-                
-                if existing:
-                    errors.append(f"Row {row_num}: Customer with phone {phone} already exists")
-                    continue
-                
-                # Generate customer code
-                last_customer = Customer.query.filter_by(tenant_id=tenant_id).order_by(Customer.id.desc()).first()
-                if last_customer and last_customer.customer_code:
-                    last_num = int(last_customer.customer_code.split('-')[-1])
-                    next_num = last_num + 1
-                else:
-                    next_num = 1
-                customer_code = f"CUST-{next_num:04d}"
-                
                 # Handle phone as float (Excel issue)
                 phone_final = str(int(phone) if isinstance(phone, float) else phone).strip()
                 
@@ -1415,9 +1556,6 @@ def import_subscription_enrollments_from_excel(file, tenant_id):
     - Same customer + Same plan = SKIP (already enrolled)
     - Same customer + Different plan = CREATE (multiple subscriptions allowed)
     """
-    # Import here to avoid circular imports
-    from routes.subscriptions import should_deliver_on_date
-    
     try:
         wb = load_workbook(file)
         ws = wb.active
@@ -1487,31 +1625,8 @@ def import_subscription_enrollments_from_excel(file, tenant_id):
                 db.session.add(subscription)
                 db.session.flush()  # Get subscription ID
                 
-                # AUTO-GENERATE DELIVERIES for metered plans
-                if plan.plan_type == 'metered':
-                    current_date = start_date
-                    delivery_pattern = plan.delivery_pattern or 'daily'
-                    custom_days = plan.custom_days
-                    
-                    while current_date <= period_end:
-                        if should_deliver_on_date(current_date, delivery_pattern, custom_days, start_date):
-                            # Get customer for delivery assignment
-                            customer = Customer.query.get(customer_id)
-                            
-                            delivery = SubscriptionDelivery(
-                                tenant_id=tenant_id,
-                                subscription_id=subscription.id,
-                                delivery_date=current_date,
-                                quantity=parsed_data['quantity'],
-                                rate=plan.unit_rate,
-                                amount=parsed_data['quantity'] * float(plan.unit_rate),
-                                status='delivered',
-                                is_modified=False,
-                                assigned_to=customer.default_delivery_employee if customer else None
-                            )
-                            db.session.add(delivery)
-                        
-                        current_date += timedelta(days=1)
+                # METERED: deliveries are expanded from the plan's schedule on demand
+                # (DeliveryEngine) - nothing is written per day
                 
                 success_count += 1
                 
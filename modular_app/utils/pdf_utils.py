@@ -1,6 +1,9 @@
 """
 PDF Generation Utilities
 Generate professional PDFs using ReportLab (pure Python, serverless-ready!)
+
+Bump PDF_TEMPLATE_VERSION whenever the layout changes - it's part of the
+PDF cache key (services/invoice_pdf_service.py).
 """
 from io import BytesIO
 from reportlab.lib.pagesizes import A4
@@ -10,6 +13,128 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_LEFT, TA_RIGHT, TA_CENTER
 
+PDF_TEMPLATE_VERSION = 1
+
+# ========== STYLES (built once per process) ==========
+styles = getSampleStyleSheet()
+
+# Company name style
+company_style = ParagraphStyle(
+    'Company',
+    parent=styles['Heading1'],
+    fontSize=16,
+    textColor=colors.black,
+    alignment=TA_LEFT,
+    spaceAfter=2
+)
+
+# TAX INVOICE style (centered, green, smaller)
+tax_invoice_style = ParagraphStyle(
+    'TaxInvoice',
+    parent=styles['Heading1'],
+    fontSize=20,
+    textColor=colors.HexColor('#4CAF50'),
+    alignment=TA_CENTER,
+    fontName='Helvetica-Bold'
+)
+
+# Section heading style
+section_heading_style = ParagraphStyle(
+    'SectionHeading',
+    parent=styles['Heading2'],
+    fontSize=13,
+    textColor=colors.black,
+    fontName='Helvetica-Bold',
+    spaceAfter=6
+)
+
+# Normal text styles
+normal_style = ParagraphStyle(
+    'CustomNormal',
+    parent=styles['Normal'],
+    fontSize=11,
+    leading=14
+)
+
+bold_style = ParagraphStyle(
+    'CustomBold',
+    parent=styles['Normal'],
+    fontSize=11,
+    fontName='Helvetica-Bold',
+    leading=14
+)
+
+right_align_style = ParagraphStyle(
+    'RightAlign',
+    parent=styles['Normal'],
+    fontSize=11,
+    alignment=TA_RIGHT,
+    leading=14
+)
+
+# Header company name (centered)
+company_center_style = ParagraphStyle(
+    'CompanyCenter',
+    parent=styles['Heading1'],
+    fontSize=18,
+    textColor=colors.black,
+    alignment=TA_CENTER,
+    fontName='Helvetica-Bold'
+)
+
+# Left-aligned style for invoice details (first letters match)
+left_detail_style = ParagraphStyle(
+    'LeftDetail',
+    parent=normal_style,
+    alignment=TA_LEFT
+)
+
+# Totals section
+totals_label_style = ParagraphStyle(
+    'TotalsLabel',
+    parent=styles['Normal'],
+    fontSize=11,
+    alignment=TA_RIGHT,
+    leading=16
+)
+
+totals_value_style = ParagraphStyle(
+    'TotalsValue',
+    parent=styles['Normal'],
+    fontSize=11,
+    fontName='Helvetica-Bold',
+    alignment=TA_RIGHT,
+    leading=16
+)
+
+grand_total_label_style = ParagraphStyle(
+    'GrandTotalLabel',
+    parent=styles['Normal'],
+    fontSize=14,
+    fontName='Helvetica-Bold',
+    alignment=TA_RIGHT,
+    leading=20
+)
+
+grand_total_value_style = ParagraphStyle(
+    'GrandTotalValue',
+    parent=styles['Normal'],
+    fontSize=14,
+    fontName='Helvetica-Bold',
+    alignment=TA_RIGHT,
+    leading=20
+)
+
+# Amount in words box
+words_box_style = ParagraphStyle(
+    'WordsBox',
+    parent=styles['Normal'],
+    fontSize=11,
+    leading=14,
+    textColor=colors.HexColor('#1a1a1a')
+)
+
+
 def generate_invoice_pdf(invoice, tenant):
     """
     Generate professional invoice PDF using ReportLab
@@ -30,73 +155,7 @@ def generate_invoice_pdf(invoice, tenant):
     # Container for PDF elements
     elements = []
     
-    # Define custom styles
-    styles = getSampleStyleSheet()
-    
-    # Company name style
-    company_style = ParagraphStyle(
-        'Company',
-        parent=styles['Heading1'],
-        fontSize=16,
-        textColor=colors.black,
-        alignment=TA_LEFT,
-        spaceAfter=2
-    )
-    
-    # TAX INVOICE style (centered, green, smaller)
-    tax_invoice_style = ParagraphStyle(
-        'TaxInvoice',
-        parent=styles['Heading1'],
-        fontSize=20,
-        textColor=colors.HexColor('#4CAF50'),
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    # Section heading style
-    section_heading_style = ParagraphStyle(
-        'SectionHeading',
-        parent=styles['Heading2'],
-        fontSize=13,
-        textColor=colors.black,
-        fontName='Helvetica-Bold',
-        spaceAfter=6
-    )
-    
-    # Normal text styles
-    normal_style = ParagraphStyle(
-        'CustomNormal',
-        parent=styles['Normal'],
-        fontSize=11,
-        leading=14
-    )
-    
-    bold_style = ParagraphStyle(
-        'CustomBold',
-        parent=styles['Normal'],
-        fontSize=11,
-        fontName='Helvetica-Bold',
-        leading=14
-    )
-    
-    right_align_style = ParagraphStyle(
-        'RightAlign',
-        parent=styles['Normal'],
-        fontSize=11,
-        alignment=TA_RIGHT,
-        leading=14
-    )
-    
     # ========== HEADER ROW 1: Company Name (CENTER) | Phone/Email (RIGHT) ==========
-    company_center_style = ParagraphStyle(
-        'CompanyCenter',
-        parent=styles['Heading1'],
-        fontSize=18,
-        textColor=colors.black,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
     # Build right side contact info
     contact_right = [
         Paragraph(f"Phone: {tenant.admin_phone or 'N/A'}", normal_style),
@@ -149,13 +208,6 @@ def generate_invoice_pdf(invoice, tenant):
     if hasattr(invoice.customer, 'state') and invoice.customer.state:
         bill_to_content.append(Paragraph(f"State: {invoice.customer.state}", normal_style))
     
-    # Left-aligned style for invoice details (first letters match)
-    left_detail_style = ParagraphStyle(
-        'LeftDetail',
-        parent=normal_style,
-        alignment=TA_LEFT
-    )
-    
     invoice_details_content = [
         Paragraph("<b>Invoice Details</b>", section_heading_style),
         Paragraph(f"Invoice No: {invoice.invoice_number}", left_detail_style),
@@ -229,41 +281,6 @@ def generate_invoice_pdf(invoice, tenant):
     elements.append(Spacer(1, 8*mm))
     
     # ========== TOTALS SECTION (Right-aligned) ==========
-    totals_label_style = ParagraphStyle(
-        'TotalsLabel',
-        parent=styles['Normal'],
-        fontSize=11,
-        alignment=TA_RIGHT,
-        leading=16
-    )
-    
-    totals_value_style = ParagraphStyle(
-        'TotalsValue',
-        parent=styles['Normal'],
-        fontSize=11,
-        fontName='Helvetica-Bold',
-        alignment=TA_RIGHT,
-        leading=16
-    )
-    
-    grand_total_label_style = ParagraphStyle(
-        'GrandTotalLabel',
-        parent=styles['Normal'],
-        fontSize=14,
-        fontName='Helvetica-Bold',
-        alignment=TA_RIGHT,
-        leading=20
-    )
-    
-    grand_total_value_style = ParagraphStyle(
-        'GrandTotalValue',
-        parent=styles['Normal'],
-        fontSize=14,
-        fontName='Helvetica-Bold',
-        alignment=TA_RIGHT,
-        leading=20
-    )
-    
     # Totals must align with AMOUNT column (last column = 28mm, starting at 157mm from left)
     # Items table columns: 8 + 65 + 22 + 22 + 25 + 15 + 28 = 185mm total
     totals_data = [
@@ -288,16 +305,12 @@ def generate_invoice_pdf(invoice, tenant):
     elements.append(Spacer(1, 6*mm))
     
     # ========== AMOUNT IN WORDS ==========
-    if hasattr(invoice, 'amount_in_words'):
-        words_box_style = ParagraphStyle(
-            'WordsBox',
-            parent=styles['Normal'],
-            fontSize=11,
-            leading=14,
-            textColor=colors.HexColor('#1a1a1a')
-        )
-        
-        words_data = [[Paragraph(f"<b>Amount in Words:</b> {invoice.amount_in_words()}", words_box_style)]]
+    amount_in_words = getattr(invoice, 'amount_in_words', None)
+    if amount_in_words:
+        # Invoice method, or the precomputed text on a batch snapshot
+        if callable(amount_in_words):
+            amount_in_words = amount_in_words()
+        words_data = [[Paragraph(f"<b>Amount in Words:</b> {amount_in_words}", words_box_style)]]
         # MATCH items table width: 185mm
         words_table = Table(words_data, colWidths=[185*mm])
         words_table.setStyle(TableStyle([
@@ -361,3 +374,8 @@ def generate_invoice_pdf(invoice, tenant):
     # Reset pointer to beginning
     pdf_bytes.seek(0)
     return pdf_bytes
+
+
+def render_invoice_pdf_bytes(invoice, tenant):
+    """PDF bytes of one invoice - process pool entry point (takes picklable snapshots)"""
+    return generate_invoice_pdf(invoice, tenant).getvalue()
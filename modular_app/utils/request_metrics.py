@@ -0,0 +1,203 @@
+"""
+Per-request SQL instrumentation
+
+Counts queries and database time per request (Server-Timing header), flags
+N+1 patterns, samples slow queries and keeps per-endpoint latency for
+/superadmin/performance. In memory per worker.
+"""
+import os
+import re
+import time
+import random
+import threading
+from collections import deque, Counter
+from datetime import datetime
+
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+REQUEST_METRICS_ENABLED = os.environ.get('REQUEST_METRICS_ENABLED', '1') == '1'
+SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 200))
+SLOW_QUERY_SAMPLE_RATE = float(os.environ.get('SLOW_QUERY_SAMPLE_RATE', 1.0))  # 0.1 = log 1 in 10
+N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 10))
+ROUTE_SAMPLE_SIZE = 500  # Latencies kept per endpoint for percentiles
+SLOW_QUERY_LOG_SIZE = 200
+MAX_STATEMENT_LENGTH = 500  # Characters kept per logged statement
+
+_lock = threading.Lock()
+_routes = {}  # endpoint -> route stats dict
+_slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+_started_at = datetime.utcnow()
+
+_WHITESPACE = re.compile(r'\s+')
+_IN_LIST = re.compile(r'IN \((?:[^()]|\([^()]*\))*\)', re.IGNORECASE)
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def statement_shape(statement):
+    """SQL with literals and IN-lists collapsed, so repeats of one query compare equal"""
+    shape = _WHITESPACE.sub(' ', statement).strip()
+    shape = _IN_LIST.sub('IN (...)', shape)
+    return _LITERALS.sub('?', shape)[:MAX_STATEMENT_LENGTH]
+
+
+def _percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(percent / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+# ============================================================
+# SQLAlchemy hooks
+# ============================================================
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('query_start_time')
+    if not starts:
+        return
+    elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+
+    in_request = has_request_context() and 'sql_metrics' in g
+    if in_request:
+        metrics = g.sql_metrics
+        metrics['count'] += 1
+        metrics['time_ms'] += elapsed_ms
+        metrics['shapes'][statement_shape(statement)] += 1
+
+    if elapsed_ms >= SLOW_QUERY_MS and random.random() < SLOW_QUERY_SAMPLE_RATE:
+        entry = {
+            'at': datetime.utcnow(),
+            'duration_ms': round(elapsed_ms, 1),
+            'endpoint': (request.endpoint or request.path) if in_request else 'background',
+            'statement': _WHITESPACE.sub(' ', statement).strip()[:MAX_STATEMENT_LENGTH],
+        }
+        with _lock:
+            _slow_queries.append(entry)
+        print(f"🐢 Slow query ({entry['duration_ms']:.0f}ms) in {entry['endpoint']}: {entry['statement'][:200]}")
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute - drop its start time
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_start_time'):
+        connection.info['query_start_time'].pop()
+
+
+# ============================================================
+# Flask hooks
+# ============================================================
+
+def _start_request():
+    g.request_start_time = time.perf_counter()
+    g.sql_metrics = {'count': 0, 'time_ms': 0.0, 'shapes': Counter()}
+
+
+def _finish_request(response):
+    if 'sql_metrics' not in g:
+        return response
+
+    total_ms = (time.perf_counter() - g.request_start_time) * 1000
+    metrics = g.sql_metrics
+    endpoint = request.endpoint or 'unmatched'
+
+    repeated = [(shape, count) for shape, count in metrics['shapes'].items() if count > N_PLUS_ONE_THRESHOLD]
+    for shape, count in repeated:
+        print(f"⚠️  N+1 in {endpoint}: {count}× {shape[:200]}")
+
+    response.headers['Server-Timing'] = (
+        f'db;dur={metrics["time_ms"]:.1f};desc="{metrics["count"]} queries", '
+        f'total;dur={total_ms:.1f}'
+    )
+
+    with _lock:
+        route = _routes.get(endpoint)
+        if route is None:
+            route = _routes[endpoint] = {
+                'requests': 0, 'queries': 0, 'db_ms': 0.0,
+                'durations': deque(maxlen=ROUTE_SAMPLE_SIZE),
+                'n_plus_one_requests': 0, 'n_plus_one_example': None,
+            }
+        route['requests'] += 1
+        route['queries'] += metrics['count']
+        route['db_ms'] += metrics['time_ms']
+        route['durations'].append(total_ms)
+        if repeated:
+            route['n_plus_one_requests'] += 1
+            shape, count = max(repeated, key=lambda item: item[1])
+            route['n_plus_one_example'] = f'{count}× {shape}'
+
+    return response
+
+
+def init_request_metrics(app):
+    """
+    Install the SQL and request hooks (call before other before_request
+    handlers so their queries are counted too)
+    """
+    if not REQUEST_METRICS_ENABLED:
+        return
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+
+# ============================================================
+# Reporting
+# ============================================================
+
+def get_route_stats():
+    """Per-endpoint latency and query stats, slowest p95 first"""
+    with _lock:
+        routes = [(endpoint, dict(route, durations=sorted(route['durations'])))
+                  for endpoint, route in _routes.items()]
+
+    stats = []
+    for endpoint, route in routes:
+        durations = route['durations']
+        stats.append({
+            'endpoint': endpoint,
+            'requests': route['requests'],
+            'p50_ms': round(_percentile(durations, 50), 1),
+            'p95_ms': round(_percentile(durations, 95), 1),
+            'max_ms': round(durations[-1], 1) if durations else 0.0,
+            'avg_queries': round(route['queries'] / route['requests'], 1),
+            'avg_db_ms': round(route['db_ms'] / route['requests'], 1),
+            'n_plus_one_requests': route['n_plus_one_requests'],
+            'n_plus_one_example': route['n_plus_one_example'],
+        })
+    stats.sort(key=lambda item: item['p95_ms'], reverse=True)
+    return stats
+
+
+def get_slow_queries():
+    """Sampled slow queries, newest first"""
+    with _lock:
+        return list(reversed(_slow_queries))
+
+
+def get_metrics_info():
+    return {
+        'pid': os.getpid(),
+        'since': _started_at,
+        'enabled': REQUEST_METRICS_ENABLED,
+        'slow_query_ms': SLOW_QUERY_MS,
+        'slow_query_sample_rate': SLOW_QUERY_SAMPLE_RATE,
+        'n_plus_one_threshold': N_PLUS_ONE_THRESHOLD,
+        'route_sample_size': ROUTE_SAMPLE_SIZE,
+    }
+
+
+def reset_metrics():
+    with _lock:
+        _routes.clear()
+        _slow_queries.clear()
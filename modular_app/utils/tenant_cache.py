@@ -0,0 +1,190 @@
+"""
+In-process tenant cache for the subdomain middleware
+
+TTL + LRU cache per worker of read-only tenant snapshots keyed by subdomain.
+Tenant edits call invalidate_tenant() after commit.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from models import db, Tenant
+
+TENANT_CACHE_TTL = int(os.environ.get('TENANT_CACHE_TTL', 60))  # seconds
+TENANT_CACHE_SIZE = int(os.environ.get('TENANT_CACHE_SIZE', 512))  # subdomains per worker
+UNKNOWN_SUBDOMAIN_TTL = 30  # "Business Not Found" lookups (typos, bots)
+PENDING_COUNT_TTL = 60  # purchase request badge
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a TTL"""
+
+    MISSING = object()
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Cached value, or TTLCache.MISSING if absent/expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return self.MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits * 100.0 / lookups, 1) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+
+# Columns copied into the snapshot (everything the request path reads).
+# Secrets/tokens are deliberately left out - see TenantSnapshot.__getattr__.
+SNAPSHOT_FIELDS = (
+    'id', 'company_name', 'subdomain',
+    'admin_name', 'admin_email', 'admin_phone',
+    'plan', 'status', 'trial_ends_at', 'subscription_ends_at',
+    'max_employees', 'max_sites', 'storage_limit_mb',
+    'features', 'settings',
+    'total_bottles_inventory', 'damaged_bottles_count',
+    'created_at', 'updated_at',
+)
+
+
+class TenantSnapshot:
+    """
+    Immutable copy of a Tenant row, shared by all requests of a worker
+
+    Behaves like the Tenant model for reads (including is_active/is_trial/
+    days_remaining/url). Anything not in the snapshot (password hash,
+    relationships, employee_count...) is read from the request's ORM row.
+    Writes must go through get_current_tenant_record().
+    """
+    __slots__ = SNAPSHOT_FIELDS
+
+    def __init__(self, tenant):
+        for field in SNAPSHOT_FIELDS:
+            object.__setattr__(self, field, getattr(tenant, field))
+
+    # Same business rules as the model
+    is_trial = property(Tenant.is_trial.fget)
+    is_active = property(Tenant.is_active.fget)
+    days_remaining = property(Tenant.days_remaining.fget)
+    url = property(Tenant.url.fget)
+
+    def __getattr__(self, name):
+        # Only called for attributes that aren't in the snapshot
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(load_tenant_record(self.id), name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(
+            f"Tenant snapshot is read-only (tried to set '{name}') - "
+            f"use get_current_tenant_record() to modify the tenant"
+        )
+
+    def __repr__(self):
+        return f'<TenantSnapshot {self.company_name} ({self.subdomain})>'
+
+
+_NOT_FOUND = 'not-found'
+
+_tenants = TTLCache(TENANT_CACHE_SIZE, TENANT_CACHE_TTL)
+_pending_purchase_counts = TTLCache(TENANT_CACHE_SIZE, PENDING_COUNT_TTL)
+
+
+def load_tenant_record(tenant_id):
+    """ORM Tenant row for the current session (identity map = one query per request)"""
+    return db.session.get(Tenant, tenant_id)
+
+
+def get_tenant_snapshot(subdomain):
+    """
+    Resolve a subdomain to a TenantSnapshot (None if no such tenant)
+
+    Hits the database only on a cache miss.
+    """
+    cached = _tenants.get(subdomain)
+    if cached is not TTLCache.MISSING:
+        return None if cached == _NOT_FOUND else cached
+
+    tenant = Tenant.query.filter_by(subdomain=subdomain).first()
+    if tenant is None:
+        _tenants.set(subdomain, _NOT_FOUND, ttl=UNKNOWN_SUBDOMAIN_TTL)
+        return None
+
+    snapshot = TenantSnapshot(tenant)
+    _tenants.set(subdomain, snapshot)
+    return snapshot
+
+
+def invalidate_tenant(subdomain):
+    """Drop a tenant's cached snapshot (call after committing tenant changes)"""
+    _tenants.invalidate(subdomain)
+    print(f"🔄 Tenant cache invalidated: {subdomain}")
+
+
+def get_pending_purchase_count(tenant_id):
+    """Pending purchase requests for the sidebar badge (cached per tenant)"""
+    cached = _pending_purchase_counts.get(tenant_id)
+    if cached is not TTLCache.MISSING:
+        return cached
+
+    from models import PurchaseRequest
+    count = PurchaseRequest.query.filter_by(tenant_id=tenant_id, status='pending').count()
+    _pending_purchase_counts.set(tenant_id, count)
+    return count
+
+
+def invalidate_pending_purchase_count(tenant_id):
+    """Call after a purchase request is created, approved or rejected"""
+    _pending_purchase_counts.invalidate(tenant_id)
+
+
+def get_cache_stats():
+    """Hit/miss counters for this worker (superadmin system health)"""
+    return {
+        'pid': os.getpid(),
+        'tenants': _tenants.stats(),
+        'pending_purchase_counts': _pending_purchase_counts.stats()
+    }
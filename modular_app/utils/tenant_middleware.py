@@ -2,7 +2,8 @@
 Multi-tenant middleware for subdomain-based tenant detection
 """
 from flask import request, g, abort, render_template_string, make_response
-from models import Tenant
+from utils.tenant_cache import (get_tenant_snapshot, get_pending_purchase_count,
+                                load_tenant_record)
 
 def get_subdomain_from_host(host):
     """Extract subdomain from host header"""
@@ -62,8 +63,8 @@ def load_tenant():
         g.subdomain = None
         return
     
-    # Look up tenant by subdomain
-    tenant = Tenant.query.filter_by(subdomain=subdomain).first()
+    # Look up tenant by subdomain (⚡ cached per worker - no DB round trip when warm)
+    tenant = get_tenant_snapshot(subdomain)
     
     # Tenant not found
     if not tenant:
@@ -327,11 +328,7 @@ def load_tenant():
     
     # Add pending purchase requests count for notification badge
     try:
-        from models import PurchaseRequest
-        g.pending_purchase_count = PurchaseRequest.query.filter_by(
-            tenant_id=tenant.id,
-            status='pending'
-        ).count()
+        g.pending_purchase_count = get_pending_purchase_count(tenant.id)
     except:
         g.pending_purchase_count = 0
 
@@ -443,6 +440,17 @@ def get_current_tenant():
     return getattr(g, 'tenant', None)
 
 
+def get_current_tenant_record():
+    """
+    Current tenant as an ORM row (for routes that modify the tenant)
+
+    g.tenant is a shared read-only snapshot - call invalidate_tenant()
+    after committing changes to the returned row.
+    """
+    tenant_id = getattr(g, 'tenant_id', None)
+    return load_tenant_record(tenant_id) if tenant_id else None
+
+
 def get_current_tenant_id():
     """Helper to get current tenant ID or None"""
     return getattr(g, 'tenant_id', None)
@@ -0,0 +1,17 @@
+#!/bin/bash
+# Vercel build command (vercel.json) - runs once per deploy, before any
+# function serves traffic.
+#
+# 1. Apply pending schema migrations: the app refuses to start on an older
+#    schema. Needs DATABASE_URL available to builds (Vercel project env vars,
+#    Production + Preview).
+# 2. Publish static/ to the CDN output directory.
+
+set -euo pipefail
+
+python3 -m pip install --quiet -r requirements.txt
+python3 migrate.py
+
+rm -rf public
+mkdir -p public
+cp -r static public/static